@@ -29,6 +29,7 @@ from monailabel.endpoints import (
     info,
     login,
     logs,
+    metrics,
     model,
     ohif,
     proxy,
@@ -52,6 +53,7 @@ async def lifespan(app: FastAPI):
 
     yield
     print("App Shutdown...")
+    instance.on_shutdown()
 
 
 app = FastAPI(
@@ -93,6 +95,7 @@ app.include_router(batch_infer.router, prefix=settings.MONAI_LABEL_API_STR)
 app.include_router(scoring.router, prefix=settings.MONAI_LABEL_API_STR)
 app.include_router(datastore.router, prefix=settings.MONAI_LABEL_API_STR)
 app.include_router(logs.router, prefix=settings.MONAI_LABEL_API_STR)
+app.include_router(metrics.router, prefix=settings.MONAI_LABEL_API_STR)
 app.include_router(ohif.router, prefix=settings.MONAI_LABEL_API_STR)
 app.include_router(proxy.router, prefix=settings.MONAI_LABEL_API_STR)
 app.include_router(session.router, prefix=settings.MONAI_LABEL_API_STR)
@@ -66,9 +66,14 @@ class Settings(BaseSettings):
     MONAI_LABEL_DICOMWEB_CACHE_EXPIRY: int = 7200
     MONAI_LABEL_DICOMWEB_PROXY_TIMEOUT: float = 30.0
     MONAI_LABEL_DICOMWEB_READ_TIMEOUT: float = 5.0
+    MONAI_LABEL_DICOMWEB_INDEX_WORKERS: int = 8
+    MONAI_LABEL_DICOM_DECODE_WORKERS: int = 4  # processes decoding compressed series (RLE / JPEG-LS / JPEG 2000); 0 uses SimpleITK
 
     MONAI_LABEL_DATASTORE_AUTO_RELOAD: bool = True
     MONAI_LABEL_DATASTORE_READ_ONLY: bool = False
+    MONAI_LABEL_DATASTORE_AUTO_RELOAD_DEBOUNCE: float = 1.0
+    MONAI_LABEL_DATASTORE_FULL_SCAN_INTERVAL: float = 600
+    MONAI_LABEL_DATASTORE_INDEX: str = "json"  # json | sqlite (local datastore only)
     MONAI_LABEL_DATASTORE_FILE_EXT: List[str] = [
         "*.nii.gz",
         "*.nii",
@@ -89,6 +94,29 @@ class Settings(BaseSettings):
     MONAI_LABEL_SESSION_PATH: str = ""
     MONAI_LABEL_SESSION_EXPIRY: int = 3600
 
+    MONAI_LABEL_SAM2_DEVICE: str = ""  # cuda | cpu; cuda when available if empty
+    MONAI_LABEL_SAM2_AUTOCAST: bool = True  # bf16 on cuda and on cpus with native bf16
+    MONAI_LABEL_SAM2_QUANTIZE: bool = False  # dynamic int8 linear layers (cpu only)
+    MONAI_LABEL_SAM2_NUM_THREADS: int = 0  # torch cpu threads; 0 keeps the default
+    MONAI_LABEL_SAM2_ONNX_ENCODER: str = ""  # exported image encoder (sam2.utils.onnx_utils) run in onnxruntime
+    MONAI_LABEL_MEDSAM2_ONNX_ENCODER: str = ""
+    MONAI_LABEL_SAM2_FEATURE_CACHE_MB: int = 1024  # image features kept per volume across requests; 0 disables
+    MONAI_LABEL_SAM2_SPECULATIVE_SLICES: int = 2  # neighbouring slices encoded ahead after a single-slice prompt
+    MONAI_LABEL_MODEL_BUDGET_MB: int = 0  # device memory for nnInteractive / SAM2 / MedSAM2; 0 keeps all resident
+    MONAI_LABEL_MODEL_OFFLOAD: str = "cpu"  # where evicted models go: cpu | disk (dropped, mmapped back)
+    MONAI_LABEL_MODEL_OFFLOAD_DIR: str = ""
+    MONAI_LABEL_INTERACTIVE_DEVICES: List[str] = []  # one nnInteractive / SAM2 / MedSAM2 replica per device
+    MONAI_LABEL_INTERACTIVE_MAX_QUEUE: int = 2  # queued requests at which a replica is saturated; 0 never rebalances
+    MONAI_LABEL_NNINTER_UNDO_DEPTH: int = 20  # undo / redo steps of an nnInteractive session; 0 disables
+    MONAI_LABEL_SCHEDULER_SLOTS: int = 2  # concurrent device work (infer / batch / scoring) per device; 0 disables
+    MONAI_LABEL_SCHEDULER_LIMITS: Dict[str, int] = {"batch": 1, "scoring": 1}  # slots per priority class
+    MONAI_LABEL_TRANSFORM_CACHE_MB: int = 1024  # pre-transform results (CacheTransformDatad) kept in memory
+    MONAI_LABEL_TRANSFORM_CACHE_DISK_MB: int = 4096  # same, spilled to memory-mapped .npy files; 0 disables
+    MONAI_LABEL_RESULT_CACHE_MB: int = 256  # packed results of repeated SAM2 requests kept in memory; 0 disables
+    MONAI_LABEL_RESULT_CACHE_DISK_MB: int = 0  # same, on disk (survives restarts); 0 disables
+    MONAI_LABEL_RESULT_CACHE_PATH: str = ""  # directory of the disk tier; "" for ~/.cache/monailabel/results
+    MONAI_LABEL_TRACE_PATH: str = ""  # record /infer requests per session as JSONL (see monailabel replay); "" disables
+
     MONAI_LABEL_INFER_CONCURRENCY: int = -1
     MONAI_LABEL_INFER_TIMEOUT: int = 600
     MONAI_LABEL_TRACKING_ENABLED: bool = True
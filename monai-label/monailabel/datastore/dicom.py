@@ -13,6 +13,7 @@ import logging
 import os
 import pathlib
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import requests
@@ -23,7 +24,7 @@ from pydicom.dataset import Dataset
 from monailabel.config import settings
 from monailabel.datastore.local import LocalDatastore
 from monailabel.datastore.utils.convert import binary_to_image, dicom_to_nifti, nifti_to_dicom_seg
-from monailabel.datastore.utils.dicom import dicom_web_download_series, dicom_web_upload_dcm
+from monailabel.datastore.utils.dicom import DICOMwebSegIndex, dicom_web_download_series, dicom_web_upload_dcm
 from monailabel.interfaces.datastore import DefaultLabelTag
 from monailabel.utils.others.generic import md5_digest
 
@@ -47,12 +48,14 @@ class DICOMWebDatastore(LocalDatastore):
         cache_path: Optional[str] = None,
         fetch_by_frame=False,
         convert_to_nifti=True,
+        index_workers=8,
     ):
         self._client = client
         self._search_filter = search_filter
         self._fetch_by_frame = fetch_by_frame
         self._convert_to_nifti = convert_to_nifti
         self._studyInstanceUID = ""
+        self._index_workers = index_workers
 
         uri_hash = md5_digest(self._client.base_url)
         datastore_path = (
@@ -64,6 +67,13 @@ class DICOMWebDatastore(LocalDatastore):
         logger.info(f"DICOMWeb Convert To Nifti: {convert_to_nifti}")
         super().__init__(datastore_path=datastore_path, auto_reload=True)
 
+        self._seg_index = DICOMwebSegIndex(
+            client,
+            os.path.join(datastore_path, "seg_index.json"),
+            max_workers=index_workers,
+            refresh_interval=settings.MONAI_LABEL_DICOMWEB_CACHE_EXPIRY,
+        )
+
     def name(self) -> str:
         base_url: str = self._client.base_url
         return base_url
@@ -134,36 +144,22 @@ class DICOMWebDatastore(LocalDatastore):
         logger.debug("Total Series: {}\n{}".format(len(series), "\n".join(series)))
         return series
 
-    @cached(cache=TTLCache(maxsize=16, ttl=settings.MONAI_LABEL_DICOMWEB_CACHE_EXPIRY))
-    def get_labeled_images(self, label_tag: Optional[str] = None, labels: Optional[List[str]] = None) -> List[str]:
-        datasets = self._client.search_for_series(search_filters={"Modality": "SEG"})
-        all_segs = [Dataset.from_json(ds) for ds in datasets]
+    def _image_labels(self, force=False) -> List[Dict[str, str]]:
+        self._seg_index.refresh(force=force)
+        images = set(self.list_images())
 
-        image_series = []
-        for seg in all_segs:
-            meta = self._client.retrieve_series_metadata(
-                str(seg["StudyInstanceUID"].value), str(seg["SeriesInstanceUID"].value)
-            )
-            seg_meta = Dataset.from_json(meta[0])
-            if seg_meta.get("ReferencedSeriesSequence"):
-                referenced_series_instance_uid = str(
-                    seg_meta["ReferencedSeriesSequence"].value[0]["SeriesInstanceUID"].value
-                )
-                if referenced_series_instance_uid in self.list_images():
-                    image_series.append(referenced_series_instance_uid)
-                else:
-                    logger.warning(
-                        "Label Ignored:: ReferencedSeriesSequence is NOT in filtered image list: {}".format(
-                            str(seg["SeriesInstanceUID"].value)
-                        )
-                    )
+        image_labels = []
+        for label, image in self._seg_index.labels():
+            if not image:
+                logger.warning(f"Label Ignored:: ReferencedSeriesSequence is NOT found: {label}")
+            elif image not in images:
+                logger.warning(f"Label Ignored:: ReferencedSeriesSequence is NOT in filtered image list: {label}")
             else:
-                logger.warning(
-                    "Label Ignored:: ReferencedSeriesSequence is NOT found: {}".format(
-                        str(seg["SeriesInstanceUID"].value)
-                    )
-                )
-        return image_series
+                image_labels.append({"image": image, "label": label})
+        return image_labels
+
+    def get_labeled_images(self, label_tag: Optional[str] = None, labels: Optional[List[str]] = None) -> List[str]:
+        return [image_label["image"] for image_label in self._image_labels()]
 
     def get_unlabeled_images(self, label_tag: Optional[str] = None, labels: Optional[List[str]] = None) -> List[str]:
         series = self.list_images()
@@ -206,6 +202,8 @@ class DICOMWebDatastore(LocalDatastore):
                 }
             )
             os.unlink(label_file)
+            if label_series_id:
+                self._seg_index.add(label_series_id, str(image_info.get("StudyInstanceUID")), image_id)
 
         label_id = super().save_label(image_id, label_filename, label_tag, label_info)
         logger.info("Save completed!")
@@ -215,38 +213,7 @@ class DICOMWebDatastore(LocalDatastore):
         return label_id
 
     def _download_labeled_data(self):
-        datasets = self._client.search_for_series(search_filters={"Modality": "SEG"})
-        all_segs = [Dataset.from_json(ds) for ds in datasets]
-
-        image_labels = []
-        for seg in all_segs:
-            meta = self._client.retrieve_series_metadata(
-                str(seg["StudyInstanceUID"].value), str(seg["SeriesInstanceUID"].value)
-            )
-            seg_meta = Dataset.from_json(meta[0])
-            if seg_meta.get("ReferencedSeriesSequence"):
-                referenced_series_instance_uid = str(
-                    seg_meta["ReferencedSeriesSequence"].value[0]["SeriesInstanceUID"].value
-                )
-                if referenced_series_instance_uid in self.list_images():
-                    image_labels.append(
-                        {
-                            "image": str(seg_meta["ReferencedSeriesSequence"].value[0]["SeriesInstanceUID"].value),
-                            "label": str(seg["SeriesInstanceUID"].value),
-                        }
-                    )
-                else:
-                    logger.warning(
-                        "Label Ignored:: ReferencedSeriesSequence is NOT in filtered image list: {}".format(
-                            str(seg["SeriesInstanceUID"].value)
-                        )
-                    )
-            else:
-                logger.warning(
-                    "Label Ignored:: ReferencedSeriesSequence is NOT found: {}".format(
-                        str(seg["SeriesInstanceUID"].value)
-                    )
-                )
+        image_labels = self._image_labels(force=True)
 
         invalid = set(super().get_labeled_images()) - {image_label["image"] for image_label in image_labels}
         logger.info(f"Invalid Labels: {invalid}")
@@ -257,11 +224,17 @@ class DICOMWebDatastore(LocalDatastore):
                 shutil.rmtree(os.path.join(os.path.dirname(label_uri), e), ignore_errors=True)
                 os.unlink(label_uri)
 
+        # first label wins when an image has more than one SEG (same as fetching them in sequence)
+        unique: Dict[str, str] = {}
         for image_label in image_labels:
-            self.get_image_uri(image_id=image_label["image"])
-            self.get_label_uri(
-                label_id=image_label["label"], label_tag=DefaultLabelTag.FINAL, image_id=image_label["image"]
-            )
+            unique.setdefault(image_label["image"], image_label["label"])
+
+        def _download(image_id, label_id):
+            self.get_image_uri(image_id=image_id)
+            self.get_label_uri(label_id=label_id, label_tag=DefaultLabelTag.FINAL, image_id=image_id)
+
+        with ThreadPoolExecutor(max_workers=self._index_workers, thread_name_prefix="DICOMFetch") as executor:
+            list(executor.map(_download, unique.keys(), unique.values()))
 
     def datalist(self, full_path=True) -> List[Dict[str, Any]]:
         self._download_labeled_data()
@@ -18,6 +18,7 @@ import os
 import pathlib
 import shutil
 import tempfile
+import threading
 import time
 import zipfile
 from typing import Any, Dict, List, Optional, Tuple
@@ -105,6 +106,8 @@ class LocalDatastore(Datastore):
         extensions=("*.nii.gz", "*.nii"),
         auto_reload=False,
         read_only=False,
+        auto_reload_debounce: float = 1.0,
+        full_scan_interval: float = 600,
     ):
         """
         Creates a `LocalDataset` object
@@ -116,6 +119,13 @@ class LocalDatastore(Datastore):
 
         `datastore_config: str`
             optional file name of the dataset configuration file (by default `dataset.json`)
+
+        `auto_reload_debounce: float`
+            seconds to collect file events before applying them as one batch (when `auto_reload` is enabled)
+
+        `full_scan_interval: float`
+            seconds between full reconciliations with the files on disk (when `auto_reload` is enabled);
+            0 disables the periodic scan
         """
         self._datastore_path = datastore_path
         self._datastore_config_path = os.path.join(datastore_path, datastore_config)
@@ -124,6 +134,23 @@ class LocalDatastore(Datastore):
         self._ignore_event_config = False
         self._config_ts = 0
         self._auto_reload = auto_reload
+        self._auto_reload_debounce = auto_reload_debounce
+        self._full_scan_interval = full_scan_interval
+
+        self._index_lock = threading.RLock()
+        self._events_lock = threading.Lock()
+        self._pending_events: Dict[str, float] = {}
+        self._events_timer: Optional[threading.Timer] = None
+        self._stop_scan = threading.Event()
+        self._reload_stats: Dict[str, Any] = {
+            "events": 0,
+            "batches": 0,
+            "last_event_lag": 0.0,
+            "max_event_lag": 0.0,
+            "scans": 0,
+            "last_scan_ts": 0,
+            "last_scan_duration": 0.0,
+        }
 
         logging.getLogger("filelock").setLevel(logging.ERROR)
 
@@ -165,6 +192,7 @@ class LocalDatastore(Datastore):
             self._handler = PatternMatchingEventHandler(patterns=include_patterns)
             self._handler.on_created = self._on_any_event
             self._handler.on_deleted = self._on_any_event
+            self._handler.on_moved = self._on_any_event
             self._handler.on_modified = self._on_modify_event
 
             try:
@@ -180,6 +208,10 @@ class LocalDatastore(Datastore):
                 )
                 logger.error(str(e))
 
+            if full_scan_interval > 0:
+                self._scanner = threading.Thread(target=self._run_full_scans, name="datastore-scan", daemon=True)
+                self._scanner.start()
+
     def name(self) -> str:
         """
         Dataset name (if one is assigned)
@@ -398,7 +430,7 @@ class LocalDatastore(Datastore):
                         path = d[key]
                         archive.write(path, arcname=os.path.join(key, os.path.basename(path)))
                 # add metadata
-                datastore_metadata: str = self._datastore.model_dump_json(exclude={"base_path"})
+                datastore_metadata: str = self._to_model().model_dump_json(exclude={"base_path"})
                 archive.writestr("metadata.json", datastore_metadata)
 
             assert archive.filename is not None, "ZIP archive could not be created"
@@ -412,7 +444,107 @@ class LocalDatastore(Datastore):
             return
 
         logger.debug(f"Event: {event}")
-        self.refresh()
+        now = time.time()
+        paths = [event.src_path, getattr(event, "dest_path", "")]
+        with self._events_lock:
+            for path in paths:
+                if path:
+                    self._pending_events.setdefault(path, now)
+
+            # flush at most `debounce` seconds after the first pending event (a busy copy can't starve the batch)
+            if self._events_timer is None and not self._stop_scan.is_set():
+                self._events_timer = threading.Timer(self._auto_reload_debounce, self._flush_events)
+                self._events_timer.daemon = True
+                self._events_timer.start()
+
+    def _flush_events(self):
+        with self._events_lock:
+            events, self._pending_events = self._pending_events, {}
+            self._events_timer = None
+        if not events:
+            return
+
+        logger.debug(f"Apply {len(events)} file event(s)")
+        self._apply_fs_changes(list(events.keys()))
+
+        lag = time.time() - min(events.values())
+        with self._index_lock:
+            self._reload_stats["events"] += len(events)
+            self._reload_stats["batches"] += 1
+            self._reload_stats["last_event_lag"] = lag
+            self._reload_stats["max_event_lag"] = max(lag, self._reload_stats["max_event_lag"])
+
+    def _run_full_scans(self):
+        while not self._stop_scan.wait(self._full_scan_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.exception(f"Failed to reconcile datastore => {e}")
+
+    def _fs_changes(self, paths: List[str]) -> List[Tuple[Optional[str], str, str, bool]]:
+        """
+        Map changed file paths to index entries: (label tag or None for an image, id, ext, exists on disk).
+        Images come first so labels created in the same batch find their image.
+        """
+        image_path = os.path.realpath(self._datastore.image_path())
+        labels_path = os.path.realpath(self._datastore.label_path(None))
+
+        changes = []
+        for path in paths:
+            name = os.path.basename(path)
+            if not any(fnmatch.fnmatch(name, pattern) for pattern in self._extensions):
+                continue
+
+            dirname = os.path.realpath(os.path.dirname(path))
+            if dirname == image_path:
+                tag = None
+            elif os.path.dirname(dirname) == labels_path:
+                tag = os.path.basename(dirname)
+            else:
+                continue
+
+            id, ext = self._to_id(name)
+            changes.append((tag, id, ext, os.path.isfile(path)))
+
+        return sorted(changes, key=lambda c: c[0] is not None)
+
+    def _apply_fs_changes(self, paths: List[str]) -> int:
+        """
+        Apply the final on-disk state of the given paths to the index (instead of a full reconcile)
+        """
+        invalidate = 0
+        with self._index_lock:
+            self._init_from_datastore_file()
+            for tag, id, ext, exists in self._fs_changes(paths):
+                obj = self._datastore.objects.get(id)
+                name = self._filename(id, ext)
+                if tag is None:
+                    if exists and not obj:
+                        logger.info(f"Adding New Image: {id} => {name}")
+                        info = {"ts": int(time.time()), "name": name}
+                        self._datastore.objects[id] = ImageLabelModel(image=DataModel(info=info, ext=ext))
+                        invalidate += 1
+                    elif not exists and obj and obj.image.ext == ext:
+                        logger.info(f"Removing non existing Image Id: {id}")
+                        self._datastore.objects.pop(id)
+                        invalidate += 1
+                    continue
+
+                label = obj.labels.get(tag) if obj else None
+                if exists and not obj:
+                    logger.warning(f"IGNORE:: No matching image exists for '{id}' to add [{name}]")
+                elif exists and not label:
+                    logger.info(f"Adding New Label: {tag} => {id} => {name}")
+                    obj.labels[tag] = DataModel(info={"ts": int(time.time()), "name": name}, ext=ext)
+                    invalidate += 1
+                elif not exists and label and label.ext == ext:
+                    logger.info(f"Removing non existing Label Id: '{id}' for '{tag}'")
+                    obj.labels.pop(tag)
+                    invalidate += 1
+
+            if invalidate:
+                self._update_datastore_file()
+        return invalidate
 
     def _on_modify_event(self, event):
         # handle modify events only for config path; rest ignored
@@ -429,7 +561,30 @@ class LocalDatastore(Datastore):
         """
         Refresh the datastore based on the state of the files on disk
         """
-        self._reconcile_datastore()
+        start = time.time()
+        with self._index_lock:
+            self._reconcile_datastore()
+            self._reload_stats["scans"] += 1
+            self._reload_stats["last_scan_ts"] = int(start)
+            self._reload_stats["last_scan_duration"] = time.time() - start
+
+    def close(self) -> None:
+        """
+        Stop auto reload: file watcher, pending event batch and periodic full scans
+        """
+        self._stop_scan.set()
+        with self._events_lock:
+            if self._events_timer is not None:
+                self._events_timer.cancel()
+                self._events_timer = None
+
+        observer = getattr(self, "_observer", None)
+        if observer is not None and observer.is_alive():
+            observer.stop()
+            observer.join(timeout=5)
+        scanner = getattr(self, "_scanner", None)
+        if scanner is not None:
+            scanner.join(timeout=5)
 
     def add_image(self, image_id: str, image_filename: str, image_info: Dict[str, Any]) -> str:
         id, image_ext = self._to_id(os.path.basename(image_filename))
@@ -715,7 +870,21 @@ class LocalDatastore(Datastore):
             "total": len(self.list_images()),
             "completed": len(self.get_labeled_images()),
             "label_tags": tags,
+            **self._auto_reload_status(),
         }
 
+    def _auto_reload_status(self) -> Dict[str, Any]:
+        if not self._auto_reload:
+            return {}
+
+        with self._events_lock:
+            pending = len(self._pending_events)
+        with self._index_lock:
+            stats = dict(self._reload_stats)
+        return {"auto_reload": {**stats, "pending_events": pending}}
+
+    def _to_model(self) -> LocalDatastoreModel:
+        return self._datastore
+
     def json(self):
-        return self._datastore.model_dump(exclude={"base_path"})
+        return self._to_model().model_dump(exclude={"base_path"})
@@ -0,0 +1,481 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from filelock import FileLock
+
+from monailabel.datastore.local import DataModel, ImageLabelModel, LocalDatastore, LocalDatastoreModel
+from monailabel.interfaces.datastore import DefaultLabelTag
+from monailabel.interfaces.exception import ImageNotFoundException, LabelNotFoundException
+from monailabel.utils.others.generic import remove_file
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS images (
+    id TEXT PRIMARY KEY,
+    ext TEXT NOT NULL,
+    info TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS labels (
+    image_id TEXT NOT NULL REFERENCES images (id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    info TEXT NOT NULL,
+    PRIMARY KEY (image_id, tag)
+);
+CREATE INDEX IF NOT EXISTS labels_by_tag ON labels (tag, image_id);
+"""
+
+_META_KEYS = ("name", "description", "images_dir", "labels_dir")
+
+
+def _dumps(info: Dict[str, Any]) -> str:
+    return json.dumps(info, default=str)
+
+
+class SQLiteLocalDatastore(LocalDatastore):
+    """
+    Local Datastore which keeps its index in a SQLite database (WAL mode) instead of `datastore_v2.json`.
+
+    Adding an image or saving a label upserts a single row rather than rewriting the whole index, and
+    lookups by image id or label tag are served by indexes.  If the database does not exist yet and a
+    JSON index is present, the JSON index is imported once (the JSON file itself is left untouched).
+    """
+
+    def __init__(
+        self,
+        datastore_path: str,
+        images_dir: str = ".",
+        labels_dir: str = "labels",
+        datastore_config: str = "datastore_v2.db",
+        extensions=("*.nii.gz", "*.nii"),
+        auto_reload=False,
+        read_only=False,
+        auto_reload_debounce: float = 1.0,
+        full_scan_interval: float = 600,
+        json_config: str = "datastore_v2.json",
+    ):
+        """
+        Creates a `SQLiteLocalDatastore` object
+
+        Parameters:
+
+        `datastore_path: str`
+            a string to the directory tree of the desired dataset
+
+        `datastore_config: str`
+            optional file name of the SQLite index (by default `datastore_v2.db`)
+
+        `json_config: str`
+            optional file name of the JSON index to migrate from (by default `datastore_v2.json`)
+        """
+        self._json_config_path = os.path.join(datastore_path, json_config)
+        self._local = threading.local()
+        super().__init__(
+            datastore_path=datastore_path,
+            images_dir=images_dir,
+            labels_dir=labels_dir,
+            datastore_config=datastore_config,
+            extensions=extensions,
+            auto_reload=auto_reload,
+            read_only=read_only,
+            auto_reload_debounce=auto_reload_debounce,
+            full_scan_interval=full_scan_interval,
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads; one per (thread, datastore)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._datastore_config_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _set_meta(self, **kwargs):
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                [(k, v) for k, v in kwargs.items()],
+            )
+
+    def datalist(self, full_path=True) -> List[Dict[str, Any]]:
+        tag = DefaultLabelTag.FINAL
+        image_path = self._datastore.image_path()
+        label_path = self._datastore.label_path(tag)
+
+        rows = self._conn().execute(
+            "SELECT i.id, i.ext, l.ext FROM images i JOIN labels l ON l.image_id = i.id WHERE l.tag = ? "
+            "ORDER BY i.rowid",
+            (tag,),
+        )
+
+        ds = []
+        for image_id, image_ext, label_ext in rows:
+            ds.append(
+                {
+                    "image": os.path.realpath(os.path.join(image_path, self._filename(image_id, image_ext))),
+                    "label": os.path.realpath(os.path.join(label_path, self._filename(image_id, label_ext))),
+                }
+            )
+
+        if not full_path:
+            ds = json.loads(json.dumps(ds).replace(f"{self._datastore_path.rstrip(os.pathsep)}{os.pathsep}", ""))
+        return ds
+
+    def _image_row(self, image_id: str):
+        return self._conn().execute("SELECT ext, info FROM images WHERE id = ?", (image_id,)).fetchone()
+
+    def _label_row(self, label_id: str, label_tag: str):
+        return (
+            self._conn()
+            .execute("SELECT ext, info FROM labels WHERE image_id = ? AND tag = ?", (label_id, label_tag))
+            .fetchone()
+        )
+
+    def get_image_uri(self, image_id: str) -> str:
+        row = self._image_row(image_id)
+        if not row:
+            return ""
+        return str(os.path.realpath(os.path.join(self._datastore.image_path(), self._filename(image_id, row[0]))))
+
+    def get_image_info(self, image_id: str) -> Dict[str, Any]:
+        row = self._image_row(image_id)
+        if not row:
+            return {}
+
+        info = json.loads(row[1])
+        info["path"] = os.path.realpath(os.path.join(self._datastore.image_path(), self._filename(image_id, row[0])))
+        return info
+
+    def get_label_uri(self, label_id: str, label_tag: str) -> str:
+        row = self._label_row(label_id, label_tag)
+        if not row:
+            return ""
+        path = os.path.join(self._datastore.label_path(label_tag), self._filename(label_id, row[0]))
+        return str(os.path.realpath(path))
+
+    def get_labels_by_image_id(self, image_id: str) -> Dict[str, str]:
+        rows = self._conn().execute("SELECT tag FROM labels WHERE image_id = ?", (image_id,))
+        return {tag: image_id for tag, in rows}
+
+    def get_label_info(self, label_id: str, label_tag: str) -> Dict[str, Any]:
+        row = self._label_row(label_id, label_tag)
+        return json.loads(row[1]) if row else {}
+
+    def get_labeled_images(self, label_tag: Optional[str] = None, labels: Optional[List[str]] = None) -> List[str]:
+        rows = self._conn().execute(
+            "SELECT i.id FROM images i JOIN labels l ON l.image_id = i.id WHERE l.tag = ? ORDER BY i.rowid",
+            (DefaultLabelTag.FINAL,),
+        )
+        return [image_id for image_id, in rows]
+
+    def get_unlabeled_images(self, label_tag: Optional[str] = None, labels: Optional[List[str]] = None) -> List[str]:
+        rows = self._conn().execute(
+            "SELECT id FROM images i WHERE NOT EXISTS "
+            "(SELECT 1 FROM labels l WHERE l.image_id = i.id AND l.tag = ?) ORDER BY i.rowid",
+            (DefaultLabelTag.FINAL,),
+        )
+        return [image_id for image_id, in rows]
+
+    def list_images(self) -> List[str]:
+        return [image_id for image_id, in self._conn().execute("SELECT id FROM images ORDER BY rowid")]
+
+    def _on_modify_event(self, event):
+        # every read goes to the database; nothing to reload when the index changes
+        return
+
+    def add_image(self, image_id: str, image_filename: str, image_info: Dict[str, Any]) -> str:
+        id, image_ext = self._to_id(os.path.basename(image_filename))
+        if not image_id:
+            image_id = id
+
+        logger.info(f"Adding Image: {image_id} => {image_filename}")
+        name = self._filename(image_id, image_ext)
+        dest = os.path.realpath(os.path.join(self._datastore.image_path(), name))
+
+        with FileLock(self._lock_file):
+            logger.debug("Acquired the lock!")
+            if image_filename != dest:
+                shutil.copy(image_filename, dest)
+
+            image_info = image_info if image_info else {}
+            image_info["ts"] = int(time.time())
+            image_info["name"] = name
+
+            # same as json index; re-adding an image drops its labels until the next reconcile
+            with self._conn() as conn:
+                conn.execute(
+                    "INSERT INTO images (id, ext, info) VALUES (?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET ext = excluded.ext, info = excluded.info",
+                    (image_id, image_ext, _dumps(image_info)),
+                )
+                conn.execute("DELETE FROM labels WHERE image_id = ?", (image_id,))
+        logger.debug("Released the lock!")
+        return image_id
+
+    def remove_image(self, image_id: str) -> None:
+        logger.info(f"Removing Image: {image_id}")
+
+        row = self._image_row(image_id)
+        if not row:
+            raise ImageNotFoundException(f"Image {image_id} not found")
+
+        # Remove all labels
+        for tag in self.get_labels_by_image_id(image_id):
+            self.remove_label(image_id, tag)
+
+        # Remove Image
+        name = self._filename(image_id, row[0])
+        remove_file(os.path.realpath(os.path.join(self._datastore.image_path(), name)))
+
+        if not self._auto_reload:
+            self.refresh()
+
+    def save_label(self, image_id: str, label_filename: str, label_tag: str, label_info: Dict[str, Any]) -> str:
+        logger.info(f"Saving Label for Image: {image_id}; Tag: {label_tag}; Info: {label_info}")
+        if not self._image_row(image_id):
+            raise ImageNotFoundException(f"Image {image_id} not found")
+
+        _, label_ext = self._to_id(os.path.basename(label_filename))
+        label_id = image_id
+
+        logger.info(f"Adding Label: {image_id} => {label_tag} => {label_filename}")
+        label_path = self._datastore.label_path(label_tag)
+        name = self._filename(image_id, label_ext)
+        dest = os.path.join(label_path, name)
+
+        with FileLock(self._lock_file):
+            logger.debug("Acquired the lock!")
+            os.makedirs(label_path, exist_ok=True)
+            shutil.copy(label_filename, dest)
+
+            label_info = label_info if label_info else {}
+            label_info["ts"] = int(time.time())
+            label_info["name"] = name
+
+            with self._conn() as conn:
+                conn.execute(
+                    "INSERT INTO labels (image_id, tag, ext, info) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (image_id, tag) DO UPDATE SET ext = excluded.ext, info = excluded.info",
+                    (image_id, label_tag, label_ext, _dumps(label_info)),
+                )
+            logger.info(f"Label Info: {label_info}")
+        logger.debug("Release the lock!")
+        return label_id
+
+    def update_image_info(self, image_id: str, info: Dict[str, Any]) -> None:
+        with self._conn() as conn:
+            row = conn.execute("SELECT info FROM images WHERE id = ?", (image_id,)).fetchone()
+            if not row:
+                raise ImageNotFoundException(f"Image {image_id} not found")
+
+            image_info = json.loads(row[0])
+            image_info.update(info)
+            conn.execute("UPDATE images SET info = ? WHERE id = ?", (_dumps(image_info), image_id))
+
+    def update_label_info(self, label_id: str, label_tag: str, info: Dict[str, Any]) -> None:
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT info FROM labels WHERE image_id = ? AND tag = ?", (label_id, label_tag)
+            ).fetchone()
+            if not row:
+                raise LabelNotFoundException(f"Label: {label_id} Tag: {label_tag} not found")
+
+            label_info = json.loads(row[0])
+            label_info.update(info)
+            conn.execute(
+                "UPDATE labels SET info = ? WHERE image_id = ? AND tag = ?", (_dumps(label_info), label_id, label_tag)
+            )
+
+    def _reconcile_datastore(self):
+        logger.debug("reconcile datastore...")
+        conn = self._conn()
+        image_path = self._datastore.image_path()
+
+        images = dict(conn.execute("SELECT id, ext FROM images"))
+        labels = {(image_id, tag): ext for image_id, tag, ext in conn.execute("SELECT image_id, tag, ext FROM labels")}
+
+        def _exists(path, id, ext):
+            return os.path.exists(os.path.realpath(os.path.join(path, self._filename(id, ext))))
+
+        removed_images = [image_id for image_id, ext in images.items() if not _exists(image_path, image_id, ext)]
+        for image_id in removed_images:
+            logger.info(f"Removing non existing Image Id: {image_id}")
+            images.pop(image_id)
+
+        removed_labels = []
+        for (image_id, tag), ext in labels.items():
+            if image_id in images and not _exists(self._datastore.label_path(tag), image_id, ext):
+                logger.info(f"Removing non existing Label Id: '{image_id}' for '{tag}'")
+                removed_labels.append((image_id, tag))
+
+        added_images = []
+        for image_file in self._list_files(image_path, self._extensions):
+            image_id, image_ext = self._to_id(image_file)
+            if image_id not in images:
+                logger.info(f"Adding New Image: {image_id} => {image_file}")
+                name = self._filename(image_id, image_ext)
+                images[image_id] = image_ext
+                added_images.append((image_id, image_ext, _dumps({"ts": int(time.time()), "name": name})))
+
+        labels_dir = self._datastore.label_path(None)
+        tags = [f for f in os.listdir(labels_dir) if os.path.isdir(os.path.join(labels_dir, f))]
+        logger.debug(f"Label Tags: {tags}")
+
+        added_labels = []
+        for tag in tags:
+            for label_file in self._list_files(self._datastore.label_path(tag), self._extensions):
+                label_id, label_ext = self._to_id(label_file)
+                if label_id not in images:
+                    logger.warning(f"IGNORE:: No matching image exists for '{label_id}' to add [{label_file}]")
+                    continue
+
+                if (label_id, tag) not in labels:
+                    logger.info(f"Adding New Label: {tag} => {label_id} => {label_file}")
+                    name = self._filename(label_id, label_ext)
+                    labels[(label_id, tag)] = label_ext
+                    added_labels.append((label_id, tag, label_ext, _dumps({"ts": int(time.time()), "name": name})))
+
+        invalidate = len(removed_images) + len(removed_labels) + len(added_images) + len(added_labels)
+        logger.info(f"Invalidate count: {invalidate}")
+        if not invalidate:
+            logger.debug("No changes needed to flush to disk")
+            return
+
+        with conn:
+            conn.executemany("DELETE FROM images WHERE id = ?", [(i,) for i in removed_images])
+            conn.executemany("DELETE FROM labels WHERE image_id = ? AND tag = ?", removed_labels)
+            conn.executemany("INSERT OR IGNORE INTO images (id, ext, info) VALUES (?, ?, ?)", added_images)
+            conn.executemany("INSERT OR IGNORE INTO labels (image_id, tag, ext, info) VALUES (?, ?, ?, ?)", added_labels)
+
+    def _apply_fs_changes(self, paths: List[str]) -> int:
+        images = []
+        labels = []
+        removed_images = []
+        removed_labels = []
+
+        conn = self._conn()
+        for tag, id, ext, exists in self._fs_changes(paths):
+            name = self._filename(id, ext)
+            info = _dumps({"ts": int(time.time()), "name": name})
+            if tag is None:
+                if exists:
+                    images.append((id, ext, info))
+                else:
+                    removed_images.append((id, ext))
+            elif exists:
+                labels.append((id, tag, ext, info))
+            else:
+                removed_labels.append((id, tag, ext))
+
+        with self._index_lock, conn:
+            invalidate = 0
+            for params in images:
+                invalidate += conn.execute("INSERT OR IGNORE INTO images (id, ext, info) VALUES (?, ?, ?)", params).rowcount
+            for params in removed_images:
+                invalidate += conn.execute("DELETE FROM images WHERE id = ? AND ext = ?", params).rowcount
+            for params in labels:
+                invalidate += conn.execute(
+                    "INSERT OR IGNORE INTO labels (image_id, tag, ext, info) "
+                    "SELECT id, ?, ?, ? FROM images WHERE id = ?",
+                    (*params[1:], params[0]),
+                ).rowcount
+            for params in removed_labels:
+                invalidate += conn.execute(
+                    "DELETE FROM labels WHERE image_id = ? AND tag = ? AND ext = ?", params
+                ).rowcount
+
+        logger.info(f"Invalidate count: {invalidate}")
+        return invalidate
+
+    def _init_from_datastore_file(self, throw_exception=False):
+        try:
+            with FileLock(self._lock_file):
+                logger.debug("Acquired the lock!")
+                conn = self._conn()
+                conn.executescript(_SCHEMA)
+
+                meta = dict(conn.execute("SELECT key, value FROM meta"))
+                if not meta:
+                    meta = self._migrate_from_json(conn)
+
+                for k in _META_KEYS:
+                    setattr(self._datastore, k, meta.get(k, getattr(self._datastore, k)))
+            logger.debug("Release the Lock...")
+        except (ValueError, sqlite3.Error) as e:
+            logger.error(f"+++ Failed to load datastore => {e}")
+            if throw_exception:
+                raise e
+
+    def _migrate_from_json(self, conn: sqlite3.Connection) -> Dict[str, str]:
+        model = self._datastore
+        if os.path.exists(self._json_config_path):
+            logger.info(f"Migrating datastore index: {self._json_config_path} => {self._datastore_config_path}")
+            with open(self._json_config_path) as fp:
+                model = LocalDatastoreModel.model_validate_json(fp.read())
+
+        meta = {k: getattr(model, k) for k in _META_KEYS}
+        with conn:
+            conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", meta.items())
+            conn.executemany(
+                "INSERT INTO images (id, ext, info) VALUES (?, ?, ?)",
+                [(k, v.image.ext, _dumps(v.image.info)) for k, v in model.objects.items()],
+            )
+            conn.executemany(
+                "INSERT INTO labels (image_id, tag, ext, info) VALUES (?, ?, ?, ?)",
+                [(k, t, l.ext, _dumps(l.info)) for k, v in model.objects.items() for t, l in v.labels.items()],
+            )
+        return meta
+
+    def _update_datastore_file(self, lock=True):
+        # rows are written as they change; only the metadata is kept on the in-memory model
+        self._set_meta(**{k: getattr(self._datastore, k) for k in _META_KEYS})
+
+    def status(self) -> Dict[str, Any]:
+        tags = dict(self._conn().execute("SELECT tag, COUNT(*) FROM labels GROUP BY tag"))
+        total, completed = self._conn().execute(
+            "SELECT COUNT(*), COUNT(l.tag) FROM images i LEFT JOIN labels l ON l.image_id = i.id AND l.tag = ?",
+            (DefaultLabelTag.FINAL,),
+        ).fetchone()
+
+        return {
+            "total": total,
+            "completed": completed,
+            "label_tags": tags,
+            **self._auto_reload_status(),
+        }
+
+    def _to_model(self) -> LocalDatastoreModel:
+        model = LocalDatastoreModel(**{k: getattr(self._datastore, k) for k in _META_KEYS})
+        model.base_path = self._datastore.base_path
+
+        conn = self._conn()
+        for image_id, ext, info in conn.execute("SELECT id, ext, info FROM images ORDER BY rowid"):
+            model.objects[image_id] = ImageLabelModel(image=DataModel(ext=ext, info=json.loads(info)))
+        for image_id, tag, ext, info in conn.execute("SELECT image_id, tag, ext, info FROM labels"):
+            model.objects[image_id].labels[tag] = DataModel(ext=ext, info=json.loads(info))
+        return model
@@ -25,9 +25,14 @@ from pydicom import config
 import SimpleITK
 
 from monai.transforms import LoadImage
+from pydicom.dataset import Dataset
 from pydicom.filereader import dcmread
+from pydicom.sequence import Sequence
+from pydicom_seg.dicom_utils import DimensionOrganizationSequence
+from pydicom_seg.segmentation_dataset import SegmentationDataset, SegmentationType
 
 from monailabel.datastore.utils.colors import GENERIC_ANATOMY_COLORS
+from monailabel.datastore.utils.dicom import SeriesHeaderIndex, get_series_header_index
 from monailabel.transform.writer import write_itk
 from monailabel.utils.others.generic import run_command
 
@@ -130,30 +135,31 @@ def binary_to_image(reference_image, label, dtype=np.uint8, file_ext=".nii.gz"):
     return output_file
 
 
-def nifti_to_dicom_seg(series_dir, label, final_result_json, file_ext="*", use_itk=True) -> str:
+def nifti_to_dicom_seg(series_dir, label, final_result_json, file_ext="*", use_itk=True, use_native=True) -> str:
+    """
+    Convert a label (NIfTI file path or in-memory (z, y, x) mask) into DICOM SEG for the given source series.
+
+    By default the SEG is built in-process (see :func:`native_image_to_dicom_seg`) from the cached series header
+    index;  set ``use_native=False`` to fall back to dcmqi (``itkimage2segimage``) or pydicom-seg.  A label file is
+    mapped onto the series grid by its geometry (see :func:`label_to_series_grid`);  an in-memory mask must already
+    be in the slice order of the series.
+    """
     start = time.time()
-    #reader.SetFileNames(dicom_filenames)
-    reader = SimpleITK.ImageSeriesReader()
-    dicom_filenames = reader.GetGDCMSeriesFileNames(series_dir)
-    # Read source Images
-    series_dir = pathlib.Path(series_dir)
-    image_files = series_dir.glob(file_ext)
-    image_datasets = [dcmread(str(f), stop_before_pixels=True) for f in image_files]
+    index = get_series_header_index(series_dir, file_ext)
+    logger.info(f"Total Source Images: {len(index)}")
 
+    image_series_desc = str(index.reference.get("SeriesDescription", ""))
+    final_result_json = final_result_json if final_result_json else {}
 
-    reader.SetFileNames(dicom_filenames)            
-    image = reader.Execute()
-    logger.info(f"Total Source Images: {len(image_datasets)}")
-    
-    if 0x0008103e in image_datasets[0].keys():
-        image_series_desc = image_datasets[0][0x0008103e].value
+    if isinstance(label, np.ndarray):
+        label_np = label
+        label_hint = str(final_result_json.get("label_name", ""))
     else:
-        image_series_desc = ""
-        
-    label_itk = SimpleITK.ReadImage(label)
-    label_np = SimpleITK.GetArrayFromImage(label_itk)
+        label_itk = SimpleITK.ReadImage(label)
+        label_np = label_to_series_grid(label_itk, index) if use_native else SimpleITK.GetArrayFromImage(label_itk)
+        label_hint = label
 
-    unique_labels = np.unique(label_np.flatten()).astype(np.int_)
+    unique_labels = np.unique(label_np).astype(np.int_)
     unique_labels = unique_labels[unique_labels != 0]
     logger.info(f"unique_labels: {unique_labels}")
     #info = label_info[0] if label_info and 0 < len(label_info) else {}
@@ -163,7 +169,7 @@ def nifti_to_dicom_seg(series_dir, label, final_result_json, file_ext="*", use_i
     # Generate timestamp in YYYYMMDDHHMM format
     timestamp = datetime.now().strftime("%Y%m%d%H%M")
     
-    if "nninter_" in label:
+    if "nninter_" in label_hint:
         label_names = [f"nninter_pred_{timestamp}"]
         image_series_desc = "nninter_"+ image_series_desc#"SAM2_"+ image_series_desc
     else:
@@ -174,17 +180,17 @@ def nifti_to_dicom_seg(series_dir, label, final_result_json, file_ext="*", use_i
     for i, idx in enumerate(unique_labels):
         #info = label_info[i] if label_info and i < len(label_info) else {}
         label_info = {}
-        name = label_names[idx-1]
-        description = label_info.get("description", json.dumps(final_result_json["prompt_info"]))
+        name = label_names[idx-1] if idx - 1 < len(label_names) else f"{label_names[0]}_{idx}"
+        description = label_info.get("description", json.dumps(final_result_json.get("prompt_info")))
         rgb = list(np.random.random(size=3) * 256)
         rgb = [int(x) for x in rgb]
 
         logger.info(f"{i} => {idx} => {name}")
 
-        if "nninter_" in label:
-            elapsed = "nninter_"+str(final_result_json["nninter_elapsed"])
+        if "nninter_" in label_hint:
+            elapsed = "nninter_"+str(final_result_json.get("nninter_elapsed"))
         else:
-            elapsed = "sam_"+str(final_result_json["sam_elapsed"])
+            elapsed = "sam_"+str(final_result_json.get("sam_elapsed"))
         logger.info(f"{idx}_{name}_elapsed: {elapsed}")
         segment_attribute = label_info.get(
             "segmentAttribute",
@@ -228,10 +234,18 @@ def nifti_to_dicom_seg(series_dir, label, final_result_json, file_ext="*", use_i
         logger.error("Missing Attributes/Empty Label provided")
         return ""
 
+    if use_native:
+        output_file = native_image_to_dicom_seg(label_np, index, template)
+        logger.info(f"nifti_to_dicom_seg latency : {time.time() - start} (sec)")
+        return output_file
+
+    if isinstance(label, np.ndarray):
+        raise ValueError("In-memory label is only supported by the native DICOM SEG writer")
+
     use_itk=True
     
     if use_itk:
-        output_file = itk_image_to_dicom_seg(label, series_dir, template)
+        output_file = itk_image_to_dicom_seg(label, str(series_dir), template)
     else:
         template = pydicom_seg.template.from_dcmqi_metainfo(template)
         config.settings.reading_validation_mode = config.IGNORE
@@ -246,13 +260,129 @@ def nifti_to_dicom_seg(series_dir, label, final_result_json, file_ext="*", use_i
         mask = SimpleITK.Cast(mask, SimpleITK.sitkUInt16)
 
         output_file = "/code/test.dcm"
-        dcm = writer.write(mask, image_datasets)
+        dcm = writer.write(mask, index.datasets)
         dcm.save_as(output_file)
 
     logger.info(f"nifti_to_dicom_seg latency : {time.time() - start} (sec)")
     return output_file
 
 
+def label_to_series_grid(label_itk: SimpleITK.Image, index: SeriesHeaderIndex, tolerance=1e-3) -> np.ndarray:
+    """
+    Return the (z, y, x) array of ``label_itk`` on the voxel grid of the source series of ``index``.
+
+    A label with the same size, origin, spacing and direction (within ``tolerance``) is used as is; any other label
+    is resampled (nearest neighbour, background outside) onto the series grid.
+    """
+    geometry = index.geometry()
+    if geometry is None:
+        raise ValueError(f"Source series {index.series_dir} has no geometry (position/orientation) to map the label")
+
+    size, origin, spacing, direction = geometry
+    if (
+        label_itk.GetSize() == size
+        and np.allclose(label_itk.GetOrigin(), origin, atol=tolerance)
+        and np.allclose(label_itk.GetSpacing(), spacing, atol=tolerance)
+        and np.allclose(label_itk.GetDirection(), direction, atol=tolerance)
+    ):
+        return SimpleITK.GetArrayFromImage(label_itk)
+
+    logger.info(
+        f"Resampling label (size: {label_itk.GetSize()}; origin: {label_itk.GetOrigin()}; "
+        f"spacing: {label_itk.GetSpacing()}) to source series (size: {size}; origin: {tuple(origin)}; "
+        f"spacing: {tuple(spacing)})"
+    )
+    reference = SimpleITK.Image([int(s) for s in size], label_itk.GetPixelID())
+    reference.SetOrigin(origin.tolist())
+    reference.SetSpacing(spacing.tolist())
+    reference.SetDirection(direction.tolist())
+    resampled = SimpleITK.Resample(label_itk, reference, SimpleITK.Transform(), SimpleITK.sitkNearestNeighbor, 0)
+    return SimpleITK.GetArrayFromImage(resampled)
+
+
+def native_image_to_dicom_seg(label_np: np.ndarray, index: SeriesHeaderIndex, template) -> str:
+    """
+    Write a BINARY DICOM SEG in-process (no dcmqi/subprocess, no temporary NIfTI).
+
+    Layout follows ``itkimage2segimage``: only non-empty frames are stored (segment-major, slice ascending),
+    dimension index is (ReferencedSegmentNumber, ImagePositionPatient) and per-frame functional groups are
+    shallow items built from the per-series templates of ``index``.
+
+    :param label_np: label mask (z, y, x) on the voxel grid of ``index`` (see :func:`label_to_series_grid`)
+    :param index: header index of the source series (see ``get_series_header_index``)
+    :param template: dcmqi style meta-info (segmentAttributes etc.)
+    :return: path of the written DICOM SEG file
+    """
+    start = time.time()
+    if label_np.ndim == 4 and label_np.shape[0] == 1:
+        label_np = label_np[0]
+    if label_np.shape != (len(index), index.rows, index.columns):
+        raise ValueError(
+            f"Label shape {label_np.shape} does not match source series {(len(index), index.rows, index.columns)}"
+        )
+
+    meta = pydicom_seg.template.from_dcmqi_metainfo(template)
+    seg = SegmentationDataset(
+        rows=index.rows,
+        columns=index.columns,
+        segmentation_type=SegmentationType.BINARY,
+        reference_dicom=index.reference,
+    )
+    for element in meta:
+        seg[element.tag] = element
+    seg.Manufacturer = "MONAI Label"
+    seg.ManufacturerModelName = "MONAI Label"
+    seg.SegmentsOverlap = "NO"
+
+    dim_organization = DimensionOrganizationSequence()
+    dim_organization.add_dimension("ReferencedSegmentNumber", "SegmentIdentificationSequence")
+    dim_organization.add_dimension("ImagePositionPatient", "PlanePositionSequence")
+    seg.add_dimension_organization(dim_organization)
+
+    seg.SharedFunctionalGroupsSequence = index.shared_functional_groups()
+    seg.ReferencedSeriesSequence = index.referenced_series()
+
+    # one vectorized reduction per segment to find non-empty frames
+    flat = label_np.reshape(label_np.shape[0], -1)
+    frames = []
+    per_frame = []
+    for segment in meta.SegmentSequence:
+        segment_number = int(segment.SegmentNumber)
+        slices = np.flatnonzero((flat == segment_number).any(axis=1))
+        if not len(slices):
+            continue
+
+        frames.append(label_np[slices] == segment_number)
+        for z in slices:
+            derivation, position = index.frame_items(int(z))
+            item = Dataset()
+            item.DerivationImageSequence = derivation
+            content = Dataset()
+            content.DimensionIndexValues = [segment_number, int(z) + 1]
+            item.FrameContentSequence = Sequence([content])
+            item.PlanePositionSequence = position
+            segment_id = Dataset()
+            segment_id.ReferencedSegmentNumber = segment_number
+            item.SegmentIdentificationSequence = Sequence([segment_id])
+            per_frame.append(item)
+
+    if not per_frame:
+        logger.error("Empty Label provided; No frames to write")
+        return ""
+
+    seg.PerFrameFunctionalGroupsSequence = Sequence(per_frame)
+    seg.NumberOfFrames = len(per_frame)
+
+    # frames are bit-packed back to back (LSB first), padded to even length
+    pixel_data = np.packbits(np.concatenate(frames).reshape(-1), bitorder="little").tobytes()
+    seg.PixelData = pixel_data + b"\0" if len(pixel_data) % 2 else pixel_data
+
+    output_file = tempfile.NamedTemporaryFile(suffix=".dcm").name
+    seg.save_as(output_file, write_like_original=False)
+    logger.info(f"native_image_to_dicom_seg ({len(per_frame)} frames) latency : {time.time() - start} (sec)")
+    return output_file
+
+
 def itk_image_to_dicom_seg(label, series_dir, template) -> str:
     output_file = tempfile.NamedTemporaryFile(suffix=".dcm").name
     meta_data = tempfile.NamedTemporaryFile(suffix=".json").name
@@ -0,0 +1,163 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Sequence
+
+import numpy as np
+import SimpleITK as sitk
+from pydicom import config as pydicom_config
+from pydicom.dataset import Dataset
+from pydicom.filereader import dcmread
+
+from monailabel.config import settings
+
+logger = logging.getLogger(__name__)
+
+# a worker decodes a few chunks of the series, so a slow chunk does not hold back the others
+CHUNKS_PER_WORKER = 4
+# smaller series are not worth the round trip to the pool
+MIN_SLICES_PER_WORKER = 4
+
+
+def can_decode(transfer_syntax) -> bool:
+    """Whether pydicom has a pixel data handler for `transfer_syntax` (RLE; JPEG-LS / JPEG 2000 with the plugins)"""
+    handlers = pydicom_config.pixel_data_handlers
+    return any(h.is_available() and h.supports_transfer_syntax(transfer_syntax) for h in handlers)
+
+
+def _decode_slices(files: Sequence[str], dtype: str) -> np.ndarray:
+    """Pixels of single frame DICOM `files` (with their modality rescale) as a [slices, rows, columns] volume"""
+    volume = None
+    for i, file in enumerate(files):
+        ds = dcmread(file)
+        pixels = ds.pixel_array
+        slope, intercept = float(ds.get("RescaleSlope", 1) or 1), float(ds.get("RescaleIntercept", 0) or 0)
+        if slope != 1 or intercept != 0:
+            pixels = pixels * slope + intercept
+        if volume is None:
+            volume = np.empty((len(files), *pixels.shape), dtype)
+        volume[i] = pixels
+    return volume
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _decode_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: the app runs threads (and torch), which a forked worker would inherit half way
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+
+
+def _parallel(filenames: Sequence[str], header: Dataset, workers: int) -> bool:
+    transfer_syntax = header.file_meta.get("TransferSyntaxUID") if hasattr(header, "file_meta") else None
+    return (
+        workers > 1
+        and len(filenames) >= workers * MIN_SLICES_PER_WORKER
+        and transfer_syntax is not None
+        and transfer_syntax.is_compressed
+        and can_decode(transfer_syntax)
+        and int(header.get("NumberOfFrames", 1) or 1) == 1
+        and int(header.get("SamplesPerPixel", 1)) == 1
+        and header.get("PhotometricInterpretation") == "MONOCHROME2"
+    )
+
+
+def _read_serial(filenames: Sequence[str]) -> sitk.Image:
+    reader = sitk.ImageSeriesReader()
+    reader.SetFileNames(list(filenames))
+    return reader.Execute()
+
+
+def _read_parallel(filenames: Sequence[str], workers: int) -> sitk.Image:
+    # geometry and pixel type as SimpleITK gives them for the series, from the headers of the first / last file
+    first, last = sitk.ImageFileReader(), sitk.ImageFileReader()
+    for reader, file in ((first, filenames[0]), (last, filenames[-1])):
+        reader.SetFileName(file)
+        reader.ReadImageInformation()
+    columns, rows = first.GetSize()[:2]
+    dtype = sitk.GetArrayViewFromImage(sitk.Image([1, 1], first.GetPixelID())).dtype
+    direction = np.asarray(first.GetDirection()).reshape(3, 3)
+    normal = np.dot(np.subtract(last.GetOrigin(), first.GetOrigin()), direction[:, 2])
+    spacing = (*first.GetSpacing()[:2], normal / (len(filenames) - 1) if normal else first.GetSpacing()[2])
+
+    volume = np.empty((len(filenames), rows, columns), dtype)
+    pool = _decode_pool(workers)
+    chunks = [c for c in np.array_split(np.arange(len(filenames)), workers * CHUNKS_PER_WORKER) if len(c)]
+    futures = {pool.submit(_decode_slices, [filenames[i] for i in c], dtype.str): int(c[0]) for c in chunks}
+    try:
+        for future in as_completed(futures):
+            start = futures[future]
+            part = future.result()
+            volume[start : start + len(part)] = part
+    except BrokenProcessPool:
+        _reset_pool()
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+
+    img = sitk.GetImageFromArray(volume)
+    img.SetOrigin(first.GetOrigin())
+    img.SetSpacing(spacing)
+    img.SetDirection(first.GetDirection())
+    return img
+
+
+def read_dicom_series(
+    filenames: Sequence[str], header: Optional[Dataset] = None, workers: Optional[int] = None
+) -> sitk.Image:
+    """
+    Read the slices of a DICOM series (sorted, e.g. by `ImageSeriesReader.GetGDCMSeriesFileNames`) into a volume.
+
+    Series in a compressed transfer syntax which pydicom can decode (RLE, JPEG-LS, JPEG 2000) are decoded by a
+    pool of `workers` processes (MONAI_LABEL_DICOM_DECODE_WORKERS), a chunk of slices each, into a preallocated
+    volume with the geometry and pixel type SimpleITK gives the series. Other series (or if that fails) are
+    read by SimpleITK / GDCM, slice by slice on this thread.
+
+    :param header: header of one of the files (if already read), for the transfer syntax
+    """
+    workers = settings.MONAI_LABEL_DICOM_DECODE_WORKERS if workers is None else workers
+    header = header if header is not None else dcmread(filenames[0], stop_before_pixels=True)
+    if _parallel(filenames, header, workers):
+        start = time.time()
+        try:
+            img = _read_parallel(filenames, workers)
+            logger.info(
+                f"Decoded {len(filenames)} {header.file_meta.TransferSyntaxUID.name} slices with {workers} workers "
+                f"in {time.time() - start:.3f} (sec)"
+            )
+            return img
+        except Exception as e:
+            logger.warning(f"Parallel decode of the series failed; reading it with SimpleITK: {e}")
+    return _read_serial(filenames)
@@ -9,16 +9,25 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import glob
+import json
 import logging
 import os
+import threading
 import time
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+import requests
 from dicomweb_client import DICOMwebClient
 from pydicom.dataset import Dataset
 from pydicom.filereader import dcmread
+from pydicom.sequence import Sequence
 
 from monailabel.utils.others.generic import md5_digest, run_command
+from monailabel.utils.others.metrics import count_bytes, observe
 
 logger = logging.getLogger(__name__)
 
@@ -61,6 +70,180 @@ def store_scu(input_file, host="127.0.0.1", port="4242", aet="MONAILABEL"):
     logger.info(f"Time to run STORE-SCU: {time.time() - start} (sec)")
 
 
+class SeriesHeaderIndex:
+    """
+    Pixel-free header index of a DICOM series on disk.
+
+    Headers are sorted along the slice normal (same order as GDCM/SimpleITK series reader), so index ``z`` matches
+    ``z`` of ``sitk.GetArrayFromImage(reader.Execute())``.  Functional group items needed to write derived objects
+    (e.g. DICOM SEG) are built once per series and reused across writes.
+    """
+
+    def __init__(self, series_dir: str, datasets: List[Dataset]):
+        if not datasets:
+            raise ValueError(f"No DICOM instances found in: {series_dir}")
+
+        self.series_dir = series_dir
+        self.datasets = self._sort(datasets)
+        self.reference = self.datasets[0]
+        self.rows = int(self.reference.Rows)
+        self.columns = int(self.reference.Columns)
+
+        self._shared_functional_groups: Optional[Sequence] = None
+        self._referenced_series: Optional[Sequence] = None
+        self._frame_items: Dict[int, Tuple[Sequence, Sequence]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.datasets)
+
+    @staticmethod
+    def _sort(datasets: List[Dataset]) -> List[Dataset]:
+        ref = datasets[0]
+        has_position = all(d.get("ImagePositionPatient") for d in datasets)
+        if len(datasets) > 1 and has_position and ref.get("ImageOrientationPatient"):
+            iop = np.asarray(ref.ImageOrientationPatient, dtype=np.float64)
+            normal = np.cross(iop[:3], iop[3:])
+            dist = [float(np.dot(normal, np.asarray(d.ImagePositionPatient, dtype=np.float64))) for d in datasets]
+            return [datasets[i] for i in np.argsort(dist, kind="stable")]
+        return sorted(datasets, key=lambda d: int(d.get("InstanceNumber", 0) or 0))
+
+    @property
+    def sop_instance_uids(self) -> List[str]:
+        return [str(d.SOPInstanceUID) for d in self.datasets]
+
+    def geometry(self) -> Optional[Tuple[Tuple[int, ...], np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Return (size, origin, spacing, direction) of the series volume in SimpleITK convention (x, y, z order,
+        row-major direction); None if the headers carry no position / orientation.
+        """
+        first, last = self.datasets[0], self.datasets[-1]
+        if not (first.get("ImagePositionPatient") and first.get("ImageOrientationPatient")):
+            return None
+        if not (last.get("ImagePositionPatient") and first.get("PixelSpacing")):
+            return None
+
+        iop = np.asarray(first.ImageOrientationPatient, dtype=np.float64)
+        normal = np.cross(iop[:3], iop[3:])
+        origin = np.asarray(first.ImagePositionPatient, dtype=np.float64)
+        if len(self.datasets) > 1:
+            slice_spacing = np.dot(np.asarray(last.ImagePositionPatient, dtype=np.float64) - origin, normal)
+            slice_spacing /= len(self.datasets) - 1
+        else:
+            slice_spacing = float(first.get("SliceThickness") or 1.0)
+
+        row_spacing, column_spacing = (float(s) for s in first.PixelSpacing)
+        spacing = np.asarray([column_spacing, row_spacing, slice_spacing])
+        direction = np.column_stack([iop[:3], iop[3:], normal]).reshape(-1)
+        return (self.columns, self.rows, len(self.datasets)), origin, spacing, direction
+
+    def shared_functional_groups(self) -> Sequence:
+        with self._lock:
+            if self._shared_functional_groups is None:
+                item = Dataset()
+                if self.reference.get("ImageOrientationPatient"):
+                    orientation = Dataset()
+                    orientation.ImageOrientationPatient = self.reference.ImageOrientationPatient
+                    item.PlaneOrientationSequence = Sequence([orientation])
+
+                measures = Dataset()
+                if self.reference.get("PixelSpacing"):
+                    measures.PixelSpacing = self.reference.PixelSpacing
+                if self.reference.get("SliceThickness"):
+                    measures.SliceThickness = self.reference.SliceThickness
+                if len(self.datasets) > 1 and self.datasets[1].get("ImagePositionPatient"):
+                    p0 = np.asarray(self.datasets[0].ImagePositionPatient, dtype=np.float64)
+                    p1 = np.asarray(self.datasets[1].ImagePositionPatient, dtype=np.float64)
+                    measures.SpacingBetweenSlices = f"{np.linalg.norm(p1 - p0):.6g}"
+                item.PixelMeasuresSequence = Sequence([measures])
+                self._shared_functional_groups = Sequence([item])
+            return self._shared_functional_groups
+
+    def referenced_series(self) -> Sequence:
+        with self._lock:
+            if self._referenced_series is None:
+                series = Dataset()
+                series.SeriesInstanceUID = self.reference.SeriesInstanceUID
+                instances = []
+                for d in self.datasets:
+                    instance = Dataset()
+                    instance.ReferencedSOPClassUID = d.SOPClassUID
+                    instance.ReferencedSOPInstanceUID = d.SOPInstanceUID
+                    instances.append(instance)
+                series.ReferencedInstanceSequence = Sequence(instances)
+                self._referenced_series = Sequence([series])
+            return self._referenced_series
+
+    def frame_items(self, z: int) -> Tuple[Sequence, Sequence]:
+        """
+        Return (DerivationImageSequence, PlanePositionSequence) for slice ``z``; built once and shared by all frames
+        that reference the same source instance.
+        """
+        items = self._frame_items.get(z)
+        if items is not None:
+            return items
+
+        d = self.datasets[z]
+        source = Dataset()
+        source.ReferencedSOPClassUID = d.SOPClassUID
+        source.ReferencedSOPInstanceUID = d.SOPInstanceUID
+        source.PurposeOfReferenceCodeSequence = Sequence(
+            [_code("121322", "DCM", "Source image for image processing operation")]
+        )
+        derivation = Dataset()
+        derivation.SourceImageSequence = Sequence([source])
+        derivation.DerivationCodeSequence = Sequence([_code("113076", "DCM", "Segmentation")])
+
+        position = Dataset()
+        if d.get("ImagePositionPatient"):
+            position.ImagePositionPatient = d.ImagePositionPatient
+
+        items = (Sequence([derivation]), Sequence([position]))
+        self._frame_items[z] = items
+        return items
+
+
+def _code(value: str, scheme: str, meaning: str) -> Dataset:
+    ds = Dataset()
+    ds.CodeValue = value
+    ds.CodingSchemeDesignator = scheme
+    ds.CodeMeaning = meaning
+    return ds
+
+
+_series_header_cache: "OrderedDict[str, Tuple[Tuple[int, int], SeriesHeaderIndex]]" = OrderedDict()
+_series_header_lock = threading.Lock()
+_SERIES_HEADER_CACHE_SIZE = 32
+
+
+def get_series_header_index(series_dir: str, file_ext: str = "*") -> SeriesHeaderIndex:
+    """
+    Return the (cached) header index for a DICOM series directory.
+    Cache entry is invalidated when the directory is modified (files added/removed).
+    """
+    key = os.path.realpath(series_dir)
+    st = os.stat(key)
+    stamp = (st.st_mtime_ns, st.st_ino)
+
+    with _series_header_lock:
+        cached = _series_header_cache.get(key)
+        if cached and cached[0] == stamp:
+            _series_header_cache.move_to_end(key)
+            return cached[1]
+
+    start = time.time()
+    files = [f for f in glob.glob(os.path.join(key, file_ext)) if os.path.isfile(f)]
+    index = SeriesHeaderIndex(key, [dcmread(f, stop_before_pixels=True) for f in files])
+    logger.info(f"Series header index ({len(index)} instances) built in {time.time() - start:.3f} (sec): {key}")
+
+    with _series_header_lock:
+        _series_header_cache[key] = (stamp, index)
+        _series_header_cache.move_to_end(key)
+        while len(_series_header_cache) > _SERIES_HEADER_CACHE_SIZE:
+            _series_header_cache.popitem(last=False)
+    return index
+
+
 def dicom_web_download_series(study_id, series_id, save_dir, client: DICOMwebClient, frame_fetch=False):
     start = time.time()
 
@@ -107,6 +290,8 @@ def dicom_web_download_series(study_id, series_id, save_dir, client: DICOMwebCli
         with ThreadPoolExecutor(max_workers=2, thread_name_prefix="DICOMFetch") as executor:
             executor.map(save_from_frame, meta_list)
 
+    observe("dicomweb_download", time.time() - start)
+    count_bytes("in", "dicomweb", sum(os.path.getsize(f) for f in glob.glob(os.path.join(save_dir, "*.dcm"))))
     logger.info(f"Time to download: {time.time() - start} (sec)")
 
 
@@ -130,6 +315,112 @@ def dicom_web_upload_dcm(input_file, client: DICOMwebClient):
     return series_id
 
 
+class DICOMwebSegIndex:
+    """
+    Persistent index of SEG series => referenced image series for a DICOMweb server.
+
+    A refresh lists all SEG series with a single QIDO query (asking for ReferencedSeriesSequence via
+    includefield, which many servers honour).  Only SEG series that are new since the last refresh and
+    whose reference was not returned by QIDO are resolved through series metadata, in parallel with
+    bounded concurrency.  SEG series that disappeared from the server are dropped.
+    """
+
+    def __init__(self, client: DICOMwebClient, path: str, max_workers: int = 8, refresh_interval: float = 0):
+        self._client = client
+        self._path = path
+        self._max_workers = max_workers
+        self._refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._refresh_ts = 0.0
+        self._entries: Dict[str, Dict[str, str]] = {}  # seg series => {"study": study uid, "image": series uid}
+
+        if os.path.exists(path):
+            try:
+                with open(path) as fp:
+                    self._entries = json.load(fp).get("segs", {})
+            except ValueError as e:
+                logger.warning(f"Ignoring corrupt SEG index {path} => {e}")
+
+    def _save(self):
+        tmp = f"{self._path}.tmp"
+        with open(tmp, "w") as fp:
+            json.dump({"segs": self._entries}, fp)
+        os.replace(tmp, self._path)
+
+    @staticmethod
+    def _referenced_series(ds: Dataset) -> Optional[str]:
+        seq = ds.get("ReferencedSeriesSequence")
+        if seq and seq[0].get("SeriesInstanceUID"):
+            return str(seq[0].SeriesInstanceUID)
+        return None
+
+    def _search_segs(self) -> List[Dataset]:
+        try:
+            datasets = self._client.search_for_series(
+                search_filters={"Modality": "SEG"}, fields=["ReferencedSeriesSequence"], get_remaining=True
+            )
+        except requests.HTTPError as e:
+            logger.info(f"QIDO includefield=ReferencedSeriesSequence not supported ({e}); retry without it")
+            datasets = self._client.search_for_series(search_filters={"Modality": "SEG"}, get_remaining=True)
+        return [Dataset.from_json(ds) for ds in datasets]
+
+    def _resolve(self, seg: Tuple[str, str]) -> str:
+        study_id, series_id = seg
+        try:
+            meta = self._client.retrieve_series_metadata(study_id, series_id)
+            return (self._referenced_series(Dataset.from_json(meta[0])) or "") if meta else ""
+        except requests.HTTPError as e:
+            logger.warning(f"Failed to fetch metadata for SEG {series_id} => {e}")
+            return ""
+
+    def refresh(self, force=False) -> int:
+        """
+        Sync the index with the server; returns the number of added + removed SEG series
+        """
+        with self._lock:
+            if not force and self._refresh_ts and time.time() - self._refresh_ts < self._refresh_interval:
+                return 0
+
+            start = time.time()
+            segs: Dict[str, Tuple[str, Optional[str]]] = {}
+            for ds in self._search_segs():
+                segs[str(ds["SeriesInstanceUID"].value)] = (str(ds["StudyInstanceUID"].value), self._referenced_series(ds))
+
+            removed = [uid for uid in self._entries if uid not in segs]
+            for uid in removed:
+                self._entries.pop(uid)
+
+            added = {uid: v for uid, v in segs.items() if uid not in self._entries}
+            unresolved = [(study, uid) for uid, (study, image) in added.items() if image is None]
+            with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="SEGIndex") as executor:
+                resolved = dict(zip((uid for _, uid in unresolved), executor.map(self._resolve, unresolved)))
+
+            for uid, (study, image) in added.items():
+                self._entries[uid] = {"study": study, "image": image if image is not None else resolved[uid]}
+
+            if added or removed:
+                self._save()
+
+            self._refresh_ts = time.time()
+            logger.info(
+                f"SEG index: {len(self._entries)} SEG(s); added: {len(added)}; removed: {len(removed)}; "
+                f"metadata fetched: {len(unresolved)}; time: {time.time() - start:.3f} (sec)"
+            )
+            return len(added) + len(removed)
+
+    def add(self, seg_series_id: str, study_id: str, image_series_id: str):
+        with self._lock:
+            self._entries[seg_series_id] = {"study": study_id, "image": image_series_id}
+            self._save()
+
+    def labels(self) -> List[Tuple[str, str]]:
+        """
+        (seg series, referenced image series) for every SEG; image is empty if SEG has no reference
+        """
+        with self._lock:
+            return [(uid, v["image"]) for uid, v in self._entries.items()]
+
+
 if __name__ == "__main__":
     import shutil
 
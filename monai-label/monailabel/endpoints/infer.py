@@ -22,7 +22,6 @@ from datetime import date
 from typing import Optional
 from glob import glob as glob
 import io
-from copy import deepcopy
 import gzip
 import SimpleITK as sitk
 import numpy as np
@@ -33,7 +32,9 @@ from fastapi.responses import FileResponse, Response
 from requests_toolbelt import MultipartEncoder
 
 import pydicom
+from pydicom.dataset import Dataset
 from pydicom.filereader import dcmread
+from pydicom.sequence import Sequence
 from pydicom.sr.codedict import codes
 from pydicom.uid import generate_uid
 
@@ -44,6 +45,7 @@ from monailabel.endpoints.user.auth import RBAC, User
 from monailabel.interfaces.app import MONAILabelApp
 from monailabel.interfaces.utils.app import app_instance
 from monailabel.utils.others.generic import get_mime_type, remove_file
+from monailabel.utils.others.recorder import RESULT_HASH_HEADER, result_hash, trace_recorder
 from monailabel.utils.others.stream import stream_multipart
 
 from monailabel.datastore.utils.dicom import dicom_web_upload_dcm
@@ -157,6 +159,7 @@ def run_inference(
     label: UploadFile = File(None),
     output: Optional[ResultType] = None,
 ):
+    started = time.time()
     request = {"model": model, "image": image}
 
     if not file and not image and not session_id:
@@ -192,6 +195,7 @@ def run_inference(
     request.update(config)
 
     p = json.loads(params) if params else {}
+    p.pop("priority", None)  # the scheduling class is derived by the app (see infer_priority); not a client choice
     request.update(p)
 
     if session_id:
@@ -201,11 +205,39 @@ def run_inference(
             request["session"] = session.to_json()
 
     logger.info(f"Infer Request: {request}")
-    result = instance.infer(request)
-    prompt_json = result['params']
+    recorder = trace_recorder()
+    trace = {
+        "ts": round(started, 3),
+        "model": model,
+        "image": image,
+        "session_id": session_id,
+        "output": output.value if output else None,
+        "params": p,
+        "file": bool(file),
+        "label": bool(label),
+    }
+    session = p.get("studyInstanceUID") or session_id or image or "upload"
+    try:
+        result = instance.infer(request)
+    except Exception as e:
+        if recorder:
+            recorder.record(session, {**trace, "elapsed": round(time.time() - started, 4), "error": str(e)})
+        raise
+
     if result is None:
         raise HTTPException(status_code=500, detail="Failed to execute infer")
+    response = _infer_response(instance, image, result, output, background_tasks)
+
+    if recorder:
+        res_img = result.get("file") if result.get("file") is not None else result.get("label")
+        digest = result_hash(res_img)
+        recorder.record(session, {**trace, "elapsed": round(time.time() - started, 4), "result_hash": digest})
+        if digest and isinstance(response, Response):
+            response.headers[RESULT_HASH_HEADER] = digest
+    return response
+
 
+def _infer_response(instance: MONAILabelApp, image, result, output, background_tasks):
     # Dicom Seg Integration
     if output == "dicom_seg":
         dicom_seg_file = None
@@ -238,6 +270,37 @@ def run_inference(
 
     return send_response(instance.datastore(), result, output, background_tasks)
 
+def _nonempty_frames(seg, num_frames):
+    """
+    Indices of non-empty frames with one vectorized reduction.
+    When a frame is byte aligned, the reduction runs over the packed bytes (no unpacking needed).
+    """
+    frame_pixels = seg.Rows * seg.Columns
+    packed = np.frombuffer(seg.PixelData, dtype=np.uint8)
+    if frame_pixels % 8 == 0:
+        return np.flatnonzero(packed[: num_frames * frame_pixels // 8].reshape(num_frames, -1).any(axis=1))
+
+    bits = np.unpackbits(packed, count=num_frames * frame_pixels)
+    return np.flatnonzero(bits.reshape(num_frames, -1).any(axis=1))
+
+
+def _unpack_frames(seg, frames):
+    """
+    Unpack only the selected frames from the bit-packed PixelData.
+    """
+    rows, columns = seg.Rows, seg.Columns
+    frame_pixels = rows * columns
+    packed = np.frombuffer(seg.PixelData, dtype=np.uint8)
+    last = int(frames.max()) + 1
+    if frame_pixels % 8 == 0:
+        frame_bytes = frame_pixels // 8
+        selected = packed[: last * frame_bytes].reshape(last, frame_bytes)[frames]
+        return np.unpackbits(selected, axis=-1).reshape(len(frames), rows, columns)
+
+    bits = np.unpackbits(packed, count=last * frame_pixels)
+    return bits.reshape(last, rows, columns)[frames]
+
+
 def read_seg_file(seg):
     """
     Reads a DICOM-SEG file and extracts the pixel array and segment metadata.
@@ -247,9 +310,6 @@ def read_seg_file(seg):
     columns = seg.Columns
     num_segments = len(seg.SegmentSequence)
 
-    # Unpack PixelData
-    pixel_array = np.unpackbits(np.frombuffer(seg.PixelData, dtype=np.uint8)).reshape(num_frames, rows, columns)
-
     # Get the SOPInstanceUIDs from ReferencedSeriesSequence
     referenced_instance_uids = [
         item.ReferencedSOPInstanceUID
@@ -258,27 +318,49 @@ def read_seg_file(seg):
     # Reorganize pixel array by segment
     frames_per_segment = num_frames // num_segments
 
-    # Filter out empty frames for each segment
-    reduced_pixel_array = []
-    filtered_frames = []
-    total_frame_count=0
-    for i in range(num_segments):
-        # Extract frames for the current segment
-        segment_frames = pixel_array[i * frames_per_segment:(i + 1) * frames_per_segment]
-        
-        for slice_index, frame in enumerate(segment_frames):
-            if np.any(frame > 0):
-                reduced_pixel_array.append(frame)
-                if len(segment_frames) == len(referenced_instance_uids):
-                    filtered_frames.append((i + 1, len(segment_frames)-slice_index, referenced_instance_uids[slice_index]))  # 1-based indexing
-                else:
-                    filtered_frames.append((i + 1, len(segment_frames)-slice_index, seg.PerFrameFunctionalGroupsSequence[total_frame_count].DerivationImageSequence[0].SourceImageSequence[0].ReferencedSOPInstanceUID))
-                total_frame_count+=1
-    reduced_pixel_array = np.stack(reduced_pixel_array)
+    # Filter out empty frames for each segment (frames beyond num_segments * frames_per_segment are ignored)
+    frames = _nonempty_frames(seg, num_frames)
+    frames = frames[frames < num_segments * frames_per_segment]
+    segment_index, slice_index = np.divmod(frames, frames_per_segment)
+
+    if frames_per_segment == len(referenced_instance_uids):
+        source_uids = [referenced_instance_uids[i] for i in slice_index]
+    else:
+        # n-th non-empty frame maps to the n-th per-frame functional group item
+        per_frame = seg.PerFrameFunctionalGroupsSequence
+        source_uids = [
+            per_frame[n].DerivationImageSequence[0].SourceImageSequence[0].ReferencedSOPInstanceUID
+            for n in range(len(frames))
+        ]
+
+    filtered_frames = [
+        (int(i) + 1, frames_per_segment - int(z), uid)  # 1-based indexing
+        for i, z, uid in zip(segment_index, slice_index, source_uids)
+    ]
+    reduced_pixel_array = _unpack_frames(seg, frames) if len(frames) else np.zeros((0, rows, columns), np.uint8)
     return reduced_pixel_array, filtered_frames, seg
 
 
-def save_combined_segmentation(combined_pixel_array, all_segments, combined_frames, metadata_source):
+def _clone(ds, **values):
+    """
+    Shallow clone of a Dataset; elements are shared except for the (keyword => value) ones which are replaced.
+    Never assign to a shared element on the clone (pydicom updates the existing element in place).
+    """
+    clone = Dataset()
+    for elem in ds:
+        clone.add(elem)
+    for keyword, value in values.items():
+        if keyword in clone:
+            del clone[keyword]
+        setattr(clone, keyword, value)
+    return clone
+
+
+def _clone_item(sequence, **values):
+    return Sequence([_clone(sequence[0], **values)] + list(sequence[1:]))
+
+
+def save_combined_segmentation(combined_pixel_array, all_segments, combined_frames, metadata_source, chunk_size=256):
     """
     Saves the combined segmentation as a new DICOM-SEG file by reusing metadata from existing files.
     """
@@ -289,20 +371,36 @@ def save_combined_segmentation(combined_pixel_array, all_segments, combined_fram
     combined_segmentation.NumberOfFrames = combined_pixel_array.shape[0]
     combined_segmentation.SegmentSequence = all_segments
     combined_segmentation.SeriesInstanceUID = generate_uid()
-    
-    # Update PerFrameFunctionalGroupsSequence
+
+    # Update PerFrameFunctionalGroupsSequence (shared template; clone only the path to the per-frame values)
+    template = combined_segmentation.PerFrameFunctionalGroupsSequence[0]
+    content = template.FrameContentSequence
+    segment_id = template.SegmentIdentificationSequence
+    derivation = template.DerivationImageSequence
+    source = derivation[0].SourceImageSequence
+
     new_per_frame_sequence = []
     for segment_index, slice_index, sop_instance_uid in combined_frames:
-        frame = deepcopy(combined_segmentation.PerFrameFunctionalGroupsSequence[0])
-        frame.FrameContentSequence[0].DimensionIndexValues = [segment_index, slice_index]
-        frame.SegmentIdentificationSequence[0].ReferencedSegmentNumber = segment_index
         # Update ReferencedSOPInstanceUID in DerivationImageSequence
-        frame.DerivationImageSequence[0].SourceImageSequence[0].ReferencedSOPInstanceUID = sop_instance_uid
+        derivation_item = _clone(
+            derivation[0], SourceImageSequence=_clone_item(source, ReferencedSOPInstanceUID=sop_instance_uid)
+        )
+        frame = _clone(
+            template,
+            FrameContentSequence=_clone_item(content, DimensionIndexValues=[segment_index, slice_index]),
+            SegmentIdentificationSequence=_clone_item(segment_id, ReferencedSegmentNumber=segment_index),
+            DerivationImageSequence=Sequence([derivation_item] + list(derivation[1:])),
+        )
         new_per_frame_sequence.append(frame)
     combined_segmentation.PerFrameFunctionalGroupsSequence = new_per_frame_sequence
 
-    # Pack the combined binary pixel array
-    packed_pixel_data = np.packbits(combined_pixel_array.astype(np.uint8), axis=-1)
+    # Pack the combined binary pixel array (row-wise, as before) chunk by chunk into one buffer
+    num_frames, rows, columns = combined_pixel_array.shape
+    packed_pixel_data = np.empty((num_frames, rows, (columns + 7) // 8), dtype=np.uint8)
+    for i in range(0, num_frames, chunk_size):
+        packed_pixel_data[i : i + chunk_size] = np.packbits(
+            combined_pixel_array[i : i + chunk_size].astype(np.uint8, copy=False), axis=-1
+        )
     combined_segmentation.PixelData = packed_pixel_data.tobytes()
     return combined_segmentation
 
@@ -0,0 +1,28 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from monailabel.config import RBAC_USER, settings
+from monailabel.endpoints.user.auth import RBAC, User
+from monailabel.utils.others.metrics import REGISTRY
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Others"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+@router.get("/", summary=f"{RBAC_USER}Get Latency and Transfer Metrics (Prometheus)", response_class=PlainTextResponse)
+async def api_metrics(user: User = Depends(RBAC(settings.MONAI_LABEL_AUTH_ROLE_USER))):
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -37,11 +37,12 @@ from monailabel.config import settings
 from monailabel.datastore.dicom import DICOMwebClientX, DICOMWebDatastore
 from monailabel.datastore.dsa import DSADatastore
 from monailabel.datastore.local import LocalDatastore
+from monailabel.datastore.local_sqlite import SQLiteLocalDatastore
 from monailabel.datastore.xnat import XNATDatastore
 from monailabel.interfaces.datastore import Datastore, DefaultLabelTag
 from monailabel.interfaces.exception import MONAILabelError, MONAILabelException
 from monailabel.interfaces.tasks.batch_infer import BatchInferImageType, BatchInferTask
-from monailabel.interfaces.tasks.infer_v2 import InferTask
+from monailabel.interfaces.tasks.infer_v2 import InferTask, InferType
 from monailabel.interfaces.tasks.scoring import ScoringMethod
 from monailabel.interfaces.tasks.strategy import Strategy
 from monailabel.interfaces.tasks.train import TrainTask
@@ -57,6 +58,7 @@ from monailabel.utils.others.generic import (
     strtobool,
 )
 from monailabel.utils.others.pathology import create_asap_annotations_xml, create_dsa_annotations_json
+from monailabel.utils.others.scheduler import infer_priority, work_scheduler
 from monailabel.utils.sessions import Sessions
 
 logger = logging.getLogger(__name__)
@@ -137,11 +139,24 @@ class MONAILabelApp:
             self.studies = self.studies.rstrip("/").strip()
             return self.init_remote_datastore()
 
+        if settings.MONAI_LABEL_DATASTORE_INDEX.lower() == "sqlite":
+            logger.info("Using SQLite index for Local Datastore")
+            return SQLiteLocalDatastore(
+                self.studies,
+                extensions=settings.MONAI_LABEL_DATASTORE_FILE_EXT,
+                auto_reload=settings.MONAI_LABEL_DATASTORE_AUTO_RELOAD,
+                read_only=settings.MONAI_LABEL_DATASTORE_READ_ONLY,
+                auto_reload_debounce=settings.MONAI_LABEL_DATASTORE_AUTO_RELOAD_DEBOUNCE,
+                full_scan_interval=settings.MONAI_LABEL_DATASTORE_FULL_SCAN_INTERVAL,
+            )
+
         return LocalDatastore(
             self.studies,
             extensions=settings.MONAI_LABEL_DATASTORE_FILE_EXT,
             auto_reload=settings.MONAI_LABEL_DATASTORE_AUTO_RELOAD,
             read_only=settings.MONAI_LABEL_DATASTORE_READ_ONLY,
+            auto_reload_debounce=settings.MONAI_LABEL_DATASTORE_AUTO_RELOAD_DEBOUNCE,
+            full_scan_interval=settings.MONAI_LABEL_DATASTORE_FULL_SCAN_INTERVAL,
         )
 
     def init_remote_datastore(self) -> Datastore:
@@ -186,6 +201,7 @@ class MONAILabelApp:
             cache_path=cache_path if cache_path else None,
             fetch_by_frame=fetch_by_frame,
             convert_to_nifti=convert_to_nifti,
+            index_workers=settings.MONAI_LABEL_DICOMWEB_INDEX_WORKERS,
         )
 
     def _init_dsa_datastore(self) -> Datastore:
@@ -220,6 +236,7 @@ class MONAILabelApp:
         #    "labels": self.labels,
         #    "models": {k: v.info() for k, v in self._infers.items() if v.is_valid()},
             "trainers": {k: v.info() for k, v in self._trainers.items()},
+            "infer_stats": {k: v.stats() for k, v in self._infers.items()},
         #    "strategies": {k: v.info() for k, v in self._strategies.items()},
         #    "scoring": {k: v.info() for k, v in self._scoring_methods.items()},
         #    "train_stats": {k: v.stats() for k, v in self._trainers.items()},
@@ -295,16 +312,27 @@ class MONAILabelApp:
         else:
             request["save_label"] = False
 
+        priority = infer_priority(request, task.type in (InferType.DEEPGROW, InferType.DEEPEDIT, InferType.SCRIBBLES))
+        device = name_to_device(request.get("device", "cuda"))
+        if task.routes_device():
+            request["priority"] = priority.name.lower()  # the task takes the slot on the device it routes to
+
+        def run_infer(t, r):
+            if t.routes_device():
+                return t(r)
+            with work_scheduler().slot(priority, device):
+                return t(r)
+
         if self._infers_threadpool:
 
             def run_infer_in_thread(t, r):
                 handle_torch_linalg_multithread(r)
-                return t(r)
+                return run_infer(t, r)
 
             f = self._infers_threadpool.submit(run_infer_in_thread, t=task, r=request)
             result_file_name, result_json = f.result(request.get("timeout", settings.MONAI_LABEL_INFER_TIMEOUT))
         else:
-            result_file_name, result_json = task(request)
+            result_file_name, result_json = run_infer(task, request)
 
         return {"file": result_file_name, "params": result_json}
 
@@ -475,6 +503,10 @@ class MONAILabelApp:
 
         time_loop.start(block=False)
 
+    def on_shutdown(self):
+        logger.info("App Shutdown - stopping datastore")
+        self._datastore.close()
+
     def on_save_label(self, image_id, label_id):
         """
         Callback method when label is saved into datastore by a remote client
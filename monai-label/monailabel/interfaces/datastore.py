@@ -266,6 +266,12 @@ class Datastore(metaclass=ABCMeta):
         """
         pass
 
+    def close(self) -> None:
+        """
+        Release background resources (watchers, threads) of the datastore; called when the app shuts down
+        """
+        pass
+
     @abstractmethod
     def status(self) -> Dict[str, Any]:
         """
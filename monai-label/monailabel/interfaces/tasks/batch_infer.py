@@ -84,6 +84,7 @@ class BatchInferTask:
             req["label_tag"] = label_tag
             req["logging"] = request.get("logging", "INFO")
             req["device"] = device_ids[idx % len(device_ids)]
+            req["priority"] = "batch"
 
             infer_tasks.append(req)
             result[image_id] = None
@@ -87,6 +87,16 @@ class InferTask(metaclass=ABCMeta):
     def get_path(self, validate=True):
         return None
 
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def routes_device(self) -> bool:
+        """
+        Whether the task picks the device of a request itself (e.g. a replica of the model) and runs it in a
+        work scheduler slot of that device; otherwise the app runs it in a slot of the request's `device`
+        """
+        return False
+
     @abstractmethod
     def is_valid(self) -> bool:
         pass
@@ -28,7 +28,7 @@ logger = logging.getLogger(__name__)
 
 
 class Main:
-    def __init__(self, loglevel=logging.INFO, actions=("start_server", "apps", "datasets", "plugins")):
+    def __init__(self, loglevel=logging.INFO, actions=("start_server", "apps", "datasets", "plugins", "replay")):
         self.actions = set([actions] if isinstance(actions, str) else actions)
         logging.basicConfig(
             level=loglevel,
@@ -86,6 +86,16 @@ class Main:
         parser.add_argument("-o", "--output", help="Output path to save the plugin", default=None)
         parser.add_argument("--prefix", default=None)
 
+    def args_replay(self, parser):
+        parser.add_argument("traces", nargs="+", help="Trace files / directories (see MONAI_LABEL_TRACE_PATH)")
+        parser.add_argument("-u", "--url", default="http://127.0.0.1:8000", help="MONAI Label server")
+        parser.add_argument(
+            "-s", "--speed", default=1.0, type=float, help="Replay speed (1: recorded timing; 0: as fast as possible)"
+        )
+        parser.add_argument("-t", "--token", default=None, help="Bearer token (if auth is enabled)")
+        parser.add_argument("--timeout", default=600, type=float, help="Timeout per request (secs)")
+        parser.add_argument("-o", "--output", default=None, help="Write the report of every request (json)")
+
     def args_parser(self, name="monailabel"):
         parser = argparse.ArgumentParser(name)
         parser.add_argument("-v", "--version", action="store_true", help="print version")
@@ -111,6 +121,11 @@ class Main:
             self.args_plugins(parser_d)
             parser_d.set_defaults(action="plugins")
 
+        if "replay" in self.actions:
+            parser_e = subparsers.add_parser("replay", help="replay recorded infer sessions against a server")
+            self.args_replay(parser_e)
+            parser_e.set_defaults(action="replay")
+
         return parser
 
     def run(self):
@@ -131,6 +146,8 @@ class Main:
             self.action_datasets(args)
         elif args.action == "plugins":
             self.action_plugins(args)
+        elif args.action == "replay":
+            self.action_replay(args)
         else:
             self.action_start_server(args)
 
@@ -140,6 +157,18 @@ class Main:
     def action_plugins(self, args):
         self._action_xyz(args, "plugins", "Plugin", None, shutil.ignore_patterns("__pycache__"))
 
+    def action_replay(self, args):
+        from monailabel.utils.others.replay import replay
+
+        headers = {"Authorization": f"Bearer {args.token}"} if args.token else None
+        report = replay(args.traces, args.url, args.speed, headers=headers, timeout=args.timeout)
+        if args.output:
+            with open(args.output, "w") as fp:
+                json.dump(report, fp, indent=2)
+        print(json.dumps(report["summary"], indent=2))
+        if report["summary"]["failed"] or report["summary"]["hash_mismatches"]:
+            exit(1)
+
     def action_datasets(self, args):
         from monai.apps.datasets import DecathlonDataset
         from monai.apps.utils import download_and_extract
@@ -11,8 +11,10 @@
 
 import copy
 import hashlib
+import json
 import logging
 import os
+import threading
 import time
 from datetime import datetime
 from abc import abstractmethod
@@ -34,15 +36,27 @@ import pathlib
 from pydicom.filereader import dcmread
 import traceback
 
+from monailabel.config import settings
+from monailabel.datastore.utils.decode import read_dicom_series
 from monailabel.interfaces.exception import MONAILabelError, MONAILabelException
 from monailabel.interfaces.tasks.infer_v2 import InferTask, InferType
 from monailabel.interfaces.utils.transform import dump_data, run_transforms
+from monailabel.tasks.infer.sam2_prompts import group_prompts, label_map, prompt_slices, prompt_type, slice_prompts
 from monailabel.transform.cache import CacheTransformDatad
 from monailabel.transform.writer import ClassificationWriter, DetectionWriter, Writer
 from monailabel.utils.others.generic import device_list, device_map, name_to_device
 from monailabel.utils.others.helper import get_scanline_filled_points_3d, clean_and_densify_polyline, spherical_kernel, calculate_dice, timeout_context
+from monailabel.utils.others.history import SnapshotHistory, record_interaction
+from monailabel.utils.others.metrics import count_bytes, count_cache, observe, timer
+from monailabel.utils.others.residency import ModelResidencyManager
+from monailabel.utils.others.result_cache import result_cache, result_key
+from monailabel.utils.others.router import SessionRouter
+from monailabel.utils.others.scheduler import infer_priority, work_scheduler
 
 from sam2.build_sam import build_sam2_video_predictor, build_sam2_video_predictor_npz
+from sam2.utils.feature_cache import SpeculativeEncoder
+from sam2.utils.onnx_utils import use_onnx_image_encoder
+from sam2.utils.runtime import autocast, get_device, quantize_dynamic_int8, set_num_threads
 
 #from mmdet.apis import DetInferencer
 #from mmdet.evaluation import get_classes
@@ -76,30 +90,11 @@ medsam2_model_cfg = "configs/sam2.1/sam2.1_hiera_t512.yaml"
 #model.save_pretrained("code/bert-base-uncased")
 #tokenizer.save_pretrained("code/bert-base-uncased")
 
-from huggingface_hub import snapshot_download
-
 REPO_ID = "nnInteractive/nnInteractive"
 MODEL_NAME = "nnInteractive_v1.0"  # Updated models may be available in the future
 DOWNLOAD_DIR = "/code/checkpoints"  # Specify the download directory
 
-download_path = snapshot_download(
-    repo_id=REPO_ID,
-    allow_patterns=[f"{MODEL_NAME}/*"],
-    local_dir=DOWNLOAD_DIR
-)
-from nnInteractive.inference.inference_session import nnInteractiveInferenceSession
-
-session = nnInteractiveInferenceSession(
-    device=torch.device("cuda:0"),  # Set inference device
-    use_torch_compile=False,  # Experimental: Not tested yet
-    verbose=False,
-    torch_n_threads=os.cpu_count(),  # Use available CPU cores
-    do_autozoom=True,  # Enables AutoZoom for better patching
-    use_pinned_memory=True,  # Optimizes GPU memory transfers
-)
-
 model_path = os.path.join(DOWNLOAD_DIR, MODEL_NAME)
-session.initialize_from_trained_model_folder(model_path)
 
 # Config for the text prompt detector, it is disabled for now
 #config_path = '/code/dino_configs/dino.py'
@@ -109,8 +104,172 @@ session.initialize_from_trained_model_folder(model_path)
 # Initialize the DetInferencer
 #inferencer = DetInferencer(model=config_path, weights=checkpoint, palette='random')
 
-predictor_sam2 = build_sam2_video_predictor(model_cfg, sam2_checkpoint, vos_optimized=False)
-predictor_med = build_sam2_video_predictor_npz(medsam2_model_cfg, medsam2_checkpoint, vos_optimized=False)
+set_num_threads(settings.MONAI_LABEL_SAM2_NUM_THREADS)
+
+
+# nnInteractive session tensors restored by undo / redo (the result and, if the session has them, the prompt channels)
+NNINTER_UNDO_STATE = ("target_buffer", "interactions")
+
+
+class InteractiveReplica:
+    """
+    nnInteractive, SAM2 and MedSAM2 on one device, with the state of the sessions routed to it
+    (the nnInteractive image / target buffer, the prompts already applied and the SAM2 features)
+    """
+
+    def __init__(self, device, session=None, predictor_sam2=None, predictor_med=None):
+        """
+        :param device: device of the models
+        :param session: nnInteractive inference session; loaded from `model_path` if None
+        :param predictor_sam2: SAM2 video predictor; built from `sam2_checkpoint` if None
+        :param predictor_med: MedSAM2 video predictor; built from `medsam2_checkpoint` if None
+        """
+        self.device = torch.device(device)
+
+        if session is None:
+            from huggingface_hub import snapshot_download
+            from nnInteractive.inference.inference_session import nnInteractiveInferenceSession
+
+            snapshot_download(repo_id=REPO_ID, allow_patterns=[f"{MODEL_NAME}/*"], local_dir=DOWNLOAD_DIR)
+            session = nnInteractiveInferenceSession(
+                device=self.device,  # Set inference device
+                use_torch_compile=False,  # Experimental: Not tested yet
+                verbose=False,
+                torch_n_threads=os.cpu_count(),  # Use available CPU cores
+                do_autozoom=True,  # Enables AutoZoom for better patching
+                use_pinned_memory=True,  # Optimizes GPU memory transfers
+            )
+            session.initialize_from_trained_model_folder(model_path)
+        self.session = session
+
+        if predictor_sam2 is None:
+            predictor_sam2 = build_sam2_video_predictor(model_cfg, sam2_checkpoint, device=self.device, vos_optimized=False)
+        if predictor_med is None:
+            predictor_med = build_sam2_video_predictor_npz(
+                medsam2_model_cfg, medsam2_checkpoint, device=self.device, vos_optimized=False
+            )
+        self.predictor_sam2 = predictor_sam2
+        self.predictor_med = predictor_med
+        if settings.MONAI_LABEL_SAM2_QUANTIZE:
+            quantize_dynamic_int8(self.predictor_sam2)
+            quantize_dynamic_int8(self.predictor_med)
+        if settings.MONAI_LABEL_SAM2_ONNX_ENCODER:
+            use_onnx_image_encoder(self.predictor_sam2, settings.MONAI_LABEL_SAM2_ONNX_ENCODER)
+        if settings.MONAI_LABEL_MEDSAM2_ONNX_ENCODER:
+            use_onnx_image_encoder(self.predictor_med, settings.MONAI_LABEL_MEDSAM2_ONNX_ENCODER)
+
+        # image features of the last volume, kept across requests and filled ahead after single-slice prompts
+        self.speculative = SpeculativeEncoder(
+            settings.MONAI_LABEL_SAM2_FEATURE_CACHE_MB << 20, settings.MONAI_LABEL_SAM2_SPECULATIVE_SLICES
+        )
+
+        # nnInteractive, SAM2 and MedSAM2 share the device; the least recently used ones leave it when over budget
+        self.residency = ModelResidencyManager(
+            self.device,
+            settings.MONAI_LABEL_MODEL_BUDGET_MB << 20,
+            offload=settings.MONAI_LABEL_MODEL_OFFLOAD,
+            offload_dir=settings.MONAI_LABEL_MODEL_OFFLOAD_DIR,
+        )
+        self.residency.register("nninteractive", self.session.network)
+        self.residency.register("sam2", self.predictor_sam2, on_evict=self.speculative.clear)
+        self.residency.register("medsam2", self.predictor_med, on_evict=self.speculative.clear)
+
+        self.session_image: Dict[str, Any] = {
+            "seriesInstanceUID": None,
+        }
+        self.used_interactions = {
+            "pos_points": set(),
+            "neg_points": set(),
+            "pos_boxes": set(),
+            "neg_boxes": set(),
+            "pos_lassos": set(),
+            "neg_lassos": set(),
+            "pos_scribbles": set(),
+            "neg_scribbles": set(),
+        }
+        # undo / redo of the nnInteractive interactions: diffs of the regions they wrote and the prompts applied
+        self.history = SnapshotHistory(settings.MONAI_LABEL_NNINTER_UNDO_DEPTH)
+
+    def session_state(self) -> Dict[str, torch.Tensor]:
+        state = {name: getattr(self.session, name, None) for name in NNINTER_UNDO_STATE}
+        return {name: x for name, x in state.items() if isinstance(x, torch.Tensor)}
+
+    def reset_history(self):
+        self.history.reset(self.session_state(), self.used_interactions)
+
+    def interact(self, interaction):
+        """Run one nnInteractive interaction; the regions it overwrites go to the undo / redo history"""
+        return record_interaction(self.history, self.session, self.session_state(), interaction)
+
+    def add_prompt(self, prompt, prompt_type):
+        prompt_hash = hashlib.md5(np.array(prompt).tobytes()).hexdigest()
+        self.used_interactions[prompt_type].add(prompt_hash)
+
+    # When checking any type of prompt:
+    def is_prompt_used(self, prompt, prompt_type):
+        prompt_hash = hashlib.md5(np.array(prompt).tobytes()).hexdigest()
+        return prompt_hash in self.used_interactions[prompt_type]
+
+    def autocast(self):
+        # dynamically quantized layers run in fp32
+        enabled = settings.MONAI_LABEL_SAM2_AUTOCAST and not settings.MONAI_LABEL_SAM2_QUANTIZE
+        return autocast(self.device, enabled=enabled)
+
+    def stats(self):
+        return self.residency.stats()
+
+
+_interactive_router: Optional[SessionRouter] = None
+_interactive_router_lock = threading.RLock()
+
+
+def set_interactive_replicas(replicas: Sequence[InteractiveReplica], names: Optional[Sequence[str]] = None):
+    """Serve the interactive requests from `replicas` (e.g. stand-in models of a benchmark)"""
+    global _interactive_router
+    names = names if names else [f"{i}:{r.device}" for i, r in enumerate(replicas)]
+    with _interactive_router_lock:
+        _interactive_router = SessionRouter(
+            replicas, names=names, max_queue_depth=settings.MONAI_LABEL_INTERACTIVE_MAX_QUEUE
+        )
+        return _interactive_router
+
+
+def interactive_router() -> SessionRouter:
+    """
+    Router over the interactive replicas, one per device in MONAI_LABEL_INTERACTIVE_DEVICES (loaded on first use);
+    the requests of a study always go to the same one (unless it is saturated)
+    """
+    if _interactive_router is None:
+        # concurrent first requests (infer threads, /info) must not each load a set of replicas
+        with _interactive_router_lock:
+            if _interactive_router is None:
+                devices = settings.MONAI_LABEL_INTERACTIVE_DEVICES or [get_device(settings.MONAI_LABEL_SAM2_DEVICE)]
+                set_interactive_replicas([InteractiveReplica(device) for device in devices])
+    return _interactive_router
+
+
+def model_mtime(path: Optional[str]) -> float:
+    """Version of the weights in `path` (its mtime; 0 if there is no such file, e.g. a model given in code)"""
+    return os.stat(path).st_mtime if path and os.path.exists(path) else 0
+
+
+def sam2_version(model: str) -> str:
+    """
+    Version of the results of SAM2 / MedSAM2: the weights (mtime of the checkpoint) and the runtime
+    settings which change the numbers (int8 quantization, ONNX image encoder, bf16 autocast)
+    """
+    if model == "medsam2":
+        checkpoint, onnx = medsam2_checkpoint, settings.MONAI_LABEL_MEDSAM2_ONNX_ENCODER
+    else:
+        checkpoint, onnx = sam2_checkpoint, settings.MONAI_LABEL_SAM2_ONNX_ENCODER
+    version = {
+        "weights": model_mtime(checkpoint),
+        "quantize": settings.MONAI_LABEL_SAM2_QUANTIZE,
+        "autocast": settings.MONAI_LABEL_SAM2_AUTOCAST,
+        "onnx_encoder": f"{onnx}@{model_mtime(onnx)}" if onnx else "",
+    }
+    return json.dumps(version, sort_keys=True)
+
 
 logger = logging.getLogger(__name__)
 
@@ -179,22 +338,6 @@ class BasicInferTask(InferTask):
         self.train_mode = train_mode
         self.skip_writer = skip_writer
 
-        self._session_image: Dict[str, Any] = {
-            "seriesInstanceUID": None,
-        }
-
-
-        self._session_used_interactions = {
-            "pos_points": set(),
-            "neg_points": set(),
-            "pos_boxes": set(),
-            "neg_boxes": set(),
-            "pos_lassos": set(),
-            "neg_lassos": set(),
-            "pos_scribbles": set(),
-            "neg_scribbles": set(),
-        }
-
         self._networks: Dict = {}
 
         self._config.update(
@@ -212,6 +355,9 @@ class BasicInferTask(InferTask):
         if config:
             self._config.update(config)
 
+        # the interactive models are loaded with the app
+        interactive_router()
+
         if preload:
             for device in device_map().values():
                 logger.info(f"Preload Network for device: {device}")
@@ -350,16 +496,6 @@ class BasicInferTask(InferTask):
     def detector(self, data=None) -> Optional[Callable]:
         return None
 
-    # When adding any type of prompt:
-    def add_prompt(self, prompt, prompt_type):
-        prompt_hash = hashlib.md5(np.array(prompt).tobytes()).hexdigest()
-        self._session_used_interactions[prompt_type].add(prompt_hash)
-
-    # When checking any type of prompt:
-    def is_prompt_used(self, prompt, prompt_type):
-        prompt_hash = hashlib.md5(np.array(prompt).tobytes()).hexdigest()
-        return prompt_hash in self._session_used_interactions[prompt_type]
-
     def __call__(
         self, request, callbacks: Union[Dict[CallBackTypes, Any], None] = None
     ) -> Union[Dict, Tuple[str, Dict[str, Any]]]:
@@ -376,6 +512,82 @@ class BasicInferTask(InferTask):
 
         Returns: Label (File Path) and Result Params (JSON)
         """
+        # nnInteractive keeps the image and the prompts of the study on its replica; SAM2 requests carry their own state
+        nninter = request.get("nninter", self._config.get("nninter"))
+        key = request.get("studyInstanceUID") or request.get("image")
+        labels = {"model": self._resident_model(request) or "none", "prompt": prompt_type(request)}
+        cached = self._result_key(request)
+        with timer("total", **labels):
+            if cached:
+                with timer("result_cache", **labels):
+                    hit = result_cache().get(cached[0])
+                count_cache("infer_results", hits=int(hit is not None), misses=int(hit is None))
+                if hit is not None:
+                    pred, final_result_json = hit
+                    # same result as before, under a new label
+                    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+                    final_result_json["label_name"] = f"{cached[1]}_pred_{timestamp}"
+                    final_result_json["cached"] = True
+                    logger.info(f"Result Cache: hit for {request.get('image')} ({cached[1]})")
+                    return pred, final_result_json
+
+            queued = time.time()
+            with interactive_router().acquire(key, relocate=nninter == "init", spill=not nninter) as replica:
+                observe("queue_wait", time.time() - queued, **labels)
+                # the work counts against the device of the replica it was routed to
+                with work_scheduler().slot(infer_priority(request), replica.device):
+                    # the model of the request stays on the device (pinned) while it runs
+                    loading = time.time()
+                    with replica.residency.acquire(self._resident_model(request)):
+                        observe("model_load", time.time() - loading, **labels)
+                        result = self._run(request, callbacks, replica, labels)
+
+            if cached and isinstance(result[0], np.ndarray):
+                result_cache().put(cached[0], result[0], result[1], model=cached[1], version=cached[2])
+            return result
+
+    def routes_device(self) -> bool:
+        return True
+
+    def _result_key(self, request) -> Optional[Tuple[str, str, str]]:
+        """
+        Key in the result cache, model and model version of a SAM2 request (None for nnInteractive,
+        whose results depend on the prompts of the session); the SAM2 results only depend on the
+        series, the prompts and the version of the model (see `sam2_version`).
+        """
+        req = {**self._config, **request}
+        if req.get("nninter") or not isinstance(req.get("image"), str) or not result_cache().enabled:
+            return None
+
+        model = self._resident_model(req)
+        version = sam2_version(model)
+        result_cache().set_version(model, version)
+        series = req["image"].split(".nii.gz")[0].split("/")[-1]
+        return result_key(series, model, version, req), model, version
+
+    def _resident_model(self, request) -> Optional[str]:
+        """Name of the model (in the residency manager of the replica) used by the request"""
+        nninter = request.get("nninter", self._config.get("nninter"))
+        if nninter in ("reset", "undo", "redo"):
+            return None
+        if nninter:
+            return "nninteractive"
+        return "medsam2" if request.get("medsam2", self._config.get("medsam2")) else "sam2"
+
+    def stats(self) -> Dict[str, Any]:
+        router = interactive_router()
+        replicas = router.stats()
+        for stats, replica in zip(replicas, router.replicas):
+            stats["models"] = replica.stats()
+        return {"replicas": replicas}
+
+    def _run(
+        self,
+        request,
+        callbacks: Union[Dict[CallBackTypes, Any], None],
+        replica: InteractiveReplica,
+        labels: Dict[str, str],
+    ):
         begin = time.time()
         req = copy.deepcopy(self._config)
         req.update(request)
@@ -406,9 +618,10 @@ class BasicInferTask(InferTask):
         result_json = {}
         nnInter = data['nninter']
         if nnInter == "reset":
-            for key, lst in self._session_used_interactions.items():
+            for key, lst in replica.used_interactions.items():
                     lst.clear()
-            session.reset_interactions()
+            replica.session.reset_interactions()
+            replica.reset_history()
             logger.info("Reset nninter")
             return f'/code/predictions/reset.nii.gz', final_result_json
 
@@ -419,9 +632,10 @@ class BasicInferTask(InferTask):
         logger.info(f"Series Instance UID: {seriesInstanceUID}")
 
         reader = sitk.ImageSeriesReader()
-        dicom_filenames = reader.GetGDCMSeriesFileNames(dicom_dir)
-        dcm_img_sample = dcmread(dicom_filenames[0], stop_before_pixels=True)
-        dcm_img_sample_2 = dcmread(dicom_filenames[1], stop_before_pixels=True)
+        with timer("dicom_header", **labels):
+            dicom_filenames = reader.GetGDCMSeriesFileNames(dicom_dir)
+            dcm_img_sample = dcmread(dicom_filenames[0], stop_before_pixels=True)
+            dcm_img_sample_2 = dcmread(dicom_filenames[1], stop_before_pixels=True)
         
         instanceNumber = None
         instanceNumber2 = None
@@ -455,11 +669,32 @@ class BasicInferTask(InferTask):
 
         if 0x0008103e in dcm_img_sample.keys():
             image_series_desc = dcm_img_sample[0x0008103e].value
-            
-        # --- Load Input Image (Example with SimpleITK) ---
-        reader.SetFileNames(dicom_filenames)
-        #reader.SetOutputPixelType(SimpleITK.sitkUInt16) 
-        img = reader.Execute()
+
+        if nnInter in ("undo", "redo"):
+            # the target buffer and the prompts applied are restored from the snapshots; no model call
+            with timer(f"nninteractive_{nnInter}", **labels):
+                state = replica.session_state()
+                if "target_buffer" not in state:
+                    logger.info(f"Nothing to {nnInter}; no nnInteractive session")
+                    return f'/code/predictions/reset.nii.gz', final_result_json
+                step = replica.history.undo if nnInter == "undo" else replica.history.redo
+                done, used_interactions = step(state)
+                if used_interactions is not None:
+                    replica.used_interactions = used_interactions
+                pred = replica.session.target_buffer.clone().numpy()
+
+            logger.info(f"nninter {nnInter}: {done}; history: {replica.history.stats()}")
+            final_result_json["prompt_info"] = {}
+            final_result_json[nnInter] = done
+            final_result_json["flipped"] = instanceNumber > instanceNumber2
+            final_result_json["label_name"] = f"nninter_pred_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            return pred, final_result_json
+
+        # --- Load Input Image ---
+        # compressed series (RLE / JPEG-LS / JPEG 2000) are decoded in parallel; the transfer syntax is in the header
+        with timer("read_series", **labels):
+            img = read_dicom_series(dicom_filenames, header=dcm_img_sample)
+        count_bytes("in", "dicom_series", sum(os.path.getsize(f) for f in dicom_filenames))
 
         before_nnInter = time.time()
         logger.info(f"Before nnInter: {before_nnInter-begin} secs")
@@ -471,70 +706,76 @@ class BasicInferTask(InferTask):
                 raise ValueError("Input image must be 4D with shape (1, x, y, z)")
             
             if nnInter == "init":
-                if seriesInstanceUID is not None and self._session_image["seriesInstanceUID"] != seriesInstanceUID:
-                    self._session_image["seriesInstanceUID"] = seriesInstanceUID
+                if seriesInstanceUID is not None and replica.session_image["seriesInstanceUID"] != seriesInstanceUID:
+                    replica.session_image["seriesInstanceUID"] = seriesInstanceUID
                     try:
                         logger.info("Only first time, no image at nnInter or iamge changed")
-                        session.set_image(img_np)
-                        session.set_target_buffer(torch.zeros(img_np.shape[1:], dtype=torch.uint8))
+                        replica.session.set_image(img_np)
+                        replica.session.set_target_buffer(torch.zeros(img_np.shape[1:], dtype=torch.uint8))
                     except Exception as init_error:
                         logger.error(f"Failed to initialize session: {init_error}")
                         logger.info("Prefer fail!!")
-                for key, lst in self._session_used_interactions.items():
+                for key, lst in replica.used_interactions.items():
                     lst.clear()
-                session.reset_interactions()
+                replica.session.reset_interactions()
+                replica.reset_history()
+                observe("nninteractive_init", time.time() - start, **labels)
                 return f'/code/predictions/init.nii.gz', final_result_json
 
-            logger.info(f"interactions in _session_used_interactions: {self._session_used_interactions}")
+            logger.info(f"interactions in _session_used_interactions: {replica.used_interactions}")
+            num_used_interactions = sum(len(v) for v in replica.used_interactions.values())
 
             def _safe_interaction(perform_callable):
                 try:
-                    if session.original_image_shape is None or session.preprocessed_image is None:
+                    if replica.session.original_image_shape is None or replica.session.preprocessed_image is None:
                         # Edge cases: a) a lot of requests are pending, while changing layouts b) without proper image initialization
                         # For these cases, if possible, directly update the iamge and target buffer on the fly.
                         # If that's not possible, shutdown the executor and assign new one.
-                        logger.info(f"Check queue size: {session.executor._work_queue.qsize()}")
+                        logger.info(f"Check queue size: {replica.session.executor._work_queue.qsize()}")
                         logger.info("Set image and target buffer before interaction")
-                        if seriesInstanceUID is not None and self._session_image["seriesInstanceUID"] != seriesInstanceUID:
+                        if seriesInstanceUID is not None and replica.session_image["seriesInstanceUID"] != seriesInstanceUID:
                             logger.info("Series Instance UID changed -> update")
-                            self._session_image["seriesInstanceUID"] = seriesInstanceUID
-                        if session.executor._work_queue.qsize() == 0 and session.preprocess_future is None:
-                            session.set_image(img_np)
-                            session.set_target_buffer(torch.zeros(img_np.shape[1:], dtype=torch.uint8))
+                            replica.session_image["seriesInstanceUID"] = seriesInstanceUID
+                        if replica.session.executor._work_queue.qsize() == 0 and replica.session.preprocess_future is None:
+                            replica.session.set_image(img_np)
+                            replica.session.set_target_buffer(torch.zeros(img_np.shape[1:], dtype=torch.uint8))
+                            replica.reset_history()
                         
                         # Wait until session.preprocessed_image is not None
                         max_wait_time = 5.0  # Maximum wait time in seconds
                         wait_interval = 0.1   # Check every 100ms
                         waited_time = 0.0
                         
-                        while session.preprocessed_image is None and waited_time < max_wait_time:
+                        while replica.session.preprocessed_image is None and waited_time < max_wait_time:
                             time.sleep(wait_interval)
                             waited_time += wait_interval
                         
-                        if session.preprocessed_image is None:
+                        if replica.session.preprocessed_image is None:
                             logger.warning(f"Session preprocessed_image still None after {max_wait_time}s wait")
-                            logger.info(f"Check queue size: {session.executor._work_queue.qsize()}")
+                            logger.info(f"Check queue size: {replica.session.executor._work_queue.qsize()}")
                             logger.warning("Shutdown executor and assign again")
-                            session.executor.shutdown(wait=False, cancel_futures=True)
-                            session.executor = ThreadPoolExecutor(max_workers=2)
-                            session._reset_session()
-                            logger.info(f"Check queue size: {session.executor._work_queue.qsize()}")
+                            replica.session.executor.shutdown(wait=False, cancel_futures=True)
+                            replica.session.executor = ThreadPoolExecutor(max_workers=2)
+                            replica.session._reset_session()
+                            replica.history.clear()
+                            logger.info(f"Check queue size: {replica.session.executor._work_queue.qsize()}")
                             return False
                         else:
                             logger.info(f"Session preprocessed_image ready after {waited_time:.2f}s")
-                    logger.info(f"Check queue size: {session.executor._work_queue.qsize()}")        
+                    logger.info(f"Check queue size: {replica.session.executor._work_queue.qsize()}")        
                     with timeout_context(seconds=5):
-                        perform_callable()
+                        replica.interact(perform_callable)
                     return True
                 except Exception as e:
                     logger.error(f"Error during interaction: {e}")
                     logger.error(f"Full traceback: {traceback.format_exc()}")
                     try:
-                        logger.info(f"Check queue size: {session.executor._work_queue.qsize()}")
+                        logger.info(f"Check queue size: {replica.session.executor._work_queue.qsize()}")
                         logger.warning("Shutdown executor and assign again")
-                        session.executor.shutdown(wait=False, cancel_futures=True)
-                        session.executor = ThreadPoolExecutor(max_workers=2)
-                        session._reset_session()
+                        replica.session.executor.shutdown(wait=False, cancel_futures=True)
+                        replica.session.executor = ThreadPoolExecutor(max_workers=2)
+                        replica.session._reset_session()
+                        replica.history.clear()
                     except Exception as reset_error:
                         logger.error(f"Failed to reset session: {reset_error}")
                     return False
@@ -543,11 +784,11 @@ class BasicInferTask(InferTask):
                 result_json["pos_points"]=copy.deepcopy(data["pos_points"])
                 
                 for point in data['pos_points']:
-                    if not self.is_prompt_used(point, "pos_points"):
-                        self.add_prompt(point, "pos_points")
+                    if not replica.is_prompt_used(point, "pos_points"):
+                        replica.add_prompt(point, "pos_points")
                         if instanceNumber > instanceNumber2:
                             point[2]=img_np.shape[1]-1-point[2]
-                        if not _safe_interaction(lambda: session.add_point_interaction(tuple(point[::-1]), include_interaction=True)):
+                        if not _safe_interaction(lambda: replica.session.add_point_interaction(tuple(point[::-1]), include_interaction=True)):
                             return f'/code/predictions/reset.nii.gz', final_result_json
                         logger.info("Add pos points")
                                 
@@ -555,11 +796,11 @@ class BasicInferTask(InferTask):
                 result_json["neg_points"]=copy.deepcopy(data["neg_points"])
                 
                 for point in data['neg_points']:
-                    if not self.is_prompt_used(point, "neg_points"):
-                        self.add_prompt(point, "neg_points")
+                    if not replica.is_prompt_used(point, "neg_points"):
+                        replica.add_prompt(point, "neg_points")
                         if instanceNumber > instanceNumber2:
                             point[2]=img_np.shape[1]-1-point[2]
-                        if not _safe_interaction(lambda: session.add_point_interaction(tuple(point[::-1]), include_interaction=False)):
+                        if not _safe_interaction(lambda: replica.session.add_point_interaction(tuple(point[::-1]), include_interaction=False)):
                             return f'/code/predictions/reset.nii.gz', final_result_json
                         logger.info("Add neg points")
 
@@ -567,14 +808,14 @@ class BasicInferTask(InferTask):
                 result_json["pos_boxes"]=copy.deepcopy(data["pos_boxes"])
                 
                 for box in data['pos_boxes']:
-                    if not self.is_prompt_used(box, "pos_boxes"):
-                        self.add_prompt(box, "pos_boxes")
+                    if not replica.is_prompt_used(box, "pos_boxes"):
+                        replica.add_prompt(box, "pos_boxes")
                         if instanceNumber > instanceNumber2:
                             box[0][2]=img_np.shape[1]-1-box[0][2]
                             box[1][2]=img_np.shape[1]-1-box[1][2]
                         box[0]=box[0][::-1]
                         box[1]=box[1][::-1]
-                        if not _safe_interaction(lambda: session.add_bbox_interaction(
+                        if not _safe_interaction(lambda: replica.session.add_bbox_interaction(
                             [[box[0][0], box[1][0] + 1], [box[0][1], box[1][1]], [box[0][2], box[1][2]]],
                             include_interaction=True
                         )):
@@ -585,14 +826,14 @@ class BasicInferTask(InferTask):
                 result_json["neg_boxes"]=copy.deepcopy(data["neg_boxes"])
                 
                 for box in data['neg_boxes']:
-                    if not self.is_prompt_used(box, "neg_boxes"):
-                        self.add_prompt(box, "neg_boxes")
+                    if not replica.is_prompt_used(box, "neg_boxes"):
+                        replica.add_prompt(box, "neg_boxes")
                         if instanceNumber > instanceNumber2:
                             box[0][2]=img_np.shape[1]-1-box[0][2]
                             box[1][2]=img_np.shape[1]-1-box[1][2]
                         box[0]=box[0][::-1]
                         box[1]=box[1][::-1]
-                        if not _safe_interaction(lambda: session.add_bbox_interaction(
+                        if not _safe_interaction(lambda: replica.session.add_bbox_interaction(
                             [[box[0][0], box[1][0] + 1], [box[0][1], box[1][1]], [box[0][2], box[1][2]]],
                             include_interaction=False
                         )):
@@ -604,8 +845,8 @@ class BasicInferTask(InferTask):
                 result_json["pos_lassos"]=copy.deepcopy(data["pos_lassos"])
                 
                 for lasso in data['pos_lassos']:
-                    if not self.is_prompt_used(lasso, "pos_lassos"):
-                        self.add_prompt(lasso, "pos_lassos")
+                    if not replica.is_prompt_used(lasso, "pos_lassos"):
+                        replica.add_prompt(lasso, "pos_lassos")
                         lasso = get_scanline_filled_points_3d(clean_and_densify_polyline(lasso))
                         lassoMask = np.zeros(img_np.shape[1:], dtype=np.uint8)
                         
@@ -620,7 +861,7 @@ class BasicInferTask(InferTask):
                         )
                         # Apply only valid indices
                         lassoMask[z[valid], y[valid], x[valid]] = 1
-                        if not _safe_interaction(lambda: session.add_lasso_interaction(lassoMask, include_interaction=True)):
+                        if not _safe_interaction(lambda: replica.session.add_lasso_interaction(lassoMask, include_interaction=True)):
                             return f'/code/predictions/reset.nii.gz', final_result_json
                         logger.info("Add a lasso")                
             
@@ -628,8 +869,8 @@ class BasicInferTask(InferTask):
                 result_json["neg_lassos"]=copy.deepcopy(data["neg_lassos"])
                 
                 for lasso in data['neg_lassos']:
-                    if not self.is_prompt_used(lasso, "neg_lassos"):
-                        self.add_prompt(lasso, "neg_lassos")
+                    if not replica.is_prompt_used(lasso, "neg_lassos"):
+                        replica.add_prompt(lasso, "neg_lassos")
                         lasso = get_scanline_filled_points_3d(clean_and_densify_polyline(lasso))
                         lassoMask = np.zeros(img_np.shape[1:], dtype=np.uint8)
                         filled_indices = np.asarray(lasso)
@@ -643,7 +884,7 @@ class BasicInferTask(InferTask):
                         )
                         # Apply only valid indices
                         lassoMask[z[valid], y[valid], x[valid]] = 1
-                        if not _safe_interaction(lambda: session.add_lasso_interaction(lassoMask, include_interaction=False)):
+                        if not _safe_interaction(lambda: replica.session.add_lasso_interaction(lassoMask, include_interaction=False)):
                             return f'/code/predictions/reset.nii.gz', final_result_json
                         logger.info("Add a lasso")  
             
@@ -651,8 +892,8 @@ class BasicInferTask(InferTask):
                 result_json["pos_scribbles"]=copy.deepcopy(data["pos_scribbles"])
                 
                 for scribble in data['pos_scribbles']:
-                    if not self.is_prompt_used(scribble, "pos_scribbles"):
-                        self.add_prompt(scribble, "pos_scribbles")
+                    if not replica.is_prompt_used(scribble, "pos_scribbles"):
+                        replica.add_prompt(scribble, "pos_scribbles")
                         scribble = clean_and_densify_polyline(scribble)
                         scribbleMask = np.zeros(img_np.shape[1:], dtype=np.uint8)
 
@@ -685,7 +926,7 @@ class BasicInferTask(InferTask):
                             #    continue  # Skip out-of-bounds
                             scribbleMask[z0c:z1c, y0c:y1c, x0c:x1c] |= kernel[kz0:kz1, ky0:ky1, kx0:kx1]
                         scribble_start = time.time()
-                        if not _safe_interaction(lambda: session.add_scribble_interaction(scribbleMask, include_interaction=True)):
+                        if not _safe_interaction(lambda: replica.session.add_scribble_interaction(scribbleMask, include_interaction=True)):
                             return f'/code/predictions/reset.nii.gz', final_result_json
                         logger.info(f"only for add scribble: {time.time()-scribble_start} secs")
                         logger.info(f"just after add scribble: {time.time()-start} secs")
@@ -695,8 +936,8 @@ class BasicInferTask(InferTask):
                 result_json["neg_scribbles"]=copy.deepcopy(data["neg_scribbles"])
                 
                 for scribble in data['neg_scribbles']:
-                    if not self.is_prompt_used(scribble, "neg_scribbles"):
-                        self.add_prompt(scribble, "neg_scribbles")
+                    if not replica.is_prompt_used(scribble, "neg_scribbles"):
+                        replica.add_prompt(scribble, "neg_scribbles")
                         scribble = clean_and_densify_polyline(scribble)
                         scribbleMask = np.zeros(img_np.shape[1:], dtype=np.uint8)
 
@@ -731,16 +972,23 @@ class BasicInferTask(InferTask):
                             #    continue  # Skip out-of-bounds
                             scribbleMask[z0c:z1c, y0c:y1c, x0c:x1c] |= kernel[kz0:kz1, ky0:ky1, kx0:kx1]
                     
-                        if not _safe_interaction(lambda: session.add_scribble_interaction(scribbleMask, include_interaction=False)):
+                        if not _safe_interaction(lambda: replica.session.add_scribble_interaction(scribbleMask, include_interaction=False)):
                             return f'/code/predictions/reset.nii.gz', final_result_json
                         logger.info("Add a scribble")
 
+            observe("nninteractive_interactions", time.time() - start, **labels)
+
+            if sum(len(v) for v in replica.used_interactions.values()) != num_used_interactions:
+                with timer("nninteractive_snapshot", **labels):
+                    replica.history.push(replica.session_state(), replica.used_interactions)
+
             # --- Retrieve Results ---
             # The target buffer holds the segmentation result.
-            results = session.target_buffer.clone()
+            with timer("mask_conversion", **labels):
+                results = replica.session.target_buffer.clone()
 
-            # Enjoy!
-            pred = results.numpy()
+                # Enjoy!
+                pred = results.numpy()
 
             
 
@@ -772,14 +1020,16 @@ class BasicInferTask(InferTask):
         if nnInter == False:
             medsam2 = data['medsam2']
             if medsam2:
-                predictor = predictor_med
+                predictor = replica.predictor_med
             else:
-                predictor = predictor_sam2
+                predictor = replica.predictor_sam2
             start = time.time()
+            # the model is ours again; stop encoding slices ahead
+            replica.speculative.cancel()
             #result_json["pos_points"]=data["pos_points"]
-            result_json["pos_points"]=copy.deepcopy(data["pos_points"])
-            result_json["neg_points"]=copy.deepcopy(data["neg_points"])
-            result_json["pos_boxes"]=copy.deepcopy(data["pos_boxes"])
+            result_json["pos_points"]=copy.deepcopy(data.get("pos_points", []))
+            result_json["neg_points"]=copy.deepcopy(data.get("neg_points", []))
+            result_json["pos_boxes"]=copy.deepcopy(data.get("pos_boxes", []))
             
             len_z = img.GetSize()[2]
             len_y = img.GetSize()[1]
@@ -854,123 +1104,76 @@ class BasicInferTask(InferTask):
                         boxes_text = [int_list_with_z[i:i + 2] for i in range(0, len(int_list_with_z), 2)]
                         logger.info(f"boxes from text: {boxes_text}")
                         data['boxes']=boxes_text[:1]
-                with torch.inference_mode(), torch.autocast("cuda", dtype=torch.bfloat16):
-                    inference_state = predictor.init_state(video_path=img, clip_low=contrast_center-contrast_window/2, clip_high=contrast_center+contrast_window/2)
-            else:    
-                with torch.inference_mode(), torch.autocast("cuda", dtype=torch.bfloat16):
-                    inference_state = predictor.init_state(video_path=img)
+                clip_low, clip_high = contrast_center-contrast_window/2, contrast_center+contrast_window/2
+            else:
+                clip_low, clip_high = None, None
+            feature_cache = None
+            if settings.MONAI_LABEL_SAM2_FEATURE_CACHE_MB > 0:
+                feature_cache = replica.speculative.feature_cache((medsam2, data['image'], clip_low, clip_high))
+                cache_lookups = feature_cache.hits, feature_cache.misses
+            with torch.inference_mode(), replica.autocast(), timer("init_state", **labels):
+                inference_state = predictor.init_state(
+                    video_path=img, clip_low=clip_low, clip_high=clip_high, feature_cache=feature_cache
+                )
             #predictor.reset_state(inference_state)
             #breakpoint()
-            ann_obj_id = 1
-            video_segments = {}  # video_segments contains the per-frame segmentation results
-            
-            ann_frame_list = np.unique(np.array(list(map(lambda x: x[2], result_json['pos_points'])), dtype=np.int16))
-            ann_frame_list_neg = np.unique(np.array(list(map(lambda x: x[2], result_json['neg_points'])), dtype=np.int16))
-
-            if "pos_boxes" not in result_json:
-                result_json["pos_boxes"] = []            
-            if len(result_json["pos_boxes"])!=0:
-                #result_json["boxes"]=data["boxes"]
-                #logger.info(f"prompt boxes: {result_json["boxes"]}")
-                # Temp remove pos points
-                #data['pos_points']=[]
-                ann_frame_list_box = np.unique(np.array(list(map(lambda x: x[2], [x for xs in result_json["pos_boxes"] for x in xs])), dtype=np.int16))
-                ann_frame_list = np.unique(np.concatenate((ann_frame_list, ann_frame_list_box, ann_frame_list_neg)))
-
-            for i in range(len(ann_frame_list)):
-
-                reader = sitk.ImageSeriesReader()
-                dicom_filenames = reader.GetGDCMSeriesFileNames(dicom_dir)
-                dcm_img_sample = dcmread(dicom_filenames[0], stop_before_pixels=True)
-                dcm_img_sample_2 = dcmread(dicom_filenames[1], stop_before_pixels=True)
-                
-                instanceNumber = None
-                instanceNumber2 = None
-
-                if 0x00200013 in dcm_img_sample.keys():
-                    instanceNumber = dcm_img_sample[0x00200013].value
-                logger.info(f"Prompt First InstanceNumber: {instanceNumber}")
-                if 0x00200013 in dcm_img_sample_2.keys():
-                    instanceNumber2 = dcm_img_sample_2[0x00200013].value
-                logger.info(f"Prompt Second InstanceNumber: {instanceNumber2}")
-
-                if instanceNumber < instanceNumber2:
-                    ann_frame_idx = ann_frame_list[i]
-                else:    
-                    ann_frame_idx = len_z-1-ann_frame_list[i]
-            
-            #ann_frame_idx = len_z-1-data['pos_points'][0][2]  # the frame index we interact with 
-                  # give a unique id to each object we interact with (it can be any integers)
-            
-            # Let's add a positive click at (x, y) = (210, 350) to get started
-            #pos_points = np.array(list(map(lambda x: x[0:2], data['pos_points'])), dtype=np.float32)
-                #breakpoint()
-                value = ann_frame_list[i]
-                logger.info(f"z axis slice: value: {value}")
-                pos_points = np.array([i[0:2] for i in result_json['pos_points'] if i[2]==value], dtype=np.int16)
-                neg_points = np.array([i[0:2] for i in result_json['neg_points'] if i[2]==value], dtype=np.int16)
-                pre_boxes = np.array([i for i in result_json["pos_boxes"] if i[0][2]==value], dtype=np.int16)
-
-                if len(neg_points) >0 and len(pos_points) >0:
-                    points = np.concatenate((pos_points, neg_points), axis=0)
-                    # for labels, `1` means positive click and `0` means negative click        
-                    labels = np.array([1]*len(pos_points) + [0]*len(neg_points), np.int32)
-                elif len(pos_points) >0:
-                    points = pos_points
-                    labels = np.array([1]*len(points), np.int32)
-                elif len(neg_points) >0:
-                    points = neg_points
-                    labels = np.array([0]*len(points), np.int32)
-                else:
-                    points = np.array([], dtype=np.int16)
-                    labels = np.array([], dtype=np.int32)
-
-                if len(pre_boxes)!=0:
-                    boxes = pre_boxes[:,:,:-1].reshape(pre_boxes.shape[0],-1)
-                    logger.info(f"ann_frame_list: {ann_frame_list}")
-                    logger.info(f"ann_frame_idx: {ann_frame_idx}")
-                    with torch.inference_mode(), torch.autocast("cuda", dtype=torch.bfloat16):
-                        _, out_obj_ids, out_mask_logits = predictor.add_new_points_or_box(
-                        inference_state=inference_state,
-                        frame_idx=ann_frame_idx,
-                        obj_id=ann_obj_id,
-                        points=points,
-                        labels=labels,
-                        box=boxes
-                    )
-                else:
-                    with torch.inference_mode(), torch.autocast("cuda", dtype=torch.bfloat16):
+            # one object per segment; all of them are tracked together in one propagation
+            segment_prompts = group_prompts(data)
+            if data.get("segments"):
+                result_json["segments"] = segment_prompts
+            video_segments = {}  # video_segments contains the per-frame label maps
+
+            reader = sitk.ImageSeriesReader()
+            dicom_filenames = reader.GetGDCMSeriesFileNames(dicom_dir)
+            dcm_img_sample = dcmread(dicom_filenames[0], stop_before_pixels=True)
+            dcm_img_sample_2 = dcmread(dicom_filenames[1], stop_before_pixels=True)
+
+            instanceNumber = None
+            instanceNumber2 = None
+
+            if 0x00200013 in dcm_img_sample.keys():
+                instanceNumber = dcm_img_sample[0x00200013].value
+            logger.info(f"Prompt First InstanceNumber: {instanceNumber}")
+            if 0x00200013 in dcm_img_sample_2.keys():
+                instanceNumber2 = dcm_img_sample_2[0x00200013].value
+            logger.info(f"Prompt Second InstanceNumber: {instanceNumber2}")
+
+            for ann_obj_id, prompts in segment_prompts.items():
+                ann_frame_list = prompt_slices(prompts)
+                for value in ann_frame_list:
+                    if instanceNumber < instanceNumber2:
+                        ann_frame_idx = value
+                    else:
+                        ann_frame_idx = len_z-1-value
+
+                    logger.info(f"segment: {ann_obj_id}; z axis slice: value: {value}")
+                    points, point_labels, boxes = slice_prompts(prompts, value)
+                    box_kwargs = {"box": boxes} if len(boxes) != 0 else {}
+                    with torch.inference_mode(), replica.autocast(), timer("add_prompts", **labels):
                         _, out_obj_ids, out_mask_logits = predictor.add_new_points_or_box(
-                        inference_state=inference_state,
-                        frame_idx=ann_frame_idx,
-                        obj_id=ann_obj_id,
-                        points=points,
-                        labels=labels,
-                    )
-
-                if "one" in data:
-                    video_segments[ann_frame_idx] = {
-                        out_obj_id: (out_mask_logits[i] > 0.0).cpu().numpy()
-                        for i, out_obj_id in enumerate(out_obj_ids)
-                    }
+                            inference_state=inference_state,
+                            frame_idx=ann_frame_idx,
+                            obj_id=ann_obj_id,
+                            points=points,
+                            labels=point_labels,
+                            **box_kwargs,
+                        )
+
+                    if "one" in data:
+                        video_segments[ann_frame_idx] = label_map(out_obj_ids, out_mask_logits)
             if "one" not in data:
-                with torch.inference_mode(), torch.autocast("cuda", dtype=torch.bfloat16):
+                with torch.inference_mode(), replica.autocast(), timer("propagate_forward", **labels):
                     for out_frame_idx, out_obj_ids, out_mask_logits in predictor.propagate_in_video(inference_state, reverse=False):
-                        video_segments[out_frame_idx] = {
-                            out_obj_id: (out_mask_logits[i] > 0.0).cpu().numpy()
-                            for i, out_obj_id in enumerate(out_obj_ids)
-                        }
-                with torch.inference_mode(), torch.autocast("cuda", dtype=torch.bfloat16):
+                        video_segments[out_frame_idx] = label_map(out_obj_ids, out_mask_logits)
+                with torch.inference_mode(), replica.autocast(), timer("propagate_reverse", **labels):
                     for out_frame_idx, out_obj_ids, out_mask_logits in predictor.propagate_in_video(inference_state, reverse=True):
-                        video_segments[out_frame_idx] = {
-                            out_obj_id: (out_mask_logits[i] > 0.0).cpu().numpy()
-                            for i, out_obj_id in enumerate(out_obj_ids)
-                        }
+                        video_segments[out_frame_idx] = label_map(out_obj_ids, out_mask_logits)
 
-            pred = np.zeros((len_z, len_y, len_x))
+            with timer("mask_conversion", **labels):
+                pred = np.zeros((len_z, len_y, len_x))
 
-            for i in video_segments.keys():
-                pred[i]=video_segments[i][1][0].astype(int)
+                for i in video_segments.keys():
+                    pred[i]=video_segments[i]
             #pred_itk = sitk.GetImageFromArray(pred)
             #pred_itk.CopyInformation(img)
             #pred_itk = sitk.Cast(pred_itk, sitk.sitkUInt8)
@@ -981,6 +1184,14 @@ class BasicInferTask(InferTask):
 
             final_result_json["prompt_info"] = result_json
             final_result_json["sam_elapsed"] = sam_elapsed
+            if feature_cache is not None:
+                final_result_json["feature_cache"] = feature_cache.stats()
+                count_cache(
+                    "sam2_features",
+                    hits=feature_cache.hits - cache_lookups[0],
+                    misses=feature_cache.misses - cache_lookups[1],
+                )
+                logger.info(f"SAM2 feature cache: {final_result_json['feature_cache']}")
             
             if instanceNumber > instanceNumber2:
                 final_result_json["flipped"] = True
@@ -996,6 +1207,10 @@ class BasicInferTask(InferTask):
             logger.info(f"Result json info: {final_result_json}")
             # result_json contains prompt information
 
+            if feature_cache is not None and "one" in data and video_segments:
+                # the user is likely to prompt a neighbouring slice next
+                replica.speculative.schedule(predictor, inference_state, ann_frame_idx, replica.autocast)
+
             return pred, final_result_json
 
     def run_pre_transforms(self, data: Dict[str, Any], transforms):
@@ -1078,13 +1293,13 @@ class BasicInferTask(InferTask):
             )
 
         cached = self._networks.get(device)
-        statbuf = os.stat(path) if path else None
+        mtime = model_mtime(path)
         network = None
         if cached:
-            if statbuf and statbuf.st_mtime == cached[1]:
+            if mtime and mtime == cached[1]:
                 network = cached[0]
-            elif statbuf:
-                logger.warning(f"Reload model from cache.  Prev ts: {cached[1]}; Current ts: {statbuf.st_mtime}")
+            elif mtime:
+                logger.warning(f"Reload model from cache.  Prev ts: {cached[1]}; Current ts: {mtime}")
 
         if network is None:
             if self.network:
@@ -1112,7 +1327,7 @@ class BasicInferTask(InferTask):
                 network.train()
             else:
                 network.eval()
-            self._networks[device] = (network, statbuf.st_mtime if statbuf else 0)
+            self._networks[device] = (network, mtime)
 
         return network
 
@@ -0,0 +1,99 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import torch
+
+PROMPT_KEYS = ("pos_points", "neg_points", "pos_boxes")
+
+# kind of prompt -> request keys (SAM2 and nnInteractive)
+PROMPT_TYPES = {
+    "points": ("pos_points", "neg_points"),
+    "boxes": ("pos_boxes", "neg_boxes", "boxes"),
+    "lassos": ("pos_lassos", "neg_lassos"),
+    "scribbles": ("pos_scribbles", "neg_scribbles"),
+    "texts": ("texts",),
+}
+
+
+def group_prompts(data: Dict[str, Any]) -> Dict[int, Dict[str, List]]:
+    """
+    Prompts of a SAM2 infer request, grouped by segment (object) id.
+
+    Several segments are given as ``{"segments": {<segment id>: {"pos_points": [...], "neg_points": [...],
+    "pos_boxes": [...]}}}``; otherwise the top level prompts of the request are segment 1.
+    """
+    segments = data.get("segments")
+    if not segments:
+        return {1: {k: copy.deepcopy(data.get(k) or []) for k in PROMPT_KEYS}}
+
+    grouped = {}
+    for segment_id, prompts in segments.items():
+        segment_id = int(segment_id)
+        if segment_id <= 0:
+            raise ValueError(f"Segment id must be a positive integer: {segment_id}")
+        grouped[segment_id] = {k: copy.deepcopy(prompts.get(k) or []) for k in PROMPT_KEYS}
+    return dict(sorted(grouped.items()))
+
+
+def prompt_type(data: Dict[str, Any]) -> str:
+    """
+    Kinds of prompts in an infer request (e.g. ``points+boxes``, ``none``), a label of low cardinality
+    for the latency metrics; nnInteractive ``init`` / ``reset`` / ``undo`` / ``redo`` requests are labelled as such.
+    """
+    if data.get("nninter") in ("init", "reset", "undo", "redo"):
+        return data["nninter"]
+
+    requests = [data] + list((data.get("segments") or {}).values())
+    kinds = [
+        kind for kind, keys in PROMPT_TYPES.items() if any(any(r.get(k) or []) for r in requests for k in keys)
+    ]
+    return "+".join(kinds) if kinds else "none"
+
+
+def prompt_slices(prompts: Dict[str, List]) -> np.ndarray:
+    """Slices (z) with prompts; slices with only negative clicks count when boxes are given"""
+    slices = np.unique(np.array([p[2] for p in prompts["pos_points"]], dtype=np.int16))
+    if len(prompts["pos_boxes"]):
+        box_slices = np.array([p[2] for box in prompts["pos_boxes"] for p in box], dtype=np.int16)
+        neg_slices = np.array([p[2] for p in prompts["neg_points"]], dtype=np.int16)
+        slices = np.unique(np.concatenate((slices, box_slices, neg_slices)))
+    return slices
+
+
+def slice_prompts(prompts: Dict[str, List], value) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Points, labels (1 positive / 0 negative click) and boxes (x0, y0, x1, y1) on slice `value`"""
+    pos_points = np.array([p[0:2] for p in prompts["pos_points"] if p[2] == value], dtype=np.int16)
+    neg_points = np.array([p[0:2] for p in prompts["neg_points"] if p[2] == value], dtype=np.int16)
+    boxes = np.array([b for b in prompts["pos_boxes"] if b[0][2] == value], dtype=np.int16)
+
+    if len(pos_points) or len(neg_points):
+        points = np.concatenate([x for x in (pos_points, neg_points) if len(x)], axis=0)
+    else:
+        points = np.array([], dtype=np.int16)
+    labels = np.array([1] * len(pos_points) + [0] * len(neg_points), np.int32)
+    if len(boxes):
+        boxes = boxes[:, :, :-1].reshape(boxes.shape[0], -1)
+    return points, labels, boxes
+
+
+def label_map(obj_ids: Sequence[int], mask_logits: torch.Tensor) -> np.ndarray:
+    """
+    Multi-label map of a frame from the per-object mask logits [num_obj, 1, H, W]; each pixel
+    gets the id of the object with the highest positive logit (0 for background).
+    """
+    scores, index = mask_logits[:, 0].max(dim=0)
+    ids = torch.as_tensor(list(obj_ids), device=mask_logits.device)
+    labels = torch.where(scores > 0.0, ids[index], torch.zeros_like(index))
+    return labels.cpu().numpy()
@@ -22,6 +22,8 @@ from monai.utils import deprecated
 
 from monailabel.interfaces.datastore import Datastore
 from monailabel.interfaces.tasks.scoring import ScoringMethod
+from monailabel.utils.others.generic import name_to_device
+from monailabel.utils.others.scheduler import Priority, work_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -164,7 +166,8 @@ class EpistemicScoring(ScoringMethod):
             data = {"image": datastore.get_image_uri(image_id)}
             accum_unl_outputs = []
             for i in range(num_samples):
-                output_pred = self.infer_seg(data, model, self.roi_size, 1)
+                with work_scheduler().slot(Priority.SCORING, name_to_device(self.device)):
+                    output_pred = self.infer_seg(data, model, self.roi_size, 1)
                 logger.info(f"EPISTEMIC:: {image_id} => {i} => pred: {output_pred.shape}; sum: {np.sum(output_pred)}")
                 accum_unl_outputs.append(output_pred)
 
@@ -9,6 +9,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
 import logging
 import multiprocessing
 import os
@@ -23,6 +24,7 @@ from monailabel.interfaces.datastore import Datastore
 from monailabel.interfaces.tasks.scoring import ScoringMethod
 from monailabel.tasks.infer.basic_infer import BasicInferTask
 from monailabel.utils.others.generic import name_to_device
+from monailabel.utils.others.scheduler import Priority, work_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -172,8 +174,14 @@ class EpistemicScoring(ScoringMethod):
         }
 
         accum_unl_outputs = []
+        device = name_to_device(request.get("device", "cuda"))
+        routed = self.infer_task.routes_device()
+        if routed:
+            request["priority"] = Priority.SCORING.name.lower()  # the task takes the slot on the device it routes to
         for i in range(simulation_size):
-            data = self.infer_task(request=request)
+            # one slot per simulation; interactive / infer work waiting meanwhile goes first
+            with contextlib.nullcontext() if routed else work_scheduler().slot(Priority.SCORING, device):
+                data = self.infer_task(request=request)
             pred = data[self.infer_task.output_label_key] if isinstance(data, dict) else None
             if pred is not None:
                 logger.debug(f"EPISTEMIC:: {image_id} => {i} => pred: {pred.shape}; sum: {np.sum(pred)}")
@@ -10,38 +10,239 @@
 # limitations under the License.
 
 import copy
+import itertools
 import logging
 import os
 import pathlib
-from typing import Hashable, Sequence, Tuple, Union
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import torch
-from expiring_dict import ExpiringDict
 from monai.config import KeysCollection
 from monai.data import MetaTensor
 from monai.transforms import Transform
 from monai.utils import ensure_tuple
 
+from monailabel.config import settings
 from monailabel.utils.others.generic import md5_digest
-from monailabel.utils.sessions import Sessions
 
 logger = logging.getLogger(__name__)
 
+
+def _nbytes(obj) -> int:
+    """Bytes of the tensors / arrays in `obj` (nested in dicts, lists and tuples)"""
+    if isinstance(obj, torch.Tensor):
+        return obj.element_size() * obj.nelement()
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(_nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(_nbytes(v) for v in obj)
+    return 0
+
+
+class _Spilled:
+    """Placeholder of an array written to a `.npy` file"""
+
+    def __init__(self, path: str, kind: str, meta=None, applied_operations=None, is_batch=False):
+        self.path = path
+        self.kind = kind  # numpy, tensor or metatensor
+        self.meta = meta
+        self.applied_operations = applied_operations
+        self.is_batch = is_batch
+
+    def load(self):
+        # copy-on-write: the file is mapped read-only; pages are only copied if the result is modified
+        array = np.load(self.path, mmap_mode="c")
+        if self.kind == "numpy":
+            return array
+        tensor = torch.from_numpy(array)
+        if self.kind == "tensor":
+            return tensor
+        tensor = MetaTensor(tensor, meta=self.meta, applied_operations=self.applied_operations)
+        tensor.is_batch = self.is_batch
+        return tensor
+
+
+class _Entry:
+    def __init__(self, obj, nbytes: int, expires: float):
+        self.obj = obj
+        self.nbytes = nbytes
+        self.expires = expires
+        self.files: List[str] = []
+
+
+class TransformCache:
+    """
+    Pre-transform results by key, bounded in bytes (of their tensors / arrays) with least recently used eviction.
+
+    Memory keeps results up to `max_bytes`. The least recently used ones move to `path` (up to `disk_max_bytes`):
+    their arrays of at least `spill_bytes` are written as raw `.npy` files and memory-mapped back on a hit, the
+    rest of the result (meta data, small arrays) stays in memory. Results expire after their ttl; a budget <= 0
+    disables the tier.
+    """
+
+    def __init__(self, max_bytes: int, path: str, disk_max_bytes: int = 0, spill_bytes: int = 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.disk_max_bytes = disk_max_bytes
+        self.spill_bytes = spill_bytes
+        self.lock = threading.RLock()
+        self.memory: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.disk: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._sequence = itertools.count()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.lock:
+            self.remove_expired()
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                return entry.obj
+
+            entry = self.disk.get(key)
+            if entry is None:
+                return None
+            self.disk.move_to_end(key)
+            obj = copy.deepcopy(entry.obj)  # without the spilled arrays
+        return self._restore(obj)
+
+    def put(self, key: str, obj: Any, ttl: int, in_memory: bool = True):
+        """Cache `obj` (a copy); straight to the disk tier if not `in_memory`"""
+        with self.lock:
+            self._drop(key)
+            entry = _Entry(copy.deepcopy(obj) if in_memory else obj, _nbytes(obj), time.time() + ttl)
+            if in_memory and 0 < self.max_bytes and entry.nbytes <= self.max_bytes:
+                self.memory[key] = entry
+                self._evict()
+            else:
+                self._spill(key, entry)
+
+    def _evict(self):
+        total = sum(e.nbytes for e in self.memory.values())
+        while self.memory and total > self.max_bytes:
+            key, entry = self.memory.popitem(last=False)
+            total -= entry.nbytes
+            self._spill(key, entry)
+
+    def _spill(self, key: str, entry: _Entry):
+        if self.disk_max_bytes <= 0 or entry.nbytes > self.disk_max_bytes:
+            logger.info(f"Transform Cache: dropping {key} ({entry.nbytes} bytes); over the budget")
+            return
+
+        try:
+            entry.obj = copy.deepcopy(self._write(entry.obj, entry.files))  # the rest is small
+        except OSError as e:
+            logger.warning(f"Transform Cache: failed to spill {key}: {e}")
+            for file in entry.files:
+                if os.path.exists(file):
+                    os.remove(file)
+            return
+        self.disk[key] = entry
+        total = sum(e.nbytes for e in self.disk.values())
+        while self.disk and total > self.disk_max_bytes:
+            old = next(iter(self.disk))
+            total -= self.disk[old].nbytes
+            self._drop(old)
+
+    def _write(self, obj, files: List[str]):
+        """`obj` with its large arrays written to `.npy` files (and replaced by placeholders)"""
+        if isinstance(obj, dict):
+            return {k: self._write(v, files) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return type(obj)(self._write(v, files) for v in obj)
+
+        spill = isinstance(obj, np.ndarray) and obj.dtype != object
+        if isinstance(obj, torch.Tensor):
+            spill = obj.device.type == "cpu" and obj.dtype not in (torch.bfloat16,) and not obj.requires_grad
+        if not spill or _nbytes(obj) < self.spill_bytes:
+            return obj
+
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(self.path, f"{next(self._sequence)}.npy")
+        if isinstance(obj, MetaTensor):
+            np.save(path, obj.as_tensor().numpy())
+            spilled = _Spilled(path, "metatensor", obj.meta, obj.applied_operations, obj.is_batch)
+        elif isinstance(obj, torch.Tensor):
+            np.save(path, obj.numpy())
+            spilled = _Spilled(path, "tensor")
+        else:
+            np.save(path, obj)
+            spilled = _Spilled(path, "numpy")
+        files.append(path)
+        return spilled
+
+    def _restore(self, obj):
+        if isinstance(obj, _Spilled):
+            return obj.load()
+        if isinstance(obj, dict):
+            return {k: self._restore(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return type(obj)(self._restore(v) for v in obj)
+        return obj
+
+    def _drop(self, key: str):
+        self.memory.pop(key, None)
+        entry = self.disk.pop(key, None)
+        for file in entry.files if entry else []:
+            if os.path.exists(file):
+                os.remove(file)  # a result still mapped keeps its pages until it is released
+
+    def remove_expired(self):
+        with self.lock:
+            now = time.time()
+            for key in [k for k, e in itertools.chain(self.memory.items(), self.disk.items()) if e.expires < now]:
+                self._drop(key)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "memory": {"entries": len(self.memory), "bytes": sum(e.nbytes for e in self.memory.values())},
+                "disk": {"entries": len(self.disk), "bytes": sum(e.nbytes for e in self.disk.values())},
+            }
+
+
 _cache_path = None
-_data_mem_cache = None
-_data_file_cache = None
+_data_cache: Optional[TransformCache] = None
+_cache_lock = threading.Lock()
+
+
+def _remove_stale(root: str):
+    """Spilled arrays of other (stopped) processes; they are only known to the process which wrote them"""
+    for name in os.listdir(root) if os.path.isdir(root) else []:
+        path = os.path.join(root, name)
+        if not name.isdigit() or int(name) == os.getpid():
+            if os.path.isfile(path):
+                os.remove(path)  # files of the previous (torch.save) format
+            continue
+        try:
+            os.kill(int(name), 0)
+        except ProcessLookupError:
+            shutil.rmtree(path, ignore_errors=True)
+        except PermissionError:
+            pass
 
 
 def init_cache():
     global _cache_path
-    global _data_mem_cache
-    global _data_file_cache
-    if not _cache_path:
-        _cache_path = os.path.join(pathlib.Path.home(), ".cache", "monailabel", "cacheT")
-        _data_mem_cache = ExpiringDict(ttl=600)
-        _data_file_cache = Sessions(store_path=_cache_path, expiry=600)
+    global _data_cache
+    with _cache_lock:
+        if not _cache_path:
+            root = os.path.join(pathlib.Path.home(), ".cache", "monailabel", "cacheT")
+            _remove_stale(root)
+            _cache_path = os.path.join(root, str(os.getpid()))
+            _data_cache = TransformCache(
+                settings.MONAI_LABEL_TRANSFORM_CACHE_MB * 1024 * 1024,
+                _cache_path,
+                settings.MONAI_LABEL_TRANSFORM_CACHE_DISK_MB * 1024 * 1024,
+            )
 
-    _data_file_cache.remove_expired()
+    _data_cache.remove_expired()
 
 
 class CacheTransformDatad(Transform):
@@ -106,20 +307,7 @@ class CacheTransformDatad(Transform):
         return d
 
     def _load(self, hash_key):
-        if self.in_memory:
-            return _data_mem_cache.get(hash_key)
-
-        info = _data_file_cache.get_session(session_id=hash_key)
-        if info and os.path.isfile(info.image):
-            return torch.load(info.image)
-        return None
+        return _data_cache.get(hash_key)
 
     def _save(self, hash_key, obj):
-        if self.in_memory:
-            _data_mem_cache.ttl(key=hash_key, value=copy.deepcopy(obj), ttl=self.ttl)
-        else:
-            os.makedirs(_cache_path, exist_ok=True)
-
-            cached_file = os.path.join(_cache_path, f"{hash_key}.tmp")
-            torch.save(obj, cached_file)
-            _data_file_cache.add_session(cached_file, expiry=self.ttl, session_id=hash_key)
+        _data_cache.put(hash_key, obj, ttl=self.ttl, in_memory=self.in_memory)
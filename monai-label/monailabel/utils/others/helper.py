@@ -1,6 +1,8 @@
+import ctypes
 import math
 import numpy as np
 import signal
+import threading
 from contextlib import contextmanager
 
 def clean_and_densify_polyline(polyline, max_segment_length=1):
@@ -151,15 +153,48 @@ class TimeoutError(Exception):
 
 @contextmanager
 def timeout_context(seconds):
-    """Context manager for timeout protection using signal.alarm"""
-    def timeout_handler(signum, frame):
-        raise TimeoutError(f"Operation timed out after {seconds} seconds")
-    
-    old_handler = signal.signal(signal.SIGALRM, timeout_handler)
-    signal.alarm(seconds)
-    
+    """
+    Context manager for timeout protection: raises TimeoutError in the calling thread after `seconds`.
+
+    The main thread uses signal.alarm. Signals can not be used in other threads (e.g. the infer thread pool),
+    so there a timer raises the TimeoutError asynchronously in the thread. Like the signal handler, it is
+    raised between Python bytecodes, i.e. once a running native call (e.g. a torch op) returns.
+    """
+    if threading.current_thread() is threading.main_thread():
+        def timeout_handler(signum, frame):
+            raise TimeoutError(f"Operation timed out after {seconds} seconds")
+
+        old_handler = signal.signal(signal.SIGALRM, timeout_handler)
+        signal.alarm(seconds)
+
+        try:
+            yield
+        finally:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, old_handler)
+        return
+
+    thread_id = ctypes.c_ulong(threading.get_ident())
+    lock = threading.Lock()
+    state = {"active": True, "expired": False}
+
+    def expire():
+        with lock:
+            if state["active"]:
+                state["expired"] = True
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(thread_id, ctypes.py_object(TimeoutError))
+
+    timer = threading.Timer(seconds, expire)
+    timer.daemon = True
+    timer.start()
     try:
         yield
     finally:
-        signal.alarm(0)
-        signal.signal(signal.SIGALRM, old_handler)
+        timer.cancel()
+        with lock:
+            state["active"] = False
+            if state["expired"]:
+                # not raised yet (the block ended first); don't let it escape later, outside of the block
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(thread_id, None)
+    if state["expired"]:
+        raise TimeoutError(f"Operation timed out after {seconds} seconds")
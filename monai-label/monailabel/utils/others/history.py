@@ -0,0 +1,234 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import logging
+import zlib
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+# integer type of the same size, to xor the bytes of a tensor
+_BITS = {1: torch.uint8, 2: torch.int16, 4: torch.int32, 8: torch.int64}
+
+
+def _as_bits(x: torch.Tensor) -> torch.Tensor:
+    x = x.contiguous()
+    return x.view(torch.uint8) if x.dtype == torch.bool else x.view(_BITS[x.element_size()])
+
+
+def _as_slices(region, shape) -> Tuple[slice, ...]:
+    """`region` (indices / unit-step slices over the leading dims) as one `slice(start, stop)` per dim"""
+    slices = []
+    for i, n in enumerate(shape):
+        r = region[i] if i < len(region) else slice(None)
+        if isinstance(r, slice):
+            start, stop, _ = r.indices(n)
+        else:
+            start = int(r) % n
+            stop = start + 1
+        slices.append(slice(start, max(start, stop)))
+    return tuple(slices)
+
+
+class TensorDiff:
+    """Compressed xor of two versions of a tensor over the bounding box of their differences"""
+
+    def __init__(self, name: str, region: Tuple[slice, ...], shape, dtype, data: bytes):
+        self.name = name
+        self.region = region
+        self.shape = shape
+        self.dtype = dtype
+        self.data = data
+
+    @classmethod
+    def between(
+        cls, name: str, before: torch.Tensor, after: torch.Tensor, level: int = 1, region: Tuple = ()
+    ) -> Optional["TensorDiff"]:
+        """
+        Diff from `before` to `after` (None if they are equal); only `after[region]` is compared, `before`
+        holds the previous values of that region (by default the whole tensor)
+        """
+        region = _as_slices(region, after.shape)
+        after = after[region]
+        before = before.to(after.device).reshape(after.shape)
+        changed = before != after
+        if not changed.any():
+            return None
+
+        local = []
+        for d in range(changed.ndim):
+            others = [i for i in range(changed.ndim) if i != d]
+            index = torch.nonzero(changed.any(dim=others) if others else changed).flatten()
+            local.append(slice(int(index[0]), int(index[-1]) + 1))
+        local = tuple(local)
+
+        xor = torch.bitwise_xor(_as_bits(before[local]), _as_bits(after[local])).cpu().numpy()
+        region = tuple(slice(r.start + l.start, r.start + l.stop) for r, l in zip(region, local))
+        return cls(name, region, xor.shape, xor.dtype, zlib.compress(xor.tobytes(), level))
+
+    def apply(self, x: torch.Tensor):
+        """Turn one version of the tensor into the other, in place (the xor works in both directions)"""
+        xor = np.frombuffer(zlib.decompress(self.data), dtype=self.dtype).reshape(self.shape)
+        bits = torch.bitwise_xor(_as_bits(x[self.region]), torch.from_numpy(xor.copy()).to(x.device))
+        x[self.region] = bits.view(torch.bool) if x.dtype == torch.bool else bits.view(x.dtype)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data)
+
+
+class SnapshotHistory:
+    """
+    Undo / redo of the state of an interactive session: named tensors (e.g. the nnInteractive target
+    buffer) plus metadata (e.g. the prompts already applied).
+
+    Each interaction `record`s the pre-images of the regions it overwrites (nnInteractive keeps them in its
+    own undo log, see `record_interaction`); `push` then stores the difference over those regions as a
+    compressed `TensorDiff`, so a step costs in the size of the change, not of the volume, and no copy of
+    the state is kept. `undo` / `redo` apply the diffs to the tensors in place, without running the model.
+    At most `max_depth` steps are kept (0 disables).
+    """
+
+    def __init__(self, max_depth: int = 20, level: int = 1):
+        self.max_depth = max_depth
+        self.level = level
+        self._layout: Dict[str, Tuple] = {}
+        self._pending: List[Tuple[str, Tuple, torch.Tensor]] = []
+        self._meta: Any = None
+        self._undo: deque = deque()
+        self._redo: List = []
+
+    def reset(self, state: Dict[str, torch.Tensor], meta: Any = None):
+        """Start over from `state` (e.g. after a new image or a reset); drops all the steps"""
+        self._undo.clear()
+        self._redo.clear()
+        self._pending.clear()
+        self._layout = {k: (v.shape, v.dtype) for k, v in state.items()}
+        self._meta = copy.deepcopy(meta)
+
+    def clear(self):
+        self.reset({})
+
+    def record(self, name: str, region: Tuple, before: torch.Tensor):
+        """Keep `before`, the values of `state[name][region]` about to be overwritten; call in write order"""
+        if self.max_depth:
+            self._pending.append((name, region, before))
+
+    def push(self, state: Dict[str, torch.Tensor], meta: Any = None) -> bool:
+        """Record the step from the current state to `state`; returns whether it was recorded"""
+        pending, self._pending = self._pending, []
+        if not self.max_depth:
+            return False
+        if {k: (v.shape, v.dtype) for k, v in state.items()} != self._layout:
+            logger.info("Snapshot History: state changed shape (new image?); starting over")
+            self.reset(state, meta)
+            return False
+
+        diffs = []
+        for name, x in state.items():
+            regions = [(_as_slices(r, x.shape), b) for n, r, b in pending if n == name]
+            regions = [(r, b) for r, b in regions if all(s.stop > s.start for s in r)]
+            if not regions:
+                continue
+
+            # previous values over the hull of the written regions: undo the writes in reverse order
+            hull = tuple(
+                slice(min(r[d].start for r, _ in regions), max(r[d].stop for r, _ in regions)) for d in range(x.ndim)
+            )
+            before = x[hull].clone()
+            for r, b in reversed(regions):
+                view = before[tuple(slice(s.start - h.start, s.stop - h.start) for s, h in zip(r, hull))]
+                view.copy_(b.reshape(view.shape))
+            diff = TensorDiff.between(name, before, x, self.level, hull)
+            if diff is not None:
+                diffs.append(diff)
+
+        self._undo.append((diffs, self._meta, copy.deepcopy(meta)))
+        while len(self._undo) > self.max_depth:
+            self._undo.popleft()
+        self._redo.clear()
+        self._meta = copy.deepcopy(meta)
+        return True
+
+    def undo(self, state: Dict[str, torch.Tensor]) -> Tuple[bool, Any]:
+        """Restore the state before the last step (in place); returns whether there was one, and its meta"""
+        if not self._undo:
+            return False, copy.deepcopy(self._meta)
+        step = self._undo.pop()
+        self._apply(step[0], state)
+        self._redo.append(step)
+        self._meta = step[1]
+        return True, copy.deepcopy(self._meta)
+
+    def redo(self, state: Dict[str, torch.Tensor]) -> Tuple[bool, Any]:
+        """Apply the last undone step again (in place); returns whether there was one, and its meta"""
+        if not self._redo:
+            return False, copy.deepcopy(self._meta)
+        step = self._redo.pop()
+        self._apply(step[0], state)
+        self._undo.append(step)
+        self._meta = step[2]
+        return True, copy.deepcopy(self._meta)
+
+    def _apply(self, diffs: List[TensorDiff], state: Dict[str, torch.Tensor]):
+        for d in diffs:
+            d.apply(state[d.name])
+
+    def stats(self):
+        steps = list(self._undo) + self._redo
+        return {
+            "undo": len(self._undo),
+            "redo": len(self._redo),
+            "bytes": sum(d.nbytes for diffs, _, _ in steps for d in diffs),
+        }
+
+
+def _as_tensor(x) -> torch.Tensor:
+    x = x[:]  # blosc2 / numpy / torch
+    return x if isinstance(x, torch.Tensor) else torch.from_numpy(np.ascontiguousarray(x))
+
+
+def record_interaction(
+    history: SnapshotHistory, session, state: Dict[str, torch.Tensor], interaction: Callable[[], Any]
+) -> Any:
+    """
+    Run one nnInteractive interaction (e.g. `session.add_point_interaction`), handing the pre-images of the
+    regions of `state` it overwrites to `history`.
+
+    nnInteractive (with its default `enable_undo`) logs them for its own single level undo: the updated crop
+    of the prediction and the prompt. Without that log the whole state is the pre-image.
+    """
+    if not history.max_depth:
+        return interaction()
+    logged = getattr(session, "supports_undo", False)
+    before = {} if logged else {name: x.clone() for name, x in state.items()}
+
+    result = interaction()
+
+    if not logged:
+        for name, x in before.items():
+            history.record(name, (), x)
+        return result
+    log = getattr(session, "_undo_log", None) or {}
+    for kind, channel, region, pre_image in log.get("records", []):
+        if kind == "target" and "target_buffer" in state:
+            history.record("target_buffer", region, _as_tensor(pre_image))
+        elif kind == "interactions" and "interactions" in state:
+            history.record("interactions", (channel, *region), _as_tensor(pre_image))
+        elif kind == "zero_channel" and "interactions" in state:
+            x = state["interactions"]
+            history.record("interactions", (channel,), torch.zeros(x.shape[1:], dtype=x.dtype))
+    return result
@@ -0,0 +1,212 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import contextlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in labels.items()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}; got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        """(name, labels, value) of every sample, as exposed to Prometheus"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(f"{n}{_format_labels(labels)} {_format_value(v)}" for n, labels, v in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, value: float = 1, **labels):
+        if value < 0:
+            raise ValueError(f"{self.name}: counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the time spent in the context (also when it raises)"""
+        self._key(labels)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get(self, **labels):
+        """Cumulative count per bucket upper bound (`le`), sum and count of the observations"""
+        with self._lock:
+            counts, total = self._values.get(self._key(labels), ([0] * len(self.buckets), 0.0))
+            counts = list(counts)
+        cumulative = OrderedDict()
+        running = 0
+        for le, c in zip(self.buckets, counts):
+            running += c
+            cumulative[le] = running
+        return {"buckets": cumulative, "sum": total, "count": running}
+
+    def samples(self):
+        with self._lock:
+            keys = sorted(self._values)
+        for key in keys:
+            labels = dict(zip(self.labelnames, key))
+            h = self.get(**labels)
+            for le, count in h["buckets"].items():
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(le)}, count
+            yield f"{self.name}_sum", labels, h["sum"]
+            yield f"{self.name}_count", labels, h["count"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def clear(self):
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+INFER_STAGE_SECONDS = REGISTRY.histogram(
+    "monailabel_infer_stage_seconds",
+    "Latency of the stages of the inference path",
+    ("stage", "model", "prompt"),
+)
+TRANSFER_BYTES = REGISTRY.counter(
+    "monailabel_transfer_bytes_total",
+    "Bytes read (in) and written (out) by the inference path",
+    ("direction", "source"),
+)
+SCHEDULER_WAIT_SECONDS = REGISTRY.histogram(
+    "monailabel_scheduler_wait_seconds",
+    "Time device work waited for a slot of the work scheduler, by priority class",
+    ("priority", "device"),
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "monailabel_cache_lookups_total",
+    "Cache lookups by cache and result (hit | miss)",
+    ("cache", "result"),
+)
+
+
+def timer(stage: str, model: str = "", prompt: str = ""):
+    """Context which observes its duration as `stage` of the inference path"""
+    return INFER_STAGE_SECONDS.time(stage=stage, model=model, prompt=prompt)
+
+
+def observe(stage: str, seconds: float, model: str = "", prompt: str = ""):
+    INFER_STAGE_SECONDS.observe(seconds, stage=stage, model=model, prompt=prompt)
+
+
+def count_bytes(direction: str, source: str, nbytes: int):
+    TRANSFER_BYTES.inc(nbytes, direction=direction, source=source)
+
+
+def count_cache(cache: str, hits: int = 0, misses: int = 0):
+    if hits:
+        CACHE_LOOKUPS.inc(hits, cache=cache, result="hit")
+    if misses:
+        CACHE_LOOKUPS.inc(misses, cache=cache, result="miss")
@@ -0,0 +1,98 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+import torch
+
+from monailabel.config import settings
+
+logger = logging.getLogger(__name__)
+
+RESULT_HASH_HEADER = "X-Result-Hash"
+
+
+def result_hash(result: Any) -> Optional[str]:
+    """
+    Digest of an inference result (mask array / tensor, result file or string), independent of how
+    it is encoded in the response (multipart boundaries, compression), so results can be compared
+    across runs
+    """
+    if result is None:
+        return None
+
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(result, torch.Tensor):
+        result = result.detach().cpu().numpy()
+    if isinstance(result, np.ndarray):
+        result = np.ascontiguousarray(result)
+        h.update(f"{result.dtype.str}{result.shape}".encode())
+        h.update(memoryview(result).cast("B"))
+    elif isinstance(result, str) and os.path.isfile(result):
+        with open(result, "rb") as fp:
+            for chunk in iter(lambda: fp.read(1 << 20), b""):
+                h.update(chunk)
+    elif isinstance(result, bytes):
+        h.update(result)
+    else:
+        h.update(str(result).encode())
+    return h.hexdigest()
+
+
+class TraceRecorder:
+    """
+    Appends the `/infer` requests of each session (study) to `<path>/<session>.jsonl`, one compact JSON
+    object per request: the time it was received, the model / image / output and params as sent by the
+    client, the time spent on the server and the hash of the result. See `monailabel replay`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def trace_file(self, session: str) -> str:
+        name = re.sub(r"[^\w.-]", "_", str(session)) or "default"
+        return os.path.join(self.path, f"{name}.jsonl")
+
+    def record(self, session: str, entry: Dict[str, Any]):
+        line = json.dumps(entry, separators=(",", ":"), default=str)
+        with self._lock:
+            with open(self.trace_file(session), "a") as fp:
+                fp.write(line + "\n")
+
+
+_recorder: Optional[TraceRecorder] = None
+
+
+def trace_recorder() -> Optional[TraceRecorder]:
+    """Recorder of the `/infer` requests; None unless MONAI_LABEL_TRACE_PATH is set"""
+    global _recorder
+    path = settings.MONAI_LABEL_TRACE_PATH
+    if not path:
+        return None
+    if _recorder is None or _recorder.path != path:
+        logger.info(f"Recording infer requests to: {path}")
+        _recorder = TraceRecorder(path)
+    return _recorder
+
+
+def load_trace(path: str):
+    """Entries of a trace file, in the order they were recorded"""
+    with open(path) as fp:
+        return [json.loads(line) for line in fp if line.strip()]
@@ -0,0 +1,150 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+
+from monailabel.utils.others.recorder import RESULT_HASH_HEADER, load_trace
+
+logger = logging.getLogger(__name__)
+
+
+def trace_files(paths: List[str]) -> List[str]:
+    """Trace files of `paths` (files or directories of `*.jsonl` traces)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".jsonl")))
+        else:
+            files.append(path)
+    return files
+
+
+def replay_trace(entries: List[Dict], url: str, speed: float = 1.0, session=None, headers=None, timeout=600):
+    """
+    Sends the recorded `/infer` requests of one session to the app at `url`, one after the other.
+
+    With `speed` > 0 the requests are sent at the recorded times (scaled by 1 / `speed`), or as soon
+    as the previous one is done if it took longer; with 0 as fast as possible. Requests which
+    uploaded an image / label are skipped (the files are not recorded).
+    """
+    session = session if session is not None else requests.Session()
+    results = []
+    if not entries:
+        return results
+
+    t0 = entries[0]["ts"]
+    start = time.perf_counter()
+    for i, entry in enumerate(entries):
+        result = {
+            "index": i,
+            "model": entry["model"],
+            "image": entry["image"],
+            "recorded_elapsed": entry.get("elapsed"),
+            "recorded_hash": entry.get("result_hash"),
+            "recorded_error": entry.get("error"),
+        }
+        if entry.get("file") or entry.get("label"):
+            results.append({**result, "skipped": "upload"})
+            continue
+
+        if speed > 0:
+            wait = (entry["ts"] - t0) / speed - (time.perf_counter() - start)
+            if wait > 0:
+                time.sleep(wait)
+
+        query = {k: entry[k] for k in ("image", "session_id", "output") if entry.get(k)}
+        sent = time.perf_counter()
+        try:
+            response = session.post(
+                f"{url.rstrip('/')}/infer/{entry['model']}",
+                params=query,
+                data={"params": json.dumps(entry.get("params", {}))},
+                headers=headers,
+                timeout=timeout,
+            )
+            status, digest = response.status_code, response.headers.get(RESULT_HASH_HEADER)
+            _ = response.content
+        except requests.RequestException as e:
+            status, digest = None, None
+            result["error"] = str(e)
+
+        replayed_hash = digest if status == 200 else None
+        compared = result["recorded_hash"] is not None and replayed_hash is not None
+        results.append(
+            {
+                **result,
+                "elapsed": round(time.perf_counter() - sent, 4),
+                "status": status,
+                "hash": replayed_hash,
+                "hash_match": result["recorded_hash"] == replayed_hash if compared else None,
+            }
+        )
+    return results
+
+
+def _latency(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    ms = 1000 * np.asarray(values)
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+    }
+
+
+def summarize(results: List[Dict]) -> Dict:
+    """Counts, latency of the recorded vs replayed requests and the requests whose results differ"""
+    sent = [r for r in results if not r.get("skipped")]
+    failed = [r for r in sent if r["status"] != 200 and not r["recorded_error"]]
+    mismatches = [r for r in sent if r["hash_match"] is False]
+    return {
+        "requests": len(results),
+        "skipped": len(results) - len(sent),
+        "failed": len(failed),
+        "hash_compared": sum(r["hash_match"] is not None for r in sent),
+        "hash_mismatches": len(mismatches),
+        "recorded_latency": _latency([r["recorded_elapsed"] for r in sent]),
+        "replayed_latency": _latency([r["elapsed"] for r in sent]),
+        "mismatched": [{k: r[k] for k in ("trace", "index", "model", "image") if k in r} for r in mismatches],
+    }
+
+
+def replay(
+    paths: List[str],
+    url: str,
+    speed: float = 1.0,
+    headers: Optional[Dict] = None,
+    timeout=600,
+) -> Dict:
+    """Replays the traces of `paths` concurrently (one thread per session trace); returns the report"""
+    files = trace_files(paths)
+    logger.info(f"Replaying {len(files)} trace(s) against {url} (speed: {speed or 'max'})")
+
+    def run(path):
+        results = replay_trace(load_trace(path), url, speed, headers=headers, timeout=timeout)
+        return [{"trace": os.path.basename(path), **r} for r in results]
+
+    results = []
+    if files:
+        with ThreadPoolExecutor(max_workers=len(files)) as executor:
+            for r in executor.map(run, files):
+                results.extend(r)
+    return {"summary": summarize(results), "requests": results}
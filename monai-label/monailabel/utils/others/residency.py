@@ -0,0 +1,201 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import itertools
+import logging
+import os
+import pathlib
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+def module_nbytes(module: torch.nn.Module) -> int:
+    """Bytes of the parameters and buffers of `module` (shared tensors counted once)"""
+    tensors = {id(t): t for t in itertools.chain(module.parameters(), module.buffers())}
+    return sum(t.numel() * t.element_size() for t in tensors.values())
+
+
+class ResidentModel:
+    def __init__(self, name: str, module: torch.nn.Module, nbytes: int, on_evict: Optional[Callable] = None):
+        self.name = name
+        self.module = module
+        self.nbytes = nbytes
+        self.on_evict = on_evict
+        self.resident = True
+        self.pinned = 0  # number of users (a pinned model is never evicted)
+        self.last_used = time.time()
+        self.offload_path: Optional[str] = None  # weights on disk, for offload="disk"
+
+    def to_json(self):
+        return {
+            "bytes": self.nbytes,
+            "resident": self.resident,
+            "pinned": self.pinned > 0,
+            "last_used": self.last_used,
+        }
+
+
+class ModelResidencyManager:
+    """
+    Keeps the registered models on `device` within a byte budget (parameters and buffers plus an
+    optional reserve for working buffers per model).
+
+    Models are brought back to the device on demand (`acquire`) and, when the budget would be
+    exceeded, the least recently used models which are not pinned (in use) are evicted, either
+    to CPU memory (offload="cpu") or dropped (offload="disk"); dropped weights are written to
+    `offload_dir` once and memory-mapped back when the model is needed again. A budget <= 0
+    keeps every model resident.
+    """
+
+    def __init__(
+        self,
+        device,
+        budget_bytes: int,
+        offload: str = "cpu",
+        offload_dir: str = "",
+    ):
+        if offload not in ("cpu", "disk"):
+            raise ValueError(f"Invalid offload: {offload}; expected 'cpu' or 'disk'")
+
+        self.device = torch.device(device)
+        self.budget_bytes = budget_bytes
+        self.offload = offload
+        self.offload_dir = offload_dir or os.path.join(pathlib.Path.home(), ".cache", "monailabel", "offload")
+        self.models: Dict[str, ResidentModel] = {}
+        self.lock = threading.RLock()
+
+    def register(
+        self,
+        name: str,
+        module: torch.nn.Module,
+        reserve_bytes: int = 0,
+        on_evict: Optional[Callable] = None,
+    ) -> torch.nn.Module:
+        """
+        Manage `module` (currently on the device) as `name`; `reserve_bytes` is added to its size for
+        working buffers, and `on_evict` is called before it is moved off the device.
+        """
+        with self.lock:
+            model = ResidentModel(name, module, module_nbytes(module) + reserve_bytes, on_evict)
+            self.models[name] = model
+            self._make_room(model)
+            logger.info(f"Model Residency: {name} ({model.nbytes >> 20} MB); resident: {self.resident_bytes() >> 20} MB")
+        return module
+
+    def resident_bytes(self) -> int:
+        return sum(m.nbytes for m in self.models.values() if m.resident)
+
+    @contextlib.contextmanager
+    def acquire(self, name: Optional[str]):
+        """Context in which model `name` is on the device and pinned (`None` for no model)"""
+        if name is None:
+            yield None
+            return
+
+        with self.lock:
+            model = self.models[name]
+            model.pinned += 1
+            try:
+                self._load(model)
+            except BaseException:
+                model.pinned -= 1
+                raise
+        try:
+            yield model.module
+        finally:
+            with self.lock:
+                model.pinned -= 1
+                model.last_used = time.time()
+
+    def evict(self, name: str):
+        with self.lock:
+            model = self.models[name]
+            if model.pinned:
+                raise RuntimeError(f"Model {name} is in use and can not be evicted")
+            self._evict(model)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "device": str(self.device),
+                "budget_bytes": self.budget_bytes,
+                "resident_bytes": self.resident_bytes(),
+                "models": {name: m.to_json() for name, m in self.models.items()},
+            }
+
+    def _make_room(self, model: ResidentModel):
+        if self.budget_bytes <= 0:
+            return
+        candidates = sorted(
+            (m for m in self.models.values() if m.resident and not m.pinned and m is not model),
+            key=lambda m: m.last_used,
+        )
+        for victim in candidates:
+            required = self.resident_bytes() + (0 if model.resident else model.nbytes)
+            if required <= self.budget_bytes:
+                break
+            self._evict(victim)
+
+        required = self.resident_bytes() + (0 if model.resident else model.nbytes)
+        if required > self.budget_bytes:
+            logger.warning(
+                f"Model Residency: {model.name} needs {required >> 20} MB on {self.device}; "
+                f"over the budget of {self.budget_bytes >> 20} MB (other models are in use)"
+            )
+
+    def _load(self, model: ResidentModel):
+        if model.resident:
+            return
+        self._make_room(model)
+
+        start = time.time()
+        module = model.module
+        if model.offload_path:
+            module.to_empty(device=self.device)
+            state = torch.load(model.offload_path, map_location="cpu", mmap=True, weights_only=True)
+            with torch.no_grad():
+                for k, t in itertools.chain(module.named_parameters(), module.named_buffers()):
+                    t.copy_(state[k])
+        else:
+            module.to(self.device)
+        model.resident = True
+        logger.info(f"Model Residency: loaded {model.name} to {self.device} in {time.time() - start:.3f} secs")
+
+    def _evict(self, model: ResidentModel):
+        if not model.resident:
+            return
+        if model.on_evict:
+            model.on_evict()
+
+        start = time.time()
+        module = model.module
+        if self.offload == "disk":
+            if not model.offload_path:
+                os.makedirs(self.offload_dir, exist_ok=True)
+                # replicas of a model (one per device) must not share (or read half written) weights
+                device = str(self.device).replace(":", "_")
+                path = os.path.join(self.offload_dir, f"{model.name}.{device}.pt")
+                tmp = f"{path}.{os.getpid()}.tmp"
+                state = {k: t for k, t in itertools.chain(module.named_parameters(), module.named_buffers())}
+                torch.save(state, tmp)
+                os.replace(tmp, path)
+                model.offload_path = path
+            module.to("meta")
+        else:
+            module.to("cpu")
+        model.resident = False
+        logger.info(f"Model Residency: evicted {model.name} to {self.offload} in {time.time() - start:.3f} secs")
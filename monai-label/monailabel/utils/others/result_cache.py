@@ -0,0 +1,285 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from monailabel.config import settings
+from monailabel.tasks.infer.sam2_prompts import PROMPT_KEYS, group_prompts
+
+logger = logging.getLogger(__name__)
+
+# request options (besides the prompts) which change the result of a SAM2 request
+RESULT_OPTIONS = ("texts", "boxes")
+
+
+def _numbers(value):
+    """Coordinates as floats (1 and 1.0 are the same prompt)"""
+    if isinstance(value, (list, tuple)):
+        return [_numbers(v) for v in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def result_key(series: str, model: str, version: str, request: Dict[str, Any]) -> str:
+    """
+    Content key of the result of a SAM2 request: the series, the model (and its version, e.g. the
+    mtime of the checkpoint and the runtime settings) and the prompt set. The prompts are normalized, so
+    the same points / boxes in another order or as floats give the same key.
+    """
+    segments = {
+        str(segment_id): {k: sorted(_numbers(p) for p in prompts[k]) for k in PROMPT_KEYS if prompts[k]}
+        for segment_id, prompts in group_prompts(request).items()
+    }
+    options = {k: [v for v in request.get(k) or [] if v != ""] for k in RESULT_OPTIONS}  # [""]: no text prompt
+    content = {
+        "series": series,
+        "model": model,
+        "version": version,
+        "segments": segments,
+        "options": {k: _numbers(v) for k, v in options.items() if v},
+        "one": "one" in request,
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def pack_mask(mask: np.ndarray, level: int = 1) -> Tuple[Dict[str, Any], bytes]:
+    """Compressed mask (bits for a binary mask, uint8 for a label map of a few labels) and its header"""
+    header = {"shape": list(mask.shape), "dtype": mask.dtype.str, "packing": "raw"}
+    data = np.ascontiguousarray(mask)
+    if mask.size and np.array_equal(mask, np.round(mask)) and mask.min() >= 0:
+        if mask.max() <= 1:
+            header["packing"] = "bits"
+            data = np.packbits(mask.astype(bool))
+        elif mask.max() <= 255:
+            header["packing"] = "uint8"
+            data = mask.astype(np.uint8)
+    return header, zlib.compress(data.tobytes(), level)
+
+
+def unpack_mask(header: Dict[str, Any], data: bytes) -> np.ndarray:
+    shape, dtype = tuple(header["shape"]), np.dtype(header["dtype"])
+    raw = zlib.decompress(data)
+    if header["packing"] == "bits":
+        mask = np.unpackbits(np.frombuffer(raw, np.uint8), count=int(np.prod(shape)))
+    elif header["packing"] == "uint8":
+        mask = np.frombuffer(raw, np.uint8)
+    else:
+        mask = np.frombuffer(raw, dtype)
+    return mask.astype(dtype).reshape(shape)
+
+
+class _Entry:
+    def __init__(self, model: str, version: str, nbytes: int, header=None, data: Optional[bytes] = None):
+        self.model = model
+        self.version = version
+        self.nbytes = nbytes
+        self.header = header
+        self.data = data
+
+
+class ResultCache:
+    """
+    Results (label mask + result json) of idempotent infer requests by their content key (see `result_key`).
+
+    Two tiers, each bounded in bytes and evicting the least recently used results: memory and a
+    directory (`path`), which survives restarts; a hit on disk moves the result back to memory.
+    The masks are stored packed and compressed, so a result takes a small fraction of the mask
+    size. A budget <= 0 disables the tier.
+
+    The results of a model are dropped when its version changes (`set_version`).
+    """
+
+    SUFFIX = ".result"
+
+    def __init__(self, max_bytes: int, path: str = "", disk_max_bytes: int = 0, level: int = 1):
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes if path else 0
+        self.path = path
+        self.level = level
+        self.lock = threading.RLock()
+        self.memory: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.disk: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.versions: Dict[str, str] = {}
+        if self.disk_max_bytes > 0:
+            self._scan()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or self.disk_max_bytes > 0
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}{self.SUFFIX}")
+
+    def _scan(self):
+        """Index the results already on disk, least recently used first"""
+        os.makedirs(self.path, exist_ok=True)
+        found = []
+        for name in os.listdir(self.path):
+            if not name.endswith(self.SUFFIX):
+                continue
+            try:
+                file = os.path.join(self.path, name)
+                header = self._read(file, header_only=True)[0]
+                found.append((os.stat(file).st_mtime, name[: -len(self.SUFFIX)], header, os.path.getsize(file)))
+            except (OSError, ValueError, struct.error) as e:
+                logger.warning(f"Result Cache: ignoring {name}: {e}")
+        for _, key, header, nbytes in sorted(found, key=lambda f: f[0]):
+            self.disk[key] = _Entry(header["model"], header["version"], nbytes)
+        self._evict(self.disk, self.disk_max_bytes)
+
+    @staticmethod
+    def _read(file: str, header_only=False):
+        with open(file, "rb") as fp:
+            (size,) = struct.unpack("<I", fp.read(4))
+            header = json.loads(fp.read(size))
+            return header, None if header_only else fp.read()
+
+    def set_version(self, model: str, version: str):
+        """Current version of `model` (weights and runtime); results of other versions are dropped"""
+        with self.lock:
+            if self.versions.get(model) == version:
+                return
+            for tier in (self.memory, self.disk):
+                stale = [k for k, e in tier.items() if e.model == model and e.version != version]
+                if stale:
+                    logger.info(f"Result Cache: {model} changed (now {version}); dropping {len(stale)} result(s)")
+                for key in stale:
+                    self._drop(tier, key)
+            self.versions[model] = version
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
+        """Result of `key` (a new mask and result json, free to modify) or None"""
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+            elif key in self.disk:
+                entry = self._load(key)
+            if entry is None:
+                return None
+            header, data = entry.header, entry.data
+        return unpack_mask(header, data), copy.deepcopy(header["result_json"])
+
+    def _load(self, key: str) -> Optional[_Entry]:
+        file = self._file(key)
+        try:
+            header, data = self._read(file)
+            os.utime(file)
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Result Cache: failed to read {file}: {e}")
+            self._drop(self.disk, key)
+            return None
+
+        self.disk.move_to_end(key)
+        entry = _Entry(header["model"], header["version"], len(data), header, data)
+        self._memorize(key, entry)
+        return entry
+
+    def put(self, key: str, mask: np.ndarray, result_json: Dict[str, Any], model: str, version: str):
+        header, data = pack_mask(mask, self.level)
+        header.update({"model": model, "version": version, "result_json": copy.deepcopy(result_json)})
+        entry = _Entry(model, version, len(data), header, data)
+
+        with self.lock:
+            if self.versions.get(model, version) != version:
+                return  # the model changed while it ran
+            self._memorize(key, entry)
+            if self.disk_max_bytes > 0 and entry.nbytes <= self.disk_max_bytes:
+                self._write(key, entry)
+
+    def _memorize(self, key: str, entry: _Entry):
+        if self.max_bytes <= 0 or entry.nbytes > self.max_bytes:
+            return
+        self.memory.pop(key, None)
+        self.memory[key] = entry
+        self._evict(self.memory, self.max_bytes)
+
+    def _write(self, key: str, entry: _Entry):
+        file = self._file(key)
+        tmp = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        header = json.dumps(entry.header).encode()
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(tmp, "wb") as fp:
+                fp.write(struct.pack("<I", len(header)))
+                fp.write(header)
+                fp.write(entry.data)
+            os.replace(tmp, file)
+        except OSError as e:
+            logger.warning(f"Result Cache: failed to write {file}: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+
+        self.disk.pop(key, None)
+        self.disk[key] = _Entry(entry.model, entry.version, 4 + len(header) + entry.nbytes)
+        self._evict(self.disk, self.disk_max_bytes)
+
+    def _evict(self, tier: "OrderedDict[str, _Entry]", max_bytes: int):
+        total = sum(e.nbytes for e in tier.values())
+        while tier and total > max_bytes:
+            key = next(iter(tier))
+            total -= tier[key].nbytes
+            self._drop(tier, key)
+
+    def _drop(self, tier: "OrderedDict[str, _Entry]", key: str):
+        tier.pop(key, None)
+        if tier is self.disk and os.path.exists(self._file(key)):
+            try:
+                os.remove(self._file(key))
+            except OSError as e:
+                logger.warning(f"Result Cache: failed to remove {key}: {e}")
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            for key in list(self.disk):
+                self._drop(self.disk, key)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "memory": {"results": len(self.memory), "bytes": sum(e.nbytes for e in self.memory.values())},
+                "disk": {"results": len(self.disk), "bytes": sum(e.nbytes for e in self.disk.values())},
+            }
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def result_cache() -> ResultCache:
+    """Result cache of the app (see MONAI_LABEL_RESULT_CACHE_MB / _DISK_MB / _PATH)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            path = settings.MONAI_LABEL_RESULT_CACHE_PATH or os.path.join(
+                pathlib.Path.home(), ".cache", "monailabel", "results"
+            )
+            _cache = ResultCache(
+                settings.MONAI_LABEL_RESULT_CACHE_MB * 1024 * 1024,
+                path,
+                settings.MONAI_LABEL_RESULT_CACHE_DISK_MB * 1024 * 1024,
+            )
+        return _cache
@@ -0,0 +1,145 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import contextlib
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class SessionRouter:
+    """
+    Routes the requests of a session (e.g. a study) to one of N replicas (e.g. the models on one
+    device each), so the per-session state stays on one replica.
+
+    Sessions are placed on a consistent hash ring (`virtual_nodes` points per replica), so adding
+    or removing a replica only moves the sessions of that replica. Requests on a replica run one
+    at a time; the queue depth of a replica is the number of its requests running or waiting.
+    When it reaches `max_queue_depth` (0 for never) and another replica is less busy:
+
+        - a request which (re)creates the state of its session (`relocate`) moves the session
+          to the least busy replica, where its following requests go
+        - a request which uses no session state (`spill`) runs there, without moving the session
+    """
+
+    def __init__(
+        self,
+        replicas: Sequence[Any],
+        names: Optional[Sequence[str]] = None,
+        virtual_nodes: int = 64,
+        max_queue_depth: int = 2,
+        max_sessions: int = 10000,
+    ):
+        if not replicas:
+            raise ValueError("At least one replica is required")
+        names = list(names) if names else [str(i) for i in range(len(replicas))]
+        if len(names) != len(replicas) or len(set(names)) != len(names):
+            raise ValueError(f"Expected {len(replicas)} unique replica names; got {names}")
+
+        self.replicas = list(replicas)
+        self.names = names
+        self.max_queue_depth = max_queue_depth
+        self.max_sessions = max_sessions
+
+        ring = sorted((_hash(f"{name}#{v}"), i) for i, name in enumerate(names) for v in range(virtual_nodes))
+        self._ring_keys = [k for k, _ in ring]
+        self._ring_replicas = [i for _, i in ring]
+
+        self._lock = threading.Lock()
+        self._replica_locks = [threading.Lock() for _ in replicas]
+        self._relocated: OrderedDict = OrderedDict()  # session -> replica, for the sessions moved off their home
+        self._depth = [0] * len(replicas)
+        self._requests = [0] * len(replicas)
+        self._spilled = [0] * len(replicas)
+        self._moved_in = [0] * len(replicas)
+
+    def home(self, key: str) -> int:
+        """Replica of the session `key` on the hash ring"""
+        i = bisect.bisect(self._ring_keys, _hash(str(key))) % len(self._ring_keys)
+        return self._ring_replicas[i]
+
+    def route(self, key: str, relocate: bool = False, spill: bool = False) -> int:
+        """Replica to run the next request of session `key` on (see the class docs for the flags)"""
+        key = str(key)
+        with self._lock:
+            return self._route(key, relocate, spill)
+
+    @contextlib.contextmanager
+    def acquire(self, key: str, relocate: bool = False, spill: bool = False):
+        """Context in which the request of session `key` has its replica to itself; yields the replica"""
+        key = str(key)
+        with self._lock:
+            index = self._route(key, relocate, spill)
+            self._depth[index] += 1
+            self._requests[index] += 1
+
+        try:
+            with self._replica_locks[index]:
+                yield self.replicas[index]
+        finally:
+            with self._lock:
+                self._depth[index] -= 1
+
+    def queue_depth(self):
+        with self._lock:
+            return list(self._depth)
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    "name": name,
+                    "queue_depth": self._depth[i],
+                    "requests": self._requests[i],
+                    "spilled": self._spilled[i],
+                    "relocated_sessions": self._moved_in[i],
+                }
+                for i, name in enumerate(self.names)
+            ]
+
+    def _route(self, key, relocate, spill):
+        home = self.home(key)
+        index = self._relocated.get(key, home)
+        if key in self._relocated:
+            self._relocated.move_to_end(key)
+
+        if not (relocate or spill) or not self.max_queue_depth or self._depth[index] < self.max_queue_depth:
+            return index
+        target = min(range(len(self.replicas)), key=lambda i: self._depth[i])
+        if self._depth[target] >= self._depth[index]:
+            return index
+
+        if spill and not relocate:
+            self._spilled[target] += 1
+            return target
+
+        logger.info(
+            f"Session Router: {key} moved from {self.names[index]} (queue: {self._depth[index]}) "
+            f"to {self.names[target]} (queue: {self._depth[target]})"
+        )
+        self._moved_in[target] += 1
+        if target == home:
+            self._relocated.pop(key, None)
+        else:
+            self._relocated[key] = target
+            self._relocated.move_to_end(key)
+            while len(self._relocated) > self.max_sessions:
+                self._relocated.popitem(last=False)
+        return target
@@ -0,0 +1,152 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import itertools
+import logging
+import threading
+import time
+from enum import IntEnum
+from typing import Dict, Optional, Union
+
+import torch
+
+from monailabel.config import settings
+from monailabel.tasks.infer.sam2_prompts import prompt_type
+from monailabel.utils.others.metrics import SCHEDULER_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Priority classes of the work on a device; lower runs first"""
+
+    INTERACTIVE = 0  # clicks / prompts of a user waiting for the result
+    INFER = 1  # single (auto) segmentation, WSI tiles
+    BATCH = 2  # batch infer
+    SCORING = 3  # scoring (e.g. epistemic simulations)
+
+    @classmethod
+    def parse(cls, value: Union["Priority", int, str]) -> "Priority":
+        if isinstance(value, str):
+            return cls[value.upper()]
+        return cls(value)
+
+
+class _DeviceState:
+    def __init__(self):
+        self.running = {p: 0 for p in Priority}
+        self.waiting = []  # (priority, sequence) of the waiting work
+
+
+class WorkScheduler:
+    """
+    Orders the work on each device by priority class. The work holds a slot of its device while it
+    runs (`slot`); a device has `slots` of them and each priority class can hold at most its limit
+    (`limits`; 0 for up to `slots`). A free slot goes to the waiting work of the highest priority
+    whose class is under its limit, first come first served within a class.
+
+    Long jobs take one slot per unit of work (a tile, an image of a batch, a scoring simulation),
+    so they are preempted at those boundaries: the interactive work waiting meanwhile runs next.
+    With `slots` = 0 work is never held back.
+    """
+
+    def __init__(self, slots: int = 2, limits: Optional[Dict[Union[Priority, str], int]] = None):
+        self.slots = slots
+        limits = {Priority.parse(k): v for k, v in (limits or {}).items()}
+        self.limits = {p: min(limits.get(p) or slots, slots) for p in Priority}
+        self._cond = threading.Condition()
+        self._devices: Dict[str, _DeviceState] = {}
+        self._sequence = itertools.count()
+
+    @contextlib.contextmanager
+    def slot(self, priority: Union[Priority, int, str] = Priority.INFER, device: str = ""):
+        """Context which runs once the work (of `priority` on `device`) has a slot of the device"""
+        if not self.slots:
+            yield
+            return
+
+        priority = Priority.parse(priority)
+        device = device_key(device)
+        ticket = (priority, next(self._sequence))
+        start = time.perf_counter()
+        with self._cond:
+            state = self._devices.setdefault(device, _DeviceState())
+            state.waiting.append(ticket)
+            while self._next(state) != ticket:
+                self._cond.wait()
+            state.waiting.remove(ticket)
+            state.running[priority] += 1
+            self._cond.notify_all()  # another slot may still be free for the next one
+
+        waited = time.perf_counter() - start
+        SCHEDULER_WAIT_SECONDS.observe(waited, priority=priority.name.lower(), device=device)
+        if waited > 1:
+            logger.info(f"Work Scheduler: {priority.name.lower()} work waited {waited:.3f} secs for {device}")
+        try:
+            yield
+        finally:
+            with self._cond:
+                state.running[priority] -= 1
+                self._cond.notify_all()
+
+    def _next(self, state: _DeviceState):
+        """Waiting work which gets the next free slot of the device (None if there is none)"""
+        if sum(state.running.values()) >= self.slots:
+            return None
+        eligible = [t for t in state.waiting if state.running[t[0]] < self.limits[t[0]]]
+        return min(eligible) if eligible else None
+
+    def stats(self):
+        with self._cond:
+            return {
+                device: {
+                    p.name.lower(): {"running": state.running[p], "waiting": sum(t[0] == p for t in state.waiting)}
+                    for p in Priority
+                }
+                for device, state in self._devices.items()
+            }
+
+
+def device_key(device) -> str:
+    """Key of a device in the scheduler; "cuda" (the current device) and "cuda:<i>" are the same device"""
+    device = str(device)
+    if device == "cuda" and torch.cuda.is_available():
+        return f"cuda:{torch.cuda.current_device()}"
+    return device
+
+
+_scheduler: Optional[WorkScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def work_scheduler() -> WorkScheduler:
+    """Scheduler of the device work of the app (see MONAI_LABEL_SCHEDULER_SLOTS / _LIMITS)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = WorkScheduler(settings.MONAI_LABEL_SCHEDULER_SLOTS, settings.MONAI_LABEL_SCHEDULER_LIMITS)
+        return _scheduler
+
+
+def infer_priority(request, interactive: bool = False) -> Priority:
+    """
+    Priority of an infer request: its `priority` if set (by the app, e.g. batch infer or scoring), else
+    interactive for prompts (clicks etc.); an invalid `priority` is ignored
+    """
+    if request.get("priority") is not None:
+        try:
+            return Priority.parse(request["priority"])
+        except (KeyError, ValueError, TypeError):
+            logger.warning(f"Work Scheduler: ignoring invalid priority: {request['priority']}")
+    if interactive or request.get("nninter") or prompt_type(request) != "none":
+        return Priority.INTERACTIVE
+    return Priority.INFER
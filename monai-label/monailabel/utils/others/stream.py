@@ -1,9 +1,11 @@
 # fastapi_streaming_multipart.py
 from fastapi import Response
 from fastapi.responses import StreamingResponse
-import json, secrets, zlib
+import json, secrets, time, zlib
 from typing import Iterable, Union
 
+from monailabel.utils.others.metrics import count_bytes, observe
+
 try:
     import numpy as np  # optional
 except ImportError:
@@ -40,20 +42,28 @@ def _as_read_chunks(obj, chunk_size: int = 1 << 20) -> Iterable[memoryview]:
         yield mv[off:end]
         off = end
 
-def _gzip_stream(chunks: Iterable[memoryview], level: int = 6) -> Iterable[bytes]:
+def _gzip_stream(chunks: Iterable[memoryview], level: int = 6, source: str = "response") -> Iterable[bytes]:
     """
     Stream gzip bytes from an iterable of (memoryview) chunks.
     wbits=16+MAX_WBITS = gzip container (not raw deflate).
+    The compression time and the bytes sent are recorded (metrics) as `source`.
     """
     comp = zlib.compressobj(level=level, method=zlib.DEFLATED, wbits=16 + zlib.MAX_WBITS)
+    elapsed, sent = 0.0, 0
     for ch in chunks:
         # ch is memoryview -> no copy when feeding zlib
+        start = time.perf_counter()
         out = comp.compress(ch)
+        elapsed += time.perf_counter() - start
         if out:
+            sent += len(out)
             yield out
     tail = comp.flush()
     if tail:
+        sent += len(tail)
         yield tail
+    observe(f"gzip_{source}", elapsed)
+    count_bytes("out", source, sent)
 
 def stream_multipart(meta: dict, seg_payload: Union[BytesLike, "np.ndarray"]) -> StreamingResponse:
     """
@@ -95,13 +105,13 @@ def stream_multipart(meta: dict, seg_payload: Union[BytesLike, "np.ndarray"]) ->
     def gen():
         # meta part
         yield meta_headers
-        for gz in _gzip_stream(meta_iter, level=6):
+        for gz in _gzip_stream(meta_iter, level=6, source="meta"):
             yield gz
         yield CRLF  # end of meta body
 
         # seg part
         yield seg_headers
-        for gz in _gzip_stream(seg_iter, level=6):
+        for gz in _gzip_stream(seg_iter, level=6, source="seg"):
             yield gz
         yield CRLF  # end of seg body
 
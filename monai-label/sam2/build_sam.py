@@ -13,6 +13,7 @@ from hydra.utils import instantiate
 from omegaconf import OmegaConf
 
 import sam2
+from sam2.utils.runtime import get_device
 
 # Check if the user is running Python from the parent directory of the sam2 repo
 # (i.e. the directory where this repo is cloned into) -- this is not supported since
@@ -150,7 +151,7 @@ def build_sam2_video_predictor_npz(
     **kwargs,
 ):
     # Use the provided device or get the best available one
-    device = "cuda"
+    device = get_device(device)
     logging.info(f"Using device: {device}")
 
     hydra_overrides = [
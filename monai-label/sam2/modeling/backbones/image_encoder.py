@@ -129,6 +129,6 @@ class FpnNeck(nn.Module):
                 prev_features = lateral_features
             x_out = prev_features
             out[i] = x_out
-            pos[i] = self.position_encoding(x_out).to(x_out.dtype)
+            pos[i] = self.position_encoding(x_out, dtype=x_out.dtype)
 
         return out, pos
@@ -0,0 +1,157 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+from functools import reduce
+
+import torch
+
+
+class MemoryBank:
+    """
+    Preallocated memory / positional encoding buffers for the memory attention, kept per
+    tracking session (in its `output_dict`).
+
+    When tracking consecutive frames, the memory window only slides by one frame, so the
+    flattened memories of the non-conditioning frames are kept in a sliding buffer of
+    2 * num_slots frame slots, preceded by the conditioning slots and followed by room for
+    the object pointer tokens. Each frame then copies in the newest memory, the
+    conditioning memories and the object pointers (plus an occasional compaction of the
+    window back to the front), and the memory attention gets a view of the buffer:
+
+        [ cond_1 .. cond_k | window (t_pos=1 .. num_slots) | obj ptrs ]
+
+    This is the same tensor (same order, values and dtype) as concatenating the memories
+    per frame, without allocating a new one. The positional encodings of the frame slots
+    (spatial + temporal) do not depend on the frame, so they are computed once.
+    """
+
+    def __init__(self, num_slots):
+        self.num_slots = num_slots
+        self.key = None
+        self.memory = None
+        self.memory_pos = None
+        self.extra_capacity = 0
+        # "maskmem_features" of the frames currently in the window (in slot order)
+        self.frames = []
+        # source of the positional encoding in each (cond + window) slot
+        self.pos_keys = []
+        self.start = 0  # first slot of the window
+
+    def _allocate(self, key, max_extra_tokens):
+        num_cond, hw, B, C, dtype, pos_dtype, device, _ = key
+        n = self.num_slots
+        self.key = key
+        self.extra_capacity = max_extra_tokens
+        self.memory = torch.empty(
+            ((num_cond + 2 * n) * hw + max_extra_tokens, B, C), dtype=dtype, device=device
+        )
+        self.memory_pos = torch.empty(
+            ((num_cond + n) * hw + max_extra_tokens, B, C), dtype=pos_dtype, device=device
+        )
+        self.frames = []
+        self.pos_keys = [None] * (num_cond + n)
+        self.start = num_cond
+
+    def _slots(self, begin, end):
+        hw = self.key[1]
+        return self.memory[begin * hw : end * hw]
+
+    def _write(self, slot, maskmem_features):
+        # [B, C, H, W] => [HW, B, C]
+        self._slots(slot, slot + 1).copy_(maskmem_features.flatten(2).permute(2, 0, 1))
+
+    def _update_window(self, window):
+        n = self.num_slots
+        num_cond = self.key[0]
+        frames = self.frames
+        if len(frames) == n and all(a is b for a, b in zip(frames, window)):
+            return
+        if len(frames) == n and all(a is b for a, b in zip(frames[1:], window[:-1])):
+            # slide by one frame; move the window back to the front once at the end of the buffer
+            if self.start + n == num_cond + 2 * n:
+                self._slots(num_cond, num_cond + n - 1).copy_(
+                    self._slots(self.start + 1, self.start + n)
+                )
+                self.start = num_cond
+            else:
+                self.start += 1
+            self._write(self.start + n - 1, window[-1])
+        else:
+            self.start = num_cond
+            for i, maskmem_features in enumerate(window):
+                self._write(num_cond + i, maskmem_features)
+        self.frames = window
+
+    def _update_pos(self, encs, t_pos, maskmem_tpos_enc, device):
+        hw = self.key[1]
+        num_maskmem = maskmem_tpos_enc.size(0)
+        for i, enc in enumerate(encs):
+            key = (enc.data_ptr(), enc.shape, enc.stride(), maskmem_tpos_enc._version)
+            if self.pos_keys[i] is not None and self.pos_keys[i][1] == key:
+                continue
+            # same as the spatial + temporal positional encoding in the memory attention
+            maskmem_enc = enc.to(device).flatten(2).permute(2, 0, 1)
+            maskmem_enc = maskmem_enc + maskmem_tpos_enc[num_maskmem - t_pos[i] - 1]
+            self.memory_pos[i * hw : (i + 1) * hw].copy_(maskmem_enc)
+            self.pos_keys[i] = (enc, key)  # hold `enc` so that its storage isn't reused
+
+    def assemble(
+        self,
+        t_pos_and_prevs,
+        maskmem_tpos_enc,
+        extra_memory,
+        extra_pos,
+        max_extra_tokens,
+        device,
+    ):
+        """
+        Memory and positional encoding for the memory attention, from the conditioning
+        frames (t_pos=0) and a full window of non-conditioning frames (t_pos=1..num_slots)
+        in `t_pos_and_prevs`, followed by `extra_memory` / `extra_pos` (the object pointers).
+        """
+        cond = [prev for t_pos, prev in t_pos_and_prevs if t_pos == 0]
+        window = [prev for t_pos, prev in t_pos_and_prevs if t_pos > 0]
+        assert len(window) == self.num_slots
+
+        feats = [prev["maskmem_features"] for prev in cond + window]
+        encs = [prev["maskmem_pos_enc"][-1] for prev in cond + window]
+        B, C, H, W = feats[0].shape
+        num_extra = sum(x.size(0) for x in extra_memory)
+        dtype = reduce(torch.promote_types, [x.dtype for x in feats + extra_memory])
+        pos_dtype = reduce(
+            torch.promote_types,
+            [x.dtype for x in encs + extra_pos] + [maskmem_tpos_enc.dtype],
+        )
+        key = (
+            len(cond),
+            H * W,
+            B,
+            C,
+            dtype,
+            pos_dtype,
+            torch.device(device),
+            torch.is_inference_mode_enabled(),
+        )
+        if key != self.key or num_extra > self.extra_capacity:
+            self._allocate(key, max(max_extra_tokens, num_extra))
+
+        num_cond, hw, n = len(cond), H * W, self.num_slots
+        self._update_window(feats[num_cond:])
+        for i, maskmem_features in enumerate(feats[:num_cond]):
+            self._write(self.start - num_cond + i, maskmem_features)
+        self._update_pos(encs, [t_pos for t_pos, _ in t_pos_and_prevs], maskmem_tpos_enc, device)
+
+        memory_end = (self.start + n) * hw
+        pos_end = (num_cond + n) * hw
+        for x, pos in zip(extra_memory, extra_pos):
+            self.memory[memory_end : memory_end + x.size(0)].copy_(x)
+            self.memory_pos[pos_end : pos_end + pos.size(0)].copy_(pos)
+            memory_end += x.size(0)
+            pos_end += pos.size(0)
+
+        memory = self.memory[(self.start - num_cond) * hw : memory_end]
+        memory_pos = self.memory_pos[:pos_end]
+        return memory, memory_pos
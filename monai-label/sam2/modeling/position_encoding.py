@@ -13,6 +13,48 @@ import torch
 from torch import nn
 
 
+class PositionEncodingCache:
+    """
+    Cache of constant positional encodings and RoPE tables, keyed by the kind of table
+    (`name`, including its parameters) and its (shape, device, dtype).
+
+    Tables are computed once per key in full precision (without autocast, so that they don't
+    depend on the context of the first call), outside of autograd and inference mode so that
+    they can be used in both, and are shared by every caller: they must not be modified in place.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.hits = 0
+        self.misses = 0  # number of tables computed
+
+    def get(self, name, shape, device, dtype, compute):
+        """Cached `compute(device)` (cast to `dtype`) for `name` and `shape`"""
+        device = torch.device(device)
+        if device.type == "cuda" and device.index is None:
+            device = torch.device("cuda", torch.cuda.current_device())
+        key = (name, tuple(shape), device, dtype)
+        table = self.tables.get(key)
+        if table is None:
+            with torch.inference_mode(False), torch.no_grad(), torch.autocast(
+                device.type, enabled=False
+            ):
+                table = compute(device).to(dtype=dtype)
+            self.tables[key] = table
+            self.misses += 1
+        else:
+            self.hits += 1
+        return table
+
+    def clear(self):
+        self.tables.clear()
+        self.hits = self.misses = 0
+
+
+# shared by all the parameter-free encodings (sine and RoPE) of the SAM2 modules
+POS_ENC_CACHE = PositionEncodingCache()
+
+
 class PositionEmbeddingSine(nn.Module):
     """
     This is a more standard version of the position embedding, very similar to the one
@@ -42,7 +84,6 @@ class PositionEmbeddingSine(nn.Module):
             scale = 2 * math.pi
         self.scale = scale
 
-        self.cache = {}
         if warmup_cache and torch.cuda.is_available():
             # Warmup cache for cuda, to help with compilation
             device = torch.device("cuda")
@@ -87,20 +128,24 @@ class PositionEmbeddingSine(nn.Module):
         return pos
 
     @torch.no_grad()
-    def _pe(self, B, device, *cache_key):
-        H, W = cache_key
-        if cache_key in self.cache:
-            return self.cache[cache_key].to(device)[None].repeat(B, 1, 1, 1)
+    def _pe(self, B, device, *cache_key, dtype=torch.float32):
+        name = ("sine", self.num_pos_feats, self.temperature, self.normalize, self.scale)
+        pos = POS_ENC_CACHE.get(
+            name, cache_key, device, dtype, lambda device: self._compute_pe(device, *cache_key)
+        )
+        # the encoding is the same for every batch element
+        return pos[None].expand(B, -1, -1, -1)
 
+    def _compute_pe(self, device, H, W):
         y_embed = (
             torch.arange(1, H + 1, dtype=torch.float32, device=device)
             .view(1, -1, 1)
-            .repeat(B, 1, W)
+            .repeat(1, 1, W)
         )
         x_embed = (
             torch.arange(1, W + 1, dtype=torch.float32, device=device)
             .view(1, 1, -1)
-            .repeat(B, H, 1)
+            .repeat(1, H, 1)
         )
 
         if self.normalize:
@@ -120,14 +165,17 @@ class PositionEmbeddingSine(nn.Module):
             (pos_y[:, :, :, 0::2].sin(), pos_y[:, :, :, 1::2].cos()), dim=4
         ).flatten(3)
         pos = torch.cat((pos_y, pos_x), dim=3).permute(0, 3, 1, 2)
-        self.cache[cache_key] = pos[0]
-        return pos
+        return pos[0]
 
     @torch.no_grad()
-    def forward(self, x: torch.Tensor):
+    def forward(self, x: torch.Tensor, dtype: Optional[torch.dtype] = None):
+        """
+        Encoding of the positions of `x` ([B, C, H, W]) in `dtype` (float32 by default);
+        an expanded view of a cached tensor, so it must not be modified in place.
+        """
         B = x.shape[0]
         cache_key = (x.shape[-2], x.shape[-1])
-        return self._pe(B, x.device, *cache_key)
+        return self._pe(B, x.device, *cache_key, dtype=dtype or torch.float32)
 
 
 class PositionEmbeddingRandom(nn.Module):
@@ -143,6 +191,9 @@ class PositionEmbeddingRandom(nn.Module):
             "positional_encoding_gaussian_matrix",
             scale * torch.randn((2, num_pos_feats)),
         )
+        # the grid encoding depends on the (loaded) frequencies, so it is cached per module
+        self.cache = PositionEncodingCache()
+        self._cached_matrix = None  # (storage, version) of the frequencies the cache was built for
 
     def _pe_encoding(self, coords: torch.Tensor) -> torch.Tensor:
         """Positionally encode points that are normalized to [0,1]."""
@@ -154,7 +205,21 @@ class PositionEmbeddingRandom(nn.Module):
         return torch.cat([torch.sin(coords), torch.cos(coords)], dim=-1)
 
     def forward(self, size: Tuple[int, int]) -> torch.Tensor:
-        """Generate positional encoding for a grid of the specified size."""
+        """
+        Generate positional encoding for a grid of the specified size (cached, so it must
+        not be modified in place).
+        """
+        matrix = self.positional_encoding_gaussian_matrix
+        # loading / moving the frequencies changes their storage or version: drop the stale tables
+        state = (matrix.data_ptr(), matrix._version)
+        if state != self._cached_matrix:
+            self.cache.tables.clear()
+            self._cached_matrix = state
+        return self.cache.get(
+            "random", size, matrix.device, torch.float32, lambda _: self._grid_pe(size)
+        )
+
+    def _grid_pe(self, size: Tuple[int, int]) -> torch.Tensor:
         h, w = size
         device: Any = self.positional_encoding_gaussian_matrix.device
         grid = torch.ones((h, w), device=device, dtype=torch.float32)
@@ -201,6 +266,23 @@ def compute_axial_cis(dim: int, end_x: int, end_y: int, theta: float = 10000.0):
     return torch.cat([freqs_cis_x, freqs_cis_y], dim=-1)
 
 
+def cached_axial_cis(
+    dim: int, end_x: int, end_y: int, theta: float = 10000.0, repeat: int = 1, device=None
+):
+    """
+    `compute_axial_cis` (repeated `repeat` times along the sequence, for keys spanning several
+    frames) from `POS_ENC_CACHE`.
+    """
+
+    def compute(device):
+        freqs_cis = compute_axial_cis(dim, end_x, end_y, theta).to(device)
+        # torch.repeat on complex numbers may not be supported on non-CUDA devices
+        return freqs_cis[None].expand(repeat, -1, -1).flatten(0, 1)
+
+    shape = (end_x, end_y, repeat)
+    return POS_ENC_CACHE.get(("axial_cis", dim, theta), shape, device, torch.complex64, compute)
+
+
 def reshape_for_broadcast(freqs_cis: torch.Tensor, x: torch.Tensor):
     ndim = x.ndim
     assert 0 <= 1 < ndim
@@ -214,6 +296,7 @@ def apply_rotary_enc(
     xk: torch.Tensor,
     freqs_cis: torch.Tensor,
     repeat_freqs_k: bool = False,
+    freqs_cis_k: Optional[torch.Tensor] = None,
 ):
     xq_ = torch.view_as_complex(xq.float().reshape(*xq.shape[:-1], -1, 2))
     xk_ = (
@@ -227,7 +310,10 @@ def apply_rotary_enc(
         # no keys to rotate, due to dropout
         return xq_out.type_as(xq).to(xq.device), xk
     # repeat freqs along seq_len dim to match k seq_len
-    if repeat_freqs_k:
+    if freqs_cis_k is not None:
+        # precomputed (see `cached_axial_cis`)
+        freqs_cis = reshape_for_broadcast(freqs_cis_k, xk_)
+    elif repeat_freqs_k:
         r = xk_.shape[-2] // xq_.shape[-2]
         if freqs_cis.is_cuda:
             freqs_cis = freqs_cis.repeat(*([1] * (freqs_cis.ndim - 2)), r, 1)
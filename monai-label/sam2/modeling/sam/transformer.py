@@ -12,7 +12,7 @@ import torch
 import torch.nn.functional as F
 from torch import nn, Tensor
 
-from sam2.modeling.position_encoding import apply_rotary_enc, compute_axial_cis
+from sam2.modeling.position_encoding import apply_rotary_enc, cached_axial_cis
 from sam2.modeling.sam2_utils import MLP
 
 
@@ -263,12 +263,14 @@ class RoPEAttention(Attention):
     ):
         super().__init__(*args, **kwargs)
 
+        # the RoPE tables are shared by all the layers (see `cached_axial_cis`)
         self.compute_cis = partial(
-            compute_axial_cis, dim=self.internal_dim // self.num_heads, theta=rope_theta
+            cached_axial_cis, dim=self.internal_dim // self.num_heads, theta=rope_theta
         )
-        freqs_cis = self.compute_cis(end_x=feat_sizes[0], end_y=feat_sizes[1])
-        self.freqs_cis = (
-            freqs_cis.to("cuda") if torch.cuda.is_available() else freqs_cis
+        self.freqs_cis = self.compute_cis(
+            end_x=feat_sizes[0],
+            end_y=feat_sizes[1],
+            device="cuda" if torch.cuda.is_available() else "cpu",
         )
         self.rope_k_repeat = rope_k_repeat
 
@@ -286,19 +288,23 @@ class RoPEAttention(Attention):
         v = self._separate_heads(v, self.num_heads)
 
         # Apply rotary position encoding
-        w = h = math.sqrt(q.shape[-2])
-        self.freqs_cis = self.freqs_cis.to(q.device)
-        if self.freqs_cis.shape[0] != q.shape[-2]:
-            self.freqs_cis = self.compute_cis(end_x=w, end_y=h).to(q.device)
+        w = h = math.isqrt(q.shape[-2])
+        if self.freqs_cis.shape[0] != q.shape[-2] or self.freqs_cis.device != q.device:
+            self.freqs_cis = self.compute_cis(end_x=w, end_y=h, device=q.device)
         if q.shape[-2] != k.shape[-2]:
             assert self.rope_k_repeat
 
         num_k_rope = k.size(-2) - num_k_exclude_rope
+        freqs_cis_k = None
+        if self.rope_k_repeat and num_k_rope > 0:
+            repeat = num_k_rope // q.shape[-2]
+            freqs_cis_k = self.compute_cis(end_x=w, end_y=h, repeat=repeat, device=q.device)
         q, k[:, :, :num_k_rope] = apply_rotary_enc(
             q,
             k[:, :, :num_k_rope],
             freqs_cis=self.freqs_cis,
             repeat_freqs_k=self.rope_k_repeat,
+            freqs_cis_k=freqs_cis_k,
         )
 
         dropout_p = self.dropout_p if self.training else 0.0
@@ -10,6 +10,7 @@ import torch.nn.functional as F
 
 from torch.nn.init import trunc_normal_
 
+from sam2.modeling.memory_bank import MemoryBank
 from sam2.modeling.sam.mask_decoder import MaskDecoder
 from sam2.modeling.sam.prompt_encoder import PromptEncoder
 from sam2.modeling.sam.transformer import TwoWayTransformer
@@ -93,6 +94,9 @@ class SAM2Base(torch.nn.Module):
         # extra arguments used to construct the SAM mask decoder; if not None, it should be a dict of kwargs to be passed into `MaskDecoder` class.
         sam_mask_decoder_extra_args=None,
         compile_image_encoder: bool = False,
+        # during evaluation, whether to gather the memories of each frame in a preallocated buffer
+        # kept in the tracking session (instead of concatenating them into a new tensor per frame)
+        use_memory_bank: bool = True,
     ):
         super().__init__()
 
@@ -147,6 +151,7 @@ class SAM2Base(torch.nn.Module):
         self.binarize_mask_from_pts_for_mem_enc = binarize_mask_from_pts_for_mem_enc
         self.non_overlap_masks_for_mem_enc = non_overlap_masks_for_mem_enc
         self.memory_temporal_stride_for_eval = memory_temporal_stride_for_eval
+        self.use_memory_bank = use_memory_bank
         # On frames with mask input, whether to directly output the input mask without
         # using a SAM prompt encoder + mask decoder
         self.use_mask_input_as_output_without_sam = use_mask_input_as_output_without_sam
@@ -494,6 +499,100 @@ class SAM2Base(torch.nn.Module):
 
         return backbone_out, vision_feats, vision_pos_embeds, feat_sizes
 
+    def _memory_frame_indices(self, frame_idx, num_frames, track_in_reverse=False):
+        """
+        Indices of the previous frames whose outputs are read (if present) as memory when
+        tracking `frame_idx`, besides the selected conditioning frames. Returns a list of
+        (t_pos, frame) for the spatial memories and a list of (t_diff, frame) for the
+        object pointers.
+        """
+        # Add last (self.num_maskmem - 1) frames before current frame for non-conditioning memory
+        # the earliest one has t_pos=1 and the latest one has t_pos=self.num_maskmem-1
+        # We also allow taking the memory frame non-consecutively (with stride>1), in which case
+        # we take (self.num_maskmem - 2) frames among every stride-th frames plus the last frame.
+        maskmem_frames = []
+        stride = 1 if self.training else self.memory_temporal_stride_for_eval
+        for t_pos in range(1, self.num_maskmem):
+            t_rel = self.num_maskmem - t_pos  # how many frames before current frame
+            if t_rel == 1:
+                # for t_rel == 1, we take the last frame (regardless of r)
+                if not track_in_reverse:
+                    # the frame immediately before this frame (i.e. frame_idx - 1)
+                    prev_frame_idx = frame_idx - t_rel
+                else:
+                    # the frame immediately after this frame (i.e. frame_idx + 1)
+                    prev_frame_idx = frame_idx + t_rel
+            else:
+                # for t_rel >= 2, we take the memory frame from every r-th frames
+                if not track_in_reverse:
+                    # first find the nearest frame among every r-th frames before this frame
+                    # for r=1, this would be (frame_idx - 2)
+                    prev_frame_idx = ((frame_idx - 2) // stride) * stride
+                    # then seek further among every r-th frames
+                    prev_frame_idx = prev_frame_idx - (t_rel - 2) * stride
+                else:
+                    # first find the nearest frame among every r-th frames after this frame
+                    # for r=1, this would be (frame_idx + 2)
+                    prev_frame_idx = -(-(frame_idx + 2) // stride) * stride
+                    # then seek further among every r-th frames
+                    prev_frame_idx = prev_frame_idx + (t_rel - 2) * stride
+            maskmem_frames.append((t_pos, prev_frame_idx))
+
+        # Up to (max_obj_ptrs_in_encoder - 1) non-conditioning frames before current frame
+        ptr_frames = []
+        if self.use_obj_ptrs_in_encoder:
+            max_obj_ptrs_in_encoder = min(num_frames, self.max_obj_ptrs_in_encoder)
+            for t_diff in range(1, max_obj_ptrs_in_encoder):
+                t = frame_idx + t_diff if track_in_reverse else frame_idx - t_diff
+                if t < 0 or (num_frames is not None and t >= num_frames):
+                    break
+                ptr_frames.append((t_diff, t))
+        return maskmem_frames, ptr_frames
+
+    def _release_memory_outside_window(
+        self, output_dict, frame_idx, num_frames, track_in_reverse=False, evict=True, keep=()
+    ):
+        """
+        Streaming propagation: after tracking `frame_idx`, release the non-conditioning
+        outputs of the frames behind it that no later frame in this direction reads.
+
+        Frames only needed for their object pointer have "maskmem_features" and "pred_masks"
+        moved to CPU; frames needed for neither are dropped (`evict=True`) or stay on CPU.
+        Conditioning frames, non-conditioning frames around them (read when propagating in the
+        other direction from a conditioning frame) and the frames in `keep` are left as is.
+        Returns the lists of offloaded and evicted frame indices.
+        """
+        non_cond_frame_outputs = output_dict["non_cond_frame_outputs"]
+        next_frame_idx = frame_idx - 1 if track_in_reverse else frame_idx + 1
+        maskmem_frames, ptr_frames = self._memory_frame_indices(
+            next_frame_idx, num_frames, track_in_reverse
+        )
+        maskmem_frames = {t for _, t in maskmem_frames}
+        ptr_frames = {t for _, t in ptr_frames}
+
+        r = 1 if self.training else self.memory_temporal_stride_for_eval
+        horizon = max(r * self.num_maskmem, self.max_obj_ptrs_in_encoder)
+        cond_frames = output_dict["cond_frame_outputs"]
+
+        offloaded, evicted = [], []
+        for t in list(non_cond_frame_outputs):
+            behind = t > frame_idx if track_in_reverse else t < next_frame_idx
+            if not behind or t in maskmem_frames or t in keep:
+                continue
+            if any(abs(t - c) <= horizon for c in cond_frames):
+                continue
+            out = non_cond_frame_outputs[t]
+            if t in ptr_frames or not evict:
+                if out["pred_masks"].device.type != "cpu":
+                    if out["maskmem_features"] is not None:
+                        out["maskmem_features"] = out["maskmem_features"].to("cpu")
+                    out["pred_masks"] = out["pred_masks"].to("cpu")
+                    offloaded.append(t)
+            else:
+                non_cond_frame_outputs.pop(t)
+                evicted.append(t)
+        return offloaded, evicted
+
     def _prepare_memory_conditioned_features(
         self,
         frame_idx,
@@ -532,34 +631,10 @@ class SAM2Base(torch.nn.Module):
             )
             t_pos_and_prevs = [(0, out) for out in selected_cond_outputs.values()]
             # Add last (self.num_maskmem - 1) frames before current frame for non-conditioning memory
-            # the earliest one has t_pos=1 and the latest one has t_pos=self.num_maskmem-1
-            # We also allow taking the memory frame non-consecutively (with stride>1), in which case
-            # we take (self.num_maskmem - 2) frames among every stride-th frames plus the last frame.
-            stride = 1 if self.training else self.memory_temporal_stride_for_eval
-            for t_pos in range(1, self.num_maskmem):
-                t_rel = self.num_maskmem - t_pos  # how many frames before current frame
-                if t_rel == 1:
-                    # for t_rel == 1, we take the last frame (regardless of r)
-                    if not track_in_reverse:
-                        # the frame immediately before this frame (i.e. frame_idx - 1)
-                        prev_frame_idx = frame_idx - t_rel
-                    else:
-                        # the frame immediately after this frame (i.e. frame_idx + 1)
-                        prev_frame_idx = frame_idx + t_rel
-                else:
-                    # for t_rel >= 2, we take the memory frame from every r-th frames
-                    if not track_in_reverse:
-                        # first find the nearest frame among every r-th frames before this frame
-                        # for r=1, this would be (frame_idx - 2)
-                        prev_frame_idx = ((frame_idx - 2) // stride) * stride
-                        # then seek further among every r-th frames
-                        prev_frame_idx = prev_frame_idx - (t_rel - 2) * stride
-                    else:
-                        # first find the nearest frame among every r-th frames after this frame
-                        # for r=1, this would be (frame_idx + 2)
-                        prev_frame_idx = -(-(frame_idx + 2) // stride) * stride
-                        # then seek further among every r-th frames
-                        prev_frame_idx = prev_frame_idx + (t_rel - 2) * stride
+            maskmem_frames, ptr_frames = self._memory_frame_indices(
+                frame_idx, num_frames, track_in_reverse
+            )
+            for t_pos, prev_frame_idx in maskmem_frames:
                 out = output_dict["non_cond_frame_outputs"].get(prev_frame_idx, None)
                 if out is None:
                     # If an unselected conditioning frame is among the last (self.num_maskmem - 1)
@@ -567,7 +642,17 @@ class SAM2Base(torch.nn.Module):
                     out = unselected_cond_outputs.get(prev_frame_idx, None)
                 t_pos_and_prevs.append((t_pos, out))
 
+            # With a full memory window, the memories are gathered in the session's
+            # preallocated memory bank instead (see Step 2 below)
+            use_memory_bank = (
+                self.use_memory_bank
+                and not self.training
+                and len(t_pos_and_prevs) > len(selected_cond_outputs)
+                and all(prev is not None for _, prev in t_pos_and_prevs)
+            )
             for t_pos, prev in t_pos_and_prevs:
+                if use_memory_bank:
+                    break
                 if prev is None:
                     continue  # skip padding frames
                 # "maskmem_features" might have been offloaded to CPU in demo use cases,
@@ -609,10 +694,7 @@ class SAM2Base(torch.nn.Module):
                     for t, out in ptr_cond_outputs.items()
                 ]
                 # Add up to (max_obj_ptrs_in_encoder - 1) non-conditioning frames before current frame
-                for t_diff in range(1, max_obj_ptrs_in_encoder):
-                    t = frame_idx + t_diff if track_in_reverse else frame_idx - t_diff
-                    if t < 0 or (num_frames is not None and t >= num_frames):
-                        break
+                for t_diff, t in ptr_frames:
                     out = output_dict["non_cond_frame_outputs"].get(
                         t, unselected_cond_outputs.get(t, None)
                     )
@@ -649,6 +731,7 @@ class SAM2Base(torch.nn.Module):
                 else:
                     num_obj_ptr_tokens = 0
         else:
+            use_memory_bank = False
             # for initial conditioning frames, encode them without using any previous memory
             if self.directly_add_no_mem_embed:
                 # directly add no-mem embedding (instead of using the transformer encoder)
@@ -661,8 +744,29 @@ class SAM2Base(torch.nn.Module):
             to_cat_memory_pos_embed = [self.no_mem_pos_enc.expand(1, B, self.mem_dim)]
 
         # Step 2: Concatenate the memories and forward through the transformer encoder
-        memory = torch.cat(to_cat_memory, dim=0)
-        memory_pos_embed = torch.cat(to_cat_memory_pos_embed, dim=0)
+        if use_memory_bank:
+            memory_bank = output_dict.get("memory_bank")
+            if memory_bank is None or memory_bank.num_slots != self.num_maskmem - 1:
+                memory_bank = MemoryBank(self.num_maskmem - 1)
+                output_dict["memory_bank"] = memory_bank
+            max_obj_ptr_tokens = (
+                len(selected_cond_outputs) + self.max_obj_ptrs_in_encoder
+            ) * max(C // self.mem_dim, 1)
+            memory, memory_pos_embed = memory_bank.assemble(
+                t_pos_and_prevs,
+                self.maskmem_tpos_enc,
+                to_cat_memory,
+                to_cat_memory_pos_embed,
+                max_obj_ptr_tokens,
+                device,
+            )
+        else:
+            memory = torch.cat(to_cat_memory, dim=0)
+            memory_pos_embed = torch.cat(to_cat_memory_pos_embed, dim=0)
+        if memory.dtype != memory_pos_embed.dtype:
+            # memories are stored in bf16; without any (fp32) object pointer to promote them,
+            # they would reach the fp32 projections as is when running without autocast
+            memory = memory.to(memory_pos_embed.dtype)
 
         pix_feat_with_mem = self.memory_attention(
             curr=current_vision_feats,
@@ -47,6 +47,8 @@ class SAM2VideoPredictor(SAM2Base):
         async_loading_frames=False,
         clip_low=None,
         clip_high=None,
+        resample="sitk",
+        feature_cache=None,
     ):
         """Initialize an inference state."""
         compute_device = self.device  # device of the model
@@ -54,10 +56,11 @@ class SAM2VideoPredictor(SAM2Base):
             video_path=video_path,
             image_size=self.image_size,
             offload_video_to_cpu=offload_video_to_cpu,
-            #async_loading_frames=async_loading_frames,
             compute_device=compute_device,
             clip_low=clip_low,
             clip_high=clip_high,
+            resample=resample,
+            async_loading_frames=async_loading_frames,
         )
         inference_state = {}
         inference_state["images"] = images
@@ -83,6 +86,8 @@ class SAM2VideoPredictor(SAM2Base):
         inference_state["mask_inputs_per_obj"] = {}
         # visual features on a small number of recently visited frames for quick interactions
         inference_state["cached_features"] = {}
+        # visual features of the volume kept across inference states (see `FeatureCache`)
+        inference_state["feature_cache"] = feature_cache
         # values that don't change across frames (so we only need to hold one copy of them)
         inference_state["constants"] = {}
         # mapping between client-side object id and model-side object index
@@ -556,8 +561,17 @@ class SAM2VideoPredictor(SAM2Base):
         start_frame_idx=None,
         max_frame_num_to_track=None,
         reverse=False,
+        streaming=None,
     ):
-        """Propagate the input points across frames to track in the entire video."""
+        """
+        Propagate the input points across frames to track in the entire video.
+
+        With `streaming="evict"`, the non-conditioning outputs that the memory attention can
+        no longer read are dropped while propagating, so that the state grows with the memory
+        window instead of the number of frames; `streaming="offload"` keeps them on CPU.
+        """
+        if streaming not in (None, "evict", "offload"):
+            raise ValueError(f"Unsupported streaming mode: {streaming}")
         self.propagate_in_video_preflight(inference_state)
 
         obj_ids = inference_state["obj_ids"]
@@ -624,6 +638,14 @@ class SAM2VideoPredictor(SAM2Base):
                     "reverse": reverse
                 }
                 pred_masks_per_obj[obj_idx] = pred_masks
+                if streaming:
+                    self._release_memory_outside_window(
+                        obj_output_dict,
+                        frame_idx,
+                        num_frames,
+                        track_in_reverse=reverse,
+                        evict=streaming == "evict",
+                    )
 
             # Resize the output mask to the original video resolution (we directly use
             # the mask scores on GPU for output to avoid any CPU conversion in between)
@@ -702,12 +724,21 @@ class SAM2VideoPredictor(SAM2Base):
         for v in inference_state["output_dict_per_obj"].values():
             v["cond_frame_outputs"].clear()
             v["non_cond_frame_outputs"].clear()
+            v.pop("memory_bank", None)  # its buffers hold the memories of the cleared frames
         for v in inference_state["temp_output_dict_per_obj"].values():
             v["cond_frame_outputs"].clear()
             v["non_cond_frame_outputs"].clear()
         for v in inference_state["frames_tracked_per_obj"].values():
             v.clear()
 
+    def _compute_image_feature(self, inference_state, frame_idx, backbone_out=None):
+        """The input image of a given frame and its features (computed if not given)."""
+        device = inference_state["device"]
+        image = inference_state["images"][frame_idx].to(device).float().unsqueeze(0)
+        if backbone_out is None:
+            backbone_out = self.forward_image(image)
+        return image, backbone_out
+
     def _get_image_feature(self, inference_state, frame_idx, batch_size):
         """Compute the image features on a given frame."""
         # Look up in the cache first
@@ -715,10 +746,15 @@ class SAM2VideoPredictor(SAM2Base):
             frame_idx, (None, None)
         )
         if backbone_out is None:
+            # then in the features of the volume kept across inference states (if any)
+            feature_cache = inference_state.get("feature_cache")
+            cached = feature_cache.get(frame_idx) if feature_cache is not None else None
             # Cache miss -- we will run inference on a single image
-            device = inference_state["device"]
-            image = inference_state["images"][frame_idx].to(device).float().unsqueeze(0)
-            backbone_out = self.forward_image(image)
+            image, backbone_out = self._compute_image_feature(
+                inference_state, frame_idx, cached
+            )
+            if feature_cache is not None and cached is None:
+                feature_cache.put(frame_idx, backbone_out)
             # Cache the most recent frame's feature (for repeated interactions with
             # a frame; we can use an LRU cache for more frames in the future).
             inference_state["cached_features"] = {frame_idx: (image, backbone_out)}
@@ -857,7 +893,8 @@ class SAM2VideoPredictor(SAM2Base):
             if "maskmem_pos_enc" not in model_constants:
                 assert isinstance(out_maskmem_pos_enc, list)
                 # only take the slice for one object, since it's same across objects
-                maskmem_pos_enc = [x[0:1].clone() for x in out_maskmem_pos_enc]
+                # (a view of the encoding cached by the memory encoder, so no copy is needed)
+                maskmem_pos_enc = [x[0:1] for x in out_maskmem_pos_enc]
                 model_constants["maskmem_pos_enc"] = maskmem_pos_enc
             else:
                 maskmem_pos_enc = model_constants["maskmem_pos_enc"]
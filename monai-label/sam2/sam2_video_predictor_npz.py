@@ -53,6 +53,8 @@ class SAM2VideoPredictorNPZ(SAM2Base):
         offload_video_to_cpu=False,
         offload_state_to_cpu=False,
         async_loading_frames=False,
+        resample="sitk",
+        feature_cache=None,
     ):
         """Initialize an inference state."""
         compute_device = self.device  # device of the model
@@ -67,10 +69,11 @@ class SAM2VideoPredictorNPZ(SAM2Base):
             video_path=video_path,
             image_size=self.image_size,
             offload_video_to_cpu=offload_video_to_cpu,
-            #async_loading_frames=async_loading_frames,
             compute_device=compute_device,
             clip_low=clip_low,
             clip_high=clip_high,
+            resample=resample,
+            async_loading_frames=async_loading_frames,
         )
         inference_state = {}
         inference_state["images"] = images
@@ -96,6 +99,8 @@ class SAM2VideoPredictorNPZ(SAM2Base):
         inference_state["mask_inputs_per_obj"] = {}
         # visual features on a small number of recently visited frames for quick interactions
         inference_state["cached_features"] = {}
+        # visual features of the volume kept across inference states (see `FeatureCache`)
+        inference_state["feature_cache"] = feature_cache
         # values that don't change across frames (so we only need to hold one copy of them)
         inference_state["constants"] = {}
         # mapping between client-side object id and model-side object index
@@ -683,8 +688,17 @@ class SAM2VideoPredictorNPZ(SAM2Base):
         start_frame_idx=None,
         max_frame_num_to_track=None,
         reverse=False,
+        streaming=None,
     ):
-        """Propagate the input points across frames to track in the entire video."""
+        """
+        Propagate the input points across frames to track in the entire video.
+
+        With `streaming="evict"`, the non-conditioning outputs that the memory attention can
+        no longer read are dropped while propagating, so that the state grows with the memory
+        window instead of the number of frames; `streaming="offload"` keeps them on CPU.
+        """
+        if streaming not in (None, "evict", "offload"):
+            raise ValueError(f"Unsupported streaming mode: {streaming}")
         self.propagate_in_video_preflight(inference_state)
 
         output_dict = inference_state["output_dict"]
@@ -753,6 +767,10 @@ class SAM2VideoPredictorNPZ(SAM2Base):
                 inference_state, frame_idx, current_out, storage_key
             )
             inference_state["frames_already_tracked"][frame_idx] = {"reverse": reverse}
+            if streaming:
+                self._release_non_cond_outputs(
+                    inference_state, frame_idx, reverse, evict=streaming == "evict"
+                )
 
             # Resize the output mask to the original video resolution (we directly use
             # the mask scores on GPU for output to avoid any CPU conversion in between)
@@ -790,6 +808,30 @@ class SAM2VideoPredictorNPZ(SAM2Base):
                 obj_out["maskmem_pos_enc"] = [x[obj_slice] for x in maskmem_pos_enc]
             obj_output_dict[storage_key][frame_idx] = obj_out
 
+    def _release_non_cond_outputs(self, inference_state, frame_idx, reverse, evict):
+        """
+        Streaming propagation: release the outputs behind `frame_idx` that are out of the
+        memory window (see `_release_memory_outside_window`), along with their per-object
+        slices which share the same storage.
+        """
+        consolidated_frame_inds = inference_state["consolidated_frame_inds"]
+        offloaded, evicted = self._release_memory_outside_window(
+            inference_state["output_dict"],
+            frame_idx,
+            inference_state["num_frames"],
+            track_in_reverse=reverse,
+            evict=evict,
+            keep=consolidated_frame_inds["non_cond_frame_outputs"],
+        )
+        non_cond_frame_outputs = inference_state["output_dict"]["non_cond_frame_outputs"]
+        for t in offloaded:
+            self._add_output_per_object(
+                inference_state, t, non_cond_frame_outputs[t], "non_cond_frame_outputs"
+            )
+        for t in evicted:
+            for obj_output_dict in inference_state["output_dict_per_obj"].values():
+                obj_output_dict["non_cond_frame_outputs"].pop(t, None)
+
     @torch.inference_mode()
     def clear_all_prompts_in_frame(
         self, inference_state, frame_idx, obj_id, need_output=True
@@ -883,16 +925,26 @@ class SAM2VideoPredictorNPZ(SAM2Base):
         for v in inference_state["output_dict_per_obj"].values():
             v["cond_frame_outputs"].clear()
             v["non_cond_frame_outputs"].clear()
+            v.pop("memory_bank", None)  # its buffers hold the memories of the cleared frames
         for v in inference_state["temp_output_dict_per_obj"].values():
             v["cond_frame_outputs"].clear()
             v["non_cond_frame_outputs"].clear()
         inference_state["output_dict"]["cond_frame_outputs"].clear()
         inference_state["output_dict"]["non_cond_frame_outputs"].clear()
+        inference_state["output_dict"].pop("memory_bank", None)
         inference_state["consolidated_frame_inds"]["cond_frame_outputs"].clear()
         inference_state["consolidated_frame_inds"]["non_cond_frame_outputs"].clear()
         inference_state["tracking_has_started"] = False
         inference_state["frames_already_tracked"].clear()
 
+    def _compute_image_feature(self, inference_state, frame_idx, backbone_out=None):
+        """The input image of a given frame and its features (computed if not given)."""
+        device = inference_state["device"]
+        image = inference_state["images"][frame_idx].to(device).float().unsqueeze(0)
+        if backbone_out is None:
+            backbone_out = self.forward_image(image)
+        return image, backbone_out
+
     def _get_image_feature(self, inference_state, frame_idx, batch_size):
         """Compute the image features on a given frame."""
         # Look up in the cache first
@@ -900,10 +952,15 @@ class SAM2VideoPredictorNPZ(SAM2Base):
             frame_idx, (None, None)
         )
         if backbone_out is None:
+            # then in the features of the volume kept across inference states (if any)
+            feature_cache = inference_state.get("feature_cache")
+            cached = feature_cache.get(frame_idx) if feature_cache is not None else None
             # Cache miss -- we will run inference on a single image
-            device = inference_state["device"]
-            image = inference_state["images"][frame_idx].to(device).float().unsqueeze(0)
-            backbone_out = self.forward_image(image)
+            image, backbone_out = self._compute_image_feature(
+                inference_state, frame_idx, cached
+            )
+            if feature_cache is not None and cached is None:
+                feature_cache.put(frame_idx, backbone_out)
             # Cache the most recent frame's feature (for repeated interactions with
             # a frame; we can use an LRU cache for more frames in the future).
             inference_state["cached_features"] = {frame_idx: (image, backbone_out)}
@@ -1042,7 +1099,8 @@ class SAM2VideoPredictorNPZ(SAM2Base):
             if "maskmem_pos_enc" not in model_constants:
                 assert isinstance(out_maskmem_pos_enc, list)
                 # only take the slice for one object, since it's same across objects
-                maskmem_pos_enc = [x[0:1].clone() for x in out_maskmem_pos_enc]
+                # (a view of the encoding cached by the memory encoder, so no copy is needed)
+                maskmem_pos_enc = [x[0:1] for x in out_maskmem_pos_enc]
                 model_constants["maskmem_pos_enc"] = maskmem_pos_enc
             else:
                 maskmem_pos_enc = model_constants["maskmem_pos_enc"]
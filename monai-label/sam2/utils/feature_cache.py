@@ -0,0 +1,185 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import contextlib
+import logging
+import threading
+from collections import OrderedDict
+
+import torch
+
+
+def features_nbytes(backbone_out):
+    """Bytes held by the image features (the positional encodings are shared constants)"""
+    tensors = list(backbone_out["backbone_fpn"]) + [backbone_out["vision_features"]]
+    unique = {x.data_ptr(): x for x in tensors}
+    return sum(x.numel() * x.element_size() for x in unique.values())
+
+
+class FeatureCache:
+    """
+    Byte-budgeted LRU cache of the image features (`forward_image` outputs) of the frames of
+    one volume, shared by the inference states (requests) on that volume. Set as
+    `inference_state["feature_cache"]`, it is looked up and filled by `_get_image_feature`
+    and can be filled speculatively (see `SpeculativeEncoder`).
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # frame_idx -> [backbone_out, nbytes, speculative and not used yet]
+        self.nbytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.speculated = 0
+        self.speculative_hits = 0
+
+    def __contains__(self, frame_idx):
+        with self.lock:
+            return frame_idx in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, frame_idx):
+        with self.lock:
+            entry = self.entries.get(frame_idx)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(frame_idx)
+            self.hits += 1
+            if entry[2]:
+                self.speculative_hits += 1
+                entry[2] = False
+            return entry[0]
+
+    def put(self, frame_idx, backbone_out, speculative=False):
+        """
+        Add the features of `frame_idx`, evicting the least recently used frames if needed;
+        speculative features are only added if they fit without evicting anything.
+        Returns whether the features were added.
+        """
+        nbytes = features_nbytes(backbone_out)
+        with self.lock:
+            if frame_idx in self.entries or nbytes > self.max_bytes:
+                return False
+            if speculative and self.nbytes + nbytes > self.max_bytes:
+                return False
+            while self.nbytes + nbytes > self.max_bytes:
+                _, (_, evicted, _) = self.entries.popitem(last=False)
+                self.nbytes -= evicted
+            self.entries[frame_idx] = [backbone_out, nbytes, speculative]
+            self.nbytes += nbytes
+            self.speculated += int(speculative)
+        return True
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "frames": len(self.entries),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "speculated": self.speculated,
+            "speculative_hits": self.speculative_hits,
+            "speculative_hit_rate": round(self.speculative_hits / self.speculated, 4) if self.speculated else 0.0,
+        }
+
+
+class SpeculativeEncoder:
+    """
+    Encodes the neighbours of the last prompted slice into the `FeatureCache` of the volume in
+    a background thread while the user is idle, `num_slices` ahead in the direction the user
+    is scrolling (or on both sides when it is unknown). Call `cancel` before serving a new
+    request; it returns once the slice being encoded is done, so the model is never run
+    concurrently. On cuda the speculative work runs on its own stream (of default priority; it
+    never overlaps a request, so it does not need a lower one).
+    """
+
+    def __init__(self, max_bytes, num_slices=2):
+        self.max_bytes = max_bytes
+        self.num_slices = num_slices
+        self.key = None
+        self.cache = None
+        self.last_frame = None
+        self._thread = None
+        self._cancel = None
+
+    def feature_cache(self, key):
+        """`FeatureCache` of the volume `key`; the features of the previous volume are dropped"""
+        if key != self.key:
+            self.cancel()
+            self.key = key
+            self.cache = FeatureCache(self.max_bytes)
+            self.last_frame = None
+        return self.cache
+
+    def cancel(self):
+        if self._thread is not None:
+            self._cancel.set()
+        self.wait()
+
+    def clear(self):
+        """Cancel and drop the cached features (e.g. when the model leaves the device)"""
+        self.cancel()
+        self.key = None
+        self.cache = None
+        self.last_frame = None
+
+    def wait(self):
+        """Wait until the scheduled slices are encoded (or cancelled)"""
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def frames(self, frame_idx, num_frames):
+        """Slices to encode after a prompt on `frame_idx`, nearest / most likely first"""
+        direction = 0
+        if self.last_frame is not None and self.last_frame != frame_idx:
+            direction = 1 if frame_idx > self.last_frame else -1
+        if direction:
+            candidates = [frame_idx + direction * i for i in range(1, self.num_slices + 1)]
+            candidates.append(frame_idx - direction)
+        else:
+            candidates = [frame_idx + s * i for i in range(1, self.num_slices + 1) for s in (1, -1)]
+        return [f for f in candidates if 0 <= f < num_frames and f not in self.cache]
+
+    def schedule(self, predictor, inference_state, frame_idx, context=contextlib.nullcontext):
+        """Start encoding the neighbours of `frame_idx` (with `predictor` / `inference_state`)"""
+        self.cancel()
+        frames = self.frames(frame_idx, inference_state["num_frames"]) if self.cache is not None else []
+        self.last_frame = frame_idx
+        if not self.num_slices or not frames:
+            return
+
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(predictor, inference_state, frames, self.cache, context, self._cancel),
+            name="sam2-speculative-encoder",
+            daemon=True,
+        )
+        self._thread.start()
+
+    @staticmethod
+    def _run(predictor, inference_state, frames, cache, context, cancel):
+        device = torch.device(inference_state["device"])
+        stream = torch.cuda.Stream(device) if device.type == "cuda" else None
+        try:
+            with torch.inference_mode(), context():
+                with torch.cuda.stream(stream) if stream is not None else contextlib.nullcontext():
+                    for frame_idx in frames:
+                        if cancel.is_set():
+                            break
+                        _, backbone_out = predictor._compute_image_feature(inference_state, frame_idx)
+                        if stream is not None:
+                            stream.synchronize()
+                        if not cache.put(frame_idx, backbone_out, speculative=True):
+                            break  # out of budget
+        except Exception:
+            logging.exception("Speculative encoding failed")
@@ -4,9 +4,11 @@
 # This source code is licensed under the license found in the
 # LICENSE file in the root directory of this source tree.
 
+import atexit
 import os
 import warnings
-from threading import Thread
+import weakref
+from threading import RLock, Thread
 
 import SimpleITK as sitk
 import numpy as np
@@ -350,27 +352,261 @@ def concat_points(old_point_inputs, new_points, new_labels):
 
     return {"point_coords": points, "point_labels": labels}
 
+def _histogram(values, chunk_size=1 << 22):
+    """exact (lowest value, counts per value) of a volume with <= 16 bit integers; None otherwise"""
+    flat = values.reshape(-1)
+    if not (np.issubdtype(flat.dtype, np.integer) and flat.dtype.itemsize <= 2):
+        return None
+
+    lo, hi = int(flat.min()), int(flat.max())
+    counts = np.zeros(hi - lo + 1, dtype=np.int64)
+    for start in range(0, flat.size, chunk_size):
+        chunk = flat[start : start + chunk_size].astype(np.int64) - lo
+        counts += np.bincount(chunk, minlength=counts.size)
+    return lo, counts
+
+
+def _percentiles(values, q, max_samples=2_000_000, chunk_size=1 << 22, histogram=None):
+    """
+    Percentiles (linear interpolation, same as `np.percentile`) without sorting the whole volume.
+    Integer volumes (e.g. CT in HU) use an exact histogram; float volumes use a strided sample
+    of at most `max_samples` voxels.
+    """
+    histogram = histogram or _histogram(values, chunk_size)
+    if histogram is not None:
+        lo, counts = histogram
+        cdf = np.cumsum(counts)
+        rank = np.asarray(q, dtype=np.float64) / 100 * (values.size - 1)
+        below = np.searchsorted(cdf, np.floor(rank), side="right") + lo
+        above = np.searchsorted(cdf, np.ceil(rank), side="right") + lo
+        return below + (above - below) * (rank - np.floor(rank))
+
+    flat = values.reshape(-1)
+    if flat.size > max_samples:
+        flat = flat[:: -(-flat.size // max_samples)]
+    return np.percentile(flat, q)
+
+
+class ResampledSlices:
+    """
+    Slices of a volume resized in-plane to (image_size, image_size) with torch, chunk by chunk on first access.
+
+    The sampling grid is the one `sitk.Resample` uses in `load_medical_slices` (same origin, spacing scaled by
+    size / image_size, linear interpolation, 0 outside the buffer, truncation for integer volumes), so the
+    values match the SimpleITK path.  Chunks are computed on `compute_device` and fall back to CPU if that fails
+    (e.g. out of memory).  Indexing returns a lazy [3, H, W] view like `load_medical_slices`.
+    """
+
+    def __init__(
+        self,
+        volume,
+        image_size,
+        clip_low,
+        clip_high,
+        img_mean,
+        img_std,
+        compute_device,
+        storage_device,
+        dtype=torch.float32,
+        chunk_size=16,
+    ):
+        self.volume = volume  # [Z, Y, X] numpy, original resolution
+        self.image_size = image_size
+        self.clip_low, self.clip_high = float(clip_low), float(clip_high)
+        self.img_mean, self.img_std = float(img_mean), float(img_std)
+        self.compute_device = torch.device(compute_device)
+        self.storage_device = torch.device(storage_device)
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        self.chunks = {}
+        self._grids = {}
+        self._lock = RLock()
+
+    def __len__(self):
+        return self.volume.shape[0]
+
+    def _grid(self, n_in, device):
+        key = (n_in, device)
+        if key not in self._grids:
+            x = torch.arange(self.image_size, dtype=torch.float64) * n_in / self.image_size
+            i0 = x.floor()
+            i1 = (i0 + 1).clamp(max=n_in - 1)
+            inside = (x < n_in - 0.5).to(torch.float32)
+            self._grids[key] = [t.to(device) for t in (i0.long(), i1.long(), (x - i0).to(torch.float32), inside)]
+        return self._grids[key]
+
+    def _resize(self, x):
+        # separable linear interpolation: rows (dim 1) then columns (dim 2)
+        for dim in (1, 2):
+            i0, i1, w, inside = self._grid(x.shape[dim], x.device)
+            shape = [1, 1, 1]
+            shape[dim] = -1
+            x = torch.lerp(x.index_select(dim, i0), x.index_select(dim, i1), w.view(shape)) * inside.view(shape)
+        return x
+
+    def _process(self, raw, device):
+        x = self._resize(raw.to(device).float())
+        if not raw.dtype.is_floating_point:
+            x.trunc_()
+        x.clamp_(self.clip_low, self.clip_high).sub_(self.img_mean).div_(self.img_std)
+        return x.to(self.storage_device, self.dtype)
+
+    def load_chunk(self, k):
+        chunk = self.chunks.get(k)
+        if chunk is not None:
+            return chunk
+
+        # computed without holding the lock, so a requested chunk never waits behind a background one
+        raw = torch.from_numpy(np.ascontiguousarray(self.volume[k * self.chunk_size : (k + 1) * self.chunk_size]))
+        try:
+            chunk = self._process(raw, self.compute_device)
+        except RuntimeError as e:
+            if self.compute_device.type == "cpu":
+                raise
+            warnings.warn(f"Resampling on {self.compute_device} failed ({e}); falling back to CPU")
+            self.compute_device = torch.device("cpu")
+            chunk = self._process(raw, self.compute_device)
+
+        with self._lock:
+            return self.chunks.setdefault(k, chunk)
+
+    def __getitem__(self, index):
+        index = range(len(self))[index]
+        k = index // self.chunk_size
+        return self.load_chunk(k)[index - k * self.chunk_size].unsqueeze(0).expand(3, -1, -1)
+
+
+def _volume_stats(volume, clip_low=None, clip_high=None, chunk_size=16):
+    """
+    Clip window (0.5/99.5 percentiles unless given) and mean / (unbiased) std of the clipped volume.
+    Integer volumes need a single histogram pass; others are accumulated per chunk in float64.
+    """
+    histogram = _histogram(volume)
+    if clip_low is None or clip_high is None:
+        clip_low, clip_high = _percentiles(volume, (0.5, 99.5), histogram=histogram)
+
+    if histogram is not None:
+        lo, counts = histogram
+        values = np.clip(np.arange(lo, lo + counts.size, dtype=np.float64), clip_low, clip_high)
+        total, total_sq = (values * counts).sum(), (values * values * counts).sum()
+    else:
+        total, total_sq = 0.0, 0.0
+        for start in range(0, volume.shape[0], chunk_size):
+            chunk = np.clip(volume[start : start + chunk_size].astype(np.float64), clip_low, clip_high)
+            total += chunk.sum()
+            total_sq += np.square(chunk).sum()
+
+    n = volume.size
+    mean = total / n
+    return clip_low, clip_high, mean, np.sqrt(max(total_sq - n * mean * mean, 0.0) / max(n - 1, 1))
+
+
+# loaders with a running thread; stopped once at interpreter exit (not one exit hook per init_state)
+_live_loaders = weakref.WeakSet()
+
+
+@atexit.register
+def _stop_live_loaders():
+    for loader in list(_live_loaders):
+        loader.stop()
+
+
+class AsyncMedicalSliceLoader(ResampledSlices):
+    """
+    `ResampledSlices` which prepares all chunks on a background thread (the medical counterpart of
+    `AsyncVideoFrameLoader`).
+
+    Chunks are prepared outward from the most recently requested slice (frame 0 at first, then the
+    prompted slice once the predictor asks for it), forward before backward, which is the order
+    propagation will request them in.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exception = None
+        self.center = 0
+        self.num_chunks = -(-len(self) // self.chunk_size)
+        self._stopped = False
+
+        # prepare the first frame before returning (it's used to warm up the backbone)
+        self.__getitem__(0)
+
+        self.thread = Thread(target=self._load_chunks, daemon=True)
+        _live_loaders.add(self)
+        self.thread.start()
+
+    def _next_chunk(self):
+        center = self.center
+        for distance in range(self.num_chunks):
+            for k in (center + distance, center - distance):
+                if 0 <= k < self.num_chunks and k not in self.chunks:
+                    return k
+        return None
+
+    def _load_chunks(self):
+        try:
+            while not self._stopped:
+                k = self._next_chunk()
+                if k is None:
+                    return
+                self.load_chunk(k)
+        except Exception as e:
+            self.exception = e
+        finally:
+            _live_loaders.discard(self)
+
+    def stop(self):
+        self._stopped = True
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def __getitem__(self, index):
+        if self.exception is not None:
+            raise RuntimeError("Failure in slice loading thread") from self.exception
+
+        index = range(len(self))[index]
+        self.center = index // self.chunk_size
+        return super().__getitem__(index)
+
+
 def load_medical_slices(
     video_path,
     image_size,
     offload_video_to_cpu,
     compute_device,
     clip_low=None,
-    clip_high=None
+    clip_high=None,
+    dtype=torch.float32,
+    resample="sitk",
+    async_loading_frames=False,
 ):
     """
-
+    Resample a medical volume to (image_size, image_size) slices and normalize it for the image encoder.
+
+    The volume is converted once to float32, clipped (to the given window or to the 0.5/99.5 percentiles)
+    and normalized in place.  The returned tensor is a lazy [num_slices, 3, H, W] view of a single channel;
+    the three identical channels are only materialized per frame when it's fed to the backbone.
+    `dtype=torch.float16` halves the resident size of the volume (frames are cast back to float when used).
+
+    With `resample="torch"` nothing is resized up front: a `ResampledSlices` is returned which resizes
+    chunks of slices on `compute_device` when they are first accessed.  Clip percentiles and mean/std are
+    then taken from the volume at its original resolution (close to, but not identical with, the stats of
+    the resized volume).  `async_loading_frames=True` implies the torch path and additionally prepares all
+    slices on a background thread, outward from the last requested (i.e. prompted) slice.
     """
-    #if isinstance(video_path, str) and os.path.isdir(video_path):
-    #    jpg_folder = video_path
-    #else:
-    #    raise NotImplementedError("Only JPEG frames are supported at this moment")
-
     img = video_path if isinstance(video_path, sitk.Image) else sitk.ReadImage(video_path)
     img_z = img.GetSize()[2]
-    img_y = img.GetSize()[1]
-    img_x = img.GetSize()[0]
-    #new_size = [1024, 1024, img_z]
+    video_height = img.GetSize()[1]
+    video_width = img.GetSize()[0]
+
+    if resample == "torch" or async_loading_frames:
+        volume = sitk.GetArrayFromImage(img)
+        clip_low, clip_high, img_mean, img_std = _volume_stats(volume, clip_low, clip_high)
+        storage_device = torch.device("cpu") if offload_video_to_cpu else compute_device
+        cls = AsyncMedicalSliceLoader if async_loading_frames else ResampledSlices
+        images = cls(volume, image_size, clip_low, clip_high, img_mean, img_std, compute_device, storage_device, dtype)
+        return images, video_height, video_width
+
     new_size = [image_size, image_size, img_z]
     reference_image = sitk.Image(new_size, img.GetPixelIDValue())
     reference_image.SetOrigin(img.GetOrigin())
@@ -383,61 +619,22 @@ def load_medical_slices(
     )
 
     # Resample without any smoothing.
-    #sitk.Show(sitk.Resample(grid_image, reference_image), "resampled without smoothing")
-    img = sitk.Resample(img, reference_image)#, centered_transform, sitk.sitkLinear, 0.0)
-    img_npy = sitk.GetArrayFromImage(img)
-
-
-
-    #img_npy = img_npy.resize((512, 512))
+    img = sitk.Resample(img, reference_image)
+    img_npy = sitk.GetArrayViewFromImage(img)
 
-    #For CT normalization percentile (0.5, 99.5)
-    img_npy = img_npy.astype(float)
-    percentile_00_5,percentile_99_5 = np.percentile(img_npy, np.array((0.5, 99.5)))
+    # For CT normalization percentile (0.5, 99.5)
+    if clip_low is None or clip_high is None:
+        clip_low, clip_high = _percentiles(img_npy, (0.5, 99.5))
 
-    if clip_low !=None and clip_high != None:
-        np.clip(img_npy, clip_low, clip_high, out=img_npy)    
-    else:
-        np.clip(img_npy, percentile_00_5, percentile_99_5, out=img_npy)
-    
-    #std_np = np.std(img_npy)
-    #mean_np = np.mean(img_npy)
+    images = torch.from_numpy(img_npy.astype(np.float32))
+    del img, img_npy
+    images.clamp_(float(clip_low), float(clip_high))
 
-    images = torch.from_numpy(img_npy)
-    images = images.to(torch.float32)
     img_mean = images.mean()
     img_std = images.std()
-    images = torch.unsqueeze(images, 1).expand(-1, 3,-1,-1).clone()
-
-    video_height = img_y
-    video_width = img_x
+    images.sub_(img_mean).div_(img_std)
+    images = images.to(dtype)
 
-    # normalize by mean and std
-    #images -= mean_np#torch.mean(images)
-   # images /= std_np#torch.std(images)
-    #images = torch.zeros(num_frames, 3, img_y, img_x, dtype=torch.float32)
-    #img_paths = [os.path.join(jpg_folder, frame_name) for frame_name in frame_names]
-    #img_mean = torch.tensor(img_mean, dtype=torch.float32)[:, None, None]
-    #img_std = torch.tensor(img_std, dtype=torch.float32)[:, None, None]
-
-    #if async_loading_frames:
-    #    lazy_images = AsyncVideoFrameLoader(
-    #        img_paths, image_size, offload_video_to_cpu, img_mean, img_std
-    #    )
-    #    return lazy_images, lazy_images.video_height, lazy_images.video_width
-
-    
-    #for n, img_path in enumerate(tqdm(img_paths, desc="frame loading (JPEG)")):
-    #    images[n], video_height, video_width = _load_img_as_tensor(img_path, image_size)
     if not offload_video_to_cpu:
         images = images.to(compute_device)
-        img_mean = img_mean.to(compute_device)
-        img_std = img_std.to(compute_device)
-    #if not offload_video_to_cpu:
-    #    images = images.cuda()
-    #    img_mean = img_mean.cuda()
-    #    img_std = img_std.cuda()
-    # normalize by mean and std
-    images -= img_mean
-    images /= img_std
-    return images, video_height, video_width
\ No newline at end of file
+    return images.unsqueeze(1).expand(-1, 3, -1, -1), video_height, video_width
@@ -0,0 +1,241 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+ONNX export of the SAM2 image encoder (`SAM2Base.forward_image`: Hiera trunk + FPN neck and
+the high resolution projections of the mask decoder) and of the prompt encoder + mask decoder,
+and an ONNX Runtime backend for the image encoder. Memory attention / encoding stay in torch.
+
+    python -m sam2.utils.onnx_utils --config configs/sam2.1/sam2.1_hiera_t512.yaml \
+        --checkpoint /code/checkpoints/MedSAM2_latest.pt --output-dir /code/checkpoints --check
+
+`onnx` (export) and `onnxruntime` (backend) are optional dependencies.
+"""
+
+import argparse
+import logging
+import os
+
+import numpy as np
+import torch
+from torch import nn
+
+ENCODER_OUTPUTS = ("backbone_fpn", "vision_pos_enc")
+DECODER_INPUTS = ("image_embed", "high_res_feats_0", "high_res_feats_1", "point_coords", "point_labels")
+DECODER_OUTPUTS = ("low_res_masks", "ious", "sam_output_tokens", "object_score_logits")
+
+
+def _import_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError("The ONNX Runtime backend requires `onnxruntime` (or `onnxruntime-gpu`)") from e
+    return onnxruntime
+
+
+def default_providers(device="cpu"):
+    """ONNX Runtime execution providers for `device`; always falls back to the CPU provider"""
+    available = _import_onnxruntime().get_available_providers()
+    providers = []
+    if torch.device(device).type == "cuda" and "CUDAExecutionProvider" in available:
+        providers.append("CUDAExecutionProvider")
+    return providers + ["CPUExecutionProvider"]
+
+
+class ImageEncoderExport(nn.Module):
+    """`model.forward_image` with its outputs flattened to (backbone_fpn..., vision_pos_enc...)"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, image):
+        backbone_out = self.model.forward_image(image)
+        return tuple(backbone_out["backbone_fpn"]) + tuple(backbone_out["vision_pos_enc"])
+
+
+class PromptDecoderExport(nn.Module):
+    """
+    Prompt encoder + mask decoder of `model` for point prompts (boxes are points with labels 2 / 3),
+    i.e. `SAM2Base._forward_sam_heads` without mask inputs, up to the low resolution masks.
+    The number of points is dynamic.
+    """
+
+    def __init__(self, model, multimask_output=False):
+        super().__init__()
+        self.model = model
+        self.multimask_output = multimask_output
+
+    def forward(self, image_embed, high_res_feats_0, high_res_feats_1, point_coords, point_labels):
+        sparse_embeddings, dense_embeddings = self.model.sam_prompt_encoder(
+            points=(point_coords, point_labels),
+            boxes=None,
+            masks=None,
+        )
+        return self.model.sam_mask_decoder(
+            image_embeddings=image_embed,
+            image_pe=self.model.sam_prompt_encoder.get_dense_pe(),
+            sparse_prompt_embeddings=sparse_embeddings,
+            dense_prompt_embeddings=dense_embeddings,
+            multimask_output=self.multimask_output,
+            repeat_image=False,
+            high_res_features=[high_res_feats_0, high_res_feats_1],
+        )
+
+
+def _example_image(model):
+    return torch.randn(1, 3, model.image_size, model.image_size, device=model.device)
+
+
+def _example_decoder_inputs(model, num_points=2):
+    with torch.no_grad():
+        fpn = model.forward_image(_example_image(model))["backbone_fpn"]
+    coords = torch.rand(1, num_points, 2, device=model.device) * model.image_size
+    labels = torch.ones(1, num_points, dtype=torch.int32, device=model.device)
+    return fpn[-1], fpn[0], fpn[1], coords, labels
+
+
+def export_image_encoder(model, path, opset_version=17):
+    """Export `model.forward_image` for [B, 3, image_size, image_size] inputs (dynamic batch)"""
+    encoder = ImageEncoderExport(model).eval()
+    image = _example_image(model)
+    with torch.no_grad():
+        num_levels = len(encoder(image)) // len(ENCODER_OUTPUTS)
+        output_names = [f"{name}_{i}" for name in ENCODER_OUTPUTS for i in range(num_levels)]
+        torch.onnx.export(
+            encoder,
+            (image,),
+            path,
+            input_names=["image"],
+            output_names=output_names,
+            dynamic_axes={name: {0: "batch"} for name in ["image"] + output_names},
+            opset_version=opset_version,
+            dynamo=False,
+        )
+    logging.info(f"Exported SAM2 image encoder to {path}")
+    return path
+
+
+def export_prompt_decoder(model, path, multimask_output=False, opset_version=17):
+    """Export the prompt encoder + mask decoder (see `PromptDecoderExport`) with a dynamic number of points"""
+    with torch.no_grad():
+        torch.onnx.export(
+            PromptDecoderExport(model, multimask_output).eval(),
+            _example_decoder_inputs(model),
+            path,
+            input_names=list(DECODER_INPUTS),
+            output_names=list(DECODER_OUTPUTS),
+            dynamic_axes={"point_coords": {1: "num_points"}, "point_labels": {1: "num_points"}},
+            opset_version=opset_version,
+            dynamo=False,
+        )
+    logging.info(f"Exported SAM2 prompt encoder + mask decoder to {path}")
+    return path
+
+
+class OnnxImageEncoder:
+    """
+    Drop-in replacement of `SAM2Base.forward_image` running an exported image encoder in
+    ONNX Runtime; the features are returned as torch tensors on the device of the input.
+    """
+
+    def __init__(self, path, providers=None, device="cpu", num_threads=None):
+        ort = _import_onnxruntime()
+        options = ort.SessionOptions()
+        # same intra-op parallelism as torch (onnxruntime uses all cores by default)
+        options.intra_op_num_threads = num_threads or torch.get_num_threads()
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=providers or default_providers(device))
+        self.num_levels = len(self.session.get_outputs()) // len(ENCODER_OUTPUTS)
+
+    def __call__(self, img_batch: torch.Tensor):
+        image = img_batch.detach().float().cpu().numpy()
+        outputs = self.session.run(None, {"image": image})
+        outputs = [torch.from_numpy(x).to(img_batch.device) for x in outputs]
+        backbone_fpn, vision_pos_enc = outputs[: self.num_levels], outputs[self.num_levels :]
+        return {
+            "vision_features": backbone_fpn[-1],
+            "vision_pos_enc": vision_pos_enc,
+            "backbone_fpn": backbone_fpn,
+        }
+
+
+def use_onnx_image_encoder(model, path, providers=None):
+    """
+    Run the image encoder of `model` (a SAM2 predictor) from the exported graph at `path`;
+    everything else (prompt encoder, mask decoder, memory attention and encoder) stays in torch.
+    """
+    model.forward_image = OnnxImageEncoder(path, providers=providers, device=model.device)
+    logging.info(f"Using ONNX Runtime image encoder {path} ({model.forward_image.session.get_providers()})")
+    return model
+
+
+def check_parity(model, encoder_path=None, decoder_path=None, num_points=(1, 3, 8), providers=None):
+    """
+    Max absolute difference between the outputs of `model` in torch and of the exported graphs
+    in ONNX Runtime (on a random image / random point prompts), per output.
+    """
+    ort = _import_onnxruntime()
+    providers = providers or default_providers(model.device)
+    diffs = {}
+    with torch.no_grad():
+        if encoder_path:
+            image = _example_image(model)
+            expected = ImageEncoderExport(model)(image)
+            actual = ort.InferenceSession(encoder_path, providers=providers).run(None, {"image": image.cpu().numpy()})
+            num_levels = len(expected) // len(ENCODER_OUTPUTS)
+            for i, (e, a) in enumerate(zip(expected, actual)):
+                name = f"{ENCODER_OUTPUTS[i // num_levels]}_{i % num_levels}"
+                diffs[name] = float(np.abs(e.cpu().numpy() - a).max())
+
+        if decoder_path:
+            session = ort.InferenceSession(decoder_path, providers=providers)
+            ious = session.get_outputs()[DECODER_OUTPUTS.index("ious")]
+            multimask_output = ious.shape[1] == model.sam_mask_decoder.num_multimask_outputs
+            for n in num_points:
+                inputs = _example_decoder_inputs(model, n)
+                expected = PromptDecoderExport(model, multimask_output)(*inputs)
+                actual = session.run(None, {k: v.cpu().numpy() for k, v in zip(DECODER_INPUTS, inputs)})
+                for name, e, a in zip(DECODER_OUTPUTS, expected, actual):
+                    diffs[f"{name}[points={n}]"] = float(np.abs(e.cpu().numpy() - a).max())
+    return diffs
+
+
+def main():
+    from sam2.build_sam import build_sam2
+
+    parser = argparse.ArgumentParser(description="Export the SAM2 image encoder and mask decoder to ONNX")
+    parser.add_argument("--config", default="configs/sam2.1/sam2.1_hiera_t512.yaml")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--image-size", type=int, default=0, help="override the model input size (0 keeps the config)")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--multimask-output", action="store_true")
+    parser.add_argument("--check", action="store_true", help="compare the graphs with torch in ONNX Runtime")
+    parser.add_argument("--atol", type=float, default=1e-3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    overrides = [f"++model.image_size={args.image_size}"] if args.image_size else []
+    model = build_sam2(args.config, args.checkpoint, device="cpu", hydra_overrides_extra=overrides)
+    name = os.path.splitext(os.path.basename(args.checkpoint or args.config))[0]
+    os.makedirs(args.output_dir, exist_ok=True)
+    encoder = export_image_encoder(model, os.path.join(args.output_dir, f"{name}_image_encoder.onnx"), args.opset)
+    decoder = export_prompt_decoder(
+        model, os.path.join(args.output_dir, f"{name}_prompt_decoder.onnx"), args.multimask_output, args.opset
+    )
+
+    if args.check:
+        diffs = check_parity(model, encoder, decoder)
+        for k, v in diffs.items():
+            logging.info(f"max abs diff {k}: {v:.2e}")
+        failed = {k: v for k, v in diffs.items() if v > args.atol}
+        if failed:
+            raise SystemExit(f"ONNX outputs differ from torch by more than {args.atol}: {failed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import contextlib
+import logging
+
+import torch
+
+# submodules of SAM2Base whose linear layers are quantized (the bulk of the compute)
+QUANTIZED_MODULES = ("image_encoder.trunk", "memory_attention", "sam_mask_decoder")
+
+
+def get_device(device=None):
+    """`device` or, if not given, cuda when available and cpu otherwise"""
+    if device:
+        return torch.device(device)
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def cpu_supports_bf16():
+    """whether this CPU has native bf16 kernels (AVX512-BF16 / AMX); otherwise bf16 is emulated and slower"""
+    try:
+        return torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def autocast(device, enabled=True):
+    """
+    Mixed precision context for SAM2 inference on `device`: bf16 on cuda and on CPUs with
+    native bf16 support, fp32 otherwise.
+    """
+    device = torch.device(device)
+    if not enabled:
+        return contextlib.nullcontext()
+    if device.type == "cuda":
+        return torch.autocast("cuda", dtype=torch.bfloat16)
+    if device.type == "cpu" and cpu_supports_bf16():
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def quantize_dynamic_int8(model, modules=QUANTIZED_MODULES):
+    """
+    Replace the `torch.nn.Linear` layers of the given submodules of `model` (in place) with
+    dynamically quantized int8 ones. Weights are quantized once; activations are quantized
+    per batch at run time. CPU only; the quantized layers take fp32 inputs, so the model
+    should be run without autocast.
+    """
+    if next(model.parameters()).device.type != "cpu":
+        raise ValueError("Dynamic int8 quantization is only supported for models on CPU")
+
+    for name in modules:
+        module = model.get_submodule(name)
+        torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        logging.info(f"Quantized linear layers of {name} to dynamic int8")
+    return model
+
+
+def set_num_threads(num_threads):
+    """intra-op threads used by torch on CPU (<= 0 keeps the torch default)"""
+    if num_threads and num_threads > 0:
+        torch.set_num_threads(num_threads)
+    return torch.get_num_threads()
@@ -0,0 +1,192 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+End-to-end `/infer` round trips (DICOM read, conversion, models, streaming) on synthetic series with CPU
+stand-in models, reported as p50 / p95 per stage (from the `/metrics` histograms) and per round trip.
+
+    python -m tests.benchmarks.bench_infer_e2e --slices 64 --size 256 --transfer-syntax rle --output e2e.json
+
+Scenarios:
+    - cold: the first SAM2 propagation and nnInteractive init on each of `--series` new series
+    - warm: SAM2 single-slice prompts on neighbouring slices and propagations on an already seen series
+    - burst: nnInteractive clicks in quick succession on one series
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+import torch
+
+
+def stage_seconds():
+    """Total seconds observed per stage so far (over all models / prompts)"""
+    from monailabel.utils.others.metrics import INFER_STAGE_SECONDS
+
+    totals = defaultdict(float)
+    for name, labels, value in INFER_STAGE_SECONDS.samples():
+        if name.endswith("_sum"):
+            totals[labels["stage"]] += value
+    return totals
+
+
+def summary(values):
+    ms = 1000 * np.asarray(values)
+    return {
+        "n": len(values),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+    }
+
+
+class Runner:
+    def __init__(self, client, results, log_level="WARNING"):
+        self.client = client
+        self.results = results
+        self.log_level = log_level
+        self.response_bytes = defaultdict(lambda: defaultdict(list))
+
+    def infer(self, scenario, kind, series, params):
+        """Run one request; its round trip and stage times are recorded under scenario / kind"""
+        params = {"studyInstanceUID": series["study"], "logging": self.log_level, **params}
+        before = stage_seconds()
+        start = time.perf_counter()
+        response = self.client.post(
+            f"/infer/interactive?image={series['series']}&output=dicom_seg", data={"params": json.dumps(params)}
+        )
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"{scenario}/{kind}: {response.status_code} {response.text[:500]}")
+
+        stages = self.results[scenario][kind]
+        stages["round_trip"].append(elapsed)
+        after = stage_seconds()
+        for stage in after:
+            if after[stage] > before.get(stage, 0.0):
+                stages[stage].append(after[stage] - before.get(stage, 0.0))
+        self.response_bytes[scenario][kind].append(len(response.content))
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slices", type=int, default=64)
+    parser.add_argument("--size", type=int, default=256)
+    parser.add_argument("--modality", default="CT", choices=["CT", "MR"])
+    parser.add_argument("--transfer-syntax", default="explicit", choices=["explicit", "implicit", "rle"])
+    parser.add_argument("--series", type=int, default=3, help="new series of the cold scenario")
+    parser.add_argument("--repeats", type=int, default=5, help="requests per kind of the warm scenario")
+    parser.add_argument("--clicks", type=int, default=10, help="clicks of the burst scenario")
+    parser.add_argument("--replicas", type=int, default=1)
+    parser.add_argument("--image-size", type=int, default=128, help="input size of the stand-in SAM2 encoder")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    from fastapi.testclient import TestClient
+
+    from monailabel.config import settings
+    from monailabel.tasks.infer.basic_infer import set_interactive_replicas
+    from tests.benchmarks.e2e.standins import standin_replica
+    from tests.benchmarks.e2e.synthetic import write_series
+
+    tmp = tempfile.TemporaryDirectory()
+    settings.MONAI_LABEL_APP_DIR = os.path.join(os.path.dirname(__file__), "e2e", "app")
+    settings.MONAI_LABEL_STUDIES = "http://127.0.0.1:1/dicom-web"  # never contacted
+    settings.MONAI_LABEL_DICOMWEB_CACHE_PATH = os.path.join(tmp.name, "cache")
+    settings.MONAI_LABEL_SESSION_PATH = os.path.join(tmp.name, "sessions")
+    settings.MONAI_LABEL_APP_CONF = {}
+    settings.MONAI_LABEL_TRACKING_ENABLED = False
+    for k in ("MONAI_LABEL_APP_DIR", "MONAI_LABEL_STUDIES"):
+        os.environ[k] = getattr(settings, k)
+
+    set_interactive_replicas([standin_replica("cpu", args.image_size) for _ in range(args.replicas)])
+
+    from monailabel.app import app
+    from monailabel.interfaces.utils.app import app_instance
+
+    image_dir = app_instance().image_dir()
+
+    def new_series(i):
+        uid = f"1.2.826.0.1.3680043.10.1.{i}"
+        study, series = write_series(
+            os.path.join(image_dir, uid),
+            args.slices,
+            args.size,
+            args.modality,
+            args.transfer_syntax,
+            study_uid=f"{uid}.1",
+            series_uid=uid,
+            seed=i,
+        )
+        return {"study": study, "series": series}
+
+    results = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))  # scenario -> kind -> stage -> seconds
+    center = [args.size // 3, args.size // 2, args.slices // 2]  # x, y, z on the synthetic lesion
+    with TestClient(app) as client:
+        runner = Runner(client, results, "INFO" if args.verbose else "WARNING")
+
+        for i in range(args.series):
+            series = new_series(i)
+            runner.infer("cold", "sam2_propagate", series, {"pos_points": [center]})
+            runner.infer("cold", "nninteractive_init", series, {"nninter": "init"})
+
+        series = new_series(args.series)
+        runner.infer("warm", "setup", series, {"pos_points": [center]})
+        for r in range(args.repeats):
+            z = center[2] + r - args.repeats // 2
+            runner.infer("warm", "sam2_one_slice", series, {"pos_points": [[*center[:2], z]], "one": True})
+        for r in range(args.repeats):
+            runner.infer("warm", "sam2_propagate", series, {"pos_points": [[center[0] + r, center[1], center[2]]]})
+        for r in range(args.repeats):
+            runner.infer("warm", "medsam2_propagate", series, {"pos_points": [center], "medsam2": True})
+
+        runner.infer("burst", "nninteractive_init", series, {"nninter": "init"})
+        for c in range(args.clicks):
+            point = [center[0] + 2 * c, center[1] + (c % 3), center[2] + c % 5 - 2]
+            runner.infer("burst", "nninteractive_click", series, {"nninter": True, "pos_points": [point]})
+        results["warm"].pop("setup")
+        runner.response_bytes["warm"].pop("setup")
+
+    tmp.cleanup()
+    report = {
+        scenario: {
+            kind: {
+                "stages": {stage: summary(values) for stage, values in stages.items()},
+                "response_kb": round(float(np.mean(runner.response_bytes[scenario][kind])) / 1024, 1),
+            }
+            for kind, stages in kinds.items()
+        }
+        for scenario, kinds in results.items()
+    }
+
+    info = {**vars(args), "torch_threads": torch.get_num_threads()}
+    output = json.dumps({"input": info, "results": report}, indent=2)
+    if args.output:
+        with open(args.output, "w") as fp:
+            fp.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
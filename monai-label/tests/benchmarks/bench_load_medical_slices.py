@@ -0,0 +1,128 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Peak memory / time of `load_medical_slices` against the previous implementation on a synthetic CT.
+
+    python -m tests.benchmarks.bench_load_medical_slices --size 512 --slices 200 --image-size 1024
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+import SimpleITK as sitk
+import torch
+
+
+def synthetic_ct(size=512, slices=200, seed=0) -> sitk.Image:
+    """int16 CT-like volume (air background, soft tissue body, bone ring) in HU"""
+    rng = np.random.default_rng(seed)
+    z, y, x = np.ogrid[:slices, :size, :size]
+    r = np.sqrt((y - size / 2) ** 2 + (x - size / 2) ** 2) / (size / 2)
+    vol = np.full((slices, size, size), -1000, dtype=np.int16)
+    vol[np.broadcast_to(r < 0.8, vol.shape)] = 40
+    vol[np.broadcast_to((r > 0.6) & (r < 0.65), vol.shape)] = 700
+    vol += rng.normal(0, 20, vol.shape).astype(np.int16)
+
+    img = sitk.GetImageFromArray(vol)
+    img.SetSpacing((0.8, 0.8, 2.5))
+    return img
+
+
+def legacy_load_medical_slices(video_path, image_size, offload_video_to_cpu, compute_device, clip_low=None, clip_high=None):
+    img = video_path if isinstance(video_path, sitk.Image) else sitk.ReadImage(video_path)
+    img_z = img.GetSize()[2]
+    img_y = img.GetSize()[1]
+    img_x = img.GetSize()[0]
+    new_size = [image_size, image_size, img_z]
+    reference_image = sitk.Image(new_size, img.GetPixelIDValue())
+    reference_image.SetOrigin(img.GetOrigin())
+    reference_image.SetDirection(img.GetDirection())
+    reference_image.SetSpacing([sz * spc / nsz for nsz, sz, spc in zip(new_size, img.GetSize(), img.GetSpacing())])
+    img = sitk.Resample(img, reference_image)
+    img_npy = sitk.GetArrayFromImage(img)
+
+    img_npy = img_npy.astype(float)
+    percentile_00_5, percentile_99_5 = np.percentile(img_npy, np.array((0.5, 99.5)))
+    if clip_low is not None and clip_high is not None:
+        np.clip(img_npy, clip_low, clip_high, out=img_npy)
+    else:
+        np.clip(img_npy, percentile_00_5, percentile_99_5, out=img_npy)
+
+    images = torch.from_numpy(img_npy)
+    images = images.to(torch.float32)
+    img_mean = images.mean()
+    img_std = images.std()
+    images = torch.unsqueeze(images, 1).expand(-1, 3, -1, -1).clone()
+    if not offload_video_to_cpu:
+        images = images.to(compute_device)
+        img_mean = img_mean.to(compute_device)
+        img_std = img_std.to(compute_device)
+    images -= img_mean
+    images /= img_std
+    return images, img_y, img_x
+
+
+def _run(name, size, slices, image_size, queue):
+    from sam2.utils.misc import load_medical_slices
+
+    img = synthetic_ct(size, slices)
+    fn = {
+        "legacy": legacy_load_medical_slices,
+        "float32": load_medical_slices,
+        "float16": lambda *args, **kwargs: load_medical_slices(*args, dtype=torch.float16, **kwargs),
+    }[name]
+
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    images, _, _ = fn(img, image_size, True, torch.device("cpu"))
+    latency = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    input_mb = slices * size * size * 2 / 2**20
+    peak_mb = (peak - base) / 1024  # ru_maxrss is KiB on linux
+    queue.put(
+        {
+            "variant": name,
+            "seconds": round(latency, 3),
+            "peak_mb": round(peak_mb, 1),
+            "peak_x_input": round(peak_mb / input_mb, 2),
+            "resident_mb": round(images.untyped_storage().nbytes() / 2**20, 1),
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--slices", type=int, default=200)
+    parser.add_argument("--image-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    # each variant in a fresh process so peak RSS isn't shared between them
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for name in ("legacy", "float32", "float16"):
+        queue = ctx.Queue()
+        p = ctx.Process(target=_run, args=(name, args.size, args.slices, args.image_size, queue))
+        p.start()
+        results.append(queue.get())
+        p.join()
+
+    print(json.dumps({"input": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+CPU latency / agreement of SAM2 propagation in fp32, bf16 autocast and dynamic int8 on a synthetic CT.
+
+    python -m tests.benchmarks.bench_sam2_cpu --checkpoint /code/checkpoints/sam2.1_hiera_tiny.pt \
+        --config configs/sam2.1/sam2.1_hiera_t.yaml --threads 8
+
+Without a checkpoint the model has random weights, which is enough for latency but not for accuracy.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import torch
+
+from tests.benchmarks.bench_load_medical_slices import synthetic_ct
+
+
+def _predictor(args, variant):
+    from sam2.build_sam import build_sam2_video_predictor
+    from sam2.utils.runtime import quantize_dynamic_int8
+
+    torch.manual_seed(0)
+    overrides = [f"++model.image_size={args.image_size}"] if args.image_size else []
+    predictor = build_sam2_video_predictor(args.config, args.checkpoint, device="cpu", hydra_overrides_extra=overrides)
+    if variant == "int8":
+        quantize_dynamic_int8(predictor)
+    return predictor
+
+
+def _run(predictor, img, autocast):
+    start = time.perf_counter()
+    with torch.inference_mode(), autocast:
+        state = predictor.init_state(video_path=img)
+        init = time.perf_counter() - start
+
+        z, (y, x) = img.GetSize()[2] // 2, (img.GetSize()[1] // 2, img.GetSize()[0] // 2)
+        points = np.array([[x, y]], dtype=np.float32)
+        predictor.add_new_points_or_box(state, frame_idx=z, obj_id=1, points=points, labels=np.array([1], np.int32))
+
+        logits = {}
+        start = time.perf_counter()
+        for reverse in (False, True):
+            for frame_idx, _, mask_logits in predictor.propagate_in_video(state, reverse=reverse):
+                logits[frame_idx] = mask_logits[0, 0].float()
+        propagate = time.perf_counter() - start
+    return init, propagate, torch.stack([logits[i] for i in sorted(logits)])
+
+
+def dice(a, b):
+    total = a.sum() + b.sum()
+    return 1.0 if total == 0 else float(2 * (a & b).sum() / total)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="configs/sam2.1/sam2.1_hiera_t512.yaml")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--image-size", type=int, default=0, help="override the model input size (0 keeps the config)")
+    parser.add_argument("--size", type=int, default=128)
+    parser.add_argument("--slices", type=int, default=24)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--variants", nargs="+", default=["fp32", "bf16", "int8"])
+    args = parser.parse_args()
+
+    from sam2.utils.runtime import autocast, cpu_supports_bf16, set_num_threads
+
+    threads = set_num_threads(args.threads)
+    img = synthetic_ct(args.size, args.slices)
+
+    results, reference = [], None
+    for variant in ["fp32"] + [v for v in args.variants if v != "fp32"]:
+        predictor = _predictor(args, variant)
+        if variant == "bf16":
+            context = torch.autocast("cpu", dtype=torch.bfloat16)  # forced, even if emulated
+        else:
+            context = autocast("cpu", enabled=False)
+        init, propagate, logits = _run(predictor, img, context)
+
+        if reference is None:
+            reference = logits
+        results.append(
+            {
+                "variant": variant,
+                "init_seconds": round(init, 3),
+                "propagate_seconds": round(propagate, 3),
+                "ms_per_slice": round(1000 * propagate / len(logits), 1),
+                "dice_vs_fp32": round(dice(logits > 0, reference > 0), 4),
+                "max_abs_logit_diff": round(float((logits - reference).abs().max()), 4),
+            }
+        )
+
+    info = {**vars(args), "threads": threads, "native_bf16": cpu_supports_bf16()}
+    print(json.dumps({"input": info, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
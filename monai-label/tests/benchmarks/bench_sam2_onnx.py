@@ -0,0 +1,97 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+CPU throughput of the SAM2 image encoder in torch vs ONNX Runtime, and of propagation with
+either encoder on a synthetic CT (requires onnx and onnxruntime).
+
+    python -m tests.benchmarks.bench_sam2_onnx --image-size 512 --threads 8
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import torch
+
+from tests.benchmarks.bench_load_medical_slices import synthetic_ct
+from tests.benchmarks.bench_sam2_cpu import _run, dice
+
+
+def _images_per_second(fn, image, repeats):
+    fn(image)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(image)
+    return repeats / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="configs/sam2.1/sam2.1_hiera_t512.yaml")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--image-size", type=int, default=0, help="override the model input size (0 keeps the config)")
+    parser.add_argument("--size", type=int, default=128)
+    parser.add_argument("--slices", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args()
+
+    from sam2.build_sam import build_sam2_video_predictor
+    from sam2.utils.onnx_utils import OnnxImageEncoder, check_parity, export_image_encoder, use_onnx_image_encoder
+    from sam2.utils.runtime import set_num_threads
+
+    threads = set_num_threads(args.threads)
+    overrides = [f"++model.image_size={args.image_size}"] if args.image_size else []
+    img = synthetic_ct(args.size, args.slices)
+
+    def predictor():
+        torch.manual_seed(0)
+        return build_sam2_video_predictor(args.config, args.checkpoint, device="cpu", hydra_overrides_extra=overrides)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        model = predictor()
+        path = export_image_encoder(model, os.path.join(tmp, "image_encoder.onnx"))
+        parity = check_parity(model, encoder_path=path)
+
+        image = torch.randn(1, 3, model.image_size, model.image_size)
+        with torch.inference_mode():
+            torch_ips = _images_per_second(model.forward_image, image, args.repeats)
+        ort_ips = _images_per_second(OnnxImageEncoder(path), image, args.repeats)
+
+        for backend in ("torch", "onnxruntime"):
+            model = predictor()
+            if backend == "onnxruntime":
+                use_onnx_image_encoder(model, path)
+            init, propagate, logits = _run(model, img, torch.autocast("cpu", enabled=False))
+            if backend == "torch":
+                reference = logits
+            results.append(
+                {
+                    "backend": backend,
+                    "encoder_images_per_second": round(torch_ips if backend == "torch" else ort_ips, 2),
+                    "init_seconds": round(init, 3),
+                    "propagate_seconds": round(propagate, 3),
+                    "ms_per_slice": round(1000 * propagate / len(logits), 1),
+                    "dice_vs_torch": round(dice(logits > 0, reference > 0), 4),
+                    "max_abs_logit_diff": round(float((logits - reference).abs().max()), 4),
+                }
+            )
+
+    info = {**vars(args), "threads": threads}
+    print(json.dumps({"input": info, "encoder_max_abs_diff": parity, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
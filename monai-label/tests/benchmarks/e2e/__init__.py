@@ -0,0 +1,18 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+End-to-end `/infer` benchmark on synthetic DICOM series with CPU stand-in models (see `bench_infer_e2e`).
+
+    - `synthetic`: CT / MR series written with pydicom (slices, matrix size, transfer syntax)
+    - `standins`: tiny CPU models with the SAM2 video predictor and the nnInteractive session interface
+    - `app`: MONAI Label app served from a DICOMweb cache which is populated by the benchmark
+"""
@@ -0,0 +1,85 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from typing import Callable, Dict, Sequence
+
+from dicomweb_client import DICOMwebClient
+
+from monailabel.config import settings
+from monailabel.datastore.dicom import DICOMWebDatastore
+from monailabel.interfaces.app import MONAILabelApp
+from monailabel.interfaces.datastore import Datastore
+from monailabel.interfaces.tasks.infer_v2 import InferTask, InferType
+from monailabel.tasks.infer.basic_infer import BasicInferTask
+
+logger = logging.getLogger(__name__)
+
+# request keys read by the interactive path (as sent by the viewer)
+INTERACTIVE_DEFAULTS = {
+    "nninter": False,
+    "medsam2": False,
+    "texts": [""],
+    "boxes": [],
+    "pos_points": [],
+    "neg_points": [],
+    "pos_boxes": [],
+    "neg_boxes": [],
+    "pos_lassos": [],
+    "neg_lassos": [],
+    "pos_scribbles": [],
+    "neg_scribbles": [],
+}
+
+
+class InteractiveInfer(BasicInferTask):
+    """nnInteractive / SAM2 / MedSAM2 (the replicas set by the benchmark) on DICOM series"""
+
+    def __init__(self):
+        super().__init__(
+            path=None,
+            network=None,
+            type=InferType.SEGMENTATION,
+            labels=None,
+            dimension=3,
+            description="Interactive segmentation (benchmark)",
+            config=INTERACTIVE_DEFAULTS,
+        )
+
+    def is_valid(self) -> bool:
+        return True
+
+    def pre_transforms(self, data=None) -> Sequence[Callable]:
+        return []
+
+    def post_transforms(self, data=None) -> Sequence[Callable]:
+        return []
+
+
+class BenchmarkApp(MONAILabelApp):
+    def __init__(self, app_dir, studies, conf):
+        super().__init__(app_dir=app_dir, studies=studies, conf=conf, name="Benchmark", description="Benchmark")
+
+    def init_datastore(self) -> Datastore:
+        # series are served from the cache (populated by the benchmark); the server is never contacted
+        return DICOMWebDatastore(
+            client=DICOMwebClient(url=self.studies),
+            search_filter=settings.MONAI_LABEL_DICOMWEB_SEARCH_FILTER,
+            cache_path=settings.MONAI_LABEL_DICOMWEB_CACHE_PATH,
+            convert_to_nifti=False,
+        )
+
+    def init_infers(self) -> Dict[str, InferTask]:
+        return {"interactive": InteractiveInfer()}
+
+    def image_dir(self) -> str:
+        """Directory of the cached series (one sub directory per Series Instance UID)"""
+        return self._datastore._datastore.image_path()  # type: ignore
@@ -0,0 +1,218 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+from sam2.utils.misc import load_medical_slices
+
+
+class StandInVideoPredictor(nn.Module):
+    """
+    CPU stand-in for the SAM2 video predictor with the same `init_state` / `add_new_points_or_box` /
+    `propagate_in_video` interface and image feature hooks (feature cache, speculative encoding).
+
+    Frames are loaded and normalized like SAM2 does (`load_medical_slices`) and encoded by a tiny conv net;
+    the mask of an object is a disk around its prompt, shrinking away from the prompted slice.
+    """
+
+    def __init__(self, image_size=128, channels=8):
+        super().__init__()
+        self.image_size = image_size
+        self.encoder = nn.Sequential(
+            nn.Conv2d(3, channels, 3, stride=2, padding=1),
+            nn.ReLU(),
+            nn.Conv2d(channels, channels, 3, stride=2, padding=1),
+        )
+        self.head = nn.Conv2d(channels, 1, 1)
+
+    @property
+    def device(self):
+        return next(self.parameters()).device
+
+    @torch.inference_mode()
+    def init_state(self, video_path, offload_video_to_cpu=False, clip_low=None, clip_high=None, feature_cache=None):
+        images, video_height, video_width = load_medical_slices(
+            video_path, self.image_size, offload_video_to_cpu, self.device, clip_low=clip_low, clip_high=clip_high
+        )
+        state = {
+            "images": images,
+            "num_frames": len(images),
+            "video_height": video_height,
+            "video_width": video_width,
+            "device": self.device,
+            "feature_cache": feature_cache,
+            "prompts": {},  # obj_id -> (frame_idx, x, y, radius) in video coordinates
+        }
+        self._get_image_feature(state, 0)  # warm up, like SAM2
+        return state
+
+    def _compute_image_feature(self, inference_state, frame_idx, backbone_out=None):
+        image = inference_state["images"][frame_idx].to(self.device).float().unsqueeze(0)
+        if backbone_out is None:
+            features = self.encoder(image)
+            backbone_out = {
+                "backbone_fpn": [features],
+                "vision_features": features,
+                "vision_pos_enc": [torch.zeros_like(features)],
+            }
+        return image, backbone_out
+
+    def _get_image_feature(self, inference_state, frame_idx):
+        cache = inference_state.get("feature_cache")
+        backbone_out = cache.get(frame_idx) if cache is not None else None
+        if backbone_out is None:
+            _, backbone_out = self._compute_image_feature(inference_state, frame_idx)
+            if cache is not None:
+                cache.put(frame_idx, backbone_out)
+        return backbone_out
+
+    def _mask_logits(self, inference_state, frame_idx):
+        h, w = inference_state["video_height"], inference_state["video_width"]
+        features = self._get_image_feature(inference_state, frame_idx)["vision_features"]
+        texture = F.interpolate(self.head(features).float(), size=(h, w), mode="bilinear", align_corners=False)[0, 0]
+
+        y, x = torch.meshgrid(torch.arange(h), torch.arange(w), indexing="ij")
+        logits = []
+        for prompt_frame, cx, cy, radius in inference_state["prompts"].values():
+            r = radius * max(0.0, 1.0 - 2 * abs(frame_idx - prompt_frame) / inference_state["num_frames"])
+            disk = r - torch.sqrt((x - cx) ** 2 + (y - cy) ** 2)
+            logits.append(disk.to(texture.device) + 0.01 * texture)
+        return torch.stack(logits)[:, None]
+
+    @torch.inference_mode()
+    def add_new_points_or_box(
+        self, inference_state, frame_idx, obj_id, points=None, labels=None, box=None, clear_old_points=True
+    ):
+        h, w = inference_state["video_height"], inference_state["video_width"]
+        radius = min(h, w) / 8
+        if box is not None and len(box):
+            box = np.asarray(box, dtype=np.float32).reshape(-1, 4)[0]
+            cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+            radius = max(box[2] - box[0], box[3] - box[1]) / 2
+        else:
+            points, labels = np.asarray(points, dtype=np.float32), np.asarray(labels)
+            positive = points[labels == 1] if (labels == 1).any() else points
+            cx, cy = positive.mean(axis=0)
+
+        inference_state["prompts"][obj_id] = (frame_idx, float(cx), float(cy), float(radius))
+        obj_ids = list(inference_state["prompts"])
+        return frame_idx, obj_ids, self._mask_logits(inference_state, frame_idx)
+
+    @torch.inference_mode()
+    def propagate_in_video(self, inference_state, start_frame_idx=None, max_frame_num_to_track=None, reverse=False):
+        prompt_frames = [p[0] for p in inference_state["prompts"].values()]
+        num_frames = inference_state["num_frames"]
+        if start_frame_idx is None:
+            start_frame_idx = max(prompt_frames) if reverse else min(prompt_frames)
+        if max_frame_num_to_track is None:
+            max_frame_num_to_track = num_frames
+
+        if reverse:
+            frames = range(start_frame_idx, max(start_frame_idx - max_frame_num_to_track, -1), -1)
+        else:
+            frames = range(start_frame_idx, min(start_frame_idx + max_frame_num_to_track, num_frames - 1) + 1)
+        obj_ids = list(inference_state["prompts"])
+        for frame_idx in frames:
+            yield frame_idx, obj_ids, self._mask_logits(inference_state, frame_idx)
+
+
+class StandInSession:
+    """
+    nnInteractive inference session look-alike: the image is preprocessed in the background after
+    `set_image` and every interaction runs a tiny 3D conv net on a patch around it, painting the result
+    into the target buffer (or erasing it for negative interactions).
+    """
+
+    def __init__(self, device="cpu", patch_size=32):
+        self.device = torch.device(device)
+        self.patch_size = patch_size
+        self.network = nn.Conv3d(2, 1, 3, padding=1).to(self.device)
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self._reset_session()
+
+    def _reset_session(self):
+        self.original_image_shape = None
+        self.preprocessed_image = None
+        self.preprocess_future = None
+        self.target_buffer = None
+
+    def set_image(self, image):
+        self.original_image_shape = image.shape
+        self.preprocessed_image = None
+        self.preprocess_future = self.executor.submit(self._preprocess, image)
+
+    def _preprocess(self, image):
+        x = torch.from_numpy(image[0].astype(np.float32))
+        self.preprocessed_image = (x - x.mean()) / (x.std() + 1e-8)
+        self.preprocess_future = None
+
+    def set_target_buffer(self, target_buffer):
+        self.target_buffer = target_buffer
+
+    def reset_interactions(self):
+        if self.target_buffer is not None:
+            self.target_buffer.zero_()
+
+    def add_point_interaction(self, coordinates, include_interaction=True):
+        prompt = torch.zeros(self.target_buffer.shape, dtype=torch.bool)
+        index = tuple(min(max(int(c), 0), s - 1) for c, s in zip(coordinates, prompt.shape))
+        prompt[index] = True
+        self._interact(prompt, include_interaction)
+
+    def add_bbox_interaction(self, bbox_coords, include_interaction=True):
+        prompt = torch.zeros(self.target_buffer.shape, dtype=torch.bool)
+        prompt[tuple(slice(int(lo), int(hi) + 1) for lo, hi in reversed(bbox_coords))] = True
+        self._interact(prompt, include_interaction)
+
+    def add_lasso_interaction(self, mask, include_interaction=True):
+        self._interact(torch.as_tensor(np.asarray(mask) > 0), include_interaction)
+
+    add_scribble_interaction = add_lasso_interaction
+
+    @torch.inference_mode()
+    def _interact(self, prompt, include_interaction):
+        nz = prompt.nonzero()
+        if not len(nz):
+            return
+        half = self.patch_size // 2
+        center = ((nz.min(0).values + nz.max(0).values) // 2).tolist()
+        roi = tuple(slice(max(c - half, 0), min(c + half, s)) for c, s in zip(center, prompt.shape))
+
+        image = self.preprocessed_image[roi].to(self.device)
+        distance = torch.zeros_like(image)
+        grid = torch.meshgrid(*[torch.arange(r.start, r.stop, device=self.device) for r in roi], indexing="ij")
+        for g, c in zip(grid, center):
+            distance += (g - c).float() ** 2
+        x = torch.stack([image, prompt[roi].float().to(self.device)])[None]
+        logits = self.network(x)[0, 0] + (half / 2) - distance.sqrt()
+
+        patch = self.target_buffer[roi]
+        if include_interaction:
+            patch[logits.cpu() > 0] = 1
+        else:
+            patch[logits.cpu() > 0] = 0
+
+
+def standin_replica(device="cpu", image_size=128):
+    """`InteractiveReplica` with stand-in nnInteractive / SAM2 / MedSAM2 models"""
+    from monailabel.tasks.infer.basic_infer import InteractiveReplica
+
+    return InteractiveReplica(
+        device,
+        session=StandInSession(device),
+        predictor_sam2=StandInVideoPredictor(image_size).to(device),
+        predictor_med=StandInVideoPredictor(image_size).to(device),
+    )
@@ -0,0 +1,125 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import numpy as np
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import (
+    CTImageStorage,
+    ExplicitVRLittleEndian,
+    ImplicitVRLittleEndian,
+    MRImageStorage,
+    RLELossless,
+    generate_uid,
+)
+
+TRANSFER_SYNTAXES = {
+    "explicit": ExplicitVRLittleEndian,
+    "implicit": ImplicitVRLittleEndian,
+    "rle": RLELossless,
+}
+
+# modality -> SOP class, window (center, width), signed pixels
+MODALITIES = {
+    "CT": (CTImageStorage, (40, 400), True),
+    "MR": (MRImageStorage, (400, 800), False),
+}
+
+
+def synthetic_volume(modality="CT", slices=64, size=256, seed=0) -> np.ndarray:
+    """[slices, size, size] volume: a body with a ring (bone / fat) and a sphere (lesion) in it"""
+    rng = np.random.default_rng(seed)
+    z, y, x = np.ogrid[:slices, :size, :size]
+    r = np.sqrt((y - size / 2) ** 2 + (x - size / 2) ** 2) / (size / 2)
+    lesion = ((z - slices / 2) / max(slices / 4, 1)) ** 2 + ((y - size / 2) ** 2 + (x - size / 3) ** 2) / (size / 8) ** 2
+    if modality == "CT":
+        background, body, ring, sphere, noise = -1000, 40, 700, 120, 20
+    else:
+        background, body, ring, sphere, noise = 0, 300, 800, 600, 15
+
+    vol = np.full((slices, size, size), background, dtype=np.int16)
+    vol[np.broadcast_to(r < 0.8, vol.shape)] = body
+    vol[np.broadcast_to((r > 0.6) & (r < 0.65), vol.shape)] = ring
+    vol[lesion < 1] = sphere
+    vol += rng.normal(0, noise, vol.shape).astype(np.int16)
+    return vol if modality == "CT" else np.clip(vol, 0, None).astype(np.uint16)
+
+
+def write_series(
+    out_dir,
+    slices=64,
+    size=256,
+    modality="CT",
+    transfer_syntax="explicit",
+    study_uid=None,
+    series_uid=None,
+    spacing=(0.8, 0.8, 2.5),
+    seed=0,
+):
+    """
+    Write a synthetic series into `out_dir` (one file per slice, named by SOP Instance UID) with the tags
+    the infer path reads (instance number, position, window, ...). Returns the study and series uid.
+    """
+    if transfer_syntax not in TRANSFER_SYNTAXES:
+        raise ValueError(f"Invalid transfer syntax: {transfer_syntax}; expected one of {list(TRANSFER_SYNTAXES)}")
+    sop_class, (window_center, window_width), signed = MODALITIES[modality]
+    ts = TRANSFER_SYNTAXES[transfer_syntax]
+    study_uid = study_uid or generate_uid()
+    series_uid = series_uid or generate_uid()
+    frame_of_reference = generate_uid()
+
+    os.makedirs(out_dir, exist_ok=True)
+    for i, pixels in enumerate(synthetic_volume(modality, slices, size, seed)):
+        sop_uid = generate_uid()
+        meta = FileMetaDataset()
+        meta.MediaStorageSOPClassUID = sop_class
+        meta.MediaStorageSOPInstanceUID = sop_uid
+        meta.TransferSyntaxUID = ExplicitVRLittleEndian if ts == RLELossless else ts
+
+        ds = Dataset()
+        ds.file_meta = meta
+        ds.SOPClassUID = sop_class
+        ds.SOPInstanceUID = sop_uid
+        ds.StudyInstanceUID = study_uid
+        ds.SeriesInstanceUID = series_uid
+        ds.FrameOfReferenceUID = frame_of_reference
+        ds.Modality = modality
+        ds.PatientID = "synthetic"
+        ds.PatientName = "Synthetic^Benchmark"
+        ds.StudyDate = "20240101"
+        ds.SeriesDescription = f"synthetic {modality} {size}x{size}x{slices} {transfer_syntax}"
+        ds.SeriesNumber = 1
+        ds.InstanceNumber = i + 1
+        ds.ImagePositionPatient = [0.0, 0.0, i * spacing[2]]
+        ds.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+        ds.PixelSpacing = [spacing[1], spacing[0]]
+        ds.SliceThickness = spacing[2]
+        ds.Rows, ds.Columns = pixels.shape
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = "MONOCHROME2"
+        ds.BitsAllocated = 16
+        ds.BitsStored = 16
+        ds.HighBit = 15
+        ds.PixelRepresentation = 1 if signed else 0
+        ds.RescaleIntercept = 0
+        ds.RescaleSlope = 1
+        ds.WindowCenter = window_center
+        ds.WindowWidth = window_width
+
+        if ts == RLELossless:
+            ds.compress(RLELossless, pixels)
+        else:
+            ds.is_little_endian = True
+            ds.is_implicit_VR = ts == ImplicitVRLittleEndian
+            ds.PixelData = pixels.tobytes()
+        ds.save_as(os.path.join(out_dir, f"{sop_uid}.dcm"), write_like_original=False)
+    return study_uid, series_uid
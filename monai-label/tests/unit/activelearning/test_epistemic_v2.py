@@ -0,0 +1,79 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import torch
+
+from monailabel.tasks.scoring import epistemic_v2
+from monailabel.tasks.scoring.epistemic_v2 import EpistemicScoring
+from monailabel.utils.others.scheduler import Priority, WorkScheduler, infer_priority
+
+
+class StubInferTask:
+    """Infer task which (like `BasicInferTask`) may take the scheduler slot of its device itself"""
+
+    def __init__(self, scheduler, routes_device):
+        self.scheduler = scheduler
+        self._routes_device = routes_device
+        self.description = "stub"
+        self.dimension = 3
+        self.output_label_key = "pred"
+        self.priorities = []
+
+    def routes_device(self):
+        return self._routes_device
+
+    def __call__(self, request):
+        if self._routes_device:
+            priority = infer_priority(request)
+            self.priorities.append(priority)
+            with self.scheduler.slot(priority, "cpu"):
+                pass
+        return {"pred": np.random.rand(2, 4, 4, 4).astype(np.float32)}
+
+
+class TestEpistemicScoringV2(unittest.TestCase):
+    def run_scoring(self, routes_device):
+        scheduler = WorkScheduler(slots=1)
+        task = StubInferTask(scheduler, routes_device)
+        scoring = EpistemicScoring(task, simulation_size=3)
+        datastore = MagicMock()
+        datastore.get_image_uri.return_value = "image.nii.gz"
+
+        done = threading.Event()
+
+        def run():
+            stack = torch.stack
+            with patch.object(epistemic_v2, "work_scheduler", return_value=scheduler), patch.object(
+                epistemic_v2, "name_to_device", return_value="cpu"
+            ), patch.object(epistemic_v2.torch, "stack", lambda x: stack([torch.from_numpy(p) for p in x])):
+                scoring.run_scoring("image", 3, 1, datastore)
+            done.set()
+
+        threading.Thread(target=run, daemon=True).start()
+        self.assertTrue(done.wait(10))  # no nested slots of the same device (deadlock with one slot)
+        datastore.update_image_info.assert_called_once()
+        return task
+
+    def test_routed_task_takes_the_slot(self):
+        task = self.run_scoring(routes_device=True)
+        self.assertEqual(task.priorities, [Priority.SCORING] * 3)
+
+    def test_task_run_in_a_slot(self):
+        self.run_scoring(routes_device=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,13 +10,65 @@
 # limitations under the License.
 
 import os
+import shutil
 import tempfile
 import unittest
 
 import numpy as np
+import pydicom
+import pydicom_seg
+import SimpleITK
 from monai.transforms import LoadImage
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import CTImageStorage, ExplicitVRLittleEndian, generate_uid
 
-from monailabel.datastore.utils.convert import binary_to_image, dicom_to_nifti, nifti_to_dicom_seg
+from monailabel.datastore.utils.convert import (
+    binary_to_image,
+    dicom_to_nifti,
+    label_to_series_grid,
+    native_image_to_dicom_seg,
+    nifti_to_dicom_seg,
+)
+from monailabel.datastore.utils.dicom import get_series_header_index
+
+
+def create_series(series_dir, slices=6, rows=16, columns=12, reverse_files=True):
+    os.makedirs(series_dir, exist_ok=True)
+    study_uid, series_uid, for_uid = generate_uid(), generate_uid(), generate_uid()
+    for z in range(slices):
+        ds = Dataset()
+        ds.file_meta = FileMetaDataset()
+        ds.file_meta.MediaStorageSOPClassUID = CTImageStorage
+        ds.file_meta.MediaStorageSOPInstanceUID = generate_uid()
+        ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        ds.is_little_endian = True
+        ds.is_implicit_VR = False
+
+        ds.SOPClassUID = CTImageStorage
+        ds.SOPInstanceUID = ds.file_meta.MediaStorageSOPInstanceUID
+        ds.PatientName = "Synthetic^CT"
+        ds.PatientID = "SYN001"
+        ds.StudyInstanceUID = study_uid
+        ds.SeriesInstanceUID = series_uid
+        ds.FrameOfReferenceUID = for_uid
+        ds.Modality = "CT"
+        ds.SeriesDescription = "synthetic"
+        ds.InstanceNumber = slices - z if reverse_files else z + 1
+        ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+        ds.ImagePositionPatient = [0.0, 0.0, 2.5 * z]
+        ds.PixelSpacing = [0.8, 0.8]
+        ds.SliceThickness = 2.5
+        ds.Rows = rows
+        ds.Columns = columns
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = "MONOCHROME2"
+        ds.BitsAllocated = 16
+        ds.BitsStored = 16
+        ds.HighBit = 15
+        ds.PixelRepresentation = 1
+        ds.PixelData = (np.arange(rows * columns, dtype=np.int16).reshape(rows, columns) + z).tobytes()
+        ds.save_as(os.path.join(series_dir, f"{ds.SOPInstanceUID}.dcm"), write_like_original=False)
+    return series_dir
 
 
 class TestConvert(unittest.TestCase):
@@ -69,5 +121,165 @@ class TestConvert(unittest.TestCase):
         pass
 
 
+class TestNativeDicomSeg(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.series_dir = create_series(os.path.join(self.tmp_dir, "series"))
+
+        self.mask = np.zeros((6, 16, 12), dtype=np.uint8)
+        self.mask[1, 2:5, 3:9] = 1
+        self.mask[3, 7:15, 1:4] = 1
+        self.mask[4, 0:3, 0:2] = 2
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _read(self, seg_file):
+        dcm = pydicom.dcmread(seg_file)
+        result = pydicom_seg.MultiClassReader().read(dcm)
+        return dcm, SimpleITK.GetArrayFromImage(result.image)
+
+    def test_header_index_sorted_and_cached(self):
+        index = get_series_header_index(self.series_dir)
+        z = [float(d.ImagePositionPatient[2]) for d in index.datasets]
+        assert z == sorted(z)
+        assert get_series_header_index(self.series_dir) is index
+
+        # new file in the directory invalidates the cached index
+        create_series(os.path.join(self.tmp_dir, "other"), slices=1)
+        src = os.listdir(os.path.join(self.tmp_dir, "other"))[0]
+        shutil.copy(os.path.join(self.tmp_dir, "other", src), os.path.join(self.series_dir, "extra.dcm"))
+        assert get_series_header_index(self.series_dir) is not index
+
+    def test_native_writer_roundtrip(self):
+        result = nifti_to_dicom_seg(self.series_dir, self.mask, {"label_name": "nninter_pred", "nninter_elapsed": 1})
+        dcm, decoded = self._read(result)
+        os.unlink(result)
+
+        # only non-empty frames are written (segment-major)
+        assert dcm.NumberOfFrames == 3
+        assert [f.FrameContentSequence[0].DimensionIndexValues for f in dcm.PerFrameFunctionalGroupsSequence] == [
+            [1, 2],
+            [1, 4],
+            [2, 5],
+        ]
+
+        index = get_series_header_index(self.series_dir)
+        refs = [
+            f.DerivationImageSequence[0].SourceImageSequence[0].ReferencedSOPInstanceUID
+            for f in dcm.PerFrameFunctionalGroupsSequence
+        ]
+        assert refs == [index.sop_instance_uids[i] for i in (1, 3, 4)]
+        assert dcm.StudyInstanceUID == index.reference.StudyInstanceUID
+        assert dcm.SeriesDescription == "nninter_synthetic"
+        # reader reconstructs the slab spanned by the stored frames
+        np.testing.assert_array_equal(decoded, self.mask[1:5])
+
+    def test_native_writer_odd_frame_size(self):
+        series_dir = create_series(os.path.join(self.tmp_dir, "odd"), slices=3, rows=5, columns=7)
+        mask = np.zeros((3, 5, 7), dtype=np.uint8)
+        mask[0, 1:4, 2:6] = 1
+        mask[2, 0, :] = 1
+
+        template = {
+            "segmentAttributes": [
+                [
+                    {
+                        "labelID": 1,
+                        "SegmentLabel": "a",
+                        "SegmentAlgorithmType": "AUTOMATIC",
+                        "SegmentAlgorithmName": "test",
+                        "SegmentedPropertyCategoryCodeSequence": {
+                            "CodeValue": "123037004",
+                            "CodingSchemeDesignator": "SCT",
+                            "CodeMeaning": "Anatomical Structure",
+                        },
+                        "SegmentedPropertyTypeCodeSequence": {
+                            "CodeValue": "78961009",
+                            "CodingSchemeDesignator": "SCT",
+                            "CodeMeaning": "a",
+                        },
+                    }
+                ]
+            ]
+        }
+        result = native_image_to_dicom_seg(mask, get_series_header_index(series_dir), template)
+        dcm, decoded = self._read(result)
+        os.unlink(result)
+
+        assert dcm.NumberOfFrames == 2
+        assert len(dcm.PixelData) % 2 == 0
+        np.testing.assert_array_equal(decoded, mask)
+
+    def test_native_writer_shape_mismatch(self):
+        with self.assertRaises(ValueError):
+            nifti_to_dicom_seg(self.series_dir, self.mask[:-1], {})
+
+    def _series_image(self):
+        reader = SimpleITK.ImageSeriesReader()
+        reader.SetFileNames(reader.GetGDCMSeriesFileNames(self.series_dir))
+        return reader.Execute()
+
+    def test_header_index_geometry(self):
+        image = self._series_image()
+        size, origin, spacing, direction = get_series_header_index(self.series_dir).geometry()
+        assert size == image.GetSize()
+        np.testing.assert_allclose(origin, image.GetOrigin())
+        np.testing.assert_allclose(spacing, image.GetSpacing())
+        np.testing.assert_allclose(direction, image.GetDirection())
+
+    def test_label_to_series_grid(self):
+        index = get_series_header_index(self.series_dir)
+        label = SimpleITK.GetImageFromArray(self.mask)
+        label.CopyInformation(self._series_image())
+        np.testing.assert_array_equal(label_to_series_grid(label, index), self.mask)
+
+        # label of a (z, y, x) flipped series: resampled back onto the source grid, not mapped row by row
+        flipped = SimpleITK.Flip(label, [True, True, True])
+        assert not np.array_equal(SimpleITK.GetArrayFromImage(flipped), self.mask)
+        np.testing.assert_array_equal(label_to_series_grid(flipped, index), self.mask)
+
+        # label on a coarser (in-plane) grid
+        coarse = SimpleITK.Image([6, 8, 6], SimpleITK.sitkUInt8)
+        coarse.SetOrigin(label.GetOrigin())
+        coarse.SetSpacing([1.6, 1.6, 2.5])
+        coarse.SetDirection(label.GetDirection())
+        coarse[1, 2, 3] = 1
+        resampled = label_to_series_grid(coarse, index)
+        assert resampled.shape == self.mask.shape
+        assert resampled[3, 4, 2] == 1 and resampled.sum() == 4
+
+        file_label = os.path.join(self.tmp_dir, "flipped.nii.gz")
+        SimpleITK.WriteImage(flipped, file_label)
+        result = nifti_to_dicom_seg(self.series_dir, file_label, {})
+        _, decoded = self._read(result)
+        os.unlink(result)
+        np.testing.assert_array_equal(decoded, self.mask[1:5])
+
+    @unittest.skipIf(shutil.which("itkimage2segimage") is None, "dcmqi (itkimage2segimage) is not installed")
+    def test_native_writer_matches_dcmqi(self):
+        reader = SimpleITK.ImageSeriesReader()
+        reader.SetFileNames(reader.GetGDCMSeriesFileNames(self.series_dir))
+        label = SimpleITK.GetImageFromArray(self.mask)
+        label.CopyInformation(reader.Execute())
+        label_file = os.path.join(self.tmp_dir, "label.nii.gz")
+        SimpleITK.WriteImage(label, label_file)
+
+        native = nifti_to_dicom_seg(self.series_dir, label_file, {})
+        dcmqi = nifti_to_dicom_seg(self.series_dir, label_file, {}, use_native=False)
+        native_dcm, native_np = self._read(native)
+        dcmqi_dcm, dcmqi_np = self._read(dcmqi)
+        os.unlink(native)
+        os.unlink(dcmqi)
+
+        assert native_dcm.NumberOfFrames == dcmqi_dcm.NumberOfFrames
+        for a, b in zip(native_dcm.PerFrameFunctionalGroupsSequence, dcmqi_dcm.PerFrameFunctionalGroupsSequence):
+            assert (
+                a.DerivationImageSequence[0].SourceImageSequence[0].ReferencedSOPInstanceUID
+                == b.DerivationImageSequence[0].SourceImageSequence[0].ReferencedSOPInstanceUID
+            )
+        np.testing.assert_array_equal(native_np, dcmqi_np)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,82 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import glob
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import SimpleITK as sitk
+from pydicom.filereader import dcmread
+from pydicom.uid import RLELossless
+
+from monailabel.datastore.utils import decode
+from monailabel.datastore.utils.decode import can_decode, read_dicom_series
+from tests.benchmarks.e2e.synthetic import write_series
+
+
+def serial(files):
+    return read_dicom_series(files, workers=0)
+
+
+class TestReadDicomSeries(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def series(self, transfer_syntax="rle", modality="CT", slices=16, rescale=None):
+        series_dir = tempfile.mkdtemp(dir=self.tmp.name)
+        write_series(series_dir, slices, 48, modality=modality, transfer_syntax=transfer_syntax)
+        if rescale:
+            for file in glob.glob(f"{series_dir}/*"):
+                ds = dcmread(file)
+                ds.RescaleSlope, ds.RescaleIntercept = rescale
+                ds.save_as(file)
+        return sitk.ImageSeriesReader.GetGDCMSeriesFileNames(series_dir)
+
+    def assertSameImage(self, expected, actual):
+        self.assertEqual(expected.GetPixelID(), actual.GetPixelID())
+        self.assertEqual(expected.GetSize(), actual.GetSize())
+        np.testing.assert_allclose(expected.GetSpacing(), actual.GetSpacing())
+        np.testing.assert_allclose(expected.GetOrigin(), actual.GetOrigin())
+        np.testing.assert_allclose(expected.GetDirection(), actual.GetDirection())
+        np.testing.assert_array_equal(sitk.GetArrayFromImage(expected), sitk.GetArrayFromImage(actual))
+
+    def test_rle_parallel_matches_serial(self):
+        self.assertTrue(can_decode(RLELossless))
+        for modality, rescale in (("CT", None), ("MR", None), ("MR", (1, -1024)), ("MR", (0.5, 3.25))):
+            with self.subTest(modality=modality, rescale=rescale):
+                files = self.series(modality=modality, rescale=rescale)
+                with patch.object(decode, "_read_serial", wraps=decode._read_serial) as read_serial:
+                    img = read_dicom_series(files, workers=2)
+                read_serial.assert_not_called()
+                self.assertSameImage(serial(files), img)
+
+    def test_serial_path(self):
+        files = self.series("explicit")
+        self.assertFalse(decode._parallel(files, dcmread(files[0], stop_before_pixels=True), 2))  # not compressed
+        self.assertSameImage(serial(files), read_dicom_series(files, workers=2))
+
+        files = self.series(slices=4)
+        self.assertFalse(decode._parallel(files, dcmread(files[0], stop_before_pixels=True), 2))  # too few slices
+
+    def test_fallback_on_failure(self):
+        files = self.series()
+        with patch.object(decode, "_read_parallel", side_effect=RuntimeError("no handler")):
+            img = read_dicom_series(files, workers=2)
+        self.assertSameImage(serial(files), img)
+
+
+if __name__ == "__main__":
+    unittest.main()
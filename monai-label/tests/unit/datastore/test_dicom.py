@@ -46,6 +46,89 @@ class MockDICOMwebClient(DICOMwebClient):
         return Instance()
 
 
+def seg_json(study, series, referenced=None):
+    ds = {
+        "0020000D": {"vr": "UI", "Value": [study]},
+        "0020000E": {"vr": "UI", "Value": [series]},
+        "00080060": {"vr": "CS", "Value": ["SEG"]},
+    }
+    if referenced:
+        ds["00081115"] = {"vr": "SQ", "Value": [{"0020000E": {"vr": "UI", "Value": [referenced]}}]}
+    return ds
+
+
+class MockSegClient:
+    def __init__(self, segs, include_references=True):
+        self.segs = segs  # seg series => (study, referenced series)
+        self.include_references = include_references
+        self.search_calls = 0
+        self.metadata_calls = []
+
+    def search_for_series(self, search_filters=None, fields=None, **kwargs):
+        self.search_calls += 1
+        include = self.include_references and fields and "ReferencedSeriesSequence" in fields
+        return [seg_json(study, uid, ref if include else None) for uid, (study, ref) in self.segs.items()]
+
+    def retrieve_series_metadata(self, study_id, series_id):
+        self.metadata_calls.append(series_id)
+        study, ref = self.segs[series_id]
+        return [seg_json(study, series_id, ref)]
+
+
+class TestDICOMwebSegIndex(unittest.TestCase):
+    def test_refresh_from_qido(self):
+        from monailabel.datastore.utils.dicom import DICOMwebSegIndex
+
+        client = MockSegClient({f"seg{i}": ("study", f"img{i}") for i in range(5)})
+        with tempfile.TemporaryDirectory() as d:
+            index = DICOMwebSegIndex(client, os.path.join(d, "index.json"), max_workers=2)
+            assert index.refresh() == 5
+            assert sorted(index.labels()) == [(f"seg{i}", f"img{i}") for i in range(5)]
+            assert client.metadata_calls == []
+
+    def test_incremental_refresh(self):
+        from monailabel.datastore.utils.dicom import DICOMwebSegIndex
+
+        client = MockSegClient({f"seg{i}": ("study", f"img{i}") for i in range(5)}, include_references=False)
+        client.segs["orphan"] = ("study", None)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "index.json")
+            index = DICOMwebSegIndex(client, path, max_workers=3)
+            assert index.refresh() == 6
+            assert sorted(client.metadata_calls) == sorted(client.segs.keys())
+            assert ("orphan", "") in index.labels()
+
+            # only new series are resolved; removed ones are dropped
+            client.metadata_calls.clear()
+            client.segs.pop("seg0")
+            client.segs["seg9"] = ("study", "img9")
+            assert index.refresh() == 2
+            assert client.metadata_calls == ["seg9"]
+
+            # persisted; a new instance doesn't resolve anything again
+            client.metadata_calls.clear()
+            index = DICOMwebSegIndex(client, path)
+            assert index.refresh() == 0
+            assert client.metadata_calls == []
+            assert ("seg9", "img9") in index.labels()
+            assert "seg0" not in dict(index.labels())
+
+    def test_refresh_interval(self):
+        from monailabel.datastore.utils.dicom import DICOMwebSegIndex
+
+        client = MockSegClient({"seg0": ("study", "img0")})
+        with tempfile.TemporaryDirectory() as d:
+            index = DICOMwebSegIndex(client, os.path.join(d, "index.json"), refresh_interval=3600)
+            index.refresh()
+            index.refresh()
+            assert client.search_calls == 1
+
+            index.add("seg1", "study", "img1")
+            assert ("seg1", "img1") in index.labels()
+            index.refresh(force=True)
+            assert client.search_calls == 2
+
+
 class TestDicom(unittest.TestCase):
     base_dir = os.path.realpath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
     local_dataset = os.path.join(base_dir, "data", "dataset", "local", "spleen")
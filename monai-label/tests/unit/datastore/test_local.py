@@ -0,0 +1,134 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from parameterized import parameterized
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileMovedEvent
+
+from monailabel.datastore.local import LocalDatastore
+from monailabel.datastore.local_sqlite import SQLiteLocalDatastore
+from monailabel.interfaces.datastore import DefaultLabelTag
+
+BACKENDS = [("json", LocalDatastore), ("sqlite", SQLiteLocalDatastore)]
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x")
+
+
+class TestLocalDatastoreAutoReload(unittest.TestCase):
+    def setUp(self):
+        self.datastore_path = tempfile.mkdtemp()
+        touch(os.path.join(self.datastore_path, "image_0.nii.gz"))
+
+    def tearDown(self):
+        shutil.rmtree(self.datastore_path, ignore_errors=True)
+
+    def _datastore(self, cls):
+        ds = cls(self.datastore_path, auto_reload=True, auto_reload_debounce=60, full_scan_interval=0)
+        ds._observer.stop()  # events are fed explicitly below
+        return ds
+
+    def _path(self, *p):
+        return os.path.join(self.datastore_path, *p)
+
+    @parameterized.expand(BACKENDS)
+    def test_batched_events(self, _, cls):
+        ds = self._datastore(cls)
+
+        created = []
+        for i in range(1, 4):
+            touch(self._path(f"image_{i}.nii.gz"))
+            created.append(FileCreatedEvent(self._path(f"image_{i}.nii.gz")))
+        touch(self._path("labels", "final", "image_1.nii.gz"))
+        os.remove(self._path("image_0.nii.gz"))
+
+        with patch.object(cls, "_reconcile_datastore") as reconcile:
+            # label event arrives before its image; duplicates and unrelated files are coalesced/ignored
+            ds._on_any_event(FileCreatedEvent(self._path("labels", "final", "image_1.nii.gz")))
+            for e in created + created:
+                ds._on_any_event(e)
+            ds._on_any_event(FileDeletedEvent(self._path("image_0.nii.gz")))
+            ds._on_any_event(FileCreatedEvent(self._path("notes.txt")))
+
+            assert ds.status()["auto_reload"]["pending_events"] == 6
+            ds._events_timer.cancel()
+            ds._flush_events()
+            reconcile.assert_not_called()
+
+        assert sorted(ds.list_images()) == ["image_1", "image_2", "image_3"]
+        assert ds.get_labeled_images() == ["image_1"]
+
+        stats = ds.status()["auto_reload"]
+        assert stats["pending_events"] == 0
+        assert stats["events"] == 6
+        assert stats["batches"] == 1
+        assert stats["last_event_lag"] >= 0
+
+    @parameterized.expand(BACKENDS)
+    def test_moved_and_deleted_labels(self, _, cls):
+        touch(self._path("labels", "final", "image_0.nii.gz"))
+        ds = self._datastore(cls)
+        assert ds.get_labeled_images() == ["image_0"]
+
+        src = self._path("labels", "final", "image_0.nii.gz")
+        dest = self._path("labels", "review", "image_0.nii.gz")
+        os.makedirs(os.path.dirname(dest))
+        shutil.move(src, dest)
+        ds._on_any_event(FileMovedEvent(src, dest))
+        ds._events_timer.cancel()
+        ds._flush_events()
+
+        assert ds.get_labels_by_image_id("image_0") == {"review": "image_0"}
+        assert ds.get_labeled_images() == []
+
+        os.remove(dest)
+        ds._on_any_event(FileDeletedEvent(dest))
+        ds._events_timer.cancel()
+        ds._flush_events()
+        assert ds.get_labels_by_image_id("image_0") == {}
+
+    @parameterized.expand(BACKENDS)
+    def test_full_scan(self, _, cls):
+        ds = cls(self.datastore_path, auto_reload=True, auto_reload_debounce=60, full_scan_interval=0.1)
+        ds._observer.stop()
+
+        touch(self._path("labels", DefaultLabelTag.FINAL, "image_0.nii.gz"))
+        for _ in range(100):
+            if ds.get_labeled_images():
+                break
+            time.sleep(0.1)
+
+        stats = ds.status()["auto_reload"]
+        assert stats["scans"] >= 1
+        assert stats["last_scan_duration"] >= 0
+        assert ds.get_labeled_images() == ["image_0"]
+
+        ds.close()
+        assert not ds._scanner.is_alive()
+        ds._on_any_event(FileCreatedEvent(self._path("image_1.nii.gz")))
+        assert ds._events_timer is None  # no new batch once closed
+
+    def test_no_auto_reload_status(self):
+        ds = LocalDatastore(self.datastore_path)
+        assert "auto_reload" not in ds.status()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from monailabel.datastore.local import LocalDatastore
+from monailabel.datastore.local_sqlite import SQLiteLocalDatastore
+from monailabel.interfaces.datastore import DefaultLabelTag
+from monailabel.interfaces.exception import ImageNotFoundException
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x")
+
+
+class TestSQLiteLocalDatastore(unittest.TestCase):
+    def setUp(self):
+        self.datastore_path = tempfile.mkdtemp()
+        for i in range(4):
+            touch(os.path.join(self.datastore_path, f"image_{i}.nii.gz"))
+        for i in range(2):
+            touch(os.path.join(self.datastore_path, "labels", "final", f"image_{i}.nii.gz"))
+
+    def tearDown(self):
+        shutil.rmtree(self.datastore_path, ignore_errors=True)
+
+    def test_reconcile(self):
+        ds = SQLiteLocalDatastore(self.datastore_path)
+
+        assert sorted(ds.list_images()) == [f"image_{i}" for i in range(4)]
+        assert sorted(ds.get_labeled_images()) == ["image_0", "image_1"]
+        assert sorted(ds.get_unlabeled_images()) == ["image_2", "image_3"]
+        assert ds.get_labels_by_image_id("image_0") == {DefaultLabelTag.FINAL: "image_0"}
+        assert ds.status() == {"total": 4, "completed": 2, "label_tags": {DefaultLabelTag.FINAL: 2}}
+
+        os.remove(os.path.join(self.datastore_path, "image_0.nii.gz"))
+        touch(os.path.join(self.datastore_path, "labels", "final", "image_3.nii.gz"))
+        ds.refresh()
+
+        assert sorted(ds.list_images()) == ["image_1", "image_2", "image_3"]
+        assert sorted(ds.get_labeled_images()) == ["image_1", "image_3"]
+        assert ds.get_labels_by_image_id("image_0") == {}
+
+    def test_add_save_update(self):
+        ds = SQLiteLocalDatastore(self.datastore_path)
+
+        src = os.path.join(tempfile.mkdtemp(), "new.nii.gz")
+        touch(src)
+        image_id = ds.add_image("", src, {"foo": 1})
+        assert image_id == "new"
+        assert ds.get_image_uri(image_id) == os.path.realpath(os.path.join(self.datastore_path, "new.nii.gz"))
+        assert ds.get_image_info(image_id)["foo"] == 1
+
+        label_id = ds.save_label(image_id, src, DefaultLabelTag.FINAL, {"bar": 2})
+        assert label_id == image_id
+        assert os.path.exists(ds.get_label_uri(label_id, DefaultLabelTag.FINAL))
+        assert image_id in ds.get_labeled_images()
+        assert {"image": ds.get_image_uri(image_id), "label": ds.get_label_uri(label_id, "final")} in ds.datalist()
+
+        ds.update_image_info(image_id, {"foo": 3})
+        ds.update_label_info(label_id, DefaultLabelTag.FINAL, {"baz": 4})
+        assert ds.get_image_info(image_id)["foo"] == 3
+        assert ds.get_label_info(label_id, DefaultLabelTag.FINAL)["bar"] == 2
+        assert ds.get_label_info(label_id, DefaultLabelTag.FINAL)["baz"] == 4
+
+        with self.assertRaises(ImageNotFoundException):
+            ds.save_label("missing", src, DefaultLabelTag.FINAL, {})
+
+        ds.remove_image(image_id)
+        assert image_id not in ds.list_images()
+        assert ds.get_label_uri(label_id, DefaultLabelTag.FINAL) == ""
+
+        # a second instance (e.g. another worker) sees the same index
+        ds.set_name("renamed")
+        other = SQLiteLocalDatastore(self.datastore_path, read_only=True)
+        assert other.name() == "renamed"
+        assert other.list_images() == ds.list_images()
+
+    def test_migrate_from_json(self):
+        json_ds = LocalDatastore(self.datastore_path)
+        json_ds.set_description("migrated")
+        json_ds.update_label_info("image_1", DefaultLabelTag.FINAL, {"user": "x"})
+
+        ds = SQLiteLocalDatastore(self.datastore_path, read_only=True)
+        assert ds.description() == "migrated"
+        assert ds.json() == json_ds.json()
+        assert ds.get_label_info("image_1", DefaultLabelTag.FINAL)["user"] == "x"
+
+        # one time only; later changes to the json index are not imported again
+        json_ds.set_description("changed")
+        ds = SQLiteLocalDatastore(self.datastore_path, read_only=True)
+        assert ds.description() == "migrated"
+
+
+if __name__ == "__main__":
+    unittest.main()
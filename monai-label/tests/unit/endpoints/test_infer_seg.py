@@ -0,0 +1,184 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from copy import deepcopy
+
+import numpy as np
+from pydicom.dataset import Dataset
+from pydicom.sequence import Sequence
+from pydicom.uid import generate_uid
+
+from monailabel.endpoints.infer import read_seg_file, save_combined_segmentation
+
+
+def legacy_read_seg_file(seg):
+    num_frames = seg.NumberOfFrames
+    rows = seg.Rows
+    columns = seg.Columns
+    num_segments = len(seg.SegmentSequence)
+    pixel_array = np.unpackbits(np.frombuffer(seg.PixelData, dtype=np.uint8)).reshape(num_frames, rows, columns)
+    referenced_instance_uids = [
+        item.ReferencedSOPInstanceUID for item in seg.ReferencedSeriesSequence[0].ReferencedInstanceSequence
+    ]
+    frames_per_segment = num_frames // num_segments
+    reduced_pixel_array = []
+    filtered_frames = []
+    total_frame_count = 0
+    for i in range(num_segments):
+        segment_frames = pixel_array[i * frames_per_segment : (i + 1) * frames_per_segment]
+        for slice_index, frame in enumerate(segment_frames):
+            if np.any(frame > 0):
+                reduced_pixel_array.append(frame)
+                if len(segment_frames) == len(referenced_instance_uids):
+                    filtered_frames.append(
+                        (i + 1, len(segment_frames) - slice_index, referenced_instance_uids[slice_index])
+                    )
+                else:
+                    filtered_frames.append(
+                        (
+                            i + 1,
+                            len(segment_frames) - slice_index,
+                            seg.PerFrameFunctionalGroupsSequence[total_frame_count]
+                            .DerivationImageSequence[0]
+                            .SourceImageSequence[0]
+                            .ReferencedSOPInstanceUID,
+                        )
+                    )
+                total_frame_count += 1
+    return np.stack(reduced_pixel_array), filtered_frames, seg
+
+
+def legacy_save_combined_segmentation(combined_pixel_array, all_segments, combined_frames, metadata_source):
+    combined_segmentation = metadata_source
+    combined_segmentation.NumberOfFrames = combined_pixel_array.shape[0]
+    combined_segmentation.SegmentSequence = all_segments
+    combined_segmentation.SeriesInstanceUID = generate_uid()
+    new_per_frame_sequence = []
+    for segment_index, slice_index, sop_instance_uid in combined_frames:
+        frame = deepcopy(combined_segmentation.PerFrameFunctionalGroupsSequence[0])
+        frame.FrameContentSequence[0].DimensionIndexValues = [segment_index, slice_index]
+        frame.SegmentIdentificationSequence[0].ReferencedSegmentNumber = segment_index
+        frame.DerivationImageSequence[0].SourceImageSequence[0].ReferencedSOPInstanceUID = sop_instance_uid
+        new_per_frame_sequence.append(frame)
+    combined_segmentation.PerFrameFunctionalGroupsSequence = new_per_frame_sequence
+    packed_pixel_data = np.packbits(combined_pixel_array.astype(np.uint8), axis=-1)
+    combined_segmentation.PixelData = packed_pixel_data.tobytes()
+    return combined_segmentation
+
+
+def create_seg(num_segments=3, slices=4, rows=8, columns=6, num_refs=None, seed=0):
+    rng = np.random.default_rng(seed)
+    num_frames = num_segments * slices
+    pixels = (rng.random((num_frames, rows, columns)) > 0.7).astype(np.uint8)
+    pixels[rng.random(num_frames) > 0.5] = 0  # empty frames
+
+    seg = Dataset()
+    seg.NumberOfFrames = num_frames
+    seg.Rows = rows
+    seg.Columns = columns
+    seg.SegmentSequence = Sequence()
+    for i in range(num_segments):
+        s = Dataset()
+        s.SegmentNumber = i + 1
+        s.SegmentLabel = f"segment_{i + 1}"
+        seg.SegmentSequence.append(s)
+
+    refs = [generate_uid() for _ in range(slices if num_refs is None else num_refs)]
+    series = Dataset()
+    series.SeriesInstanceUID = generate_uid()
+    series.ReferencedInstanceSequence = Sequence()
+    for uid in refs:
+        instance = Dataset()
+        instance.ReferencedSOPInstanceUID = uid
+        series.ReferencedInstanceSequence.append(instance)
+    seg.ReferencedSeriesSequence = Sequence([series])
+
+    seg.PerFrameFunctionalGroupsSequence = Sequence()
+    for f in range(num_frames):
+        source = Dataset()
+        source.ReferencedSOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+        source.ReferencedSOPInstanceUID = generate_uid()
+        derivation = Dataset()
+        derivation.SourceImageSequence = Sequence([source])
+        content = Dataset()
+        content.DimensionIndexValues = [f // slices + 1, f % slices + 1]
+        segment_id = Dataset()
+        segment_id.ReferencedSegmentNumber = f // slices + 1
+        position = Dataset()
+        position.ImagePositionPatient = [0.0, 0.0, float(f)]
+        item = Dataset()
+        item.DerivationImageSequence = Sequence([derivation])
+        item.FrameContentSequence = Sequence([content])
+        item.SegmentIdentificationSequence = Sequence([segment_id])
+        item.PlanePositionSequence = Sequence([position])
+        seg.PerFrameFunctionalGroupsSequence.append(item)
+
+    seg.PixelData = np.packbits(pixels.reshape(-1)).tobytes()
+    return seg
+
+
+class TestSegMerge(unittest.TestCase):
+    def _assert_read_equal(self, seg):
+        expected_pixels, expected_frames, _ = legacy_read_seg_file(seg)
+        pixels, frames, _ = read_seg_file(seg)
+
+        assert frames == expected_frames
+        np.testing.assert_array_equal(pixels, expected_pixels)
+
+    def test_read_seg_file_referenced_instances(self):
+        self._assert_read_equal(create_seg())
+
+    def test_read_seg_file_per_frame_references(self):
+        self._assert_read_equal(create_seg(num_refs=2, seed=1))
+
+    def test_read_seg_file_unaligned_frames(self):
+        self._assert_read_equal(create_seg(num_segments=2, slices=4, rows=5, columns=7, seed=2))
+
+    def test_read_seg_file_empty(self):
+        seg = create_seg()
+        seg.PixelData = bytes(len(seg.PixelData))
+        pixels, frames, _ = read_seg_file(seg)
+        assert frames == []
+        assert pixels.shape == (0, seg.Rows, seg.Columns)
+
+    def test_save_combined_segmentation(self):
+        seg_a = create_seg(seed=3)
+        seg_b = create_seg(num_segments=2, seed=4)
+        pixels_a, frames_a, _ = read_seg_file(seg_a)
+        pixels_b, frames_b, _ = read_seg_file(seg_b)
+
+        combined_pixels = np.concatenate([pixels_a, pixels_b])
+        combined_frames = frames_a + [(s + len(seg_a.SegmentSequence), z, uid) for s, z, uid in frames_b]
+        all_segments = Sequence(list(seg_a.SegmentSequence) + list(seg_b.SegmentSequence))
+
+        expected = legacy_save_combined_segmentation(combined_pixels, all_segments, combined_frames, deepcopy(seg_a))
+        result = save_combined_segmentation(
+            combined_pixels, all_segments, combined_frames, deepcopy(seg_a), chunk_size=3
+        )
+
+        assert result.NumberOfFrames == expected.NumberOfFrames
+        assert result.PixelData == expected.PixelData
+        assert len(result.PerFrameFunctionalGroupsSequence) == len(expected.PerFrameFunctionalGroupsSequence)
+        for a, b in zip(result.PerFrameFunctionalGroupsSequence, expected.PerFrameFunctionalGroupsSequence):
+            assert a == b
+
+        # per-frame values are independent (no aliasing through the shared template)
+        frames = result.PerFrameFunctionalGroupsSequence
+        uids = [f.DerivationImageSequence[0].SourceImageSequence[0].ReferencedSOPInstanceUID for f in frames]
+        assert uids == [uid for _, _, uid in combined_frames]
+
+        segments = [f.SegmentIdentificationSequence[0].ReferencedSegmentNumber for f in frames]
+        assert segments == [s for s, _, _ in combined_frames]
+
+
+if __name__ == "__main__":
+    unittest.main()
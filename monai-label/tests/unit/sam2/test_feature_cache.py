@@ -0,0 +1,146 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+
+import numpy as np
+import SimpleITK as sitk
+import torch
+from parameterized import parameterized
+
+from sam2.build_sam import build_sam2_video_predictor
+from sam2.utils.feature_cache import FeatureCache, SpeculativeEncoder, features_nbytes
+
+
+def features(nbytes=400):
+    x = torch.zeros(nbytes // 4)
+    return {"backbone_fpn": [x], "vision_features": x, "vision_pos_enc": [torch.zeros(1000)]}
+
+
+class FakePredictor:
+    def __init__(self, gate=None):
+        self.calls = []
+        self.gate = gate
+
+    def _compute_image_feature(self, inference_state, frame_idx, backbone_out=None):
+        if self.gate is not None:
+            self.gate.wait()
+        self.calls.append(frame_idx)
+        return None, features()
+
+
+class TestFeatureCache(unittest.TestCase):
+    def test_nbytes(self):
+        assert features_nbytes(features(400)) == 400
+
+    def test_lru_budget(self):
+        cache = FeatureCache(1200)
+        for i in range(3):
+            assert cache.put(i, features())
+        assert cache.get(0) is not None  # 0 becomes the most recently used
+        assert cache.put(3, features())
+        assert list(cache.entries) == [2, 0, 3]
+        assert cache.nbytes == 1200
+        assert not cache.put(4, features(2000))  # larger than the budget
+
+    def test_speculative(self):
+        cache = FeatureCache(1000)
+        assert cache.put(0, features())
+        assert cache.put(1, features(), speculative=True)
+        assert not cache.put(2, features(), speculative=True)  # never evicts
+        assert cache.get(1) is not None and cache.get(1) is not None
+        assert cache.get(5) is None
+
+        stats = cache.stats()
+        assert stats["speculated"] == 1 and stats["speculative_hits"] == 1
+        assert stats["hits"] == 2 and stats["misses"] == 1
+        assert stats["hit_rate"] == round(2 / 3, 4) and stats["speculative_hit_rate"] == 1.0
+
+
+class TestSpeculativeEncoder(unittest.TestCase):
+    @parameterized.expand(
+        [
+            [None, 5, [6, 4, 7, 3]],
+            [4, 5, [6, 7, 4]],
+            [6, 5, [4, 3, 6]],
+            [1, 0, [1]],
+            [None, 9, [8, 7]],
+        ]
+    )
+    def test_frames(self, last_frame, frame_idx, expected):
+        encoder = SpeculativeEncoder(1 << 20, num_slices=2)
+        encoder.feature_cache("volume")
+        encoder.last_frame = last_frame
+        assert encoder.frames(frame_idx, 10) == expected
+
+    def test_schedule(self):
+        encoder = SpeculativeEncoder(1 << 20, num_slices=2)
+        cache = encoder.feature_cache("volume")
+        cache.put(6, features())
+        predictor = FakePredictor()
+        encoder.schedule(predictor, {"num_frames": 10, "device": "cpu"}, 5)
+        encoder.wait()
+        assert predictor.calls == [4, 7, 3]
+        assert cache.stats()["speculated"] == 3
+
+        # a new volume drops the features of the previous one
+        assert encoder.feature_cache("other") is not cache
+        assert encoder.last_frame is None
+
+    def test_cancel(self):
+        gate = threading.Event()
+        encoder = SpeculativeEncoder(1 << 20, num_slices=4)
+        cache = encoder.feature_cache("volume")
+        predictor = FakePredictor(gate)
+        encoder.schedule(predictor, {"num_frames": 100, "device": "cpu"}, 50)
+        encoder._cancel.set()
+        gate.set()
+        encoder.cancel()
+        # at most the slice in progress is finished
+        assert len(predictor.calls) <= 1 and len(cache) == len(predictor.calls)
+        assert encoder._thread is None
+
+
+class TestPredictorFeatureCache(unittest.TestCase):
+    def test_cached_features(self):
+        torch.manual_seed(0)
+        predictor = build_sam2_video_predictor(
+            "configs/sam2.1/sam2.1_hiera_t512.yaml", device="cpu", hydra_overrides_extra=["++model.image_size=128"]
+        )
+        img = sitk.GetImageFromArray(np.random.default_rng(0).normal(0, 100, (12, 64, 64)).astype(np.int16))
+        points, labels = np.array([[32, 32]], dtype=np.float32), np.array([1], np.int32)
+
+        def click(state, frame_idx):
+            return predictor.add_new_points_or_box(state, frame_idx=frame_idx, obj_id=1, points=points, labels=labels)
+
+        encoder = SpeculativeEncoder(1 << 30)
+        cache = encoder.feature_cache("volume")
+        with torch.inference_mode():
+            expected = click(predictor.init_state(video_path=img), 6)[2]
+
+            state = predictor.init_state(video_path=img, feature_cache=cache)
+            click(state, 5)
+            encoder.schedule(predictor, state, 5)
+            encoder.wait()
+            assert 6 in cache
+
+            # the next request on the neighbouring slice uses the speculative features
+            state = predictor.init_state(video_path=img, feature_cache=cache)
+            torch.testing.assert_close(click(state, 6)[2], expected, rtol=0, atol=0)
+
+        stats = cache.stats()
+        assert stats["speculative_hits"] == 1
+        assert stats["hits"] == 2  # frame 0 (warm up) and 6
+
+
+if __name__ == "__main__":
+    unittest.main()
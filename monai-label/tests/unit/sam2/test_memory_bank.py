@@ -0,0 +1,127 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import torch
+
+from sam2.modeling.memory_bank import MemoryBank
+from sam2.sam2_video_predictor import SAM2VideoPredictor
+from sam2.sam2_video_predictor_npz import SAM2VideoPredictorNPZ
+
+NUM_MASKMEM = 7
+B, C, H, W = 2, 8, 4, 4
+
+
+def concat(t_pos_and_prevs, maskmem_tpos_enc, extra_memory, extra_pos):
+    """memories as concatenated by `_prepare_memory_conditioned_features` without a memory bank"""
+    memory, memory_pos = [], []
+    for t_pos, prev in t_pos_and_prevs:
+        memory.append(prev["maskmem_features"].flatten(2).permute(2, 0, 1))
+        maskmem_enc = prev["maskmem_pos_enc"][-1].flatten(2).permute(2, 0, 1)
+        memory_pos.append(maskmem_enc + maskmem_tpos_enc[NUM_MASKMEM - t_pos - 1])
+    return torch.cat(memory + extra_memory), torch.cat(memory_pos + extra_pos)
+
+
+class TestMemoryBank(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.tpos = torch.randn(NUM_MASKMEM, 1, 1, C)
+        self.pos_enc = [torch.randn(1, C, H, W).expand(B, -1, -1, -1)]
+        self.outputs = {}
+
+    def out(self, frame_idx):
+        if frame_idx not in self.outputs:
+            self.outputs[frame_idx] = {
+                "maskmem_features": torch.randn(B, C, H, W).to(torch.bfloat16),
+                "maskmem_pos_enc": [x.expand(B, -1, -1, -1) for x in self.pos_enc],
+            }
+        return self.outputs[frame_idx]
+
+    def check(self, bank, frame_idx, cond_frames, num_ptrs=3):
+        t_pos_and_prevs = [(0, self.out(c)) for c in cond_frames]
+        t_pos_and_prevs += [(t_pos, self.out(frame_idx - NUM_MASKMEM + t_pos)) for t_pos in range(1, NUM_MASKMEM)]
+        extra_memory = [torch.randn(num_ptrs, B, C)]
+        extra_pos = [torch.randn(num_ptrs, B, C)]
+
+        expected = concat(t_pos_and_prevs, self.tpos, extra_memory, extra_pos)
+        actual = bank.assemble(t_pos_and_prevs, self.tpos, extra_memory, extra_pos, 16, torch.device("cpu"))
+        for a, e in zip(actual, expected):
+            assert a.dtype == e.dtype
+            assert a.is_contiguous()
+            assert torch.equal(a, e)
+        return actual
+
+    def test_sliding_window(self):
+        bank = MemoryBank(NUM_MASKMEM - 1)
+        memory, _ = self.check(bank, 100, [50])
+        storage = memory.untyped_storage().data_ptr()
+
+        # slides through several compactions of the window
+        for frame_idx in range(101, 130):
+            memory, memory_pos = self.check(bank, frame_idx, [50], num_ptrs=frame_idx % 5)
+            assert memory.untyped_storage().data_ptr() == storage
+
+    def test_rebuild(self):
+        bank = MemoryBank(NUM_MASKMEM - 1)
+        self.check(bank, 10, [0])
+        self.check(bank, 11, [0])
+        self.check(bank, 11, [0])  # same frame again
+        self.check(bank, 40, [0])  # jump
+
+        # an updated memory for a frame in the window
+        del self.outputs[38]
+        self.check(bank, 41, [0])
+
+    def test_reallocate(self):
+        bank = MemoryBank(NUM_MASKMEM - 1)
+        memory, _ = self.check(bank, 10, [0])
+        storage = memory.untyped_storage().data_ptr()
+
+        memory, _ = self.check(bank, 11, [0, 30])  # another conditioning frame
+        self.check(bank, 12, [0, 30], num_ptrs=20)  # more object pointers than reserved
+        assert memory.untyped_storage().data_ptr() != storage
+
+        for out in self.outputs.values():
+            out["maskmem_features"] = out["maskmem_features"].float()
+        self.check(bank, 13, [0, 30])
+
+
+class TestResetDropsMemoryBank(unittest.TestCase):
+    @staticmethod
+    def _state():
+        def output_dict():
+            return {"cond_frame_outputs": {0: {}}, "non_cond_frame_outputs": {1: {}}, "memory_bank": MemoryBank(6)}
+
+        return {
+            "point_inputs_per_obj": {0: {}},
+            "mask_inputs_per_obj": {0: {}},
+            "output_dict_per_obj": {0: output_dict(), 1: output_dict()},
+            "temp_output_dict_per_obj": {0: {"cond_frame_outputs": {}, "non_cond_frame_outputs": {}}},
+            "frames_tracked_per_obj": {0: {}},
+            "output_dict": output_dict(),
+            "consolidated_frame_inds": {"cond_frame_outputs": set(), "non_cond_frame_outputs": set()},
+            "frames_already_tracked": {},
+        }
+
+    def test_reset(self):
+        for cls in (SAM2VideoPredictor, SAM2VideoPredictorNPZ):
+            state = self._state()
+            cls._reset_tracking_results(None, state)
+            for v in state["output_dict_per_obj"].values():
+                assert "memory_bank" not in v
+                assert not v["cond_frame_outputs"] and not v["non_cond_frame_outputs"]
+            if cls is SAM2VideoPredictorNPZ:
+                assert "memory_bank" not in state["output_dict"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import SimpleITK as sitk
+import torch
+from parameterized import parameterized
+
+from sam2.utils.misc import (
+    AsyncMedicalSliceLoader,
+    ResampledSlices,
+    _live_loaders,
+    _percentiles,
+    _volume_stats,
+    load_medical_slices,
+)
+from tests.benchmarks.bench_load_medical_slices import legacy_load_medical_slices, synthetic_ct
+
+
+class TestLoadMedicalSlices(unittest.TestCase):
+    cpu = torch.device("cpu")
+
+    def test_parity(self):
+        img = synthetic_ct(size=64, slices=6)
+        expected, h, w = legacy_load_medical_slices(img, 96, True, self.cpu)
+        images, video_height, video_width = load_medical_slices(img, 96, True, self.cpu)
+
+        assert (video_height, video_width) == (h, w) == (64, 64)
+        assert images.shape == expected.shape == (6, 3, 96, 96)
+        torch.testing.assert_close(images, expected, rtol=1e-5, atol=1e-5)
+
+    def test_parity_window(self):
+        img = synthetic_ct(size=32, slices=4)
+        expected, _, _ = legacy_load_medical_slices(img, 48, True, self.cpu, clip_low=-160, clip_high=240)
+        images, _, _ = load_medical_slices(img, 48, True, self.cpu, clip_low=-160, clip_high=240)
+        torch.testing.assert_close(images, expected, rtol=1e-5, atol=1e-5)
+
+    def test_lazy_channels(self):
+        images, _, _ = load_medical_slices(synthetic_ct(size=32, slices=4), 48, True, self.cpu)
+
+        # a single channel is resident; the 3 channels are a view
+        assert images.stride(1) == 0
+        assert images.untyped_storage().nbytes() == 4 * 48 * 48 * 4
+        torch.testing.assert_close(images[2, 0], images[2, 2])
+
+    def test_float16(self):
+        img = synthetic_ct(size=32, slices=4)
+        expected, _, _ = load_medical_slices(img, 48, True, self.cpu)
+        images, _, _ = load_medical_slices(img, 48, True, self.cpu, dtype=torch.float16)
+
+        assert images.dtype == torch.float16
+        assert images.untyped_storage().nbytes() == 4 * 48 * 48 * 2
+        torch.testing.assert_close(images[1].float(), expected[1], rtol=1e-2, atol=1e-2)
+
+    def test_percentiles(self):
+        rng = np.random.default_rng(0)
+        q = (0.5, 99.5)
+
+        ints = rng.integers(-1024, 3000, size=(7, 33, 31)).astype(np.int16)
+        np.testing.assert_allclose(_percentiles(ints, q, chunk_size=1000), np.percentile(ints, q))
+
+        floats = rng.normal(size=(40, 64, 64)).astype(np.float32)
+        np.testing.assert_allclose(_percentiles(floats, q), np.percentile(floats, q))
+        np.testing.assert_allclose(_percentiles(floats, q, max_samples=10000), np.percentile(floats, q), atol=0.1)
+
+
+def sitk_resample(img, image_size):
+    new_size = [image_size, image_size, img.GetSize()[2]]
+    reference = sitk.Image(new_size, img.GetPixelIDValue())
+    reference.SetOrigin(img.GetOrigin())
+    reference.SetDirection(img.GetDirection())
+    reference.SetSpacing([sz * spc / nsz for nsz, sz, spc in zip(new_size, img.GetSize(), img.GetSpacing())])
+    return sitk.GetArrayFromImage(sitk.Resample(img, reference))
+
+
+class TestResampledSlices(unittest.TestCase):
+    cpu = torch.device("cpu")
+
+    def _identity(self, volume, image_size, **kwargs):
+        # no clipping / normalization; raw resized intensities
+        inf = float("inf")
+        return ResampledSlices(volume, image_size, -inf, inf, 0, 1, self.cpu, self.cpu, **kwargs)
+
+    @parameterized.expand([("upsample", 97), ("downsample", 23), ("same", 40)])
+    def test_parity_with_sitk(self, _, image_size):
+        rng = np.random.default_rng(1)
+        for dtype, atol in ((np.float32, 1e-3), (np.int16, 1)):
+            volume = rng.normal(0, 300, (5, 40, 33)).astype(dtype)
+            img = sitk.GetImageFromArray(volume)
+            img.SetSpacing((0.7, 0.9, 2.0))
+
+            expected = sitk_resample(img, image_size)
+            slices = self._identity(volume, image_size, chunk_size=2)
+            actual = torch.stack([slices[i][0] for i in range(len(slices))]).numpy()
+            np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=atol)
+
+    def test_load_medical_slices_torch(self):
+        img = synthetic_ct(size=64, slices=9)
+        expected, _, _ = load_medical_slices(img, 96, True, self.cpu)
+        images, h, w = load_medical_slices(img, 96, True, self.cpu, resample="torch")
+
+        assert isinstance(images, ResampledSlices)
+        assert (len(images), h, w) == (9, 64, 64)
+        assert images[4].shape == (3, 96, 96)
+        # stats come from the volume at its original resolution
+        for i in (0, 4, 8):
+            torch.testing.assert_close(images[i], expected[i], rtol=0, atol=0.05)
+
+    def test_lazy_chunks(self):
+        slices = self._identity(np.zeros((10, 8, 8), dtype=np.int16), 16, chunk_size=4)
+        assert slices.chunks == {}
+
+        slices[0]
+        slices[-1]
+        assert sorted(slices.chunks) == [0, 2]
+        assert slices[9].stride(0) == 0
+
+    def test_cpu_fallback(self):
+        slices = self._identity(np.ones((4, 8, 8), dtype=np.float32), 16)
+        slices.compute_device = torch.device("cuda")
+
+        original = ResampledSlices._process
+
+        def _process(self, raw, device):
+            if device.type != "cpu":
+                raise RuntimeError("CUDA out of memory")
+            return original(self, raw, device)
+
+        with patch.object(ResampledSlices, "_process", _process), self.assertWarns(UserWarning):
+            frame = slices[1]
+        assert slices.compute_device.type == "cpu"
+        assert frame.device.type == "cpu"
+
+
+class TestAsyncMedicalSliceLoader(unittest.TestCase):
+    cpu = torch.device("cpu")
+
+    def test_volume_stats(self):
+        volume = np.random.default_rng(0).integers(-1024, 2000, size=(6, 20, 20)).astype(np.int16)
+        low, high, mean, std = _volume_stats(volume)  # histogram
+        expected = _volume_stats(volume.astype(np.float64), low, high)  # per chunk
+        np.testing.assert_allclose((low, high, mean, std), expected)
+
+        clipped = torch.from_numpy(np.clip(volume.astype(np.float64), low, high))
+        np.testing.assert_allclose((mean, std), (clipped.mean().item(), clipped.std().item()))
+
+    def test_loads_all_slices(self):
+        img = synthetic_ct(size=32, slices=40)
+        expected, _, _ = load_medical_slices(img, 48, True, self.cpu, resample="torch")
+        images, _, _ = load_medical_slices(img, 48, True, self.cpu, async_loading_frames=True)
+
+        assert isinstance(images, AsyncMedicalSliceLoader)
+        assert 0 in images.chunks
+        torch.testing.assert_close(images[25], expected[25])
+
+        images.thread.join(timeout=60)
+        assert len(images.chunks) == images.num_chunks
+        assert images not in _live_loaders  # nothing left to stop at exit
+        for i in range(len(images)):
+            torch.testing.assert_close(images[i], expected[i])
+
+    def test_order_outward_from_prompt(self):
+        volume = np.zeros((10 * 4, 8, 8), dtype=np.int16)
+        with patch("sam2.utils.misc.Thread"):
+            loader = AsyncMedicalSliceLoader(volume, 16, 0, 1, 0, 1, self.cpu, self.cpu, chunk_size=4)
+
+        order = []
+        loader[22]  # prompted slice => chunk 5
+        while (k := loader._next_chunk()) is not None:
+            order.append(k)
+            loader.load_chunk(k)
+        assert order == [6, 4, 7, 3, 8, 2, 9, 1]
+
+    def test_exception(self):
+        volume = np.zeros((8, 8, 8), dtype=np.int16)
+        original = ResampledSlices._process
+
+        def _process(self, raw, device):
+            if len(self.chunks):
+                raise ValueError("broken slice")
+            return original(self, raw, device)
+
+        with patch.object(ResampledSlices, "_process", _process):
+            loader = AsyncMedicalSliceLoader(volume, 16, 0, 1, 0, 1, self.cpu, self.cpu, chunk_size=2)
+            loader.thread.join(timeout=60)
+
+        with self.assertRaises(RuntimeError):
+            loader[0]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+import torch
+from monai.utils import optional_import
+from parameterized import parameterized
+
+from sam2.build_sam import build_sam2
+from sam2.utils.onnx_utils import (
+    ImageEncoderExport,
+    OnnxImageEncoder,
+    PromptDecoderExport,
+    check_parity,
+    export_image_encoder,
+    export_prompt_decoder,
+)
+
+_, has_onnx = optional_import("onnx")
+_, has_ort = optional_import("onnxruntime")
+
+
+class TestOnnxUtils(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(0)
+        cls.model = build_sam2(
+            "configs/sam2.1/sam2.1_hiera_t512.yaml",
+            device="cpu",
+            hydra_overrides_extra=["++model.image_size=128"],
+            apply_postprocessing=False,
+        )
+        cls.image = torch.randn(1, 3, 128, 128)
+        cls.tmp = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_image_encoder_export_module(self):
+        with torch.no_grad():
+            outputs = ImageEncoderExport(self.model)(self.image)
+            expected = self.model.forward_image(self.image)
+        assert len(outputs) == 2 * len(expected["backbone_fpn"])
+        for a, b in zip(outputs, expected["backbone_fpn"] + expected["vision_pos_enc"]):
+            torch.testing.assert_close(a, b)
+
+    def test_prompt_decoder_export_module(self):
+        model = self.model
+        with torch.no_grad():
+            fpn = model.forward_image(self.image)["backbone_fpn"]
+            coords = torch.tensor([[[40.0, 60.0], [80.0, 30.0]]])
+            labels = torch.tensor([[1, 0]], dtype=torch.int32)
+            _, ious, _, object_score_logits = PromptDecoderExport(model)(fpn[-1], fpn[0], fpn[1], coords, labels)
+            expected = model._forward_sam_heads(
+                fpn[-1], point_inputs={"point_coords": coords, "point_labels": labels}, high_res_features=fpn[:2]
+            )
+        torch.testing.assert_close(ious, expected[2])
+        torch.testing.assert_close(object_score_logits, expected[6])
+
+    @unittest.skipUnless(has_onnx and has_ort, "requires onnx and onnxruntime")
+    def test_image_encoder_parity(self):
+        path = export_image_encoder(self.model, os.path.join(self.tmp.name, "image_encoder.onnx"))
+        for name, diff in check_parity(self.model, encoder_path=path).items():
+            assert diff < 1e-3, f"{name}: {diff}"
+
+        # dynamic batch
+        image = torch.randn(2, 3, 128, 128)
+        backbone_out = OnnxImageEncoder(path)(image)
+        with torch.no_grad():
+            expected = self.model.forward_image(image)
+        for a, b in zip(backbone_out["backbone_fpn"], expected["backbone_fpn"]):
+            torch.testing.assert_close(a, b, rtol=1e-3, atol=1e-3)
+        torch.testing.assert_close(backbone_out["vision_features"], expected["vision_features"], rtol=1e-3, atol=1e-3)
+
+    @parameterized.expand([[False], [True]])
+    @unittest.skipUnless(has_onnx and has_ort, "requires onnx and onnxruntime")
+    def test_prompt_decoder_parity(self, multimask_output):
+        path = os.path.join(self.tmp.name, f"prompt_decoder_{multimask_output}.onnx")
+        export_prompt_decoder(self.model, path, multimask_output=multimask_output)
+        diffs = check_parity(self.model, decoder_path=path, num_points=(1, 4, 9))
+        assert len(diffs) == 3 * 4
+        for name, diff in diffs.items():
+            assert diff < 1e-3, f"{name}: {diff}"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+import SimpleITK as sitk
+import torch
+
+from sam2.build_sam import build_sam2_video_predictor
+from sam2.modeling.position_encoding import (
+    POS_ENC_CACHE,
+    PositionEmbeddingRandom,
+    PositionEmbeddingSine,
+    PositionEncodingCache,
+    cached_axial_cis,
+    compute_axial_cis,
+)
+
+
+class TestPositionEncodingCache(unittest.TestCase):
+    def test_keys(self):
+        cache = PositionEncodingCache()
+        compute = lambda device: torch.arange(6.0, device=device).view(2, 3)  # noqa: E731
+        a = cache.get("t", (2, 3), "cpu", torch.float32, compute)
+        assert cache.get("t", (2, 3), "cpu", torch.float32, compute) is a
+        b = cache.get("t", (2, 3), "cpu", torch.bfloat16, compute)
+        assert b.dtype == torch.bfloat16
+        cache.get("t", (3, 2), "cpu", torch.float32, compute)
+        assert (cache.misses, cache.hits) == (3, 1)
+
+        cache.clear()
+        assert not cache.tables and cache.misses == 0
+
+    def test_context_independent(self):
+        cache = PositionEncodingCache()
+        with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16):
+            table = cache.get("t", (4, 4), "cpu", torch.float32, lambda d: torch.ones(4, 4, device=d) @ torch.eye(4))
+        assert not table.is_inference()
+        assert table.dtype == torch.float32
+
+    def test_sine(self):
+        pe = PositionEmbeddingSine(64, warmup_cache=False)
+        x = torch.zeros(2, 8, 6, 5)
+        pos = pe(x)
+        assert pos.shape == (2, 64, 6, 5) and pos.dtype == torch.float32
+        torch.testing.assert_close(pos[1], pe._compute_pe("cpu", 6, 5))
+        # same (cached) storage for every call and batch element
+        assert pe(x[:1]).data_ptr() == pos.data_ptr() == pos[1].data_ptr()
+        assert pe(x, dtype=torch.bfloat16).dtype == torch.bfloat16
+
+    def test_random_invalidated_on_load(self):
+        pe = PositionEmbeddingRandom(16)
+        a = pe((4, 4))
+        assert pe((4, 4)) is a
+        pe.load_state_dict({"positional_encoding_gaussian_matrix": torch.randn(2, 16)})
+        b = pe((4, 4))
+        assert b is not a
+        torch.testing.assert_close(b, pe._grid_pe((4, 4)))
+
+        # repeated reloads (e.g. residency offload / restore) keep one table per size
+        pe((8, 8))
+        for _ in range(5):
+            pe.load_state_dict({"positional_encoding_gaussian_matrix": torch.randn(2, 16)})
+            pe((4, 4))
+        assert len(pe.cache.tables) == 1
+
+    def test_axial_cis(self):
+        expected = compute_axial_cis(32, 4, 4)
+        torch.testing.assert_close(cached_axial_cis(32, 4, 4, device="cpu"), expected)
+        torch.testing.assert_close(cached_axial_cis(32, 4, 4, repeat=3, device="cpu"), expected.repeat(3, 1))
+
+
+class TestSteadyStatePropagation(unittest.TestCase):
+    def test_no_recomputation(self):
+        torch.manual_seed(0)
+        predictor = build_sam2_video_predictor(
+            "configs/sam2.1/sam2.1_hiera_t512.yaml", device="cpu", hydra_overrides_extra=["++model.image_size=128"]
+        )
+        vol = np.random.default_rng(0).normal(0, 100, (24, 64, 64)).astype(np.int16)
+        img = sitk.GetImageFromArray(vol)
+        dense_pe_cache = predictor.sam_prompt_encoder.pe_layer.cache
+
+        with torch.inference_mode():
+            state = predictor.init_state(video_path=img)
+            points = np.array([[32, 32]], dtype=np.float32)
+            predictor.add_new_points_or_box(state, frame_idx=0, obj_id=1, points=points, labels=np.array([1], np.int32))
+            # fill the memory window
+            for _ in predictor.propagate_in_video(state, max_frame_num_to_track=12):
+                pass
+
+            misses = POS_ENC_CACHE.misses, dense_pe_cache.misses
+            hits = POS_ENC_CACHE.hits
+            for _ in predictor.propagate_in_video(state, start_frame_idx=12):
+                pass
+
+        assert (POS_ENC_CACHE.misses, dense_pe_cache.misses) == misses
+        assert POS_ENC_CACHE.hits > hits
+
+
+if __name__ == "__main__":
+    unittest.main()
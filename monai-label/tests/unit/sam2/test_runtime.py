@@ -0,0 +1,76 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import unittest
+from unittest.mock import patch
+
+import torch
+from torch import nn
+
+from sam2.utils.runtime import autocast, get_device, quantize_dynamic_int8, set_num_threads
+
+
+class TinySAM2(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.image_encoder = nn.Module()
+        self.image_encoder.trunk = nn.Sequential(nn.Linear(16, 32), nn.GELU(), nn.Linear(32, 16))
+        self.image_encoder.neck = nn.Linear(16, 16)
+        self.memory_attention = nn.Sequential(nn.Linear(16, 16))
+        self.sam_mask_decoder = nn.Sequential(nn.Linear(16, 8))
+
+    def forward(self, x):
+        x = self.image_encoder.neck(self.image_encoder.trunk(x))
+        return self.sam_mask_decoder(self.memory_attention(x))
+
+
+class TestRuntime(unittest.TestCase):
+    def test_quantize_dynamic_int8(self):
+        torch.manual_seed(0)
+        model = TinySAM2().eval()
+        x = torch.randn(4, 16)
+        expected = model(x)
+
+        quantize_dynamic_int8(model)
+        quantized = torch.ao.nn.quantized.dynamic.Linear
+        assert isinstance(model.image_encoder.trunk[0], quantized)
+        assert isinstance(model.memory_attention[0], quantized)
+        assert isinstance(model.sam_mask_decoder[0], quantized)
+        assert type(model.image_encoder.neck) is nn.Linear  # not selected
+
+        torch.testing.assert_close(model(x), expected, rtol=0.05, atol=0.05)
+
+    def test_autocast(self):
+        assert isinstance(autocast("cpu", enabled=False), contextlib.nullcontext)
+        assert autocast("cuda").fast_dtype == torch.bfloat16
+
+        with patch("sam2.utils.runtime.cpu_supports_bf16", return_value=True):
+            with autocast("cpu"):
+                assert torch.mm(torch.ones(2, 2), torch.ones(2, 2)).dtype == torch.bfloat16
+        with patch("sam2.utils.runtime.cpu_supports_bf16", return_value=False):
+            assert isinstance(autocast("cpu"), contextlib.nullcontext)
+
+    def test_device_and_threads(self):
+        assert get_device("cpu") == torch.device("cpu")
+        with patch("torch.cuda.is_available", return_value=False):
+            assert get_device("") == torch.device("cpu")
+
+        threads = torch.get_num_threads()
+        try:
+            assert set_num_threads(0) == threads
+            assert set_num_threads(2) == 2
+        finally:
+            torch.set_num_threads(threads)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import torch
+from parameterized import parameterized
+
+from sam2.modeling.sam2_base import SAM2Base
+from sam2.sam2_video_predictor_npz import SAM2VideoPredictorNPZ
+
+
+class FakeTensor:
+    """stands in for a frame output tensor; only tracks its device"""
+
+    def __init__(self, device="cuda"):
+        self.device = torch.device(device)
+
+    def to(self, device):
+        return FakeTensor(device)
+
+
+def _model(cls=SAM2Base, num_maskmem=7, max_obj_ptrs=16, stride=1):
+    model = cls.__new__(cls)
+    torch.nn.Module.__init__(model)
+    model.num_maskmem = num_maskmem
+    model.memory_temporal_stride_for_eval = stride
+    model.use_obj_ptrs_in_encoder = True
+    model.max_obj_ptrs_in_encoder = max_obj_ptrs
+    return model.eval()
+
+
+def _out():
+    return {"maskmem_features": FakeTensor(), "pred_masks": FakeTensor(), "obj_ptr": FakeTensor()}
+
+
+def propagate(model, output_dict, frames, num_frames, reverse, streaming):
+    """mimics `propagate_in_video`; returns the memory frames found for each tracked frame"""
+    reads, peak = {}, (0, 0)
+    non_cond = output_dict["non_cond_frame_outputs"]
+    for f in frames:
+        if f not in output_dict["cond_frame_outputs"]:
+            maskmem_frames, ptr_frames = model._memory_frame_indices(f, num_frames, reverse)
+            maskmem = [t for _, t in maskmem_frames if t in non_cond]
+            for t in maskmem:
+                assert non_cond[t]["maskmem_features"].device.type == "cuda"
+            reads[f] = (maskmem, [t for _, t in ptr_frames if t in non_cond])
+            non_cond[f] = _out()
+
+        if streaming:
+            model._release_memory_outside_window(output_dict, f, num_frames, reverse, evict=streaming == "evict")
+        on_device = sum(out["pred_masks"].device.type == "cuda" for out in non_cond.values())
+        peak = (max(peak[0], len(non_cond)), max(peak[1], on_device))
+    return reads, peak
+
+
+class TestStreamingPropagation(unittest.TestCase):
+    @parameterized.expand([("stride_1", 1), ("stride_3", 3)])
+    def test_same_memory_frames(self, _, stride):
+        model = _model(stride=stride)
+        num_frames, cond = 200, 40
+
+        results = {}
+        for streaming in (None, "evict", "offload"):
+            output_dict = {"cond_frame_outputs": {cond: _out()}, "non_cond_frame_outputs": {}}
+            forward = propagate(model, output_dict, range(cond, num_frames), num_frames, False, streaming)
+            backward = propagate(model, output_dict, range(cond, -1, -1), num_frames, True, streaming)
+            results[streaming] = forward, backward
+
+        # the memory attention sees exactly the same frames with or without streaming
+        for streaming in ("evict", "offload"):
+            for (reads, _), (expected, _) in zip(results[streaming], results[None]):
+                assert reads == expected
+
+        horizon = max(stride * model.num_maskmem, model.max_obj_ptrs_in_encoder)
+        # frames kept around the conditioning frame + the object pointer window
+        max_resident = 2 * horizon + model.max_obj_ptrs_in_encoder
+        for _, (resident, on_device) in results["evict"]:
+            assert resident <= max_resident
+            assert on_device <= 2 * horizon + stride * model.num_maskmem
+        for _, (resident, on_device) in results["offload"]:
+            assert on_device <= 2 * horizon + stride * model.num_maskmem
+        assert results[None][0][1][0] == num_frames - cond - 1
+
+    def test_release_tiers(self):
+        model = _model(num_maskmem=3, max_obj_ptrs=6)
+        output_dict = {"cond_frame_outputs": {0: _out()}, "non_cond_frame_outputs": {}}
+        output_dict["non_cond_frame_outputs"] = {t: _out() for t in range(1, 31)}
+
+        offloaded, evicted = model._release_memory_outside_window(output_dict, 30, 100, keep={12})
+        # next frame (31) reads 29, 30 as memory and 26..30 as object pointers; 1..6 are near the prompt
+        assert offloaded == [26, 27, 28]
+        assert evicted == [t for t in range(7, 26) if t != 12]
+        assert sorted(output_dict["non_cond_frame_outputs"]) == list(range(1, 7)) + [12] + list(range(26, 31))
+        assert output_dict["non_cond_frame_outputs"][28]["pred_masks"].device.type == "cpu"
+        assert output_dict["non_cond_frame_outputs"][29]["pred_masks"].device.type == "cuda"
+
+    def test_npz_per_object_slices(self):
+        predictor = _model(SAM2VideoPredictorNPZ, num_maskmem=3, max_obj_ptrs=4)
+        non_cond = {}
+        for t in range(20):
+            non_cond[t] = {
+                "maskmem_features": torch.zeros(2, 4),
+                "maskmem_pos_enc": None,
+                "pred_masks": torch.zeros(2, 1, 4, 4),
+                "obj_ptr": torch.zeros(2, 8),
+                "object_score_logits": torch.zeros(2, 1),
+            }
+        inference_state = {
+            "num_frames": 50,
+            "output_dict": {"cond_frame_outputs": {}, "non_cond_frame_outputs": non_cond},
+            "output_dict_per_obj": {i: {"cond_frame_outputs": {}, "non_cond_frame_outputs": {}} for i in range(2)},
+            "consolidated_frame_inds": {"cond_frame_outputs": set(), "non_cond_frame_outputs": {3}},
+        }
+        for t, out in non_cond.items():
+            predictor._add_output_per_object(inference_state, t, out, "non_cond_frame_outputs")
+
+        predictor._release_non_cond_outputs(inference_state, 19, reverse=False, evict=True)
+        expected = [3, 17, 18, 19]
+        assert sorted(non_cond) == expected
+        for obj_output_dict in inference_state["output_dict_per_obj"].values():
+            assert sorted(obj_output_dict["non_cond_frame_outputs"]) == expected
+
+    def test_invalid_mode(self):
+        predictor = _model(SAM2VideoPredictorNPZ)
+        with self.assertRaises(ValueError):
+            next(predictor.propagate_in_video({}, streaming="drop"))
+
+
+if __name__ == "__main__":
+    unittest.main()
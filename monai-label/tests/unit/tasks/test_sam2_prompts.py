@@ -0,0 +1,84 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+import torch
+
+from monailabel.tasks.infer.sam2_prompts import group_prompts, label_map, prompt_slices, prompt_type, slice_prompts
+
+
+class TestSAM2Prompts(unittest.TestCase):
+    def test_group_single(self):
+        data = {"pos_points": [[1, 2, 3]], "neg_points": [], "pos_boxes": []}
+        assert group_prompts(data) == {1: {"pos_points": [[1, 2, 3]], "neg_points": [], "pos_boxes": []}}
+
+    def test_group_segments(self):
+        data = {
+            "pos_points": [[1, 2, 3]],
+            "segments": {
+                "3": {"pos_points": [[5, 5, 1]]},
+                "2": {"pos_points": [[7, 7, 2]], "neg_points": [[8, 8, 2]]},
+            },
+        }
+        grouped = group_prompts(data)
+        assert list(grouped) == [2, 3]
+        assert grouped[3] == {"pos_points": [[5, 5, 1]], "neg_points": [], "pos_boxes": []}
+
+        with self.assertRaises(ValueError):
+            group_prompts({"segments": {"0": {"pos_points": [[1, 1, 1]]}}})
+
+    def test_prompt_type(self):
+        assert prompt_type({"pos_points": [[1, 2, 3]], "neg_points": [], "texts": [""]}) == "points"
+        assert prompt_type({"pos_boxes": [[[1, 1, 0], [5, 5, 0]]], "neg_points": [[1, 2, 3]]}) == "points+boxes"
+        assert prompt_type({"segments": {"2": {"pos_boxes": [[[1, 1, 0], [5, 5, 0]]]}}}) == "boxes"
+        assert prompt_type({"nninter": "init", "pos_points": [[1, 2, 3]]}) == "init"
+        assert prompt_type({"nninter": "undo"}) == "undo"
+        assert prompt_type({"nninter": "points", "pos_scribbles": [[[1, 2, 3]]]}) == "scribbles"
+        assert prompt_type({}) == "none"
+
+    def test_slices(self):
+        prompts = {"pos_points": [[1, 2, 4], [3, 4, 4], [1, 1, 9]], "neg_points": [[5, 5, 6]], "pos_boxes": []}
+        np.testing.assert_array_equal(prompt_slices(prompts), [4, 9])
+
+        prompts["pos_boxes"] = [[[0, 0, 2], [10, 10, 2]]]
+        np.testing.assert_array_equal(prompt_slices(prompts), [2, 4, 6, 9])
+
+        points, labels, boxes = slice_prompts(prompts, 4)
+        np.testing.assert_array_equal(points, [[1, 2], [3, 4]])
+        np.testing.assert_array_equal(labels, [1, 1])
+        assert len(boxes) == 0
+
+        points, labels, boxes = slice_prompts(prompts, 6)
+        np.testing.assert_array_equal(points, [[5, 5]])
+        np.testing.assert_array_equal(labels, [0])
+
+        points, labels, boxes = slice_prompts(prompts, 2)
+        assert len(points) == len(labels) == 0
+        np.testing.assert_array_equal(boxes, [[0, 0, 10, 10]])
+
+    def test_label_map(self):
+        logits = torch.full((3, 1, 2, 3), -1.0)
+        logits[0, 0, 0, :2] = 1.0
+        logits[1, 0, 0, 1:] = 2.0  # overlaps object 0 at (0, 1) with a higher score
+        logits[2, 0, 1, 2] = 0.5
+
+        expected = [[4, 7, 7], [0, 0, 9]]
+        np.testing.assert_array_equal(label_map([4, 7, 9], logits), expected)
+
+        # single object: same as thresholding the logits
+        single = label_map([1], logits[:1])
+        np.testing.assert_array_equal(single, (logits[0, 0] > 0).numpy().astype(int))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import torch
+from monai.data import MetaTensor
+
+from monailabel.transform.cache import CacheTransformDatad, TransformCache
+
+MB = 1024 * 1024
+
+
+def volume(value=1.0, size=64):
+    return np.full((size, size, size), value, dtype=np.float32)  # 1 MB
+
+
+class TestTransformCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_budget(self):
+        entry = MB + 32  # a volume and a small label
+        cache = TransformCache(max_bytes=2 * entry, path=self.tmp.name, disk_max_bytes=3 * entry, spill_bytes=MB)
+        for i in range(8):
+            cache.put(f"k{i}", {"image": volume(i), "label": np.zeros(4)}, ttl=60)
+            stats = cache.stats()
+            self.assertLessEqual(stats["memory"]["bytes"], 2 * entry)
+            self.assertLessEqual(stats["disk"]["bytes"], 3 * entry)
+
+        self.assertEqual(list(cache.memory), ["k6", "k7"])
+        self.assertEqual(list(cache.disk), ["k3", "k4", "k5"])
+        self.assertEqual(len(os.listdir(self.tmp.name)), 3)  # only the large arrays, one file each
+        self.assertIsNone(cache.get("k2"))
+
+        cache.get("k6")  # least recently used is k7 now
+        cache.put("k8", {"image": volume(8), "label": np.zeros(4)}, ttl=60)
+        self.assertEqual(list(cache.memory), ["k6", "k8"])
+        self.assertEqual(list(cache.disk), ["k4", "k5", "k7"])
+
+    def test_mmap_hit(self):
+        cache = TransformCache(max_bytes=0, path=self.tmp.name, disk_max_bytes=8 * MB, spill_bytes=MB)
+        image = MetaTensor(torch.from_numpy(volume(3.0)), meta={"filename_or_obj": "a.nii.gz"})
+        data = {"image": image, "array": volume(2.0), "spacing": np.ones(3), "model": "m"}
+        cache.put("k", data, ttl=60, in_memory=False)
+
+        d = cache.get("k")
+        self.assertIsInstance(d["image"], MetaTensor)
+        self.assertEqual(d["image"].meta["filename_or_obj"], "a.nii.gz")
+        self.assertTrue(torch.equal(d["image"].as_tensor(), image.as_tensor()))
+        np.testing.assert_array_equal(d["array"], volume(2.0))
+        self.assertEqual(d["model"], "m")
+
+        # mapped from the file, not copied; writes only change the pages of this result
+        self.assertIsInstance(d["array"], np.memmap)
+        self.assertFalse(d["array"].flags.owndata)
+        d["array"][0] = 7
+        d["image"][0] = 7
+        d["image"].meta["filename_or_obj"] = "b.nii.gz"
+        again = cache.get("k")
+        np.testing.assert_array_equal(again["array"], volume(2.0))
+        self.assertTrue(torch.equal(again["image"].as_tensor(), image.as_tensor()))
+        self.assertEqual(again["image"].meta["filename_or_obj"], "a.nii.gz")
+
+    def test_expiry(self):
+        cache = TransformCache(max_bytes=2 * MB, path=self.tmp.name, disk_max_bytes=2 * MB, spill_bytes=MB)
+        cache.put("memory", volume(), ttl=0)
+        cache.put("disk", volume(), ttl=0, in_memory=False)
+        time.sleep(0.01)
+        self.assertIsNone(cache.get("memory"))
+        self.assertIsNone(cache.get("disk"))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+
+class TestCacheTransformDatad(unittest.TestCase):
+    def test_save_load(self):
+        for in_memory in (True, False):
+            t = CacheTransformDatad(keys="image", hash_key=("image_path", "model"), in_memory=in_memory)
+            data = {"image_path": f"/tmp/{in_memory}.nii.gz", "model": "m", "image": torch.from_numpy(volume(5.0))}
+            t(data)
+            loaded = t.load({"image_path": data["image_path"], "model": "m"})
+            self.assertTrue(torch.equal(loaded["image"], data["image"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from monailabel.utils.others.helper import TimeoutError, timeout_context
+
+
+def busy(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+def run_in_thread(seconds):
+    result = []
+
+    def work():
+        try:
+            with timeout_context(1):
+                busy(seconds)
+            result.append("done")
+        except TimeoutError:
+            result.append("timeout")
+        busy(1.2)  # nothing is raised after the block
+        result.append("after")
+
+    t = threading.Thread(target=work)
+    t.start()
+    t.join()
+    return result
+
+
+class TestTimeoutContext(unittest.TestCase):
+    def test_worker_thread(self):
+        self.assertEqual(run_in_thread(0.1), ["done", "after"])
+        self.assertEqual(run_in_thread(3), ["timeout", "after"])
+
+    def test_main_thread(self):
+        with timeout_context(1):
+            busy(0.1)
+        with self.assertRaises(TimeoutError):
+            with timeout_context(1):
+                busy(3)
+
+
+if __name__ == "__main__":
+    unittest.main()
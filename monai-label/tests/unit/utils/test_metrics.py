@@ -0,0 +1,102 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import time
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from monailabel.endpoints import metrics
+from monailabel.utils.others.metrics import (
+    INFER_STAGE_SECONDS,
+    REGISTRY,
+    TRANSFER_BYTES,
+    MetricsRegistry,
+    count_bytes,
+    count_cache,
+    timer,
+)
+from monailabel.utils.others.stream import _as_read_chunks, _gzip_stream
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        REGISTRY.clear()
+
+    def test_histogram_buckets(self):
+        registry = MetricsRegistry()
+        h = registry.histogram("stage_seconds", "test", ("stage",), buckets=(0.01, 0.05, 0.2))
+        for seconds in (0.0, 0.02, 0.02, 0.1):
+            with h.time(stage="sleep"):
+                time.sleep(seconds)
+
+        result = h.get(stage="sleep")
+        # sleep takes at least the requested time, and not 10 ms more here
+        assert list(result["buckets"].values()) == [1, 3, 4, 4]
+        assert list(result["buckets"]) == [0.01, 0.05, 0.2, math.inf]
+        assert result["count"] == 4 and 0.14 <= result["sum"] < 0.3
+        assert h.get(stage="other")["count"] == 0
+
+    def test_bucket_bounds_inclusive(self):
+        h = MetricsRegistry().histogram("h", "test", buckets=(1, 2))
+        for value in (1, 2, 3):
+            h.observe(value)
+        assert list(h.get()["buckets"].values()) == [1, 2, 3]
+
+    def test_timer_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with timer("init_state", model="sam2", prompt="points"):
+                raise RuntimeError()
+        assert INFER_STAGE_SECONDS.get(stage="init_state", model="sam2", prompt="points")["count"] == 1
+
+    def test_labels(self):
+        with self.assertRaises(ValueError):
+            INFER_STAGE_SECONDS.observe(1.0, stage="x")
+        with self.assertRaises(ValueError):
+            REGISTRY.counter("monailabel_infer_stage_seconds", "not a histogram")
+        assert REGISTRY.counter("monailabel_transfer_bytes_total", "same", ("direction", "source")) is TRANSFER_BYTES
+
+    def test_render(self):
+        with timer("read_series", model="nninteractive", prompt="points+boxes"):
+            pass
+        count_bytes("in", "dicom_series", 1024)
+        count_cache("sam2_features", hits=3, misses=1)
+
+        text = REGISTRY.render()
+        assert "# TYPE monailabel_infer_stage_seconds histogram" in text
+        prefix = 'monailabel_infer_stage_seconds_bucket{stage="read_series",model="nninteractive",prompt="points+boxes"'
+        assert f'{prefix},le="0.005"}} 1' in text
+        assert f'{prefix},le="+Inf"}} 1' in text
+        assert 'monailabel_transfer_bytes_total{direction="in",source="dicom_series"} 1024' in text
+        assert 'monailabel_cache_lookups_total{cache="sam2_features",result="hit"} 3' in text
+        assert 'monailabel_cache_lookups_total{cache="sam2_features",result="miss"} 1' in text
+
+    def test_gzip_stream(self):
+        payload = bytes(range(256)) * 1000
+        sent = sum(len(b) for b in _gzip_stream(_as_read_chunks(payload, 4096), source="seg"))
+        assert TRANSFER_BYTES.value(direction="out", source="seg") == sent < len(payload)
+        assert INFER_STAGE_SECONDS.get(stage="gzip_seg", model="", prompt="")["count"] == 1
+
+    def test_endpoint(self):
+        app = FastAPI()
+        app.include_router(metrics.router)
+        count_bytes("in", "dicomweb", 10)
+
+        response = TestClient(app).get("/metrics/")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'monailabel_transfer_bytes_total{direction="in",source="dicomweb"} 10' in response.text
+
+
+if __name__ == "__main__":
+    unittest.main()
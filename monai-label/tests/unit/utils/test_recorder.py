@@ -0,0 +1,127 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import torch
+
+from monailabel.utils.others.recorder import RESULT_HASH_HEADER, TraceRecorder, load_trace, result_hash
+from monailabel.utils.others.replay import replay_trace, summarize
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = b""
+
+
+class FakeSession:
+    """Answers with the given result hashes, in order"""
+
+    def __init__(self, hashes):
+        self.hashes = list(hashes)
+        self.calls = []
+
+    def post(self, url, params=None, data=None, headers=None, timeout=None):
+        self.calls.append((time.perf_counter(), url, params, json.loads(data["params"])))
+        return FakeResponse(200, {RESULT_HASH_HEADER: self.hashes.pop(0)})
+
+
+def entry(ts, params, result_hash="a", **kwargs):
+    return {
+        "ts": ts,
+        "model": "m",
+        "image": "1.2.3",
+        "output": "dicom_seg",
+        "params": params,
+        "elapsed": 0.1,
+        "result_hash": result_hash,
+        **kwargs,
+    }
+
+
+class TestResultHash(unittest.TestCase):
+    def test_array(self):
+        mask = np.zeros((4, 8, 8), np.uint8)
+        mask[1, 2:4, 2:4] = 1
+        self.assertEqual(result_hash(mask), result_hash(mask.copy()))
+        self.assertEqual(result_hash(mask), result_hash(torch.from_numpy(mask)))
+        self.assertNotEqual(result_hash(mask), result_hash(np.zeros_like(mask)))
+        self.assertNotEqual(result_hash(mask), result_hash(mask.reshape(8, 4, 8)))
+        self.assertNotEqual(result_hash(mask), result_hash(mask.astype(np.int16)))
+        self.assertIsNone(result_hash(None))
+
+    def test_file_and_string(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            a, b = os.path.join(tmp, "a.nii.gz"), os.path.join(tmp, "b.nii.gz")
+            for path in (a, b):
+                with open(path, "wb") as fp:
+                    fp.write(b"label")
+            self.assertEqual(result_hash(a), result_hash(b))  # content, not the name
+            self.assertEqual(result_hash("/code/predictions/init.nii.gz"), result_hash("/code/predictions/init.nii.gz"))
+
+
+class TestTraceRecorder(unittest.TestCase):
+    def test_record_per_session(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder = TraceRecorder(os.path.join(tmp, "traces"))
+            recorder.record("1.2.3", entry(1.0, {"nninter": "init"}))
+            recorder.record("1.2.3", entry(2.0, {"nninter": True, "pos_points": [[1, 2, 3]]}))
+            recorder.record("4/5", entry(3.0, {}))
+
+            self.assertEqual(sorted(os.listdir(recorder.path)), ["1.2.3.jsonl", "4_5.jsonl"])
+            trace = load_trace(recorder.trace_file("1.2.3"))
+            self.assertEqual(
+                [e["params"] for e in trace], [{"nninter": "init"}, {"nninter": True, "pos_points": [[1, 2, 3]]}]
+            )
+
+
+class TestReplay(unittest.TestCase):
+    def test_hash_differences(self):
+        entries = [
+            entry(0.0, {"nninter": "init"}, "x"),
+            entry(0.1, {"pos_points": [[1, 2, 3]]}, "y"),
+            entry(0.2, {}, None),
+        ]
+        session = FakeSession(["x", "z", "w"])
+        results = replay_trace(entries, "http://server/", speed=0, session=session)
+
+        self.assertEqual([r["hash_match"] for r in results], [True, False, None])
+        self.assertEqual(session.calls[1][1], "http://server/infer/m")
+        self.assertEqual(session.calls[1][2], {"image": "1.2.3", "output": "dicom_seg"})
+        self.assertEqual(session.calls[1][3], {"pos_points": [[1, 2, 3]]})
+
+        summary = summarize(results)
+        self.assertEqual(summary["requests"], 3)
+        self.assertEqual(summary["hash_compared"], 2)
+        self.assertEqual(summary["hash_mismatches"], 1)
+        self.assertEqual(summary["failed"], 0)
+
+    def test_timing_and_uploads(self):
+        entries = [entry(100.0, {}), entry(100.2, {}, file=True), entry(100.4, {})]
+        session = FakeSession(["a", "a"])
+        start = time.perf_counter()
+        results = replay_trace(entries, "http://server", speed=2.0, session=session)
+
+        self.assertEqual(results[1]["skipped"], "upload")
+        self.assertEqual(len(session.calls), 2)
+        self.assertGreaterEqual(session.calls[1][0] - start, 0.2)  # recorded 0.4s apart, at twice the speed
+        self.assertEqual(summarize(results)["skipped"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
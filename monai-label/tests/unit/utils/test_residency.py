@@ -0,0 +1,107 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+import torch
+from torch import nn
+
+from monailabel.utils.others.residency import ModelResidencyManager, module_nbytes
+
+
+def stand_in(seed, features=16):
+    torch.manual_seed(seed)
+    module = nn.Sequential(nn.Linear(features, features), nn.BatchNorm1d(features))
+    module.eval()
+    return module  # 16 * 16 + 16 weights/bias, 3 * 16 + 1 bn buffers/params: 1092 * 4 + 8 bytes
+
+
+class TestModelResidencyManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def manager(self, budget_models, offload="cpu"):
+        nbytes = module_nbytes(stand_in(0))
+        return ModelResidencyManager("cpu", budget_models * nbytes, offload=offload, offload_dir=self.tmp.name)
+
+    def test_nbytes(self):
+        assert module_nbytes(stand_in(0)) == (16 * 16 + 16 + 4 * 16) * 4 + 8
+
+    def test_eviction_order(self):
+        manager = self.manager(2)
+        evicted = []
+        for name in ("a", "b"):
+            manager.register(name, stand_in(0), on_evict=lambda name=name: evicted.append(name))
+        assert manager.resident_bytes() == 2 * module_nbytes(stand_in(0))
+
+        with manager.acquire("a"):  # "b" becomes the least recently used
+            pass
+        manager.register("c", stand_in(0), on_evict=lambda: evicted.append("c"))
+        assert evicted == ["b"]
+
+        with manager.acquire("b"):
+            assert evicted == ["b", "a"]
+        with manager.acquire("a"):
+            assert evicted == ["b", "a", "c"]
+        assert {n for n, m in manager.stats()["models"].items() if m["resident"]} == {"a", "b"}
+
+    def test_pinned(self):
+        manager = self.manager(1)
+        manager.register("a", stand_in(0))
+        manager.register("b", stand_in(1))
+        assert not manager.models["a"].resident
+
+        with manager.acquire("b"):
+            with self.assertRaises(RuntimeError):
+                manager.evict("b")
+            # "b" is in use, so "a" is loaded over the budget instead of evicting it
+            with manager.acquire("a"):
+                assert manager.models["a"].resident and manager.models["b"].resident
+        assert manager.stats()["resident_bytes"] == 2 * module_nbytes(stand_in(0))
+
+    def test_unlimited(self):
+        manager = ModelResidencyManager("cpu", 0)
+        for name in "abc":
+            manager.register(name, stand_in(0))
+        assert all(m.resident for m in manager.models.values())
+
+    def test_disk_reload(self):
+        manager = self.manager(1, offload="disk")
+        a, b = stand_in(0), stand_in(1)
+        a.get_submodule("1").running_mean.fill_(0.5)
+        x = torch.randn(4, 16)
+        with torch.no_grad():
+            expected = a(x)
+
+        manager.register("a", a)
+        manager.register("b", b)  # drops "a"
+        assert all(p.device.type == "meta" for p in a.parameters())
+
+        with manager.acquire("a") as module, torch.no_grad():
+            assert module is a
+            assert all(p.device.type == "cpu" for p in a.parameters())
+            torch.testing.assert_close(module(x), expected, rtol=0, atol=0)
+        assert not manager.models["b"].resident
+        # per device (replica) weight files, no temporary files left behind
+        assert sorted(os.listdir(self.tmp.name)) == ["a.cpu.pt", "b.cpu.pt"]
+
+    def test_invalid_offload(self):
+        with self.assertRaises(ValueError):
+            ModelResidencyManager("cpu", 0, offload="gpu")
+
+
+if __name__ == "__main__":
+    unittest.main()
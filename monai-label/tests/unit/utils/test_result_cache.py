@@ -0,0 +1,111 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from monailabel.utils.others.result_cache import ResultCache, pack_mask, result_key, unpack_mask
+
+
+def label_map(value=1, shape=(8, 32, 32)):
+    mask = np.zeros(shape)
+    mask[2:5, 4:12, 4:12] = value
+    return mask
+
+
+class TestResultKey(unittest.TestCase):
+    def test_normalized_prompts(self):
+        request = {"pos_points": [[1, 2, 3], [4, 5, 6]], "neg_points": [], "texts": [""]}
+        key = result_key("1.2.3", "sam2", "10", request)
+
+        self.assertEqual(key, result_key("1.2.3", "sam2", "10", {"pos_points": [[4.0, 5.0, 6.0], [1, 2, 3]]}))
+        self.assertEqual(key, result_key("1.2.3", "sam2", "10", {"segments": {"1": request}}))
+        self.assertNotEqual(key, result_key("1.2.4", "sam2", "10", request))
+        self.assertNotEqual(key, result_key("1.2.3", "medsam2", "10", request))
+        self.assertNotEqual(key, result_key("1.2.3", "sam2", "11", request))
+        self.assertNotEqual(key, result_key("1.2.3", "sam2", "10", {**request, "one": True}))
+        self.assertNotEqual(key, result_key("1.2.3", "sam2", "10", {"pos_points": [[1, 2, 3]]}))
+        self.assertNotEqual(key, result_key("1.2.3", "sam2", "10", {"neg_points": request["pos_points"]}))
+        self.assertNotEqual(key, result_key("1.2.3", "sam2", "10", {"pos_points": [[1, 2, 3], [4, 6, 5]]}))
+
+
+class TestPackMask(unittest.TestCase):
+    def test_round_trip(self):
+        for mask in (label_map(), label_map(3), label_map(300).astype(np.int32), label_map(0.5), np.zeros((0, 4))):
+            header, data = pack_mask(mask)
+            restored = unpack_mask(header, data)
+            self.assertEqual(restored.dtype, mask.dtype)
+            np.testing.assert_array_equal(restored, mask)
+
+        header, data = pack_mask(label_map())
+        self.assertEqual(header["packing"], "bits")
+        self.assertLess(len(data), label_map().nbytes // 100)
+
+
+class TestResultCache(unittest.TestCase):
+    def test_memory_lru(self):
+        size = len(pack_mask(label_map())[1])
+        cache = ResultCache(max_bytes=2 * size)
+        for key in ("a", "b"):
+            cache.put(key, label_map(), {"label_name": key}, "sam2", "1")
+        cache.get("a")
+        cache.put("c", label_map(), {"label_name": "c"}, "sam2", "1")
+
+        self.assertIsNone(cache.get("b"))
+        mask, result_json = cache.get("a")
+        np.testing.assert_array_equal(mask, label_map())
+        self.assertEqual(result_json, {"label_name": "a"})
+
+        mask[:] = 7  # a copy; the cached result stays the same
+        result_json["label_name"] = "x"
+        np.testing.assert_array_equal(cache.get("a")[0], label_map())
+        self.assertEqual(cache.get("a")[1], {"label_name": "a"})
+
+    def test_disk_tier(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(max_bytes=0, path=tmp, disk_max_bytes=1024 * 1024)
+            cache.put("a", label_map(2), {"label_name": "a"}, "sam2", "1")
+            self.assertEqual(cache.stats()["memory"]["results"], 0)
+
+            # a new cache (e.g. after a restart) finds it on disk and moves it to memory
+            cache = ResultCache(max_bytes=1024 * 1024, path=tmp, disk_max_bytes=1024 * 1024)
+            mask, result_json = cache.get("a")
+            np.testing.assert_array_equal(mask, label_map(2))
+            self.assertEqual(result_json, {"label_name": "a"})
+            self.assertEqual(cache.stats()["memory"]["results"], 1)
+
+            small = ResultCache(max_bytes=0, path=tmp, disk_max_bytes=1)
+            self.assertEqual(small.stats()["disk"]["results"], 0)
+            self.assertEqual(os.listdir(tmp), [])
+
+    def test_model_version(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(max_bytes=1024 * 1024, path=tmp, disk_max_bytes=1024 * 1024)
+            cache.set_version("sam2", "1")
+            cache.put("a", label_map(), {}, "sam2", "1")
+            cache.put("b", label_map(), {}, "medsam2", "1")
+
+            cache.set_version("sam2", "2")  # reloaded
+            self.assertIsNone(cache.get("a"))
+            self.assertIsNotNone(cache.get("b"))
+            self.assertEqual(len(os.listdir(tmp)), 1)
+
+            cache.put("c", label_map(), {}, "sam2", "1")  # ran with the previous weights
+            self.assertIsNone(cache.get("c"))
+
+        self.assertFalse(ResultCache(max_bytes=0).enabled)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+from collections import Counter
+
+import torch
+
+from monailabel.utils.others.router import SessionRouter
+
+
+class CPUReplica:
+    def __init__(self):
+        self.device = torch.device("cpu")
+        self.model = torch.nn.Linear(4, 4)
+        self.sessions = set()
+
+
+def router(num_replicas=4, **kwargs):
+    return SessionRouter([CPUReplica() for _ in range(num_replicas)], **kwargs)
+
+
+def sessions(n):
+    return [f"1.2.840.{i}" for i in range(n)]
+
+
+class TestSessionRouter(unittest.TestCase):
+    def test_sticky(self):
+        r = router()
+        for key in sessions(100):
+            with r.acquire(key) as replica:
+                replica.sessions.add(key)
+            for _ in range(3):
+                with r.acquire(key, relocate=True, spill=True) as replica:  # not saturated
+                    assert key in replica.sessions
+
+    def test_spread(self):
+        r = router(names=[f"{i}:cpu" for i in range(4)])
+        load = Counter(r.route(key) for key in sessions(4000))
+        assert sorted(load) == [0, 1, 2, 3]
+        assert all(600 < n < 1400 for n in load.values()), load
+
+    def test_consistent(self):
+        keys = sessions(2000)
+        before = [router(4).home(k) for k in keys]
+        after = [router(5).home(k) for k in keys]
+        moved = [b for a, b in zip(before, after) if a != b]
+        # only the sessions taken over by the new replica move
+        assert set(moved) == {4}
+        assert len(moved) < len(keys) / 3
+
+    def test_rebalance(self):
+        r = router(2, max_queue_depth=2)
+        key = sessions(1)[0]
+        home = r.home(key)
+
+        release = threading.Event()
+
+        def busy():
+            with r.acquire(key):
+                release.wait()
+
+        threads = [threading.Thread(target=busy) for _ in range(2)]
+        for t in threads:
+            t.start()
+        while r.queue_depth()[home] < 2:
+            time.sleep(0.01)
+
+        try:
+            assert r.route(key) == home  # a request on the session state waits for its replica
+            assert r.route(key, spill=True) == 1 - home
+            assert r.route(key) == home
+
+            with r.acquire(key, relocate=True) as replica:
+                assert replica is r.replicas[1 - home]
+            assert r.route(key) == 1 - home  # the session stays on its new replica
+        finally:
+            release.set()
+            for t in threads:
+                t.join()
+
+        stats = r.stats()
+        assert stats[1 - home]["spilled"] == 1 and stats[1 - home]["relocated_sessions"] == 1
+        assert stats[home]["requests"] == 2 and stats[home]["queue_depth"] == 0
+
+    def test_requests_serialized(self):
+        r = router(2)
+        running = Counter()
+        overlap = []
+
+        def work(key):
+            with r.acquire(key) as replica:
+                running[id(replica)] += 1
+                overlap.append(running[id(replica)])
+                time.sleep(0.005)
+                running[id(replica)] -= 1
+
+        threads = [threading.Thread(target=work, args=(key,)) for key in sessions(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert max(overlap) == 1
+        assert sum(s["requests"] for s in r.stats()) == 20
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            SessionRouter([])
+        with self.assertRaises(ValueError):
+            SessionRouter([CPUReplica(), CPUReplica()], names=["cpu", "cpu"])
+
+
+if __name__ == "__main__":
+    unittest.main()
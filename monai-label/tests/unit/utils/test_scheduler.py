@@ -0,0 +1,143 @@
+# Copyright (c) MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+import torch
+
+from monailabel.utils.others.scheduler import Priority, WorkScheduler, device_key, infer_priority
+
+
+class StubTask:
+    """Work which records when it ran (and how many of its class ran at the same time)"""
+
+    def __init__(self, scheduler, order, device="cpu"):
+        self.scheduler = scheduler
+        self.order = order
+        self.device = device
+        self.lock = threading.Lock()
+        self.running = {}
+        self.max_running = {}
+
+    def run(self, name, priority, seconds=0.01):
+        with self.scheduler.slot(priority, self.device):
+            with self.lock:
+                self.order.append(name)
+                self.running[priority] = self.running.get(priority, 0) + 1
+                self.max_running[priority] = max(self.max_running.get(priority, 0), self.running[priority])
+            time.sleep(seconds)
+            with self.lock:
+                self.running[priority] -= 1
+
+    def start(self, name, priority, seconds=0.01):
+        t = threading.Thread(target=self.run, args=(name, priority, seconds))
+        t.start()
+        return t
+
+
+def wait_for(condition, timeout=5.0):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            raise TimeoutError("condition not met")
+        time.sleep(0.001)
+
+
+def waiting(scheduler, device="cpu"):
+    return sum(c["waiting"] for c in scheduler.stats().get(device, {}).values())
+
+
+class TestWorkScheduler(unittest.TestCase):
+    def test_priority_order_under_contention(self):
+        scheduler = WorkScheduler(slots=1)
+        order = []
+        task = StubTask(scheduler, order)
+
+        threads = []
+        with scheduler.slot(Priority.INFER, "cpu"):
+            for name, priority in [
+                ("scoring-1", Priority.SCORING),
+                ("batch", Priority.BATCH),
+                ("scoring-2", Priority.SCORING),
+                ("infer", Priority.INFER),
+                ("interactive", Priority.INTERACTIVE),
+            ]:
+                threads.append(task.start(name, priority))
+                wait_for(lambda: waiting(scheduler) == len(threads))
+        for t in threads:
+            t.join()
+
+        self.assertEqual(order, ["interactive", "infer", "batch", "scoring-1", "scoring-2"])  # fifo within a class
+
+    def test_class_limits(self):
+        scheduler = WorkScheduler(slots=2, limits={"scoring": 1})
+        task = StubTask(scheduler, [])
+        threads = [task.start(f"scoring-{i}", Priority.SCORING, 0.02) for i in range(4)]
+        threads += [task.start(f"interactive-{i}", Priority.INTERACTIVE, 0.02) for i in range(2)]
+        for t in threads:
+            t.join()
+
+        self.assertEqual(task.max_running[Priority.SCORING], 1)
+        self.assertLessEqual(sum(task.max_running.values()), 3)
+        self.assertEqual(scheduler.limits[Priority.INTERACTIVE], 2)
+
+    def test_preempted_at_boundaries(self):
+        scheduler = WorkScheduler(slots=1)
+        order = []
+        task = StubTask(scheduler, order)
+
+        def scoring():
+            for i in range(6):  # one slot per simulation
+                task.run(f"simulation-{i}", Priority.SCORING, 0.02)
+
+        long_job = threading.Thread(target=scoring)
+        long_job.start()
+        wait_for(lambda: "simulation-1" in order)
+        task.run("click", Priority.INTERACTIVE)
+        long_job.join()
+
+        self.assertLess(order.index("click"), order.index("simulation-5"))
+        self.assertEqual(len(order), 7)
+
+    def test_devices_and_disabled(self):
+        scheduler = WorkScheduler(slots=1)
+        with scheduler.slot(Priority.SCORING, "cuda:0"):
+            done = threading.Event()
+            threading.Thread(target=lambda: StubTask(scheduler, [], "cuda:1").run("x", 1) or done.set()).start()
+            self.assertTrue(done.wait(5))  # other device, not held back
+
+        with scheduler.slot(Priority.INFER, torch.device("cpu")):
+            self.assertEqual(scheduler.stats()["cpu"]["infer"]["running"], 1)  # same key as "cpu"
+        if torch.cuda.is_available():
+            self.assertEqual(device_key("cuda"), f"cuda:{torch.cuda.current_device()}")
+
+        disabled = WorkScheduler(slots=0)
+        with disabled.slot(Priority.SCORING, "cpu"):
+            with disabled.slot(Priority.SCORING, "cpu"):
+                pass
+        self.assertEqual(disabled.stats(), {})
+
+    def test_infer_priority(self):
+        self.assertEqual(infer_priority({}), Priority.INFER)
+        self.assertEqual(infer_priority({"pos_points": [[1, 2, 3]]}), Priority.INTERACTIVE)
+        self.assertEqual(infer_priority({"nninter": "init"}), Priority.INTERACTIVE)
+        self.assertEqual(infer_priority({}, interactive=True), Priority.INTERACTIVE)
+        self.assertEqual(infer_priority({"priority": "batch", "pos_points": [[1, 2, 3]]}), Priority.BATCH)
+        self.assertEqual(Priority.parse("scoring"), Priority.SCORING)
+        # invalid values fall back to the derived class
+        self.assertEqual(infer_priority({"priority": "foo"}), Priority.INFER)
+        self.assertEqual(infer_priority({"priority": 9, "pos_points": [[1, 2, 3]]}), Priority.INTERACTIVE)
+
+
+if __name__ == "__main__":
+    unittest.main()